@@ -0,0 +1,222 @@
+""" Generator of synthetic, valid uC programs for benchmarking.
+
+    Generated programs parse with UCParser and also run to completion:
+    every function only reads variables it has initialized, loops have
+    constant bounds, array subscripts stay in range, divisors are non-zero
+    constants and assigned values are kept small with a modulo.
+"""
+
+import random
+
+
+class ProgramGenerator:
+    """ Generates a uC program from a few size parameters.
+        functions:
+            Number of functions besides main.
+        statements:
+            Number of statements per function body.
+        expr_depth:
+            Depth of the generated expression trees.
+        line_length:
+            Statements are packed into lines of up to this many characters.
+        comment_size:
+            Size of the block comment before each function (0 for none).
+        string_size:
+            Size of the string printed by each function.
+        array_size:
+            Number of elements of each global array initializer.
+        loop_iterations:
+            Bound of the generated loops.
+        kernels:
+            Number of nested loops over an array added to every function,
+            each computing loop-invariant values and products of the
+            loop counters.
+        helpers:
+            Number of small functions defined first, each called by the
+            kernels in turn.
+        seed:
+            Seed of the random generator; equal parameters give equal programs.
+    """
+
+    ops = ('+', '-', '*', '+', '-', '/', '%')
+    modulo = 1009
+
+    def __init__(self, functions=10, statements=20, expr_depth=3, line_length=80,
+                 comment_size=0, string_size=16, array_size=8, loop_iterations=10,
+                 kernels=0, helpers=0, seed=0):
+        self.functions = functions
+        self.statements = statements
+        self.expr_depth = expr_depth
+        self.line_length = line_length
+        self.comment_size = comment_size
+        self.string_size = string_size
+        self.array_size = max(array_size, 1)
+        self.loop_iterations = loop_iterations
+        self.kernels = kernels
+        self.helpers = helpers
+        self.seed = seed
+
+    def generate(self):
+        """ Returns the source of the program. """
+        self.random = random.Random(self.seed)
+        self.out = []
+        self.arrays = ['g_arr%d' % i for i in range(2)]
+        for name in self.arrays:
+            values = ', '.join(str(self.random.randint(0, 99)) for _ in range(self.array_size))
+            self.out.append('int %s[%d] = {%s};\n' % (name, self.array_size, values))
+        self.out.append('int g_count = 0;\n\n')
+        for i in range(self.helpers):
+            self.out.append('int h%d(int x, int y) {\n    return (x * %d + y) %% %d;\n}\n\n' % (
+                i, i + 2, self.modulo))
+        for i in range(self.functions):
+            self._function(i)
+        self._main()
+        return ''.join(self.out)
+
+    def _comment(self):
+        if self.comment_size > 0:
+            words = []
+            size = 0
+            while size < self.comment_size:
+                word = self.random.choice(('lorem', 'ipsum', 'dolor', 'sit', 'amet', 'uC'))
+                words.append(word)
+                size += len(word) + 1
+            self.out.append('/* ' + ' '.join(words)[:self.comment_size] + ' */\n')
+
+    def _string(self):
+        letters = 'abcdefghijklmnopqrstuvwxyz     '
+        return '"' + ''.join(self.random.choice(letters) for _ in range(self.string_size)) + '"'
+
+    def _expr(self, names, depth):
+        """ A random expression over the readable names. Products are
+            reduced right away, so no intermediate value exceeds 32 bits.
+        """
+        if depth <= 0 or self.random.random() < 0.2:
+            choice = self.random.random()
+            if choice < 0.5 and names:
+                return self.random.choice(names)
+            if choice < 0.7:
+                return '%s[%d]' % (self.random.choice(self.arrays),
+                                   self.random.randrange(self.array_size))
+            return str(self.random.randint(0, 99))
+        op = self.random.choice(self.ops)
+        left = self._expr(names, depth - 1)
+        if op == '*':
+            return '((%s * %d) %% %d)' % (left, self.random.randint(0, 9), self.modulo)
+        if op in ('/', '%'):
+            right = str(self.random.randint(1, 99))
+        else:
+            right = self._expr(names, depth - 1)
+        return '(%s %s %s)' % (left, op, right)
+
+    def _cond(self, names):
+        op = self.random.choice(('<', '>', '==', '!=', '<='))
+        return '%s %s %s' % (self._expr(names, 1), op, self._expr(names, 1))
+
+    def _value(self, names):
+        return '(%s) %% %d' % (self._expr(names, self.expr_depth), self.modulo)
+
+    def _statements(self, scope, readonly, count, nesting):
+        """ Returns a list of statements, each a list of lines. Declared
+            variables are appended to scope, so later statements use them.
+            Loop counters are in readonly and are never assigned.
+        """
+        body = []
+        for _ in range(count):
+            names = scope + readonly
+            kind = self.random.random()
+            if kind < 0.25 or len(scope) < 2:
+                var = 'v%d' % len(names)
+                body.append(['int %s = %s;' % (var, self._value(names))])
+                scope.append(var)
+            elif kind < 0.55:
+                var = self.random.choice(scope)
+                body.append(['%s = %s;' % (var, self._value(names))])
+            elif kind < 0.65:
+                array = self.random.choice(self.arrays)
+                index = self.random.randrange(self.array_size)
+                body.append(['%s[%d] = %s;' % (array, index, self._value(names))])
+            elif kind < 0.75 and nesting < 2:
+                inner = self._statements(list(scope), readonly, 2, nesting + 1)
+                other = self._statements(list(scope), readonly, 1, nesting + 1)
+                body.append(['if (%s) {' % self._cond(names)] + self._indent(inner) +
+                            ['} else {'] + self._indent(other) + ['}'])
+            elif kind < 0.85 and nesting < 2:
+                loop = 'i%d' % len(names)
+                inner = self._statements(list(scope), readonly + [loop], 2, nesting + 1)
+                update = '%s[%s %% %d] = (%s[%s %% %d] + %s) %% %d;' % (
+                    self.arrays[0], loop, self.array_size,
+                    self.arrays[0], loop, self.array_size, loop, self.modulo)
+                body.append(['for (int %s = 0; %s < %d; %s++) {' % (
+                    loop, loop, self.loop_iterations, loop)] +
+                    self._indent(inner + [[update]]) + ['}'])
+            elif kind < 0.9 and nesting < 2:
+                counter = 'w%d' % len(names)
+                inner = self._statements(list(scope), readonly + [counter], 1, nesting + 1)
+                body.append(['int %s = 0;' % counter,
+                             'while (%s < %d) {' % (counter, self.loop_iterations)] +
+                            self._indent(inner + [['%s = %s + 1;' % (counter, counter)]]) +
+                            ['}'])
+                readonly = readonly + [counter]
+            else:
+                body.append(['g_count += 1;'])
+        return body
+
+    def _indent(self, statements):
+        return ['    ' + line for lines in statements for line in lines]
+
+    def _pack(self, statements):
+        """ Packs single-line statements into lines of up to line_length
+            characters.
+        """
+        lines = []
+        for stmt in statements:
+            if len(stmt) == 1 and lines and lines[-1][1] and \
+                    len(lines[-1][0]) + 1 + len(stmt[0]) <= self.line_length:
+                lines[-1][0] += ' ' + stmt[0]
+            else:
+                for line in stmt:
+                    lines.append([line, len(stmt) == 1])
+        return ['    ' + line for line, _ in lines]
+
+    def _function(self, index):
+        self._comment()
+        names = ['a', 'b']
+        body = self._statements(names, [], self.statements, 0)
+        for k in range(self.kernels):
+            body.append(self._kernel(k))
+        body.append(['print(%s, %s);' % (self._string(), names[-1])])
+        self.out.append('int f%d(int a, int b) {\n' % index)
+        self.out.append('\n'.join(self._pack(body)) + '\n')
+        self.out.append('    return %s;\n}\n\n' % self._value(names))
+
+    def _kernel(self, index):
+        """ A loop nest updating every element of the first array. """
+        outer, inner = 'x%d' % index, 'y%d' % index
+        n = self.loop_iterations
+        element = '%s[(%s * %d + %s) %% %d]' % (self.arrays[0], outer, n, inner, self.array_size)
+        value = '(a * %d + b) %% %d + %s * %d' % (index + 3, self.modulo, inner, index + 5)
+        if self.helpers:
+            update = '%s = h%d(%s, %s);' % (element, index % self.helpers, element, value)
+        else:
+            update = '%s = (%s + %s) %% %d;' % (element, element, value, self.modulo)
+        return ['for (int %s = 0; %s < %d; %s++) {' % (outer, outer, n, outer),
+                '    for (int %s = 0; %s < %d; %s++) {' % (inner, inner, n, inner),
+                '        ' + update,
+                '    }',
+                '}']
+
+    def _main(self):
+        self.out.append('int main() {\n    int total = 0;\n')
+        for i in range(self.functions):
+            self.out.append('    total = (total + f%d(%d, total)) %% %d;\n' % (
+                i, self.random.randint(0, 99), self.modulo))
+        self.out.append('    print("total: ", total, " count: ", g_count);\n')
+        self.out.append('    return 0;\n}\n')
+
+
+def generate_program(**params):
+    """ Returns the source of a program generated with the given
+        ProgramGenerator parameters.
+    """
+    return ProgramGenerator(**params).generate()
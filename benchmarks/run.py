@@ -0,0 +1,376 @@
+""" Benchmark suite of the uC compiler.
+
+    Runs every measurement over a set of generated programs (scenarios),
+    and prints the results, or compares them with stored baselines:
+
+        $ python3 -m benchmarks.run                 # print the results
+        $ python3 -m benchmarks.run --save          # store them as baselines
+        $ python3 -m benchmarks.run --compare       # compare with baselines
+        $ python3 -m benchmarks.run -s long_lines   # a single scenario
+
+    Timings depend on the machine, so the baselines are not part of the
+    repository: store them with --save on the machine that compares.
+
+    Metrics ending in _per_s are throughputs (higher is better), the others
+    are costs (lower is better).
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from interpreter.bytecode import BytecodeCompiler
+from interpreter.evaluator import Evaluator
+from interpreter.transpiler import PythonProgram, compile_program
+from interpreter.vm import VM
+from ir.cfg import build_cfgs
+from ir.dataflow import Liveness, ReachingDefinitions
+from optimizer.cse import CommonSubexpressions
+from optimizer.dce import DeadCodeEliminator
+from optimizer.inline import Inliner
+from optimizer.loops import LoopOptimizer
+from parser.lex.uc_lexer import UCLexer
+from parser.ast_diff import diff_ast
+from parser.uc_parser import UCParser
+from parser.unparse import write_source
+from semantic.resolver import NameResolver
+from semantic.type_checker import TypeChecker
+
+from .generator import generate_program
+
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), 'baselines.json')
+
+# Parameters of ProgramGenerator for every scenario
+SCENARIOS = {
+    'default': dict(functions=20),
+    'many_functions': dict(functions=150, statements=10),
+    'long_lines': dict(functions=5, statements=100, line_length=4000),
+    'deep_exprs': dict(functions=10, expr_depth=8),
+    'comments_strings': dict(functions=20, comment_size=4000, string_size=1000),
+    'big_arrays': dict(functions=5, array_size=10000),
+    'loops': dict(functions=5, statements=30, loop_iterations=150),
+    'loop_kernels': dict(functions=5, statements=10, loop_iterations=60, kernels=3),
+    'helper_calls': dict(functions=5, statements=10, loop_iterations=60, kernels=3, helpers=2),
+    'huge_function': dict(functions=1, statements=4000),
+}
+
+
+def _lexer_error(msg, line, column):
+    raise RuntimeError('%s at %d:%d' % (msg, line, column))
+
+
+def _semantic_error(lineno, message):
+    raise RuntimeError('%s: %s' % (lineno, message))
+
+
+def count_nodes(node):
+    """ Number of nodes of the tree rooted at node. """
+    count = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(child for _, child in node.children())
+    return count
+
+
+def best_time(func, repeat):
+    """ Best wall time of repeat calls of func, and its last result. """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def measure_lex(context, repeat):
+    lexer = UCLexer(_lexer_error)
+    lexer.build()
+
+    def run():
+        lexer.input(context.source)
+        count = 0
+        while lexer.token():
+            count += 1
+        return count
+
+    elapsed, tokens = best_time(run, repeat)
+    return {'lex_tokens_per_s': tokens / elapsed}
+
+
+def measure_parse(context, repeat):
+    parser = context.parser
+    elapsed, ast = best_time(lambda: parser.parse(context.source), repeat)
+    context.ast = ast
+    context.nodes = count_nodes(ast)
+    return {'parse_nodes_per_s': context.nodes / elapsed}
+
+
+def measure_show(context, repeat):
+
+    def run():
+        buf = io.StringIO()
+        context.ast.show(buf=buf, showcoord=True)
+        return len(buf.getvalue())
+
+    elapsed, size = best_time(run, repeat)
+    return {'show_bytes_per_s': size / elapsed}
+
+
+def measure_diff(context, repeat):
+    """ Diffs the program against a new parse of it, and against the
+        program of another seed, which leaves more to the tree edit
+        distance.
+    """
+    parser = context.parser
+    same = parser.parse(context.source)
+    other = parser.parse(generate_program(**dict(context.params, seed=1)))
+    same_elapsed, _ = best_time(lambda: diff_ast(context.ast, same), repeat)
+    other_elapsed, _ = best_time(lambda: diff_ast(context.ast, other), repeat)
+    return {'diff_nodes_per_s': context.nodes / same_elapsed,
+            'diff_dissimilar_nodes_per_s': context.nodes / other_elapsed}
+
+
+def measure_unparse(context, repeat):
+    elapsed, _ = best_time(lambda: write_source(context.ast, io.StringIO()), repeat)
+    return {'unparse_nodes_per_s': context.nodes / elapsed}
+
+
+def measure_resolve(context, repeat):
+
+    def run():
+        NameResolver(_semantic_error).resolve(context.ast)
+
+    elapsed, _ = best_time(run, repeat)
+    return {'resolve_nodes_per_s': context.nodes / elapsed}
+
+
+def measure_typecheck(context, repeat):
+
+    def run():
+        TypeChecker(_semantic_error).check(context.ast)
+
+    elapsed, _ = best_time(run, repeat)
+    return {'typecheck_nodes_per_s': context.nodes / elapsed}
+
+
+def measure_dataflow(context, repeat):
+
+    def run():
+        for cfg in build_cfgs(context.ast):
+            definitions = ReachingDefinitions(cfg)
+            Liveness(cfg, definitions.accesses)
+
+    elapsed, _ = best_time(run, repeat)
+    return {'dataflow_nodes_per_s': context.nodes / elapsed}
+
+
+def measure_eval(context, repeat):
+    compile_time, evaluator = best_time(lambda: Evaluator(context.ast), repeat)
+    run_time, _ = best_time(lambda: evaluator.run(io.StringIO(), io.StringIO()), repeat)
+    return {'eval_compile_nodes_per_s': context.nodes / compile_time,
+            'eval_run_ms': run_time * 1000}
+
+
+def measure_vm(context, repeat):
+    compile_time, module = best_time(lambda: BytecodeCompiler().compile(context.ast), repeat)
+    vm = VM(module)
+    run_time, _ = best_time(lambda: vm.run(io.StringIO(), io.StringIO()), repeat)
+    return {'vm_compile_nodes_per_s': context.nodes / compile_time,
+            'vm_run_ms': run_time * 1000}
+
+
+def measure_py(context, repeat):
+    compile_time, code = best_time(lambda: compile_program(context.ast), repeat)
+    program = PythonProgram(code)
+    run_time, _ = best_time(lambda: program.run(io.StringIO(), io.StringIO()), repeat)
+    return {'py_compile_nodes_per_s': context.nodes / compile_time,
+            'py_run_ms': run_time * 1000}
+
+
+def measure_optimize(context, repeat):
+    # The passes change the tree: each repetition gets its own
+    asts = []
+    for _ in range(repeat):
+        ast = context.parser.parse(context.source)
+        NameResolver(_semantic_error).resolve(ast)
+        TypeChecker(_semantic_error).check(ast)
+        asts.append(ast)
+
+    def run():
+        ast = asts.pop()
+        Inliner().inline(ast)
+        CommonSubexpressions().eliminate(ast)
+        LoopOptimizer().optimize(ast)
+        DeadCodeEliminator().eliminate(ast)
+        return ast
+
+    elapsed, ast = best_time(run, repeat)
+    evaluator = Evaluator(ast)
+    run_time, _ = best_time(lambda: evaluator.run(io.StringIO(), io.StringIO()), repeat)
+    return {'optimize_nodes_per_s': context.nodes / elapsed,
+            'opt_eval_run_ms': run_time * 1000}
+
+
+def measure_memory(context, repeat):
+    tracemalloc.start()
+    try:
+        context.parser.parse(context.source)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'parse_peak_mb': peak / (1 << 20)}
+
+
+def measure_run_memory(context, repeat):
+    evaluator = Evaluator(context.ast)
+    tracemalloc.start()
+    try:
+        evaluator.run(io.StringIO(), io.StringIO())
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'eval_run_peak_kb': peak / 1024}
+
+
+# Measurements run in order for every scenario. Each one takes the
+# scenario context and the number of repetitions, and returns its metrics.
+MEASUREMENTS = [
+    measure_lex,
+    measure_parse,
+    measure_show,
+    measure_unparse,
+    measure_diff,
+    measure_resolve,
+    measure_typecheck,
+    measure_dataflow,
+    measure_eval,
+    measure_vm,
+    measure_py,
+    measure_optimize,
+    measure_memory,
+    measure_run_memory,
+]
+
+
+class Context:
+    """ State shared by the measurements of a scenario. """
+
+    def __init__(self, source, parser, params):
+        self.source = source
+        self.parser = parser
+        self.params = params
+        self.ast = None
+        self.nodes = 0
+
+
+def run_scenario(name, parser, repeat):
+    """ Runs all the measurements over the program of a scenario. """
+    params = SCENARIOS[name]
+    context = Context(generate_program(**params), parser, params)
+    results = {}
+    for measure in MEASUREMENTS:
+        results.update(measure(context, repeat))
+    return results
+
+
+def higher_is_better(metric):
+    return metric.endswith('_per_s')
+
+
+def table(results):
+    """ Returns the lines of the report of results. """
+    lines = ['{:<18} {:<26} {:>14}'.format('scenario', 'metric', 'current')]
+    for scenario, metrics in results.items():
+        for metric, value in metrics.items():
+            lines.append('{:<18} {:<26} {:>14.1f}'.format(scenario, metric, value))
+    return lines
+
+
+def compare(baselines, results, threshold):
+    """ Returns the lines of the comparison report, and the number of
+        metrics that regressed by more than threshold (a fraction).
+    """
+    lines = ['{:<18} {:<26} {:>14} {:>14} {:>8}'.format(
+        'scenario', 'metric', 'baseline', 'current', 'change')]
+    regressions = 0
+    for scenario, metrics in results.items():
+        for metric, value in metrics.items():
+            base = baselines.get(scenario, {}).get(metric)
+            if base is None:
+                change = 'new'
+            else:
+                ratio = value / base if base else 1.0
+                gain = ratio - 1 if higher_is_better(metric) else 1 - ratio
+                change = '{:+.1%}'.format(gain)
+                if gain < -threshold:
+                    change += ' !'
+                    regressions += 1
+            lines.append('{:<18} {:<26} {:>14} {:>14} {:>8}'.format(
+                scenario, metric,
+                '-' if base is None else '{:.1f}'.format(base),
+                '{:.1f}'.format(value), change))
+    return lines, regressions
+
+
+def main(argv=None):
+    args = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    args.add_argument('-s', '--scenario', action='append', choices=sorted(SCENARIOS),
+                      help='scenario to run (default: all)')
+    args.add_argument('-r', '--repeat', type=int, default=3,
+                      help='repetitions of each measurement (best is kept)')
+    args.add_argument('-t', '--threshold', type=float, default=0.2,
+                      help='slowdown fraction reported as a regression')
+    args.add_argument('--save', action='store_true',
+                      help='store the results as the new baselines')
+    args.add_argument('--compare', action='store_true',
+                      help='compare the results with the baselines stored by --save')
+    args.add_argument('--baselines', default=BASELINES_PATH,
+                      help='baselines file')
+    opts = args.parse_args(argv)
+
+    baselines = {}
+    if os.path.exists(opts.baselines):
+        with open(opts.baselines) as f:
+            baselines = json.load(f)
+    elif opts.compare:
+        print('No baselines in %s: store them with --save first.' % opts.baselines)
+        return 1
+
+    parser = UCParser()
+    results = {}
+    for name in opts.scenario or list(SCENARIOS):
+        results[name] = run_scenario(name, parser, opts.repeat)
+
+    regressions = 0
+    if opts.compare:
+        lines, regressions = compare(baselines, results, opts.threshold)
+    else:
+        lines = table(results)
+    print('\n'.join(lines))
+
+    if opts.save:
+        for name, metrics in results.items():
+            baselines.setdefault(name, {}).update(metrics)
+        with open(opts.baselines, 'w') as f:
+            json.dump(baselines, f, indent=4, sort_keys=True)
+            f.write('\n')
+        print('Baselines saved to %s.' % opts.baselines)
+        return 0
+
+    if regressions:
+        print('%d metric(s) regressed by more than %.0f%%.' % (regressions, opts.threshold * 100))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
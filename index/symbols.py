@@ -0,0 +1,327 @@
+""" Persistent index of the symbols of many uC files.
+
+    Records, in a SQLite database, where the functions and global variables
+    of every file are defined, and where names are called or referred to:
+
+        $ python3 -m index.symbols -d symbols.db update src/    # index a tree
+        $ python3 -m index.symbols -d symbols.db find main      # query a name
+
+    Updates are incremental: a file whose modification time and size did
+    not change is skipped without being read, and one whose content hash
+    did not change is not parsed again. Queries only read the database.
+"""
+
+import argparse
+import hashlib
+import io
+import os
+import sqlite3
+import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+
+from parser import ast_classes
+from parser.uc_parser import UCParser
+
+# Version of the schema, stored as the user_version of the database: an
+# index of another version is rebuilt
+SCHEMA_VERSION = 2
+
+SCHEMA = '''
+CREATE TABLE files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    hash TEXT NOT NULL,
+    mtime INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    error TEXT
+);
+CREATE TABLE symbols (
+    file INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    line INTEGER,
+    col INTEGER,
+    scope TEXT
+);
+CREATE INDEX symbols_name ON symbols (name, kind);
+CREATE INDEX symbols_file ON symbols (file);
+'''
+
+# Kinds of symbols
+FUNCTION = 'function'
+GLOBAL = 'global'
+DECLARATION = 'declaration'
+CALL = 'call'
+REFERENCE = 'reference'
+
+
+Location = namedtuple('Location', ['path', 'line', 'column', 'kind', 'scope'])
+Location.__doc__ = """ Where a name occurs.
+        path:
+            Absolute path of the file.
+        line, column:
+            Coordinates of the name.
+        kind:
+            FUNCTION or GLOBAL for a definition, DECLARATION for the
+            prototype of a function, CALL for a function call and REFERENCE
+            for any other use.
+        scope:
+            Name of the function the name occurs in, None outside of them.
+"""
+
+
+def extract_symbols(ast):
+    """ List of the (name, kind, line, column, scope) of the symbols of the
+        Program ast. The names declared by local declarations and
+        parameters are left out.
+    """
+    rows = []
+    stack = []
+    for gdecl in ast.gdecls or ():
+        if isinstance(gdecl, ast_classes.FuncDef):
+            scope = gdecl.decl.name.name
+            rows.append(_row(gdecl.decl.name, FUNCTION, None))
+            stack.extend((scope, node) for node in (gdecl.decl.type, gdecl.body))
+        elif isinstance(gdecl, ast_classes.GlobalDecl):
+            for decl in gdecl.decls:
+                kind = DECLARATION if isinstance(decl.type, ast_classes.FuncDecl) else GLOBAL
+                rows.append(_row(decl.name, kind, None))
+                stack.append((None, decl))
+        while stack:
+            scope, node = stack.pop()
+            if isinstance(node, ast_classes.ID):
+                rows.append(_row(node, REFERENCE, scope))
+            elif isinstance(node, ast_classes.FuncCall):
+                rows.append(_row(node.name, CALL, scope))
+                if node.args is not None:
+                    stack.append((scope, node.args))
+            elif not isinstance(node, ast_classes.VarDecl):
+                stack.extend((scope, child) for _, child in node.children())
+    return rows
+
+
+def _row(name, kind, scope):
+    coord = name.coord
+    if coord is None:
+        return name.name, kind, None, None, scope
+    return name.name, kind, coord.line, coord.column, scope
+
+
+# Parser of the process, created on its first scan
+_parser = None
+
+
+def _scan(task):
+    """ Reads the file of a (path, hash) task. Returns its path, content
+        hash, modification time, size, symbols and parse errors, with None
+        as symbols if the content still has the given hash.
+    """
+    global _parser
+    path, known_hash = task
+    with open(path, 'rb') as f:
+        stat = os.fstat(f.fileno())
+        data = f.read()
+    digest = hashlib.sha1(data).hexdigest()
+    if digest == known_hash:
+        return path, digest, stat.st_mtime_ns, stat.st_size, None, None
+
+    if _parser is None:
+        _parser = UCParser()
+    # The parser prints its errors
+    out = io.StringIO()
+    error = None
+    try:
+        with redirect_stdout(out):
+            ast = _parser.parse(data.decode('utf-8', 'replace'))
+    except Exception as e:
+        ast = None
+        error = str(e)
+    rows = extract_symbols(ast) if ast is not None else []
+    error = error or out.getvalue().strip() or (None if ast is not None else 'does not parse')
+    return path, digest, stat.st_mtime_ns, stat.st_size, rows, error
+
+
+class SymbolIndex:
+    """ Index of the symbols of uC files, stored in the SQLite database at
+        path (in memory by default).
+    """
+
+    def __init__(self, path=':memory:'):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('PRAGMA synchronous = NORMAL')
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        if version != SCHEMA_VERSION:
+            with self.connection:
+                self.connection.execute('DROP TABLE IF EXISTS files')
+                self.connection.execute('DROP TABLE IF EXISTS symbols')
+                self.connection.executescript(SCHEMA)
+                self.connection.execute('PRAGMA user_version = %d' % SCHEMA_VERSION)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Updates
+
+    def update(self, paths, jobs=1):
+        """ Indexes the files at paths that changed since they were last
+            indexed, parsing them with jobs worker processes (one per CPU if
+            None), and forgets those that no longer exist. Returns the
+            numbers of files indexed, unchanged and removed.
+        """
+        known = {path: (file_id, digest, mtime, size) for file_id, path, digest, mtime, size
+                 in self.connection.execute('SELECT id, path, hash, mtime, size FROM files')}
+        tasks = []
+        missing = []
+        unchanged = 0
+        for path in sorted({os.path.abspath(path) for path in paths}):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                if path in known:
+                    missing.append(path)
+                continue
+            record = known.get(path)
+            if record is not None and (record[2], record[3]) == (stat.st_mtime_ns, stat.st_size):
+                unchanged += 1
+            else:
+                tasks.append((path, record[1] if record is not None else None))
+
+        if jobs != 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(jobs) as pool:
+                results = list(pool.map(_scan, tasks, chunksize=16))
+        else:
+            results = [_scan(task) for task in tasks]
+
+        indexed = 0
+        with self.connection:
+            for path, digest, mtime, size, rows, error in results:
+                record = known.get(path)
+                if rows is None:
+                    unchanged += 1
+                    self.connection.execute('UPDATE files SET mtime = ?, size = ? WHERE id = ?',
+                                            (mtime, size, record[0]))
+                    continue
+                indexed += 1
+                if record is not None:
+                    file_id = record[0]
+                    self.connection.execute('DELETE FROM symbols WHERE file = ?', (file_id,))
+                    self.connection.execute(
+                        'UPDATE files SET hash = ?, mtime = ?, size = ?, error = ? WHERE id = ?',
+                        (digest, mtime, size, error, file_id))
+                else:
+                    file_id = self.connection.execute(
+                        'INSERT INTO files (path, hash, mtime, size, error) VALUES (?, ?, ?, ?, ?)',
+                        (path, digest, mtime, size, error)).lastrowid
+                self.connection.executemany(
+                    'INSERT INTO symbols (file, name, kind, line, col, scope) '
+                    'VALUES (%d, ?, ?, ?, ?, ?)' % file_id, rows)
+        self.remove(missing)
+        return indexed, unchanged, len(missing)
+
+    def update_tree(self, root, jobs=1):
+        """ Updates the index with the .uc files under the directory root,
+            forgetting the indexed files under it that no longer exist.
+            Returns the numbers of files indexed, unchanged and removed.
+        """
+        root = os.path.abspath(root)
+        paths = set()
+        for directory, _, names in os.walk(root):
+            paths.update(os.path.join(directory, name) for name in names if name[-3:] == '.uc')
+        prefix = os.path.join(root, '')
+        paths.update(path for path, in self.connection.execute(
+            'SELECT path FROM files WHERE substr(path, 1, ?) = ?', (len(prefix), prefix)))
+        return self.update(paths, jobs)
+
+    def remove(self, paths):
+        """ Forgets the files at paths. """
+        with self.connection:
+            for path in paths:
+                row = self.connection.execute('SELECT id FROM files WHERE path = ?',
+                                              (os.path.abspath(path),)).fetchone()
+                if row is not None:
+                    self.connection.execute('DELETE FROM symbols WHERE file = ?', row)
+                    self.connection.execute('DELETE FROM files WHERE id = ?', row)
+
+    # Queries
+
+    def find(self, name, kinds=None):
+        """ List of the Locations of name, of the given kinds (all of them
+            if None), sorted by path and position.
+        """
+        query = 'SELECT f.path, s.line, s.col, s.kind, s.scope FROM symbols s ' \
+                'JOIN files f ON f.id = s.file WHERE s.name = ?'
+        params = [name]
+        if kinds is not None:
+            query += ' AND s.kind IN (%s)' % ', '.join('?' * len(kinds))
+            params.extend(kinds)
+        query += ' ORDER BY f.path, s.line, s.col'
+        return [Location(*row) for row in self.connection.execute(query, params)]
+
+    def definitions(self, name):
+        """ Locations of the definitions of the function or global name. """
+        return self.find(name, (FUNCTION, GLOBAL))
+
+    def declarations(self, name):
+        """ Locations of the prototypes of the function name. """
+        return self.find(name, (DECLARATION,))
+
+    def calls(self, name):
+        """ Locations of the calls of the function name. """
+        return self.find(name, (CALL,))
+
+    def references(self, name):
+        """ Locations of the other uses of name. """
+        return self.find(name, (REFERENCE,))
+
+    def files(self):
+        """ List of the (path, parse errors or None) of the indexed files,
+            sorted by path.
+        """
+        return self.connection.execute('SELECT path, error FROM files ORDER BY path').fetchall()
+
+
+def main(argv=None):
+    args = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    args.add_argument('-d', '--database', default='symbols.db', help='index database')
+    args.add_argument('-j', '--jobs', type=int, default=None,
+                      help='worker processes (default: one per CPU)')
+    commands = args.add_subparsers(dest='command')
+    update = commands.add_parser('update', help='index the .uc files of directories or files')
+    update.add_argument('paths', nargs='+')
+    find = commands.add_parser('find', help='list the definitions and uses of names')
+    find.add_argument('names', nargs='+')
+    opts = args.parse_args(argv)
+    if opts.command is None:
+        args.print_usage()
+        return 1
+
+    with SymbolIndex(opts.database) as index:
+        if opts.command == 'update':
+            totals = [0, 0, 0]
+            files = [path for path in opts.paths if not os.path.isdir(path)]
+            counts = [index.update(files, opts.jobs)] if files else []
+            counts.extend(index.update_tree(path, opts.jobs) for path in opts.paths
+                          if os.path.isdir(path))
+            for count in counts:
+                totals = [total + n for total, n in zip(totals, count)]
+            print('%d file(s) indexed, %d unchanged, %d removed.' % tuple(totals))
+        else:
+            for name in opts.names:
+                for location in index.find(name):
+                    print('%s:%s:%s: %s %s%s' % (
+                        location.path, location.line, location.column, location.kind, name,
+                        '' if location.scope is None else ' in ' + location.scope))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
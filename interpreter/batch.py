@@ -0,0 +1,147 @@
+""" Batch runs of uC programs against directories of test cases.
+
+    A case is an input file name.in, with the expected output of the
+    programs on it in name.out, as in tests/io (a case without .out passes
+    if the program runs to the end). Each program is compiled once, in the
+    parent process, and its Module is sent once to each worker of a process
+    pool, which runs it with the VM on the inputs, under a time and a step
+    limit. Results are reported as they come, in the order of the runs.
+"""
+
+import io
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob
+
+from parser.uc_parser import UCParser
+
+from .bytecode import compile_source
+from .runtime import StepLimitExceeded, UCRuntimeError
+from .vm import VM
+
+# Default limits of each run: seconds and VM steps (loop iterations and calls)
+TIME_LIMIT = 10.0
+STEP_LIMIT = 10 ** 8
+
+# Outcomes of a run
+PASS = 'PASS'
+FAIL = 'FAIL'
+ERROR = 'ERROR'
+TIMEOUT = 'TIME'
+STEPS = 'STEPS'
+
+
+class TimeLimitExceeded(UCRuntimeError):
+    """ Raised when a run takes longer than its time limit. """
+
+    def __init__(self):
+        super().__init__('Time limit exceeded')
+
+
+def find_cases(directory):
+    """ List of (name, input path, expected output path or None) of the
+        cases in directory, sorted by name.
+    """
+    cases = []
+    for path in sorted(glob(os.path.join(directory, '*.in'))):
+        expected = path[:-3] + '.out'
+        cases.append((os.path.basename(path[:-3]), path,
+                      expected if os.path.exists(expected) else None))
+    return cases
+
+
+# State of the worker processes, set by _start_worker
+_modules = None
+_steps = None
+_time_limit = None
+_vms = {}
+
+
+def _start_worker(modules, steps, time_limit):
+    global _modules, _steps, _time_limit
+    _modules = modules
+    _steps = steps
+    _time_limit = time_limit
+    if time_limit and hasattr(signal, 'setitimer'):
+        signal.signal(signal.SIGALRM, _time_out)
+
+
+def _time_out(signum, frame):
+    raise TimeLimitExceeded()
+
+
+def _run_case(task):
+    """ Runs program number index on a case, in a worker. Returns the
+        outcome of the run, its time in seconds and the reason of a failure.
+    """
+    index, input_path, expected_path = task
+    vm = _vms.get(index)
+    if vm is None:
+        vm = _vms[index] = VM(_modules[index], _steps)
+    out = io.StringIO()
+    timed = _time_limit and hasattr(signal, 'setitimer')
+    start = time.perf_counter()
+    try:
+        with open(input_path) as stdin:
+            if timed:
+                signal.setitimer(signal.ITIMER_REAL, _time_limit)
+            try:
+                vm.run(stdin, out)
+            finally:
+                if timed:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+    except TimeLimitExceeded as e:
+        return TIMEOUT, time.perf_counter() - start, str(e)
+    except StepLimitExceeded as e:
+        return STEPS, time.perf_counter() - start, str(e)
+    except UCRuntimeError as e:
+        return ERROR, time.perf_counter() - start, str(e)
+    except Exception as e:
+        # The other cases still run: an unreadable input, or a bug
+        return ERROR, time.perf_counter() - start, '%s: %s' % (e.__class__.__name__, e)
+    elapsed = time.perf_counter() - start
+    if expected_path is not None:
+        with open(expected_path) as f:
+            if out.getvalue() != f.read():
+                return FAIL, elapsed, 'wrong output'
+    return PASS, elapsed, ''
+
+
+def run_batch(programs, directory, report, jobs=None, time_limit=TIME_LIMIT,
+              steps=STEP_LIMIT):
+    """ Runs each of the programs, a list of (name, source) pairs, on each
+        case of directory, with jobs worker processes (one per CPU by
+        default). Calls report(line) with a line per run, and per program
+        that does not compile. Returns the number of runs that passed and
+        the total number of runs.
+    """
+    cases = find_cases(directory)
+    parser = UCParser()
+    modules = []
+    names = []
+    failed = 0
+    for name, source in programs:
+        errors = []
+        module = compile_source(source, lambda lineno, message: errors.append(
+            '%s: %s' % (lineno, message)), parser)
+        if module is None:
+            report('%-5s %s does not compile %s' % (ERROR, name, '; '.join(errors)))
+            failed += len(cases)
+            continue
+        names.append(name)
+        modules.append(module)
+    tasks = [(index, path, expected) for index in range(len(modules))
+             for _, path, expected in cases]
+    passed = 0
+    if tasks:
+        with ProcessPoolExecutor(jobs, initializer=_start_worker,
+                                 initargs=(modules, steps, time_limit)) as pool:
+            results = pool.map(_run_case, tasks)
+            for (index, path, _), (outcome, elapsed, reason) in zip(tasks, results):
+                if outcome == PASS:
+                    passed += 1
+                line = '%-5s %s %s %.3fs' % (outcome, names[index], os.path.basename(path), elapsed)
+                report('%s %s' % (line, reason) if reason else line)
+    return passed, len(tasks) + failed
@@ -0,0 +1,997 @@
+""" Register-based bytecode for uC programs.
+
+    Every instruction takes four ints of the code array of its function:
+    an opcode and three operands a, b and c. Operands name registers (slots
+    of the frame of the running call), constants (indexes in the constant
+    pool of the module), globals, functions or code offsets. The locals of a
+    function take its first registers, its parameters first, then its
+    numeric constants, and the temporaries of expressions the registers
+    after them.
+"""
+
+import hashlib
+from array import array
+from collections import OrderedDict
+
+from parser import ast_classes
+from parser.uc_parser import UCParser
+from semantic.resolver import NameResolver
+from semantic.type_checker import TypeChecker
+from semantic.uc_types import ArrayType, CharType, FloatType
+
+from .layout import (array_size, decays, element_type, flatten, initializer, is_pointer,
+                     is_row, stride, typecode, zero_value)
+from .runtime import char_codes, unescape
+
+# Opcodes. r[x] is register x, K[x] constant x and G[x] global x.
+OPCODES = (
+    'MOVE',     # r[a] = r[b]
+    'LOADK',    # r[a] = K[b]
+    'GETG',     # r[a] = G[b]
+    'SETG',     # G[a] = r[b]
+    'ADD',      # r[a] = r[b] + r[c], on 32-bit ints
+    'SUB',
+    'MUL',
+    'DIV',
+    'MOD',
+    'FADD',     # r[a] = r[b] + r[c], on floats
+    'FSUB',
+    'FMUL',
+    'FDIV',
+    'EQ',       # r[a] = 1 if r[b] == r[c] else 0
+    'NE',
+    'LT',
+    'LE',
+    'GT',
+    'GE',
+    'SAME',     # r[a] = 1 if r[b] is r[c] else 0
+    'NSAME',
+    'NEG',      # r[a] = -r[b], on 32-bit ints
+    'FNEG',
+    'NOT',      # r[a] = 0 if r[b] else 1
+    'BOOL',     # r[a] = 1 if r[b] else 0
+    'JMP',      # go to a
+    'JMPF',     # go to b if not r[a]
+    'JMPT',     # go to b if r[a]
+    'JNEQ',     # go to c if not r[a] == r[b]
+    'JNNE',
+    'JNLT',
+    'JNLE',
+    'JNGT',
+    'JNGE',
+    'ALOAD',    # r[a] = r[b][r[c]]
+    'ASTORE',   # r[a][r[b]] = r[c]
+    'PLOAD',    # r[a] = element r[c] after pointer r[b]
+    'PSTORE',   # element r[b] after pointer r[a] = r[c]
+    'DEREF',    # r[a] = element at pointer r[b]
+    'PSET',     # element at pointer r[a] = r[b]
+    'ADDRL',    # r[a] = pointer to register b
+    'ADDRG',    # r[a] = pointer to G[b]
+    'ADDRE',    # r[a] = pointer to r[b][r[c]]
+    'ADDRP',    # r[a] = pointer to element r[c] after pointer r[b]
+    'DECAY',    # r[a] = pointer to the first element of array r[b]
+    'CAST',     # r[a] = r[b] cast to int (c=0), float (1) or char (2)
+    'CALL',     # r[a] = function b called with the registers from c on
+    'RET',      # return r[a]
+    'RETV',     # return nothing
+    'NEWARR',   # r[a] = new flat array described by K[b]
+    'PRINT',    # print r[a] as a value (b=0), a char (1) or a char array (2)
+    'PRINTK',   # print the text K[a]
+    'READ',     # r[a] = next input token, as an int (b=0), float (1) or char (2)
+    'ASSERT',   # stop if not r[a], at the coordinates K[b]
+)
+
+# The opcodes, numbered in the order of OPCODES
+(MOVE, LOADK, GETG, SETG, ADD, SUB, MUL, DIV, MOD, FADD, FSUB, FMUL, FDIV, EQ, NE, LT, LE, GT,
+ GE, SAME, NSAME, NEG, FNEG, NOT, BOOL, JMP, JMPF, JMPT, JNEQ, JNNE, JNLT, JNLE, JNGT, JNGE,
+ ALOAD, ASTORE, PLOAD, PSTORE, DEREF, PSET, ADDRL, ADDRG, ADDRE, ADDRP, DECAY, CAST, CALL,
+ RET, RETV, NEWARR, PRINT, PRINTK, READ, ASSERT) = range(len(OPCODES))
+
+_INT_OPS = {'+': ADD, '-': SUB, '*': MUL, '/': DIV, '%': MOD}
+_FLOAT_OPS = {'+': FADD, '-': FSUB, '*': FMUL, '/': FDIV}
+_COMPARE_OPS = {'==': EQ, '!=': NE, '<': LT, '<=': LE, '>': GT, '>=': GE}
+# Comparison -> branch taken when it is false
+_BRANCH_OPS = {EQ: JNEQ, NE: JNNE, LT: JNLT, LE: JNLE, GT: JNGT, GE: JNGE}
+# Operand holding the target of each jump
+_TARGETS = {JMP: 1, JMPF: 2, JMPT: 2}
+_TARGETS.update((op, 3) for op in _BRANCH_OPS.values())
+# Instructions that only write r[a], from operands read before
+_RESULT_OPS = frozenset((MOVE, LOADK, GETG, ADD, SUB, MUL, DIV, MOD, FADD, FSUB, FMUL, FDIV,
+                         EQ, NE, LT, LE, GT, GE, SAME, NSAME, NEG, FNEG, NOT, BOOL, ALOAD,
+                         PLOAD, DEREF, ADDRL, ADDRG, ADDRE, ADDRP, DECAY, CAST, CALL, NEWARR))
+_CAST_CODES = {'int': 0, 'float': 1, 'char': 2}
+
+# Nodes that compute a value, and can also be used as statements
+_EXPRESSIONS = (ast_classes.ArrayRef, ast_classes.Assignment, ast_classes.BinaryOp,
+                ast_classes.Cast, ast_classes.Constant, ast_classes.ExprList,
+                ast_classes.FuncCall, ast_classes.ID, ast_classes.UnaryOp)
+
+
+def _has_effects(node):
+    """ Whether evaluating the expression node may assign variables. """
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (ast_classes.Assignment, ast_classes.FuncCall)) or \
+                (isinstance(node, ast_classes.UnaryOp) and node.op in ('++', '--', 'p++', 'p--')):
+            return True
+        stack.extend(child for _, child in node.children())
+    return False
+
+
+class Function:
+    """ Compiled uC function.
+        name:
+            Its name.
+        code:
+            array of ints, four per instruction.
+        frame:
+            Initial frame of its calls. Numeric constants have registers of
+            their own, holding them from the start of the call.
+        nparams:
+            Number of parameters, passed in its first registers.
+    """
+    __slots__ = ('name', 'code', 'frame', 'nparams')
+
+    def __init__(self, name, code, frame, nparams):
+        self.name = name
+        self.code = code
+        self.frame = frame
+        self.nparams = nparams
+
+
+class Module:
+    """ Compiled uC program.
+        constants:
+            Constant pool shared by all its functions.
+        functions:
+            Its Functions, indexed by the operand b of CALL.
+        init:
+            Function initializing the globals.
+        nglobals:
+            Number of globals.
+        main:
+            Index of main in functions, or None.
+    """
+
+    def __init__(self):
+        self.constants = []
+        self.functions = []
+        self.init = None
+        self.nglobals = 0
+        self.main = None
+
+
+def _type_code(type):
+    return 1 if type is FloatType else 2 if type is CharType else 0
+
+
+class BytecodeCompiler:
+    """ Compiles a checked program into a Module.
+
+        Nodes are compiled by tasks taken from an explicit stack, so deep
+        expressions and nested statements do not hit the recursion limit.
+        Expression tasks leave the register holding their value on a value
+        stack. Temporaries are allocated above the locals, and a register
+        is reused once all the registers above it are free.
+
+        The program must have been resolved by the NameResolver and type
+        checked without errors by the TypeChecker.
+    """
+
+    def __init__(self):
+        self.module = Module()
+        self._constants = {}
+        self._types = TypeChecker(None)
+        self._global_slots = {}
+        self._function_slots = {}
+        self._methods = {}
+        # Decls of the parameters, which hold arrays as pointers
+        self._params = set()
+
+    def compile(self, program):
+        """ Returns the Module of program. """
+        module = self.module
+        gdecls = [gdecl for gdecl in program.gdecls if isinstance(gdecl, ast_classes.GlobalDecl)]
+        self._begin_function(None, gdecls)
+        for gdecl in gdecls:
+            for decl in gdecl.decls:
+                self._drain(self._decl, decl)
+        module.init = self._end_function('<globals>')
+        for gdecl in program.gdecls:
+            if isinstance(gdecl, ast_classes.FuncDef):
+                symbol = gdecl.decl.name.symbol
+                slot = self._function_slot(symbol)
+                self._begin_function(gdecl, [gdecl.body])
+                self._drain(self._stmt, gdecl.body)
+                module.functions[slot] = self._end_function(symbol.name)
+                if symbol.name == 'main':
+                    module.main = slot
+        module.nglobals = len(self._global_slots)
+        return module
+
+    # Tasks
+
+    def _drain(self, func, arg):
+        self._tasks = tasks = [(func, arg)]
+        while tasks:
+            func, arg = tasks.pop()
+            func(arg)
+
+    def _then(self, *tasks):
+        """ Schedules tasks, (func, arg) pairs, to run in the given order
+            before the tasks already scheduled.
+        """
+        self._tasks.extend(reversed(tasks))
+
+    # Functions and registers
+
+    def _begin_function(self, funcdef, roots):
+        """ Starts the code of a function, whose statements are under the
+            nodes roots.
+        """
+        self._code = array('i')
+        self._locals = {}
+        self._nparams = 0
+        self._loops = []
+        self._values = []
+        self._jumps = []
+        self._label = -1
+        if funcdef is not None:
+            args = funcdef.decl.type.args
+            if isinstance(args, ast_classes.ParamList):
+                for param in args.params:
+                    if isinstance(param, ast_classes.Decl):
+                        self._local(param.name.symbol)
+                        self._params.add(param)
+                        self._nparams += 1
+        # Locals are given registers as they are met, so the constants and
+        # temporaries only start after all of them
+        nlocals = len(self._locals)
+        numbers = {(int, 0), (int, 1), (float, 0.0), (float, 1.0)}
+        stack = list(roots)
+        while stack:
+            node = stack.pop()
+            if isinstance(node, ast_classes.Decl):
+                nlocals += 1
+            elif isinstance(node, ast_classes.Constant) and node.type != 'string':
+                numbers.add((node.value.__class__, node.value))
+            elif is_row(node):
+                numbers.add((int, stride(node.uc_type)))
+            for _, child in node.children():
+                stack.append(child)
+        self._numbers = {key: nlocals + i for i, key in enumerate(sorted(numbers, key=repr))}
+        # Registers below are never freed
+        self._nlocals = nlocals
+        self._fixed = nlocals + len(numbers)
+        self._top = self._nregs = self._fixed
+        self._freed = set()
+
+    def _end_function(self, name):
+        self._emit(RETV, 0, 0, 0)
+        frame = [0] * self._nregs
+        for (_, value), reg in self._numbers.items():
+            frame[reg] = value
+        return Function(name, self._code, frame, self._nparams)
+
+    def _number(self, value):
+        """ Register holding a numeric constant. """
+        reg = self._numbers.get((value.__class__, value))
+        if reg is None:
+            reg = self._alloc()
+            self._emit(LOADK, reg, self._constant(value), 0)
+        return reg
+
+    def _local(self, symbol):
+        slot = self._locals.get(symbol)
+        if slot is None:
+            slot = self._locals[symbol] = len(self._locals)
+        return slot
+
+    def _global(self, symbol):
+        slot = self._global_slots.get(symbol)
+        if slot is None:
+            slot = self._global_slots[symbol] = len(self._global_slots)
+        return slot
+
+    def _function_slot(self, symbol):
+        slot = self._function_slots.get(symbol)
+        if slot is None:
+            slot = self._function_slots[symbol] = len(self.module.functions)
+            self.module.functions.append(None)
+        return slot
+
+    def _alloc(self, count=1):
+        reg = self._top
+        self._top += count
+        if self._top > self._nregs:
+            self._nregs = self._top
+        return reg
+
+    def _free(self, reg):
+        if reg < self._fixed:
+            return
+        self._freed.add(reg)
+        while self._top - 1 in self._freed:
+            self._top -= 1
+            self._freed.discard(self._top)
+
+    def _constant(self, value):
+        # 1 == 1.0, so the type is part of the key. Other constants, such as
+        # array templates, are not shared.
+        key = (value.__class__, value) if value.__class__ in (int, float, str) else None
+        index = self._constants.get(key) if key is not None else None
+        if index is None:
+            index = len(self.module.constants)
+            self.module.constants.append(value)
+            if key is not None:
+                self._constants[key] = index
+        return index
+
+    def _emit(self, op, a, b, c):
+        self._code.extend((op, a, b, c))
+        return len(self._code) - 4
+
+    def _patch(self, pc, target=None):
+        """ Makes the jump at pc go to target (by default, the next
+            instruction emitted).
+        """
+        if target is None:
+            target = self._label = len(self._code)
+        self._code[pc + _TARGETS[self._code[pc]]] = target
+
+    def _retarget(self, reg, target):
+        """ Makes the last instruction, which computed reg, store its result
+            in the register target instead, saving a move. Returns the
+            register holding the result.
+        """
+        code = self._code
+        if reg < self._fixed or not code or self._label == len(code):
+            return reg
+        last = len(code) - 4
+        if code[last + 1] != reg or code[last] not in _RESULT_OPS:
+            return reg
+        code[last + 1] = target
+        self._free(reg)
+        return target
+
+    def _branch(self, cond):
+        """ Emits a jump taken when the value in cond is false, and returns
+            its pc. A comparison just computed into cond is fused with it.
+        """
+        code = self._code
+        last = len(code) - 4
+        if cond >= self._fixed and code and self._label != len(code) \
+                and code[last] in _BRANCH_OPS and code[last + 1] == cond:
+            op, b, c = code[last], code[last + 2], code[last + 3]
+            del code[last:]
+            self._free(cond)
+            return self._emit(_BRANCH_OPS[op], b, c, 0)
+        self._free(cond)
+        return self._emit(JMPF, cond, 0, 0)
+
+    # Expressions
+
+    def _expr(self, node):
+        cls = node.__class__
+        method = self._methods.get(cls)
+        if method is None:
+            method = self._methods[cls] = getattr(self, 'expr_' + cls.__name__)
+        method(node)
+
+    def expr_Constant(self, node):
+        if node.type != 'string':
+            self._values.append(self._number(node.value))
+            return
+        reg = self._alloc()
+        value = array('b', char_codes(unescape(node.value)))
+        self._emit(LOADK, reg, self._constant(value), 0)
+        self._values.append(reg)
+
+    def expr_ID(self, node):
+        symbol = node.symbol
+        if symbol.scope != 0:
+            self._values.append(self._local(symbol))
+            return
+        reg = self._alloc()
+        self._emit(GETG, reg, self._global(symbol), 0)
+        self._values.append(reg)
+
+    def expr_BinaryOp(self, node):
+        if node.op in ('&&', '||'):
+            self._then((self._expr, node.left), (self._logic_test, node),
+                       (self._expr, node.right), (self._logic_end, node))
+        else:
+            self._then((self._expr, node.left), (self._expr, node.right),
+                       (self._binary, node))
+
+    def _binary(self, node):
+        right = self._values.pop()
+        left = self._values.pop()
+        type = node.left.uc_type
+        pointers = is_pointer(node.left, self._params) or is_pointer(node.right, self._params)
+        if isinstance(type, ArrayType) and pointers:
+            # Compared as addresses
+            left = self._decay(left, node.left, type)
+            right = self._decay(right, node.right, type)
+        self._free(right)
+        self._free(left)
+        op = node.op
+        if op in _COMPARE_OPS:
+            code = _COMPARE_OPS[op]
+            if isinstance(type, ArrayType) and not pointers:
+                code = SAME if op == '==' else NSAME
+        elif type is FloatType:
+            code = _FLOAT_OPS[op]
+        else:
+            code = _INT_OPS[op]
+        reg = self._alloc()
+        self._emit(code, reg, left, right)
+        self._values.append(reg)
+
+    def _logic_test(self, node):
+        left = self._values.pop()
+        self._jumps.append(self._emit(JMPF if node.op == '&&' else JMPT, left, 0, 0))
+        self._free(left)
+
+    def _logic_end(self, node):
+        right = self._values.pop()
+        self._free(right)
+        reg = self._alloc()
+        self._emit(BOOL, reg, right, 0)
+        end = self._emit(JMP, 0, 0, 0)
+        self._patch(self._jumps.pop())
+        self._emit(MOVE, reg, self._number(0 if node.op == '&&' else 1), 0)
+        self._patch(end)
+        self._values.append(reg)
+
+    def expr_UnaryOp(self, node):
+        op = node.op
+        if op in ('++', '--', 'p++', 'p--'):
+            self._then((self._lvalue, node.expr), (self._increment, node))
+        elif op == '&':
+            self._then((self._lvalue, node.expr), (self._address, node))
+        elif op != '+':
+            self._then((self._expr, node.expr), (self._unary, node))
+        else:
+            self._then((self._expr, node.expr))
+
+    def _unary(self, node):
+        value = self._values.pop()
+        self._free(value)
+        reg = self._alloc()
+        if node.op == '!':
+            self._emit(NOT, reg, value, 0)
+        elif node.op == '*':
+            self._emit(DEREF, reg, value, 0)
+        else:
+            self._emit(FNEG if node.expr.uc_type is FloatType else NEG, reg, value, 0)
+        self._values.append(reg)
+
+    def _address(self, node):
+        kind, a, b = self._values.pop()
+        self._free_location((kind, a, b))
+        reg = self._alloc()
+        if kind == 'local':
+            self._emit(ADDRL, reg, a, 0)
+        elif kind == 'global':
+            self._emit(ADDRG, reg, a, 0)
+        elif kind == 'elem':
+            self._emit(ADDRE, reg, a, b)
+        elif kind == 'pelem':
+            self._emit(ADDRP, reg, a, b)
+        else:
+            self._emit(MOVE, reg, a, 0)
+        self._values.append(reg)
+
+    def _increment(self, node):
+        location = self._values.pop()
+        type = node.expr.uc_type
+        one = self._number(1.0 if type is FloatType else 1)
+        current = self._load(location)
+        if node.op[0] == 'p' and location[0] == 'local':
+            old = self._alloc()
+            self._emit(MOVE, old, current, 0)
+        else:
+            old = current
+        new = location[1] if location[0] == 'local' else self._alloc()
+        ops = _FLOAT_OPS if type is FloatType else _INT_OPS
+        self._emit(ops[node.op[-1]], new, current, one)
+        self._store(location, new)
+        result = old if node.op[0] == 'p' else new
+        for reg in (new, old, current, one):
+            if reg != result:
+                self._free(reg)
+        self._free_location(location)
+        self._values.append(result)
+
+    def expr_Assignment(self, node):
+        if not isinstance(node.lvalue, ast_classes.ID) and _has_effects(node.rvalue):
+            self._then((self._lvalue, node.lvalue), (self._pin, None), (self._expr, node.rvalue),
+                       (self._assign, node))
+        else:
+            self._then((self._lvalue, node.lvalue), (self._expr, node.rvalue),
+                       (self._assign, node))
+
+    def _pin(self, _):
+        """ Copies the locals the location on top of the value stack is made
+            of, so it stays the same while the value stored in it is computed.
+        """
+        kind, a, b = self._values.pop()
+        regs = [a, b] if kind != 'deref' else [a]
+        for i, reg in enumerate(regs):
+            if reg < self._nlocals:
+                regs[i] = self._alloc()
+                self._emit(MOVE, regs[i], reg, 0)
+        self._values.append((kind, regs[0], regs[1] if kind != 'deref' else b))
+
+    def _assign(self, node):
+        value = self._decay(self._values.pop(), node.rvalue, node.lvalue.uc_type)
+        location = self._values.pop()
+        if node.op == '=' and location[0] == 'local':
+            value = self._retarget(value, location[1])
+        elif node.op != '=':
+            type = node.lvalue.uc_type
+            current = self._load(location)
+            result = location[1] if location[0] == 'local' else self._alloc()
+            ops = _FLOAT_OPS if type is FloatType else _INT_OPS
+            self._emit(ops[node.op[0]], result, current, value)
+            self._free(value)
+            if current != result:
+                self._free(current)
+            value = result
+        self._store(location, value)
+        self._free_location(location)
+        self._values.append(value)
+
+    def _decay(self, reg, node, target):
+        """ Converts the value in reg of the expression node to the type
+            target, returning the register holding it.
+        """
+        if decays(node, target, self._params):
+            self._free(reg)
+            new = self._alloc()
+            self._emit(DECAY, new, reg, 0)
+            return new
+        return reg
+
+    def expr_ArrayRef(self, node):
+        self._then((self._lvalue, node), (self._array_load, node))
+
+    def _array_load(self, node):
+        location = self._values.pop()
+        self._free_location(location)
+        kind, array, offset = location
+        reg = self._alloc()
+        if is_row(node):
+            # A row is a pointer to its first element
+            self._emit(ADDRP if kind == 'pelem' else ADDRE, reg, array, offset)
+        else:
+            self._emit(PLOAD if kind == 'pelem' else ALOAD, reg, array, offset)
+        self._values.append(reg)
+
+    def _offset(self, strides):
+        """ Pops the registers of the subscripts of an element, and returns
+            a register holding its offset: the sum of their products by
+            strides.
+        """
+        indexes = self._values[-len(strides):]
+        del self._values[-len(strides):]
+        offset = None
+        for index, n in zip(indexes, strides):
+            if n != 1:
+                scale = self._number(n)
+                self._free(index)
+                self._free(scale)
+                reg = self._alloc()
+                self._emit(MUL, reg, index, scale)
+                index = reg
+            if offset is not None:
+                self._free(index)
+                self._free(offset)
+                reg = self._alloc()
+                self._emit(ADD, reg, offset, index)
+                index = reg
+            offset = index
+        return offset
+
+    def expr_Cast(self, node):
+        self._then((self._expr, node.expr), (self._cast, node))
+
+    def _cast(self, node):
+        type = node.new_type.names[0]
+        if node.expr.uc_type.name == type:
+            return
+        value = self._values.pop()
+        self._free(value)
+        reg = self._alloc()
+        self._emit(CAST, reg, value, _CAST_CODES[type])
+        self._values.append(reg)
+
+    def expr_ExprList(self, node):
+        self._then(*([(self._expr, e) for e in node.exprs] + [(self._sequence, len(node.exprs))]))
+
+    def _sequence(self, count):
+        last = self._values.pop()
+        for _ in range(count - 1):
+            self._free(self._values.pop())
+        self._values.append(last)
+
+    def expr_FuncCall(self, node):
+        if node.args is None:
+            args = []
+        elif isinstance(node.args, ast_classes.ExprList):
+            args = node.args.exprs
+        else:
+            args = [node.args]
+        params = node.name.uc_type.params
+        base = self._alloc(max(len(args), 1))
+        tasks = []
+        for i, (arg, param) in enumerate(zip(args, params)):
+            tasks.append((self._expr, arg))
+            tasks.append((self._argument, (base + i, arg, param)))
+        tasks.append((self._call, (node, base, len(args))))
+        self._then(*tasks)
+
+    def _argument(self, item):
+        reg, arg, param = item
+        value = self._decay(self._values.pop(), arg, param)
+        value = self._retarget(value, reg)
+        if value != reg:
+            self._emit(MOVE, reg, value, 0)
+            self._free(value)
+
+    def _call(self, item):
+        node, base, count = item
+        self._emit(CALL, base, self._function_slot(node.name.symbol), base)
+        for reg in range(base + 1, base + count):
+            self._free(reg)
+        self._values.append(base)
+
+    # Lvalues, as locations: ('local', reg, 0), ('global', slot, 0),
+    # ('elem', array reg, offset reg), ('pelem', pointer reg, offset reg)
+    # and ('deref', pointer reg, 0)
+
+    def _lvalue(self, node):
+        if isinstance(node, ast_classes.ID):
+            symbol = node.symbol
+            if symbol.scope != 0:
+                self._values.append(('local', self._local(symbol), 0))
+            else:
+                self._values.append(('global', self._global(symbol), 0))
+        elif isinstance(node, ast_classes.ArrayRef):
+            base, terms = flatten(node)
+            self._then(*([(self._expr, base)] + [(self._expr, s) for s, _ in terms] +
+                         [(self._element, (base, [n for _, n in terms]))]))
+        else:
+            self._then((self._expr, node.expr), (self._pointed, node))
+
+    def _element(self, item):
+        base, strides = item
+        offset = self._offset(strides)
+        array = self._values.pop()
+        kind = 'pelem' if is_pointer(base, self._params) else 'elem'
+        self._values.append((kind, array, offset))
+
+    def _pointed(self, node):
+        self._values.append(('deref', self._values.pop(), 0))
+
+    def _load(self, location):
+        """ Returns a register holding the value at location. """
+        kind, a, b = location
+        if kind == 'local':
+            return a
+        reg = self._alloc()
+        if kind == 'global':
+            self._emit(GETG, reg, a, 0)
+        elif kind == 'elem':
+            self._emit(ALOAD, reg, a, b)
+        elif kind == 'pelem':
+            self._emit(PLOAD, reg, a, b)
+        else:
+            self._emit(DEREF, reg, a, 0)
+        return reg
+
+    def _store(self, location, reg):
+        kind, a, b = location
+        if kind == 'local':
+            if a != reg:
+                self._emit(MOVE, a, reg, 0)
+        elif kind == 'global':
+            self._emit(SETG, a, reg, 0)
+        elif kind == 'elem':
+            self._emit(ASTORE, a, b, reg)
+        elif kind == 'pelem':
+            self._emit(PSTORE, a, b, reg)
+        else:
+            self._emit(PSET, a, reg, 0)
+
+    def _free_location(self, location):
+        kind, a, b = location
+        if kind in ('elem', 'pelem'):
+            self._free(b)
+            self._free(a)
+        elif kind == 'deref':
+            self._free(a)
+
+    # Statements
+
+    def _stmt(self, node):
+        if node is None:
+            return
+        if isinstance(node, _EXPRESSIONS):
+            self._then((self._expr, node), (self._discard, None))
+            return
+        cls = node.__class__
+        method = self._methods.get(cls)
+        if method is None:
+            method = self._methods[cls] = getattr(self, 'stmt_' + cls.__name__)
+        method(node)
+
+    def _discard(self, _):
+        self._free(self._values.pop())
+
+    def stmt_Compound(self, node):
+        self._then(*[(self._stmt, item) for item in node.block_items or []])
+
+    def stmt_DeclList(self, node):
+        self._then(*[(self._decl, decl) for decl in node.decls])
+
+    def stmt_Decl(self, node):
+        self._decl(node)
+
+    def stmt_EmptyStatement(self, node):
+        pass
+
+    def _decl(self, node):
+        symbol = node.name.symbol
+        if symbol.kind == 'func':
+            return
+        type = self._types.symbol_type(symbol)
+        if isinstance(type, ArrayType):
+            self._array_decl(node, symbol, type)
+        elif node.init is None:
+            zero = zero_value(type)
+            if zero is None:
+                reg = self._alloc()
+                self._emit(LOADK, reg, self._constant(zero), 0)
+            else:
+                reg = self._number(zero)
+            self._values.append(reg)
+            self._decl_store(symbol)
+        else:
+            self._then((self._expr, node.init), (self._decl_init, (symbol, node.init, type)))
+
+    def _decl_init(self, item):
+        symbol, init, target = item
+
+        self._values.append(self._decay(self._values.pop(), init, target))
+        self._decl_store(symbol)
+
+    def _decl_store(self, symbol):
+        """ Stores the value on top of the value stack in symbol. """
+        value = self._values.pop()
+        if symbol.scope == 0:
+            self._emit(SETG, self._global(symbol), value, 0)
+        else:
+            target = self._local(symbol)
+            value = self._retarget(value, target)
+            self._store(('local', target, 0), value)
+        self._free(value)
+
+    def _array_decl(self, node, symbol, type):
+        reg = self._alloc()
+        if node.init is None:
+            elem = element_type(type)
+            spec = ('zeros', array_size(type, node.coord), typecode(elem), zero_value(elem))
+            exprs = []
+        else:
+            template, exprs = initializer(node.init, type)
+            spec = ('copy', template)
+        self._emit(NEWARR, reg, self._constant(spec), 0)
+        self._values.append(reg)
+        tasks = []
+        for offset, expr in exprs:
+            tasks.append((self._expr, expr))
+            tasks.append((self._element_init, (reg, offset)))
+        tasks.append((self._decl_store, symbol))
+        self._then(*tasks)
+
+    def _element_init(self, item):
+        array, offset = item
+        value = self._values.pop()
+        index = self._number(offset)
+        self._emit(ASTORE, array, index, value)
+        self._free(index)
+        self._free(value)
+
+    def stmt_If(self, node):
+        self._then((self._expr, node.cond), (self._if_test, None), (self._stmt, node.iftrue),
+                   (self._if_else, node))
+
+    def _if_test(self, _):
+        self._jumps.append(self._branch(self._values.pop()))
+
+    def _if_else(self, node):
+        test = self._jumps.pop()
+        if node.iffalse is None:
+            self._patch(test)
+            return
+        self._jumps.append(self._emit(JMP, 0, 0, 0))
+        self._patch(test)
+        self._then((self._stmt, node.iffalse), (self._if_end, None))
+
+    def _if_end(self, _):
+        self._patch(self._jumps.pop())
+
+    def stmt_While(self, node):
+        self._loop_begin(None)
+        self._then((self._expr, node.cond), (self._loop_test, None),
+                   (self._stmt, node.statement), (self._loop_end, None))
+
+    def stmt_For(self, node):
+        tasks = []
+        if isinstance(node.initial, ast_classes.DeclList):
+            tasks.append((self._stmt, node.initial))
+        elif node.initial is not None:
+            tasks.append((self._stmt, node.initial))
+        tasks.append((self._loop_begin, node.cond is not None))
+        if node.cond is not None:
+            tasks.append((self._expr, node.cond))
+            tasks.append((self._loop_test, None))
+        tasks.append((self._stmt, node.statement))
+        if node.next is not None:
+            tasks.append((self._stmt, node.next))
+        tasks.append((self._loop_end, None))
+        self._then(*tasks)
+
+    def _loop_begin(self, _):
+        self._label = len(self._code)
+        self._loops.append((self._label, []))
+
+    def _loop_test(self, _):
+        self._loops[-1][1].append(self._branch(self._values.pop()))
+
+    def _loop_end(self, _):
+        start, exits = self._loops.pop()
+        self._emit(JMP, start, 0, 0)
+        for pc in exits:
+            self._patch(pc)
+
+    def stmt_Break(self, node):
+        self._loops[-1][1].append(self._emit(JMP, 0, 0, 0))
+
+    def stmt_Return(self, node):
+        if node.expr is None:
+            self._emit(RETV, 0, 0, 0)
+        else:
+            self._then((self._expr, node.expr), (self._return, None))
+
+    def _return(self, _):
+        value = self._values.pop()
+        self._emit(RET, value, 0, 0)
+        self._free(value)
+
+    def stmt_Assert(self, node):
+        self._then((self._expr, node.expr), (self._assert, node))
+
+    def _assert(self, node):
+        cond = self._values.pop()
+        self._emit(ASSERT, cond, self._constant(node.coord), 0)
+        self._free(cond)
+
+    def stmt_Print(self, node):
+        if node.expr is None:
+            self._emit(PRINTK, self._constant('\n'), 0, 0)
+            return
+        exprs = node.expr.exprs if isinstance(node.expr, ast_classes.ExprList) else [node.expr]
+        tasks = []
+        for expr in exprs:
+            if isinstance(expr, ast_classes.Constant) and expr.type == 'string':
+                tasks.append((self._print_text, unescape(expr.value)))
+            else:
+                tasks.append((self._expr, expr))
+                tasks.append((self._print, expr.uc_type))
+        self._then(*tasks)
+
+    def _print_text(self, text):
+        self._emit(PRINTK, self._constant(text), 0, 0)
+
+    def _print(self, type):
+        value = self._values.pop()
+        if type is CharType:
+            kind = 1
+        elif isinstance(type, ArrayType) and type.element is CharType:
+            kind = 2
+        else:
+            kind = 0
+        self._emit(PRINT, value, kind, 0)
+        self._free(value)
+
+    def stmt_Read(self, node):
+        targets = node.expr.exprs if isinstance(node.expr, ast_classes.ExprList) else [node.expr]
+        tasks = []
+        for target in targets:
+            tasks.append((self._lvalue, target))
+            tasks.append((self._read, target.uc_type))
+        self._then(*tasks)
+
+    def _read(self, type):
+        location = self._values.pop()
+        reg = location[1] if location[0] == 'local' else self._alloc()
+        self._emit(READ, reg, _type_code(type), 0)
+        self._store(location, reg)
+        self._free(reg)
+        self._free_location(location)
+
+
+def disassemble(function, constants=None):
+    """ Text listing of the instructions of a Function. """
+    lines = ['%s: %d register(s), %d parameter(s)' % (function.name, len(function.frame),
+                                                       function.nparams)]
+    code = function.code
+    for pc in range(0, len(code), 4):
+        op, a, b, c = code[pc:pc + 4]
+        line = '%5d  %-7s %d, %d, %d' % (pc, OPCODES[op], a, b, c)
+        if constants is not None and op == LOADK:
+            line += '    ; %r' % (constants[b], )
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def decode(function):
+    """ Instructions of a Function as a list of (op, a, b, c) tuples, with
+        jump targets counted in instructions: the form run by the VM.
+    """
+    code = function.code
+    instructions = []
+    for pc in range(0, len(code), 4):
+        instruction = code[pc:pc + 4].tolist()
+        target = _TARGETS.get(instruction[0])
+        if target is not None:
+            instruction[target] //= 4
+        instructions.append(tuple(instruction))
+    return instructions
+
+
+# Compiled modules, by hash of their source, least recently used first
+_cache = OrderedDict()
+CACHE_SIZE = 128
+
+
+def compile_source(source, error_func, parser=None):
+    """ Returns the Module of the uC program source, or None if it has
+        errors, which are reported to error_func(lineno, message).
+
+        Modules are cached by the hash of their source, so compiling the
+        same source again costs a hash computation.
+    """
+    key = hashlib.sha1(source.encode('utf-8')).hexdigest()
+    module = _cache.get(key)
+    if module is not None:
+        _cache.move_to_end(key)
+        return module
+
+    errors = []
+
+    def report(lineno, message):
+        errors.append(lineno)
+        error_func(lineno, message)
+
+    ast = (parser or UCParser()).parse(source)
+    if ast is None:
+        return None
+    NameResolver(report).resolve(ast)
+    if not errors:
+        TypeChecker(report).check(ast)
+    if errors:
+        return None
+    module = BytecodeCompiler().compile(ast)
+    _cache[key] = module
+    if len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return module
+
+
+def clear_cache():
+    _cache.clear()
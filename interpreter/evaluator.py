@@ -0,0 +1,774 @@
+""" Execution of uC programs by closure compilation.
+
+    The Evaluator compiles every node of a program once into a Python
+    closure that takes the frame of the running call. The dispatch on node
+    types, the choice of operators and the storage of every name are all
+    resolved ahead of time, so running a node is a single call. Variables
+    live in fixed slots: the locals of a call in a list (its frame), the
+    globals in a list shared by all the calls.
+
+    Statements return None to go on, _BREAK to leave the innermost loop, or
+    a 1-tuple holding the value of a return statement. Arrays are laid out
+    as described in interpreter.layout.
+"""
+
+import operator
+import sys
+from array import array
+from operator import itemgetter
+
+from parser import ast_classes
+from semantic.type_checker import TypeChecker
+from semantic.uc_ops import BINARY_OPS, INT_MAX, INT_MIN, cast, int_div, int_mod, wrap_int
+from semantic.uc_types import ArrayType, CharType, FloatType, IntType, PtrType
+
+from .layout import (array_size, decays, element_type, flatten, initializer, is_pointer,
+                     is_row, typecode, zero_value)
+from .runtime import (AssertionFailed, Input, Output, Pointer, UCRuntimeError, char_code,
+                      char_codes, chars_to_str, copy_array, new_array, unescape)
+
+_BREAK = object()
+_RETURN_NONE = (None, )
+
+# Nodes that compute a value, and can also be used as statements
+_EXPRESSIONS = (ast_classes.ArrayRef, ast_classes.Assignment, ast_classes.BinaryOp,
+                ast_classes.Cast, ast_classes.Constant, ast_classes.ExprList,
+                ast_classes.FuncCall, ast_classes.ID, ast_classes.UnaryOp)
+
+# Python frames allowed while running: deep expressions and recursive uC
+# functions both nest calls of closures
+_RECURSION_LIMIT = 50000
+
+
+def _nothing(f):
+    pass
+
+
+def _true(f):
+    return 1
+
+
+# Operators, as factories of closures over the code of their operands
+
+def _int_add(left, right):
+    def add(f):
+        v = left(f) + right(f)
+        return v if INT_MIN <= v <= INT_MAX else wrap_int(v)
+    return add
+
+
+def _int_sub(left, right):
+    def sub(f):
+        v = left(f) - right(f)
+        return v if INT_MIN <= v <= INT_MAX else wrap_int(v)
+    return sub
+
+
+def _int_mul(left, right):
+    def mul(f):
+        v = left(f) * right(f)
+        return v if INT_MIN <= v <= INT_MAX else wrap_int(v)
+    return mul
+
+
+def _binary(func):
+    def factory(left, right):
+        def binary(f):
+            return func(left(f), right(f))
+        return binary
+    return factory
+
+
+def _eq(left, right):
+    def eq(f):
+        return 1 if left(f) == right(f) else 0
+    return eq
+
+
+def _ne(left, right):
+    def ne(f):
+        return 1 if left(f) != right(f) else 0
+    return ne
+
+
+def _lt(left, right):
+    def lt(f):
+        return 1 if left(f) < right(f) else 0
+    return lt
+
+
+def _le(left, right):
+    def le(f):
+        return 1 if left(f) <= right(f) else 0
+    return le
+
+
+def _gt(left, right):
+    def gt(f):
+        return 1 if left(f) > right(f) else 0
+    return gt
+
+
+def _ge(left, right):
+    def ge(f):
+        return 1 if left(f) >= right(f) else 0
+    return ge
+
+
+def _and(left, right):
+    def and_(f):
+        return 1 if left(f) and right(f) else 0
+    return and_
+
+
+def _or(left, right):
+    def or_(f):
+        return 1 if left(f) or right(f) else 0
+    return or_
+
+
+def _same(left, right):
+    def same(f):
+        return 1 if left(f) is right(f) else 0
+    return same
+
+
+def _not_same(left, right):
+    def not_same(f):
+        return 1 if left(f) is not right(f) else 0
+    return not_same
+
+
+_COMPARISONS = {'==': _eq, '!=': _ne, '<': _lt, '<=': _le, '>': _gt, '>=': _ge,
+                '&&': _and, '||': _or}
+
+_BINARY_OPS = {
+    'int': dict(_COMPARISONS, **{'+': _int_add, '-': _int_sub, '*': _int_mul,
+                                 '/': _binary(int_div), '%': _binary(int_mod)}),
+    'float': dict(_COMPARISONS, **{'+': _binary(operator.add), '-': _binary(operator.sub),
+                                   '*': _binary(operator.mul), '/': _binary(operator.truediv)}),
+    'char': _COMPARISONS,
+    # Arrays are equal when they are the same array
+    'array': dict(_COMPARISONS, **{'==': _same, '!=': _not_same}),
+    'pointer': _COMPARISONS,
+}
+
+
+def _type_kind(type):
+    if isinstance(type, ArrayType):
+        return 'array'
+    if isinstance(type, PtrType):
+        return 'pointer'
+    return type.name
+
+
+def _read_int(token):
+    try:
+        return wrap_int(int(token))
+    except ValueError:
+        raise UCRuntimeError("Invalid int in input: '%s'" % token)
+
+
+def _read_float(token):
+    try:
+        return float(token)
+    except ValueError:
+        raise UCRuntimeError("Invalid float in input: '%s'" % token)
+
+
+def _read_char(token):
+    return char_code(token[0])
+
+
+class Evaluator:
+    """ Compiles a program into closures once, to run it any number of
+        times.
+
+        The program must have been resolved by the NameResolver and type
+        checked without errors by the TypeChecker.
+    """
+
+    def __init__(self, program):
+        self.input = None
+        self.output = None
+        # Storage of the globals, refilled by every run
+        self._globals = []
+        self._global_slots = {}
+        # Callables of the functions, and their indexes by symbol
+        self._functions = []
+        self._function_slots = {}
+        self._locals = None
+        self._params = set()
+        self._types = TypeChecker(None)
+        self._code = {}
+        self._methods = {}
+        self._compile(program)
+
+    def _compile(self, program):
+        code = self._code
+        methods = self._methods
+        stack = [(program, False)]
+        while stack:
+            node, leaving = stack.pop()
+            cls = node.__class__
+            if leaving:
+                result = methods[cls](node)
+                if result is not None:
+                    code[node] = result
+                continue
+            if cls not in methods:
+                methods[cls] = getattr(self, 'leave_' + cls.__name__, None)
+            if cls is ast_classes.FuncDef:
+                self._enter_function(node)
+            if methods[cls] is not None:
+                stack.append((node, True))
+            children = node.children()
+            for i in range(len(children) - 1, -1, -1):
+                stack.append((children[i][1], False))
+
+        self._inits = []
+        self._main = None
+        for gdecl in program.gdecls:
+            if isinstance(gdecl, ast_classes.GlobalDecl):
+                self._inits.extend(code[decl] for decl in gdecl.decls if decl in code)
+            elif gdecl.decl.name.name == 'main':
+                self._main = self._function_slot(gdecl.decl.name.symbol)
+        self._code = {}
+
+    def run(self, stdin=None, stdout=None):
+        """ Runs the program, reading from stdin and writing to stdout (the
+            standard streams by default). Returns the exit status: the value
+            returned by main, or 1 if an assertion failed.
+        """
+        if self._main is None:
+            raise UCRuntimeError('No main function')
+        self.output = Output(stdout)
+        self.input = Input(stdin, self.output)
+        g = self._globals
+        g[:] = [0] * len(self._global_slots)
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(max(limit, _RECURSION_LIMIT))
+        try:
+            for init in self._inits:
+                init(g)
+            status = self._functions[self._main](())
+        except AssertionFailed as e:
+            self.output.write('%s\n' % e)
+            status = 1
+        except ZeroDivisionError:
+            raise UCRuntimeError('Division by zero')
+        except IndexError:
+            raise UCRuntimeError('Array index out of range')
+        except RecursionError:
+            raise UCRuntimeError('Stack overflow')
+        finally:
+            sys.setrecursionlimit(limit)
+            self.output.flush()
+        return status or 0
+
+    # Storage
+
+    def _slot(self, symbol):
+        slots = self._global_slots if symbol.scope == 0 else self._locals
+        slot = slots.get(symbol)
+        if slot is None:
+            slot = slots[symbol] = len(slots)
+        return slot
+
+    def _function_slot(self, symbol):
+        slot = self._function_slots.get(symbol)
+        if slot is None:
+            slot = self._function_slots[symbol] = len(self._functions)
+            self._functions.append(None)
+        return slot
+
+    def _enter_function(self, node):
+        self._locals = {}
+        args = node.decl.type.args
+        if isinstance(args, ast_classes.ParamList):
+            for param in args.params:
+                if isinstance(param, ast_classes.Decl):
+                    self._params.add(param)
+                    self._slot(param.name.symbol)
+
+    def _locate(self, node):
+        """ Code returning the container and the index of the element
+            designated by the lvalue node.
+        """
+        if isinstance(node, ast_classes.ID):
+            slot = self._slot(node.symbol)
+            if node.symbol.scope == 0:
+                g = self._globals
+
+                def locate(f):
+                    return g, slot
+            else:
+                def locate(f):
+                    return f, slot
+            return locate
+        if isinstance(node, ast_classes.ArrayRef):
+            base, terms = flatten(node)
+            array, offset = self._code[base], self._offset(terms)
+            # Past its end, a buffer raises IndexError itself, but a negative
+            # index would wrap around to its last elements
+            if is_pointer(base, self._params):
+                def locate(f):
+                    p = array(f)
+                    i = p.index + offset(f)
+                    if i < 0:
+                        raise IndexError(i)
+                    return p.container, i
+            else:
+                def locate(f):
+                    c, i = array(f), offset(f)
+                    if i < 0:
+                        raise IndexError(i)
+                    return c, i
+            return locate
+        pointer = self._code[node.expr]
+
+        def locate(f):
+            p = pointer(f)
+            return p.container, p.index
+        return locate
+
+    def _offset(self, terms):
+        """ Code returning the offset of an element in the buffer of its
+            array, from the (subscript, stride) pairs of interpreter.layout.
+        """
+        terms = [(self._code[subscript], n) for subscript, n in terms]
+        if len(terms) == 1 and terms[0][1] == 1:
+            return terms[0][0]
+        if len(terms) == 2 and terms[1][1] == 1:
+            (row, n), (column, _) = terms
+
+            def offset2(f):
+                return row(f) * n + column(f)
+            return offset2
+
+        def offset(f):
+            return sum([index(f) * n for index, n in terms])
+        return offset
+
+    def _value(self, node, type):
+        """ Code of the expression node, converted to a value of type. """
+        value = self._code[node]
+        if decays(node, type, self._params):
+            def decay(f):
+                return Pointer(value(f), 0)
+            return decay
+        return value
+
+    def _stmt(self, node):
+        """ Code of node as a statement, or None if it does nothing. """
+        if node is None:
+            return None
+        code = self._code.get(node)
+        if code is not None and isinstance(node, _EXPRESSIONS):
+            expr = code
+
+            def expr_stmt(f):
+                expr(f)
+            return expr_stmt
+        return code
+
+    def _sequence(self, nodes):
+        stmts = [s for s in map(self._stmt, nodes) if s is not None]
+        if not stmts:
+            return None
+        if len(stmts) == 1:
+            return stmts[0]
+
+        def block(f):
+            for stmt in stmts:
+                r = stmt(f)
+                if r is not None:
+                    return r
+        return block
+
+    # Expressions
+
+    def leave_Constant(self, node):
+        if node.type == 'string':
+            value = array('b', char_codes(unescape(node.value)))
+        else:
+            value = node.value
+
+        def constant(f):
+            return value
+        return constant
+
+    def leave_ID(self, node):
+        symbol = node.symbol
+        if symbol is None or symbol.kind == 'func':
+            return None
+        slot = self._slot(symbol)
+        if symbol.scope == 0:
+            g = self._globals
+
+            def load(f):
+                return g[slot]
+            return load
+        return itemgetter(slot)
+
+    def leave_BinaryOp(self, node):
+        left, right = node.left, node.right
+        kind = _type_kind(left.uc_type)
+        if kind == 'array' and (is_pointer(left, self._params)
+                                or is_pointer(right, self._params)):
+            # Compared as addresses
+            factory = _BINARY_OPS['pointer'][node.op]
+            return factory(self._value(left, left.uc_type), self._value(right, right.uc_type))
+        factory = _BINARY_OPS[kind][node.op]
+        return factory(self._code[node.left], self._code[node.right])
+
+    def leave_UnaryOp(self, node):
+        op = node.op
+        type = node.expr.uc_type
+        if op in ('++', '--', 'p++', 'p--'):
+            return self._increment(node.expr, op, type)
+        if op == '&':
+            locate = self._locate(node.expr)
+
+            def address(f):
+                return Pointer(*locate(f))
+            return address
+        expr = self._code[node.expr]
+        if op == '+':
+            return expr
+        if op == '!':
+            def not_(f):
+                return 0 if expr(f) else 1
+            return not_
+        if op == '*':
+            def deref(f):
+                p = expr(f)
+                return p.container[p.index]
+            return deref
+        if type is IntType:
+            def neg(f):
+                return wrap_int(-expr(f))
+        else:
+            def neg(f):
+                return -expr(f)
+        return neg
+
+    def _increment(self, target, op, type):
+        locate = self._locate(target)
+        step = 1 if op[-1] == '+' else -1
+        wrap = wrap_int if type is IntType else float
+        if op[0] == 'p':
+            def post(f):
+                c, i = locate(f)
+                v = c[i]
+                c[i] = wrap(v + step)
+                return v
+            return post
+
+        def pre(f):
+            c, i = locate(f)
+            v = c[i] = wrap(c[i] + step)
+            return v
+        return pre
+
+    def leave_Assignment(self, node):
+        target = node.lvalue
+        value = self._value(node.rvalue, target.uc_type)
+        if node.op != '=':
+            func = BINARY_OPS[target.uc_type.name][node.op[:-1]]
+            locate = self._locate(target)
+
+            def update(f):
+                c, i = locate(f)
+                v = c[i] = func(c[i], value(f))
+                return v
+            return update
+        if isinstance(target, ast_classes.ID) and target.symbol.scope != 0:
+            slot = self._slot(target.symbol)
+
+            def assign_local(f):
+                v = f[slot] = value(f)
+                return v
+            return assign_local
+        locate = self._locate(target)
+
+        def assign(f):
+            c, i = locate(f)
+            v = c[i] = value(f)
+            return v
+        return assign
+
+    def leave_ArrayRef(self, node):
+        if is_row(node) or is_row(node.name):
+            locate = self._locate(node)
+            if is_row(node):
+                def row(f):
+                    return Pointer(*locate(f))
+                return row
+
+            def load_element(f):
+                c, i = locate(f)
+                return c[i]
+            return load_element
+        array, index = self._code[node.name], self._code[node.subscript]
+        if is_pointer(node.name, self._params):
+            def load_pointed(f):
+                p = array(f)
+                i = p.index + index(f)
+                if i < 0:
+                    raise IndexError(i)
+                return p.container[i]
+            return load_pointed
+
+        def load(f):
+            c, i = array(f), index(f)
+            if i < 0:
+                raise IndexError(i)
+            return c[i]
+        return load
+
+    def leave_Cast(self, node):
+        expr = self._code[node.expr]
+        type = node.new_type.names[0]
+        if node.expr.uc_type.name == type:
+            return expr
+
+        def convert(f):
+            return cast(expr(f), type)
+        return convert
+
+    def leave_ExprList(self, node):
+        exprs = [self._code[e] for e in node.exprs]
+        last = exprs.pop()
+
+        def sequence(f):
+            for expr in exprs:
+                expr(f)
+            return last(f)
+        return sequence
+
+    def leave_FuncCall(self, node):
+        funcs = self._functions
+        slot = self._function_slot(node.name.symbol)
+        if node.args is None:
+            args = []
+        elif isinstance(node.args, ast_classes.ExprList):
+            args = node.args.exprs
+        else:
+            args = [node.args]
+        params = node.name.uc_type.params
+        args = [self._value(arg, param) for arg, param in zip(args, params)]
+        if not args:
+            def call(f):
+                return funcs[slot](())
+        elif len(args) == 1:
+            a, = args
+
+            def call(f):
+                return funcs[slot]((a(f), ))
+        elif len(args) == 2:
+            a, b = args
+
+            def call(f):
+                return funcs[slot]((a(f), b(f)))
+        else:
+            def call(f):
+                return funcs[slot](tuple([a(f) for a in args]))
+        return call
+
+    # Statements
+
+    def leave_FuncDef(self, node):
+        body = self._stmt(node.body) or _nothing
+        args = node.decl.type.args
+        params = len(args.params) if isinstance(args, ast_classes.ParamList) else 0
+        pad = [0] * (len(self._locals) - params)
+
+        def function(args):
+            f = list(args)
+            f += pad
+            r = body(f)
+            if r is None or r is _BREAK:
+                return None
+            return r[0]
+        self._functions[self._function_slot(node.decl.name.symbol)] = function
+        self._locals = None
+        return None
+
+    def leave_Compound(self, node):
+        return self._sequence(node.block_items or [])
+
+    def leave_DeclList(self, node):
+        return self._sequence(node.decls)
+
+    def leave_Decl(self, node):
+        symbol = node.name.symbol
+        if symbol is None or symbol.decl is not node or symbol.kind == 'func' \
+                or node in self._params:
+            return None
+        slot = self._slot(symbol)
+        type = self._types.symbol_type(symbol)
+        if isinstance(type, ArrayType):
+            make = self._array(type, node.init, node.coord)
+
+            def decl_array(f):
+                f[slot] = make(f)
+            return decl_array
+        if node.init is None:
+            zero = zero_value(type)
+
+            def decl_zero(f):
+                f[slot] = zero
+            return decl_zero
+        init = self._value(node.init, type)
+
+        def decl(f):
+            f[slot] = init(f)
+        return decl
+
+    def _array(self, type, init, coord):
+        """ Code creating an array of type, with its initializer init. """
+        size = array_size(type, coord)
+        if init is None:
+            elem = element_type(type)
+            code, zero = typecode(elem), zero_value(elem)
+
+            def make_zeros(f):
+                return new_array(size, code, zero)
+            return make_zeros
+        template, exprs = initializer(init, type)
+        if not exprs:
+            def make_copy(f):
+                return copy_array(template)
+            return make_copy
+        values = [(offset, self._code[expr]) for offset, expr in exprs]
+
+        def make_values(f):
+            array = copy_array(template)
+            for offset, value in values:
+                array[offset] = value(f)
+            return array
+        return make_values
+
+    def leave_If(self, node):
+        cond = self._code[node.cond]
+        iftrue = self._stmt(node.iftrue) or _nothing
+        iffalse = self._stmt(node.iffalse)
+        if iffalse is None:
+            def if_(f):
+                if cond(f):
+                    return iftrue(f)
+            return if_
+
+        def if_else(f):
+            if cond(f):
+                return iftrue(f)
+            return iffalse(f)
+        return if_else
+
+    def leave_While(self, node):
+        cond = self._code[node.cond]
+        body = self._stmt(node.statement) or _nothing
+
+        def while_(f):
+            while cond(f):
+                r = body(f)
+                if r is not None:
+                    return None if r is _BREAK else r
+        return while_
+
+    def leave_For(self, node):
+        initial = self._stmt(node.initial) or _nothing
+        cond = self._code[node.cond] if node.cond is not None else _true
+        next = self._code[node.next] if node.next is not None else _nothing
+        body = self._stmt(node.statement) or _nothing
+
+        def for_(f):
+            initial(f)
+            while cond(f):
+                r = body(f)
+                if r is not None:
+                    return None if r is _BREAK else r
+                next(f)
+        return for_
+
+    def leave_Return(self, node):
+        if node.expr is None:
+            def return_none(f):
+                return _RETURN_NONE
+            return return_none
+        expr = self._code[node.expr]
+
+        def return_(f):
+            return (expr(f), )
+        return return_
+
+    def leave_Break(self, node):
+        def break_(f):
+            return _BREAK
+        return break_
+
+    def leave_Assert(self, node):
+        expr = self._code[node.expr]
+        coord = node.coord
+
+        def assert_(f):
+            if not expr(f):
+                raise AssertionFailed(coord)
+        return assert_
+
+    def leave_Print(self, node):
+        if node.expr is None:
+            parts = []
+        elif isinstance(node.expr, ast_classes.ExprList):
+            parts = [self._format(e) for e in node.expr.exprs]
+        else:
+            parts = [self._format(node.expr)]
+        machine = self
+        if not parts:
+            def print_line(f):
+                machine.output.write('\n')
+            return print_line
+
+        def print_(f):
+            machine.output.write(''.join([part(f) for part in parts]))
+        return print_
+
+    def _format(self, node):
+        """ Code returning the text printed for the expression node. """
+        if isinstance(node, ast_classes.Constant) and node.type == 'string':
+            text = unescape(node.value)
+
+            def literal(f):
+                return text
+            return literal
+        expr = self._code[node]
+        type = node.uc_type
+        if type is CharType:
+            def char(f):
+                return chr(expr(f) & 0xFF)
+            return char
+        if isinstance(type, ArrayType) and type.element is CharType:
+            def string(f):
+                return chars_to_str(expr(f))
+            return string
+
+        def value(f):
+            return str(expr(f))
+        return value
+
+    def leave_Read(self, node):
+        targets = node.expr.exprs if isinstance(node.expr, ast_classes.ExprList) else [node.expr]
+        items = []
+        for target in targets:
+            type = target.uc_type
+            convert = _read_float if type is FloatType else \
+                _read_char if type is CharType else _read_int
+            items.append((self._locate(target), convert))
+        machine = self
+
+        def read(f):
+            for locate, convert in items:
+                c, i = locate(f)
+                c[i] = convert(machine.input.token())
+        return read
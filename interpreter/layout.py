@@ -0,0 +1,129 @@
+""" Layout of the arrays of uC programs in memory.
+
+    An array is a single flat buffer, whatever its number of dimensions:
+    a typed array.array for ints, floats and chars, which takes a fraction
+    of the memory of a list of Python objects, or a list for pointers. The
+    element a[i][j] of an array of rows of n elements is at offset
+    i * n + j, n being the stride of the first subscript. A row used as a
+    value (to print it or to pass it to a function) is a Pointer to its
+    first element.
+"""
+
+from parser import ast_classes
+from semantic.uc_ops import wrap_int
+from semantic.uc_types import ArrayType, FloatType, PtrType
+
+from .runtime import UCRuntimeError, char_codes, new_array, unescape
+
+# Typecodes of the buffers by element type name: chars are signed bytes
+TYPECODES = {'int': 'i', 'float': 'd', 'char': 'b'}
+
+
+def element_type(type):
+    """ Type of the scalar elements of the array type. """
+    while isinstance(type, ArrayType):
+        type = type.element
+    return type
+
+
+def typecode(type):
+    """ Typecode of the buffers of elements of type, None for lists. """
+    return TYPECODES.get(type.name)
+
+
+def zero_value(type):
+    """ Initial value of the variables of the scalar type. """
+    if type is FloatType:
+        return 0.0
+    if isinstance(type, PtrType):
+        return None
+    return 0
+
+
+def stride(type):
+    """ Number of elements in a value of type: 1, or the product of the
+        sizes of the dimensions of an array.
+    """
+    count = 1
+    while isinstance(type, ArrayType):
+        count *= type.size
+        type = type.element
+    return count
+
+
+def array_size(type, coord=None):
+    """ Number of elements of the buffer of the array type. """
+    elem = type
+    while isinstance(elem, ArrayType):
+        if elem.size is None:
+            raise UCRuntimeError('Array size unknown', coord)
+        elem = elem.element
+    return stride(type)
+
+
+def is_row(node):
+    """ Whether the expression node designates a row of an array: an
+        element that is an array itself.
+    """
+    return isinstance(node, ast_classes.ArrayRef) and isinstance(node.uc_type, ArrayType)
+
+
+def is_pointer(node, params):
+    """ Whether the value of the expression node is a Pointer: pointers,
+        rows, and the array parameters declared by the Decl nodes of the set
+        params, as arrays are passed decayed.
+    """
+    if isinstance(node.uc_type, PtrType) or is_row(node):
+        return True
+    return isinstance(node, ast_classes.ID) and node.symbol is not None \
+        and node.symbol.decl in params
+
+
+def decays(node, type, params):
+    """ Whether the expression node, an array, is converted to a Pointer to
+        its first element when used as a value of type.
+    """
+    return isinstance(type, (PtrType, ArrayType)) and isinstance(node.uc_type, ArrayType) \
+        and not is_pointer(node, params)
+
+
+def flatten(node):
+    """ Splits the ArrayRef node into the array or pointer whose buffer holds
+        its element, and the list of (subscript, stride) pairs whose
+        products sum up to the offset of the element.
+    """
+    terms = []
+    while True:
+        terms.append((node.subscript, stride(node.uc_type)))
+        node = node.name
+        if not is_row(node):
+            terms.reverse()
+            return node, terms
+
+
+def initializer(init, type):
+    """ Bulk initializer of an array of type from init, an InitList or a
+        string Constant. Returns the template buffer of the array, holding
+        the constant elements and zeros elsewhere, and the list of (offset,
+        expr) pairs of the elements computed at run time, in order.
+    """
+    elem = element_type(type)
+    code = typecode(elem)
+    template = new_array(array_size(type, init.coord), code, zero_value(elem))
+    size = len(template)
+    exprs = []
+    stack = [(init, type, 0)]
+    while stack:
+        node, type, offset = stack.pop()
+        if isinstance(node, ast_classes.InitList):
+            n = stride(type.element)
+            for i in range(len(node.exprs) - 1, -1, -1):
+                stack.append((node.exprs[i], type.element, offset + i * n))
+        elif isinstance(node, ast_classes.Constant) and node.type == 'string':
+            for i, c in enumerate(char_codes(unescape(node.value))[:size - offset]):
+                template[offset + i] = c
+        elif isinstance(node, ast_classes.Constant):
+            template[offset] = wrap_int(node.value) if code == 'i' else node.value
+        else:
+            exprs.append((offset, node))
+    return template, exprs
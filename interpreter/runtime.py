@@ -0,0 +1,219 @@
+""" Runtime support shared by the uC execution engines: errors, pointers,
+    arrays and the standard input and output of the programs.
+"""
+
+import sys
+from array import array
+from functools import partial
+
+from semantic.uc_ops import wrap_int
+
+
+class UCRuntimeError(Exception):
+    """ Error that stops the execution of a uC program. """
+
+    def __init__(self, message, coord=None):
+        super().__init__(message)
+        self.message = message
+        self.coord = coord
+
+    def __str__(self):
+        if self.coord is not None and self.coord.line:
+            return '%s on %s:%s' % (self.message, self.coord.line, self.coord.column)
+        return self.message
+
+
+class AssertionFailed(UCRuntimeError):
+    """ Raised by a failed assert statement. """
+
+    def __init__(self, coord=None):
+        super().__init__('assertion_fail', coord)
+
+
+class StepLimitExceeded(UCRuntimeError):
+    """ Raised when a program runs more steps than it is allowed. """
+
+    def __init__(self, coord=None):
+        super().__init__('Step limit exceeded', coord)
+
+
+class Pointer:
+    """ Address of an element of a container (an array or a frame of
+        variables). Pointers are equal when they address the same element.
+    """
+    __slots__ = ('container', 'index')
+
+    def __init__(self, container, index):
+        self.container = container
+        self.index = index
+
+    def __eq__(self, other):
+        return isinstance(other, Pointer) and self.container is other.container \
+            and self.index == other.index
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((id(self.container), self.index))
+
+
+_escapes = {'n': '\n', 't': '\t', 'r': '\r', '0': '\0', '\\': '\\', '"': '"', "'": "'"}
+
+
+def unescape(literal):
+    """ Text of a string constant, given with its quotes. """
+    text = literal[1:-1]
+    if '\\' not in text:
+        return text
+    out = []
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if c == '\\' and i + 1 < len(text):
+            i += 1
+            c = _escapes.get(text[i], text[i])
+        out.append(c)
+        i += 1
+    return ''.join(out)
+
+
+def char_code(c):
+    """ Value of the char c in uC: a signed byte. """
+    return ((ord(c) + 128) & 0xFF) - 128
+
+
+def char_codes(text):
+    """ Values of the chars of text. """
+    return [char_code(c) for c in text]
+
+
+def new_array(size, typecode, zero):
+    """ Flat array of size elements equal to zero: a typed buffer of
+        typecode, or a list if typecode is None.
+    """
+    if typecode is None:
+        return [zero] * size
+    return array(typecode, (zero, )) * size
+
+
+def copy_array(template):
+    """ Copy of a flat array, in bulk. """
+    return template[:]
+
+
+def chars_to_str(chars):
+    """ Text of a char array, or of the chars at a Pointer, up to the first
+        null char.
+    """
+    start = 0
+    if isinstance(chars, Pointer):
+        chars, start = chars.container, chars.index
+    if isinstance(chars, array):
+        data = chars.tobytes()[start:]
+        end = data.find(0)
+        return (data if end < 0 else data[:end]).decode('latin-1')
+    out = []
+    for i in range(start, len(chars)):
+        c = chars[i]
+        if not c:
+            break
+        out.append(chr(c & 0xFF))
+    return ''.join(out)
+
+
+# Types of the values read, by the kind codes of read_value
+READ_TYPES = ('int', 'float', 'char')
+
+
+def read_value(token, kind):
+    """ Value of an input token, read as an int (kind 0), a float (1) or a
+        char (2).
+    """
+    try:
+        if kind == 1:
+            return float(token)
+        if kind == 2:
+            return char_code(token[0])
+        return wrap_int(int(token))
+    except ValueError:
+        raise UCRuntimeError("Invalid %s in input: '%s'" % (READ_TYPES[kind], token))
+
+
+# Chars read from the input at a time
+BLOCK_SIZE = 1 << 16
+
+# Writes kept in the output buffer before it is written to its stream
+BUFFERED_WRITES = 4096
+
+
+def _interactive(stream):
+    try:
+        return stream.isatty()
+    except (AttributeError, ValueError):
+        return False
+
+
+class Input:
+    """ Standard input of a program, read as whitespace separated tokens.
+
+        The stream is read in blocks of block_size chars, each split into
+        tokens at once by a generator, which token() just resumes. An
+        interactive stream is read a line at a time instead, after flushing
+        output (if given) so that prompts show up first.
+    """
+
+    def __init__(self, stream=None, output=None, block_size=BLOCK_SIZE):
+        self.stream = sys.stdin if stream is None else stream
+        self.output = output
+        self.block_size = block_size
+        # Returns the next token
+        self.token = partial(next, self._tokens())
+
+    def _tokens(self):
+        stream = self.stream
+        interactive = _interactive(stream)
+        rest = ''
+        while True:
+            if interactive:
+                if self.output is not None:
+                    self.output.flush()
+                block = stream.readline()
+            else:
+                block = stream.read(self.block_size)
+            if not block:
+                break
+            text = rest + block
+            tokens = text.split()
+            # The last token may go on in the next block
+            rest = tokens.pop() if tokens and not text[-1].isspace() else ''
+            yield from tokens
+        if rest:
+            yield rest
+        raise UCRuntimeError('Unexpected end of input')
+
+
+class Output:
+    """ Standard output of a program, accumulated in a buffer. The buffer
+        is written to the stream at the flush points: when it holds limit
+        writes, before waiting for interactive input, and when the program
+        stops, normally, on a failed assertion or on a runtime error.
+    """
+
+    def __init__(self, stream=None, limit=BUFFERED_WRITES):
+        self.stream = sys.stdout if stream is None else stream
+        self.limit = limit
+        self._parts = []
+
+    def write(self, text):
+        parts = self._parts
+        parts.append(text)
+        if len(parts) >= self.limit:
+            self.flush()
+
+    def flush(self):
+        """ Writes the buffer to the stream. """
+        if self._parts:
+            self.stream.write(''.join(self._parts))
+            self._parts = []
+        self.stream.flush()
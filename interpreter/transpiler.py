@@ -0,0 +1,1055 @@
+""" Translation of uC programs into Python source code.
+
+    Every uC function becomes a Python function and every uC local a Python
+    local, so loops, conditionals and arithmetic run as plain CPython
+    bytecode. ints are wrapped around to 32 bits inline, once per chain of
+    additions, subtractions and multiplications since wrapping commutes
+    with them, and divisions take a fast path for positive operands. Arrays
+    are flat buffers indexed with computed offsets (see interpreter.layout)
+    and pointers Pointer objects, as in the other engines. Variables whose
+    address is taken live in one-element lists (boxes), which pointers can
+    address.
+
+    The code objects of translated programs are cached in memory and on
+    disk, by the hash of their uC source, so a program is translated and
+    compiled once.
+"""
+
+import hashlib
+import marshal
+import os
+import sys
+import tempfile
+import types
+from array import array
+from collections import OrderedDict
+
+from parser import ast_classes
+from parser.uc_parser import UCParser
+from semantic.resolver import NameResolver
+from semantic.type_checker import TypeChecker
+from semantic.uc_ops import cast, int_div, int_mod, wrap_int
+from semantic.uc_types import ArrayType, CharType, FloatType, IntType, PtrType
+
+from .layout import (array_size, decays, element_type, flatten, initializer, is_pointer,
+                     is_row, typecode, zero_value)
+from .runtime import (AssertionFailed, Input, Output, Pointer, UCRuntimeError, char_codes,
+                      chars_to_str, new_array, read_value, unescape)
+
+# Kinds of the Python expressions on the value stack
+_LITERAL = 0    # number or string literal
+_TEMP = 1       # temporary, assigned once
+_NAME = 2       # variable, read without effects
+_EXPR = 3       # any other expression
+_BOOL = 4       # expression giving a truth value instead of 1 or 0
+_RAW = 5        # int expression still to be wrapped around to 32 bits
+
+# Expressions cheap enough to be written twice
+_SIMPLE = (_LITERAL, _TEMP, _NAME)
+
+# Deeper subexpressions are assigned to temporaries, as CPython limits the
+# nesting of parentheses
+_MAX_DEPTH = 32
+
+# Runs of zeros up to this size are written out in array literals
+_INLINE_PADDING = 32
+
+_COMPARISONS = ('==', '!=', '<', '<=', '>', '>=')
+_INCREMENTS = ('++', '--', 'p++', 'p--')
+
+# Nodes that compute a value, and can also be used as statements
+_EXPRESSIONS = (ast_classes.ArrayRef, ast_classes.Assignment, ast_classes.BinaryOp,
+                ast_classes.Cast, ast_classes.Constant, ast_classes.ExprList,
+                ast_classes.FuncCall, ast_classes.ID, ast_classes.UnaryOp)
+
+
+def _subscript(offset):
+    """ The offset of an element in the buffer of its array, unless it is
+        negative.
+    """
+    if offset < 0:
+        raise IndexError(offset)
+    return offset
+
+
+# Names the translated code uses besides its own, bound when it runs
+_RUNTIME = {
+    '_AssertionFailed': AssertionFailed,
+    '_Coord': ast_classes.Coord,
+    '_Pointer': Pointer,
+    '_array': array,
+    '_cast': cast,
+    '_chars_to_str': chars_to_str,
+    '_div': int_div,
+    '_mod': int_mod,
+    '_new_array': new_array,
+    '_read_value': read_value,
+    '_subscript': _subscript,
+}
+
+# Python frames allowed while running: every uC call is a Python call
+_RECURSION_LIMIT = 50000
+
+
+def _literal(value):
+    text = repr(value)
+    return '(%s)' % text if text[0] == '-' else text
+
+
+def _literal_value(text):
+    return int(text.strip('()'))
+
+
+def _zero(type):
+    if type is FloatType:
+        return '0.0'
+    if isinstance(type, PtrType):
+        return 'None'
+    return '0'
+
+
+def _read_kind(type):
+    return 1 if type is FloatType else 2 if type is CharType else 0
+
+
+def _address_taken(program):
+    """ Symbols of the variables whose address is taken with &. """
+    symbols = set()
+    stack = [program]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ast_classes.UnaryOp) and node.op == '&' \
+                and isinstance(node.expr, ast_classes.ID):
+            symbols.add(node.expr.symbol)
+        stack.extend(child for _, child in node.children())
+    return symbols
+
+
+def _parts(lvalue):
+    """ Number of values computed to locate the lvalue node. """
+    if isinstance(lvalue, ast_classes.ArrayRef):
+        return len(flatten(lvalue)[1]) + 1
+    if isinstance(lvalue, ast_classes.UnaryOp):
+        return 1
+    return 0
+
+
+class Transpiler:
+    """ Translates a checked program into the source of a Python module,
+        which defines a function f_<name> per uC function and initializes
+        the globals g_<name>.
+
+        Nodes are translated by tasks taken from an explicit stack, so deep
+        expressions and nested statements do not hit the recursion limit.
+        Expression tasks leave their Python expressions on a value stack,
+        as (text, kind, depth, calls) tuples, where calls tells whether the
+        expression calls a uC function. Expressions are kept inline as long
+        as possible. When a statement has to be emitted in the middle of an
+        expression (for an assignment or an increment used as a value), the
+        expressions still pending on the stack are first assigned to
+        temporaries, so everything is evaluated left to right, as in the
+        other engines.
+
+        The program must have been resolved by the NameResolver and type
+        checked without errors by the TypeChecker.
+    """
+
+    def __init__(self):
+        self._types = TypeChecker(None)
+        self._methods = {}
+        self._boxed = set()
+        # Decls of the parameters, which hold arrays as pointers
+        self._params = set()
+
+    def transpile(self, program):
+        """ Returns the Python source of program. """
+        self._boxed = _address_taken(program)
+        chunks = ['# uC program translated by interpreter.transpiler']
+        for gdecl in program.gdecls:
+            if isinstance(gdecl, ast_classes.FuncDef):
+                chunks.append(self._function(gdecl))
+        self._begin(False)
+        for gdecl in program.gdecls:
+            if isinstance(gdecl, ast_classes.GlobalDecl):
+                for decl in gdecl.decls:
+                    self._drain(self._decl, decl)
+        chunks.append(self._text(self._lines, 0))
+        return '\n'.join(chunk for chunk in chunks if chunk) + '\n'
+
+    def _function(self, funcdef):
+        self._begin(True)
+        params = []
+        args = funcdef.decl.type.args
+        if isinstance(args, ast_classes.ParamList):
+            for param in args.params:
+                if isinstance(param, ast_classes.Decl):
+                    self._params.add(param)
+                    symbol = param.name.symbol
+                    name = self._name(symbol)
+                    params.append(name)
+                    if symbol in self._boxed:
+                        self._emit('%s = [%s]' % (name, name))
+        self._drain(self._stmt, funcdef.body)
+        lines = ['def f_%s(%s):' % (funcdef.decl.name.name, ', '.join(params))]
+        if self._written:
+            lines.append('    global %s' % ', '.join(sorted(self._written)))
+        lines.append(self._text(self._lines, 1) or '    pass')
+        return '\n'.join(lines) + '\n'
+
+    def _text(self, lines, base):
+        return '\n'.join('    ' * (base + indent) + text for indent, text in lines)
+
+    # Tasks
+
+    def _drain(self, func, arg):
+        self._tasks = tasks = [(func, arg)]
+        while tasks:
+            func, arg = tasks.pop()
+            func(arg)
+
+    def _then(self, *tasks):
+        """ Schedules tasks, (func, arg) pairs, to run in the given order
+            before the tasks already scheduled.
+        """
+        self._tasks.extend(reversed(tasks))
+
+    # Lines, temporaries and the value stack
+
+    def _begin(self, in_function):
+        self._in_function = in_function
+        self._lines = []
+        self._indent = 0
+        self._values = []
+        # Values below the mark belong to the enclosing buffer of lines
+        self._mark = 0
+        self._buffers = []
+        self._blocks = []
+        self._ntemps = 0
+        # Raw texts (x + c) with a constant c, by their text: (x, c)
+        self._offsets = {}
+        # Globals assigned by the function
+        self._written = set()
+
+    def _emit(self, text):
+        self._lines.append((self._indent, text))
+
+    def _effect(self, text):
+        """ Emits a statement, after the values it must not overtake. """
+        self._spill()
+        self._emit(text)
+
+    def _temp(self, text=None):
+        name = 't%d' % self._ntemps
+        self._ntemps += 1
+        if text is not None:
+            self._emit('%s = %s' % (name, text))
+        return name
+
+    def _push(self, text, kind, depth=0, calls=False):
+        self._values.append((text, kind, depth, calls))
+        if depth > _MAX_DEPTH:
+            self._simple(-1)
+
+    def _pop(self, count):
+        values = self._values
+        entries = values[len(values) - count:]
+        del values[len(values) - count:]
+        return entries
+
+    def _as_value(self, entry):
+        text, kind = entry[0], entry[1]
+        if kind == _BOOL:
+            return '(1 if %s else 0)' % text
+        if kind == _RAW:
+            base, offset = self._offsets.get(text, (text, 0))
+            return '(((%s + %d) & 4294967295) - 2147483648)' % (base, offset + (1 << 31))
+        return text
+
+    def _as_cond(self, entry):
+        return self._as_value(entry) if entry[1] == _RAW else entry[0]
+
+    def _spill(self, end=None):
+        """ Assigns the values pending on the stack (up to the index end) to
+            temporaries, so they are computed before the next statement.
+        """
+        values = self._values
+        for i in range(self._mark, len(values) if end is None else end):
+            entry = values[i]
+            if entry[1] not in (_LITERAL, _TEMP):
+                values[i] = (self._temp(self._as_value(entry)), _TEMP, 0, False)
+
+    def _simple(self, position):
+        """ Makes the value at position (from the top, negative) of the stack
+            simple enough to be written twice.
+        """
+        values = self._values
+        index = len(values) + position
+        entry = values[index]
+        if entry[1] in _SIMPLE:
+            return
+        if any(e[3] for e in values[self._mark:index + 1]):
+            # Calls must stay in order with the values before them
+            self._spill(index + 1)
+        else:
+            values[index] = (self._temp(self._as_value(entry)), _TEMP, 0, False)
+
+    def _settle(self, count):
+        """ Spills the pending values if any of the top count ones calls a
+            function, as Python evaluates the target of an assignment after
+            its value.
+        """
+        values = self._values
+        if any(e[3] for e in values[len(values) - count:]):
+            self._spill()
+
+    def _open(self, _):
+        """ Starts a new buffer of lines, for code that may not run. """
+        self._buffers.append((self._lines, self._indent, self._mark))
+        self._lines, self._indent, self._mark = [], 0, len(self._values)
+
+    def _close(self):
+        lines = self._lines
+        self._lines, self._indent, self._mark = self._buffers.pop()
+        return lines
+
+    def _splice(self, lines):
+        for indent, text in lines:
+            self._lines.append((self._indent + indent, text))
+
+    def _block(self, header):
+        """ Starts a block of statements under the line header. """
+        self._emit(header)
+        self._indent += 1
+        self._blocks.append(len(self._lines))
+
+    def _end_block(self, _=None):
+        if len(self._lines) == self._blocks.pop():
+            self._emit('pass')
+        self._indent -= 1
+
+    # Variables
+
+    def _name(self, symbol):
+        if symbol.scope == 0:
+            return 'g_' + symbol.name
+        return 'l_%s_%d' % (symbol.name, symbol.id)
+
+    def _variable(self, symbol):
+        name = self._name(symbol)
+        return name + '[0]' if symbol in self._boxed else name
+
+    # Expressions
+
+    def _expr(self, node):
+        cls = node.__class__
+        method = self._methods.get(cls)
+        if method is None:
+            method = self._methods[cls] = getattr(self, 'expr_' + cls.__name__)
+        method(node)
+
+    def expr_Constant(self, node):
+        if node.type == 'string':
+            self._push("_array('b', %r)" % char_codes(unescape(node.value)), _EXPR)
+        else:
+            self._push(_literal(node.value), _LITERAL)
+
+    def expr_ID(self, node):
+        self._push(self._variable(node.symbol), _NAME)
+
+    def expr_BinaryOp(self, node):
+        if node.op in ('&&', '||'):
+            self._then((self._expr, node.left), (self._open, None),
+                       (self._expr, node.right), (self._logic, node))
+        else:
+            self._then((self._expr, node.left), (self._expr, node.right),
+                       (self._binary, node))
+
+    def _binary(self, node):
+        type = node.left.uc_type
+        if type is IntType and node.op in ('/', '%'):
+            self._simple(-2)
+            self._simple(-1)
+        left, right = self._pop(2)
+        if isinstance(type, ArrayType) and (is_pointer(node.left, self._params)
+                                            or is_pointer(node.right, self._params)):
+            # Compared as addresses
+            left = self._decayed(left, node.left, type)
+            right = self._decayed(right, node.right, type)
+            type = PtrType(type.element)
+        text, kind = self._operation(node.op, type, left, right)
+        self._push(text, kind, max(left[2], right[2]) + 1, left[3] or right[3])
+
+    def _operation(self, op, type, left, right):
+        """ Text and kind of the expression left op right, on operands of
+            type.
+        """
+        a, b = self._as_value(left), self._as_value(right)
+        if op in _COMPARISONS:
+            if isinstance(type, ArrayType):
+                # Arrays are equal when they are the same array
+                op = 'is' if op == '==' else 'is not'
+            return '(%s %s %s)' % (a, op, b), _BOOL
+        if type is not IntType:
+            return '(%s %s %s)' % (a, op, b), _EXPR
+        if op in ('/', '%'):
+            func, op = ('_div', '//') if op == '/' else ('_mod', '%')
+            if left[1] not in _SIMPLE or right[1] not in _SIMPLE:
+                return '%s(%s, %s)' % (func, a, b), _EXPR
+            if right[1] == _LITERAL and _literal_value(b) > 0:
+                test = '%s >= 0' % a
+            else:
+                test = '%s >= 0 and %s > 0' % (a, b)
+            return '(%s %s %s if %s else %s(%s, %s))' % (a, op, b, test, func, a, b), _EXPR
+        if op == '*':
+            # Keeps the operands small
+            return '(%s * %s)' % (a, b), _RAW
+        if left[1] == _RAW:
+            a = left[0]
+        if right[1] == _RAW:
+            b = right[0]
+        text = '(%s %s %s)' % (a, op, b)
+        if right[1] == _LITERAL:
+            value = _literal_value(b)
+            self._offsets[text] = (a, value if op == '+' else -value)
+        return text, _RAW
+
+    def _logic(self, node):
+        right, = self._pop(1)
+        lines = self._close()
+        left, = self._pop(1)
+        if not lines:
+            op = 'and' if node.op == '&&' else 'or'
+            self._push('(%s %s %s)' % (self._as_cond(left), op, self._as_cond(right)), _BOOL,
+                       max(left[2], right[2]) + 1, left[3] or right[3])
+            return
+        # The right operand needs statements, run only when it is evaluated
+        self._spill()
+        temp = self._temp('1 if %s else 0' % self._as_cond(left))
+        self._emit(('if %s:' if node.op == '&&' else 'if not %s:') % temp)
+        self._indent += 1
+        self._splice(lines)
+        self._emit('%s = 1 if %s else 0' % (temp, self._as_cond(right)))
+        self._indent -= 1
+        self._push(temp, _TEMP)
+
+    def expr_UnaryOp(self, node):
+        op = node.op
+        if op in _INCREMENTS:
+            self._then((self._lvalue, node.expr), (self._increment, (node, True)))
+        elif op == '&':
+            self._then((self._lvalue, node.expr), (self._address, node))
+        elif op != '+':
+            self._then((self._expr, node.expr), (self._unary, node))
+        else:
+            self._then((self._expr, node.expr))
+
+    def _unary(self, node):
+        op = node.op
+        if op == '*':
+            self._simple(-1)
+        value, = self._pop(1)
+        text = value[0]
+        kind = _EXPR
+        if op == '*':
+            text = '%s.container[%s.index]' % (text, text)
+        elif op == '!':
+            text, kind = '(not %s)' % self._as_cond(value), _BOOL
+        elif node.expr.uc_type is not IntType:
+            text = '(-%s)' % text
+        elif value[1] == _LITERAL:
+            text, kind = _literal(wrap_int(-_literal_value(text))), _LITERAL
+        else:
+            text, kind = '(-%s)' % (text if value[1] == _RAW else self._as_value(value)), _RAW
+        self._push(text, kind, value[2] + 1, value[3])
+
+    def _address(self, node):
+        target = node.expr
+        if isinstance(target, ast_classes.ID):
+            self._push('_Pointer(%s, 0)' % self._name(target.symbol), _EXPR, 1)
+        elif isinstance(target, ast_classes.ArrayRef):
+            container, index, entries = self._element(target)
+            self._push('_Pointer(%s, %s)' % (container, index), _EXPR,
+                       max(entry[2] for entry in entries) + 1, any(entry[3] for entry in entries))
+        # &*p is p, left on the stack
+
+    def _increment(self, item):
+        node, used = item
+        type = node.expr.uc_type
+        location = self._location(node.expr, True)
+        one = ('1' if type is IntType else '1.0', _LITERAL, 0, False)
+        op = node.op[-1]
+        if not used:
+            new = self._operation(op, type, (location, _NAME), one)
+            self._effect('%s = %s' % (location, self._as_value(new)))
+            return
+        self._spill()
+        if node.op[0] == 'p':
+            temp = self._temp(location)
+            new = self._operation(op, type, (temp, _TEMP), one)
+            self._emit('%s = %s' % (location, self._as_value(new)))
+        else:
+            temp = self._temp()
+            new = self._operation(op, type, (location, _NAME), one)
+            self._emit('%s = %s = %s' % (temp, location, self._as_value(new)))
+        self._push(temp, _TEMP)
+
+    def expr_Assignment(self, node):
+        self._then((self._lvalue, node.lvalue), (self._expr, node.rvalue),
+                   (self._assign, (node, True)))
+
+    def _assign(self, item):
+        node, used = item
+        target = node.lvalue
+        type = target.uc_type
+        self._settle(_parts(target) + 1)
+        if node.op != '=' and type is IntType and node.op in ('/=', '%='):
+            self._simple(-1)
+        value, = self._pop(1)
+        if node.op == '=':
+            location = self._location(target)
+            text = self._as_value(self._decayed(value, node.rvalue, type))
+        else:
+            location = self._location(target, True)
+            text = self._as_value(self._operation(node.op[0], type, (location, _NAME), value))
+        if not used:
+            self._effect('%s = %s' % (location, text))
+        elif isinstance(target, ast_classes.ID):
+            self._effect('%s = %s' % (location, text))
+            self._push(location, _NAME)
+        else:
+            self._spill()
+            temp = self._temp()
+            self._emit('%s = %s = %s' % (temp, location, text))
+            self._push(temp, _TEMP)
+
+    def expr_ArrayRef(self, node):
+        self._then((self._lvalue, node), (self._array_load, node))
+
+    def _array_load(self, node):
+        container, index, entries = self._element(node)
+        # A row is a pointer to its first element
+        text = ('_Pointer(%s, %s)' if is_row(node) else '%s[%s]') % (container, index)
+        self._push(text, _EXPR, max(entry[2] for entry in entries) + 1,
+                   any(entry[3] for entry in entries))
+
+    def _element(self, node, twice=False):
+        """ Pops the values locating the element of the ArrayRef node, and
+            returns the Python expressions of its container and of its
+            offset in it (which are to be written twice if twice), with the
+            popped entries.
+        """
+        base, terms = flatten(node)
+        count = len(terms)
+        pointer = is_pointer(base, self._params)
+        if pointer or twice:
+            self._simple(-count - 1)
+        if twice:
+            for position in range(-count, 0):
+                self._simple(position)
+        entries = self._pop(count + 1)
+        parts = []
+        # Kinds of the subscripts that are not literals
+        variables = []
+        constant = 0
+        for entry, (_, n) in zip(entries[1:], terms):
+            text = self._as_value(entry)
+            if entry[1] == _LITERAL:
+                constant += _literal_value(text) * n
+            else:
+                parts.append(text if n == 1 else '%s * %d' % (text, n))
+                variables.append(entry[1])
+        array = entries[0][0]
+        if pointer:
+            parts.insert(0, '%s.index' % array)
+        if constant or not parts:
+            parts.append(_literal(constant))
+        offset = ' + '.join(parts)
+
+        # Past its end, a buffer raises IndexError itself, but a negative
+        # offset would wrap around to its last elements. A variable is
+        # checked inline, read twice rather than passed to _subscript
+        if pointer or variables and (count > 1 or variables[0] not in (_NAME, _TEMP)):
+            offset = '_subscript(%s)' % offset
+        elif variables:
+            offset = '%s if %s >= 0 else _subscript(%s)' % (offset, offset, offset)
+        elif constant < 0:
+            offset = '_subscript(%s)' % offset
+        if pointer:
+            return '%s.container' % array, offset, entries
+        return array, offset, entries
+
+    def _decayed(self, entry, node, type):
+        """ The entry of the expression node, converted to a value of type. """
+        if not decays(node, type, self._params):
+            return entry
+        return ('_Pointer(%s, 0)' % self._as_value(entry), _EXPR, entry[2] + 1, entry[3])
+
+    def expr_Cast(self, node):
+        self._then((self._expr, node.expr), (self._cast, node))
+
+    def _cast(self, node):
+        type = node.new_type.names[0]
+        if node.expr.uc_type.name == type:
+            return
+        value, = self._pop(1)
+        if type == 'float':
+            text = 'float(%s)' % self._as_value(value)
+        else:
+            text = '_cast(%s, %r)' % (self._as_value(value), type)
+        self._push(text, _EXPR, value[2] + 1, value[3])
+
+    def expr_ExprList(self, node):
+        self._then(*([(self._expr, e) for e in node.exprs] + [(self._sequence, len(node.exprs))]))
+
+    def _sequence(self, count):
+        entries = self._pop(count)
+        last = entries.pop()
+        for entry in entries:
+            if entry[1] not in _SIMPLE:
+                self._effect(self._as_value(entry))
+        self._values.append(last)
+
+    def expr_FuncCall(self, node):
+        args = self._args(node)
+        self._then(*([(self._expr, arg) for arg in args] + [(self._call, node)]))
+
+    def _args(self, node):
+        if node.args is None:
+            return []
+        if isinstance(node.args, ast_classes.ExprList):
+            return node.args.exprs
+        return [node.args]
+
+    def _call(self, node):
+        args = self._args(node)
+        entries = self._pop(len(args))
+        texts = []
+        for entry, arg, param in zip(entries, args, node.name.uc_type.params):
+            texts.append(self._as_value(self._decayed(entry, arg, param)))
+        depth = max([entry[2] for entry in entries] + [0]) + 1
+        self._push('f_%s(%s)' % (node.name.name, ', '.join(texts)), _EXPR, depth, True)
+
+    # Lvalues
+
+    def _lvalue(self, node):
+        """ Computes the values locating the lvalue node. """
+        if isinstance(node, ast_classes.ArrayRef):
+            base, terms = flatten(node)
+            self._then(*([(self._expr, base)] + [(self._expr, s) for s, _ in terms]))
+        elif isinstance(node, ast_classes.UnaryOp):
+            self._then((self._expr, node.expr))
+
+    def _location(self, node, twice=False):
+        """ Pops the values locating the lvalue node, and returns the Python
+            expression designating it, which is to be written (and read
+            too, if twice).
+        """
+        if isinstance(node, ast_classes.ID):
+            symbol = node.symbol
+            if symbol.scope == 0 and symbol not in self._boxed and self._in_function:
+                self._written.add(self._name(symbol))
+            return self._variable(symbol)
+        if isinstance(node, ast_classes.ArrayRef):
+            container, index, _ = self._element(node, twice)
+            return '%s[%s]' % (container, index)
+        self._simple(-1)
+        pointer = self._values.pop()[0]
+        return '%s.container[%s.index]' % (pointer, pointer)
+
+    # Statements
+
+    def _stmt(self, node):
+        if node is None:
+            return
+        if isinstance(node, ast_classes.Assignment):
+            self._then((self._lvalue, node.lvalue), (self._expr, node.rvalue),
+                       (self._assign, (node, False)))
+        elif isinstance(node, ast_classes.UnaryOp) and node.op in _INCREMENTS:
+            self._then((self._lvalue, node.expr), (self._increment, (node, False)))
+        elif isinstance(node, ast_classes.ExprList):
+            self._then(*[(self._stmt, e) for e in node.exprs])
+        elif isinstance(node, _EXPRESSIONS):
+            self._then((self._expr, node), (self._discard, None))
+        else:
+            cls = node.__class__
+            method = self._methods.get(cls)
+            if method is None:
+                method = self._methods[cls] = getattr(self, 'stmt_' + cls.__name__)
+            method(node)
+
+    def _discard(self, _):
+        entry = self._values.pop()
+        if entry[1] not in _SIMPLE:
+            self._effect(self._as_value(entry))
+
+    def stmt_Compound(self, node):
+        self._then(*[(self._stmt, item) for item in node.block_items or []])
+
+    def stmt_DeclList(self, node):
+        self._then(*[(self._decl, decl) for decl in node.decls])
+
+    def stmt_Decl(self, node):
+        self._decl(node)
+
+    def stmt_EmptyStatement(self, node):
+        pass
+
+    def _decl(self, node):
+        symbol = node.name.symbol
+        if symbol is None or symbol.decl is not node or symbol.kind == 'func':
+            return
+        type = self._types.symbol_type(symbol)
+        if isinstance(type, ArrayType):
+            template, exprs = (None, []) if node.init is None else initializer(node.init, type)
+            self._then(*([(self._expr, expr) for _, expr in exprs] +
+                         [(self._array_decl, (node, type, template, exprs))]))
+        elif node.init is None:
+            self._store(symbol, _zero(type))
+        else:
+            self._then((self._expr, node.init), (self._decl_init, (symbol, node.init, type)))
+
+    def _decl_init(self, item):
+        symbol, init, target = item
+        self._store(symbol, self._as_value(self._decayed(self._values.pop(), init, target)))
+
+    def _store(self, symbol, text):
+        """ Emits the declaration of symbol, with the initial value text. """
+        if symbol in self._boxed:
+            text = '[%s]' % text
+        self._effect('%s = %s' % (self._name(symbol), text))
+
+    def _array_decl(self, item):
+        node, type, template, exprs = item
+        size = array_size(type, node.coord)
+        elem = element_type(type)
+        code, zero = typecode(elem), zero_value(elem)
+        if template is None:
+            text = '_new_array(%d, %r, %r)' % (size, code, zero)
+        else:
+            items = [_literal(value) for value in template]
+            for (offset, _), entry in zip(exprs, self._pop(len(exprs))):
+                items[offset] = self._as_value(entry)
+            text = self._array_text(items, code, repr(zero))
+        self._store(node.name.symbol, text)
+
+    def _array_text(self, items, code, zero):
+        """ Python expression building the flat array of typecode code whose
+            elements have the texts items, in bulk: long runs of zeros are
+            made by _new_array.
+        """
+        display = '[%s]' if code is None else '_array(%r, [%%s])' % code
+        texts = []
+        run = []
+        i = 0
+        while i < len(items):
+            j = i
+            while j < len(items) and items[j] == zero:
+                j += 1
+            if j - i <= _INLINE_PADDING:
+                run.extend(items[i:j + 1])
+                i = j + 1
+                continue
+            if run:
+                texts.append(display % ', '.join(run))
+                run = []
+            texts.append('_new_array(%d, %r, %s)' % (j - i, code, zero))
+            i = j
+        if run or not texts:
+            texts.append(display % ', '.join(run))
+        return ' + '.join(texts)
+
+    def stmt_If(self, node):
+        self._then((self._expr, node.cond), (self._if_test, None), (self._stmt, node.iftrue),
+                   (self._if_else, node))
+
+    def _if_test(self, _):
+        self._block('if %s:' % self._as_cond(self._values.pop()))
+
+    def _if_else(self, node):
+        self._end_block()
+        if node.iffalse is not None:
+            self._block('else:')
+            self._then((self._stmt, node.iffalse), (self._end_block, None))
+
+    def stmt_While(self, node):
+        self._then((self._open, None), (self._expr, node.cond), (self._loop_test, None),
+                   (self._stmt, node.statement), (self._end_block, None))
+
+    def stmt_For(self, node):
+        tasks = [(self._stmt, node.initial)]
+        if node.cond is not None:
+            tasks += [(self._open, None), (self._expr, node.cond), (self._loop_test, None)]
+        else:
+            tasks.append((self._block, 'while True:'))
+        # uC has no continue, so the next expression ends the body
+        tasks += [(self._stmt, node.statement), (self._stmt, node.next), (self._end_block, None)]
+        self._then(*tasks)
+
+    def _loop_test(self, _):
+        cond = self._as_cond(self._values.pop())
+        lines = self._close()
+        if not lines:
+            self._block('while %s:' % cond)
+            return
+        # The condition needs statements, run before every test
+        self._block('while True:')
+        self._splice(lines)
+        self._emit('if not %s:' % cond)
+        self._emit('    break')
+
+    def stmt_Break(self, node):
+        self._emit('break')
+
+    def stmt_Return(self, node):
+        if node.expr is None:
+            self._emit('return')
+        else:
+            self._then((self._expr, node.expr), (self._return, None))
+
+    def _return(self, _):
+        self._emit('return %s' % self._as_value(self._values.pop()))
+
+    def stmt_Assert(self, node):
+        self._then((self._expr, node.expr), (self._assert, node))
+
+    def _assert(self, node):
+        self._block('if not %s:' % self._as_cond(self._values.pop()))
+        self._emit('raise _AssertionFailed(_Coord(%r, %r))' % (node.coord.line, node.coord.column))
+        self._end_block()
+
+    def stmt_Print(self, node):
+        if node.expr is None:
+            self._emit("_write('\\n')")
+            return
+        exprs = node.expr.exprs if isinstance(node.expr, ast_classes.ExprList) else [node.expr]
+        tasks = []
+        for expr in exprs:
+            if isinstance(expr, ast_classes.Constant) and expr.type == 'string':
+                tasks.append((self._print_text, unescape(expr.value)))
+            else:
+                tasks.append((self._expr, expr))
+                tasks.append((self._format, expr.uc_type))
+        tasks.append((self._print, len(exprs)))
+        self._then(*tasks)
+
+    def _print_text(self, text):
+        self._push(repr(text), _LITERAL)
+
+    def _format(self, type):
+        value, = self._pop(1)
+        text = self._as_value(value)
+        if type is CharType:
+            text = 'chr(%s & 255)' % text
+        elif isinstance(type, ArrayType) and type.element is CharType:
+            text = '_chars_to_str(%s)' % text
+        else:
+            text = 'str(%s)' % text
+        self._push(text, _EXPR, value[2] + 1, value[3])
+
+    def _print(self, count):
+        texts = [entry[0] for entry in self._pop(count)]
+        if count == 1:
+            self._emit('_write(%s)' % texts[0])
+        else:
+            self._emit("_write(''.join((%s)))" % ', '.join(texts))
+
+    def stmt_Read(self, node):
+        targets = node.expr.exprs if isinstance(node.expr, ast_classes.ExprList) else [node.expr]
+        tasks = []
+        for target in targets:
+            tasks.append((self._lvalue, target))
+            tasks.append((self._read, target))
+        self._then(*tasks)
+
+    def _read(self, target):
+        self._settle(_parts(target))
+        location = self._location(target)
+        self._emit('%s = _read_value(_token(), %d)' % (location, _read_kind(target.uc_type)))
+
+
+class PythonProgram:
+    """ uC program translated into a Python code object, which can be run
+        any number of times.
+    """
+
+    def __init__(self, code):
+        self.code = code
+        self.input = None
+        self.output = None
+
+    def run(self, stdin=None, stdout=None):
+        """ Runs the program, reading from stdin and writing to stdout (the
+            standard streams by default). Returns the exit status: the value
+            returned by main, or 1 if an assertion failed.
+        """
+        if 'f_main' not in self.code.co_names:
+            raise UCRuntimeError('No main function')
+        self.output = Output(stdout)
+        self.input = Input(stdin, self.output)
+        namespace = dict(_RUNTIME, _write=self.output.write, _token=self.input.token)
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(max(limit, _RECURSION_LIMIT))
+        try:
+            exec(self.code, namespace)
+            status = namespace['f_main']()
+        except AssertionFailed as e:
+            self.output.write('%s\n' % e)
+            status = 1
+        except ZeroDivisionError:
+            raise UCRuntimeError('Division by zero')
+        except IndexError:
+            raise UCRuntimeError('Array index out of range')
+        except RecursionError:
+            raise UCRuntimeError('Stack overflow')
+        finally:
+            sys.setrecursionlimit(limit)
+            self.output.flush()
+        return status or 0
+
+
+def compile_program(program):
+    """ Code object of the checked program. """
+    return compile(Transpiler().transpile(program), '<uc>', 'exec')
+
+
+# Version of the translation, part of the keys of the cached code objects
+VERSION = 3
+
+# Packages whose code makes the translations: a change to any of their
+# modules changes the keys, so stale code objects are never used
+_PACKAGES = ('parser', 'semantic', 'optimizer', 'interpreter')
+
+
+def _sources_hash():
+    """ Hash of the sources of the modules of _PACKAGES. """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    digest = hashlib.sha1()
+    for package in _PACKAGES:
+        for directory, dirs, files in os.walk(os.path.join(root, package)):
+            dirs.sort()
+            for name in sorted(files):
+                # PLY generates parsetab.py from uc_parser.py
+                if not name.endswith('.py') or name == 'parsetab.py':
+                    continue
+                path = os.path.join(directory, name)
+                digest.update(os.path.relpath(path, root).encode('utf-8'))
+                with open(path, 'rb') as f:
+                    digest.update(f.read())
+    return digest.hexdigest()
+
+
+SOURCES = _sources_hash()
+
+
+# Directory of the cached code objects
+CACHE_DIR = os.environ.get('UC_CACHE_DIR') or \
+    os.path.join(os.path.expanduser('~'), '.cache', 'uc')
+
+# Code objects, by hash of their source, least recently used first
+_cache = OrderedDict()
+CACHE_SIZE = 128
+
+
+def _load(path):
+    try:
+        with open(path, 'rb') as f:
+            code = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    return code if isinstance(code, types.CodeType) else None
+
+
+def _save(path, code):
+    """ Writes code to path atomically. The disk cache is only an
+        optimization, so failures are ignored.
+    """
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                marshal.dump(code, f)
+            os.replace(temp, path)
+        except BaseException:
+            os.unlink(temp)
+            raise
+    except OSError:
+        pass
+
+
+def _key(source, passes=()):
+    text = '%s:%s:%s:%s' % (VERSION, SOURCES, sys.implementation.cache_tag, source)
+    if passes:
+        text += ':' + ','.join(passes)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _cached(key, translate, cache_dir):
+    """ PythonProgram of the code object cached under key, in memory or in
+        the directory cache_dir, or else of the one translate() returns and
+        the cache keeps. None if translate() returns None.
+    """
+    code = _cache.get(key)
+    if code is not None:
+        _cache.move_to_end(key)
+        return PythonProgram(code)
+    path = os.path.join(cache_dir, key + '.ucc') if cache_dir is not None else None
+    code = _load(path) if path is not None else None
+
+    if code is None:
+        code = translate()
+        if code is None:
+            return None
+        if path is not None:
+            _save(path, code)
+
+    _cache[key] = code
+    if len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return PythonProgram(code)
+
+
+def compile_source(source, error_func, parser=None, cache_dir=CACHE_DIR):
+    """ Returns the PythonProgram of the uC program source, or None if it
+        has errors, which are reported to error_func(lineno, message).
+
+        Code objects are cached by the hash of their source and of the
+        compiler's own, in memory and in the directory cache_dir (unless it
+        is None), so an unchanged program is neither parsed nor translated
+        again.
+    """
+
+    def translate():
+        errors = []
+
+        def report(lineno, message):
+            errors.append(lineno)
+            error_func(lineno, message)
+
+        ast = (parser or UCParser()).parse(source)
+        if ast is None:
+            return None
+        NameResolver(report).resolve(ast)
+        if not errors:
+            TypeChecker(report).check(ast)
+        if errors:
+            return None
+        return compile_program(ast)
+
+    return _cached(_key(source), translate, cache_dir)
+
+
+def compile_tree(program, source, passes=(), cache_dir=CACHE_DIR):
+    """ Returns the PythonProgram of the checked program, parsed from
+        source and then transformed by passes, a list of strings naming
+        them (with their parameters) in order.
+
+        Code objects are cached like those of compile_source, by the hash
+        of the source and of the passes.
+    """
+    return _cached(_key(source, passes), lambda: compile_program(program), cache_dir)
+
+
+def clear_cache():
+    _cache.clear()
@@ -0,0 +1,281 @@
+""" Virtual machine running the bytecode of interpreter.bytecode. """
+
+import sys
+
+from semantic.uc_ops import INT_MAX, INT_MIN, cast, int_div, int_mod, wrap_int
+
+from .bytecode import (ADD, ADDRE, ADDRG, ADDRL, ADDRP, ALOAD, ASSERT, ASTORE, BOOL, CALL,
+                       CAST, DECAY, DEREF, DIV, EQ, FADD, FDIV, FMUL, FNEG, FSUB, GE, GETG,
+                       GT, JMP, JMPF, JMPT, JNEQ, JNGE, JNGT, JNLE, JNLT, JNNE, LE, LOADK,
+                       LT, MOD, MOVE, MUL, NE, NEG, NEWARR, NOT, NSAME, PLOAD, PRINT,
+                       PRINTK, PSET, PSTORE, READ, RET, RETV, SAME, SETG, SUB, decode)
+from .runtime import (AssertionFailed, Input, Output, Pointer, StepLimitExceeded,
+                      UCRuntimeError, chars_to_str, copy_array, new_array, read_value)
+
+# Python frames allowed while running: every uC call is a Python call
+_RECURSION_LIMIT = 50000
+
+_CAST_TYPES = ('int', 'float', 'char')
+
+# Opcodes of the instructions charged a step under a step limit, which
+# replace backward jumps (one per loop iteration) and calls
+_LOOP = -1
+_CALLS = -2
+
+
+def _charged(code):
+    """ Decoded code with its backward jumps and calls replaced by their
+        charged versions.
+    """
+    charged = []
+    for pc, (op, a, b, c) in enumerate(code):
+        if op == JMP and a <= pc:
+            op = _LOOP
+        elif op == CALL:
+            op = _CALLS
+        charged.append((op, a, b, c))
+    return charged
+
+
+class VM:
+    """ Runs a Module any number of times.
+
+        Each call of a uC function runs a dispatch loop over the code of its
+        Function, with a new frame of registers. The code arrays are decoded
+        once into lists of instruction tuples, which are faster to fetch.
+
+        If steps is given, a run stops with a StepLimitExceeded error after
+        steps loop iterations and calls. Only the instructions taking steps
+        are charged for them, so runs without a limit cost the same.
+    """
+
+    def __init__(self, module, steps=None):
+        self.module = module
+        self.steps = steps
+        self.input = None
+        self.output = None
+        self.globals = []
+        self._code = [decode(f) for f in module.functions]
+        self._init_code = decode(module.init)
+        if steps is not None:
+            self._code = [_charged(code) for code in self._code]
+            self._init_code = _charged(self._init_code)
+        self._steps_left = steps
+
+    def run(self, stdin=None, stdout=None):
+        """ Runs the program, reading from stdin and writing to stdout (the
+            standard streams by default). Returns the exit status: the value
+            returned by main, or 1 if an assertion failed.
+        """
+        module = self.module
+        if module.main is None:
+            raise UCRuntimeError('No main function')
+        self.output = Output(stdout)
+        self.input = Input(stdin, self.output)
+        self.globals = [0] * module.nglobals
+        self._steps_left = self.steps
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(max(limit, _RECURSION_LIMIT))
+        try:
+            self.execute(module.init, self._init_code, [])
+            status = self.execute(module.functions[module.main], self._code[module.main], [])
+        except AssertionFailed as e:
+            self.output.write('%s\n' % e)
+            status = 1
+        except ZeroDivisionError:
+            raise UCRuntimeError('Division by zero')
+        except IndexError:
+            raise UCRuntimeError('Array index out of range')
+        except RecursionError:
+            raise UCRuntimeError('Stack overflow')
+        finally:
+            sys.setrecursionlimit(limit)
+            self.output.flush()
+        return status or 0
+
+    def execute(self, function, code, args):
+        """ Calls function, whose decoded code is code, with the list of
+            values args.
+        """
+        r = list(function.frame)
+        r[:len(args)] = args
+        K = self.module.constants
+        G = self.globals
+        functions = self.module.functions
+        codes = self._code
+        pc = 0
+        while True:
+            op, a, b, c = code[pc]
+            pc += 1
+            # Most frequent instructions first
+            if op == MOVE:
+                r[a] = r[b]
+            elif op == ADD:
+                v = r[b] + r[c]
+                r[a] = v if INT_MIN <= v <= INT_MAX else wrap_int(v)
+            elif op == JNLT:
+                if not r[a] < r[b]:
+                    pc = c
+            elif op == JMP:
+                pc = a
+            elif op == _LOOP:
+                self._step()
+                pc = a
+            elif op == MOD:
+                x = r[b]
+                y = r[c]
+                r[a] = x % y if x >= 0 and y > 0 else int_mod(x, y)
+            elif op == JMPF:
+                if not r[a]:
+                    pc = b
+            elif op == ALOAD:
+                i = r[c]
+                if i < 0:
+                    raise IndexError(i)
+                r[a] = r[b][i]
+            elif op == ASTORE:
+                i = r[b]
+                if i < 0:
+                    raise IndexError(i)
+                r[a][i] = r[c]
+            elif op == GETG:
+                r[a] = G[b]
+            elif op == SETG:
+                G[a] = r[b]
+            elif op == SUB:
+                v = r[b] - r[c]
+                r[a] = v if INT_MIN <= v <= INT_MAX else wrap_int(v)
+            elif op == MUL:
+                v = r[b] * r[c]
+                r[a] = v if INT_MIN <= v <= INT_MAX else wrap_int(v)
+            elif op == DIV:
+                x = r[b]
+                y = r[c]
+                r[a] = x // y if x >= 0 and y > 0 else int_div(x, y)
+            elif op == JNEQ:
+                if not r[a] == r[b]:
+                    pc = c
+            elif op == JNNE:
+                if not r[a] != r[b]:
+                    pc = c
+            elif op == JNLE:
+                if not r[a] <= r[b]:
+                    pc = c
+            elif op == JNGT:
+                if not r[a] > r[b]:
+                    pc = c
+            elif op == JNGE:
+                if not r[a] >= r[b]:
+                    pc = c
+            elif op == LT:
+                r[a] = 1 if r[b] < r[c] else 0
+            elif op == EQ:
+                r[a] = 1 if r[b] == r[c] else 0
+            elif op == NE:
+                r[a] = 1 if r[b] != r[c] else 0
+            elif op == LE:
+                r[a] = 1 if r[b] <= r[c] else 0
+            elif op == GT:
+                r[a] = 1 if r[b] > r[c] else 0
+            elif op == GE:
+                r[a] = 1 if r[b] >= r[c] else 0
+            elif op == CALL:
+                callee = functions[b]
+                r[a] = self.execute(callee, codes[b], r[c:c + callee.nparams])
+            elif op == RET:
+                return r[a]
+            elif op == RETV:
+                return None
+            elif op == LOADK:
+                r[a] = K[b]
+            elif op == JMPT:
+                if r[a]:
+                    pc = b
+            elif op == BOOL:
+                r[a] = 1 if r[b] else 0
+            elif op == NOT:
+                r[a] = 0 if r[b] else 1
+            elif op == NEG:
+                r[a] = wrap_int(-r[b])
+            elif op == FADD:
+                r[a] = r[b] + r[c]
+            elif op == FSUB:
+                r[a] = r[b] - r[c]
+            elif op == FMUL:
+                r[a] = r[b] * r[c]
+            elif op == FDIV:
+                r[a] = r[b] / r[c]
+            elif op == FNEG:
+                r[a] = -r[b]
+            elif op == PRINT:
+                if b == 1:
+                    self.output.write(chr(r[a] & 0xFF))
+                elif b == 2:
+                    self.output.write(chars_to_str(r[a]))
+                else:
+                    self.output.write(str(r[a]))
+            elif op == PRINTK:
+                self.output.write(K[a])
+            elif op == READ:
+                r[a] = read_value(self.input.token(), b)
+            elif op == ASSERT:
+                if not r[a]:
+                    raise AssertionFailed(K[b])
+            elif op == NEWARR:
+                spec = K[b]
+                if spec[0] == 'copy':
+                    r[a] = copy_array(spec[1])
+                else:
+                    r[a] = new_array(spec[1], spec[2], spec[3])
+            elif op == CAST:
+                r[a] = cast(r[b], _CAST_TYPES[c])
+            elif op == PLOAD:
+                p = r[b]
+                i = p.index + r[c]
+                if i < 0:
+                    raise IndexError(i)
+                r[a] = p.container[i]
+            elif op == PSTORE:
+                p = r[a]
+                i = p.index + r[b]
+                if i < 0:
+                    raise IndexError(i)
+                p.container[i] = r[c]
+            elif op == DEREF:
+                p = r[b]
+                r[a] = p.container[p.index]
+            elif op == PSET:
+                p = r[a]
+                p.container[p.index] = r[b]
+            elif op == ADDRL:
+                r[a] = Pointer(r, b)
+            elif op == ADDRG:
+                r[a] = Pointer(G, b)
+            elif op == ADDRE:
+                i = r[c]
+                if i < 0:
+                    raise IndexError(i)
+                r[a] = Pointer(r[b], i)
+            elif op == ADDRP:
+                p = r[b]
+                i = p.index + r[c]
+                if i < 0:
+                    raise IndexError(i)
+                r[a] = Pointer(p.container, i)
+            elif op == DECAY:
+                r[a] = Pointer(r[b], 0)
+            elif op == SAME:
+                r[a] = 1 if r[b] is r[c] else 0
+            elif op == NSAME:
+                r[a] = 1 if r[b] is not r[c] else 0
+            elif op == _CALLS:
+                self._step()
+                callee = functions[b]
+                r[a] = self.execute(callee, codes[b], r[c:c + callee.nparams])
+            else:
+                raise UCRuntimeError('Invalid opcode %d' % op)
+
+    def _step(self):
+        self._steps_left -= 1
+        if self._steps_left < 0:
+            raise StepLimitExceeded()
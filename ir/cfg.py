@@ -0,0 +1,381 @@
+""" Control-flow graphs of uC functions.
+
+    The statements of a FuncDef are lowered into basic blocks: sequences of
+    simple statements (declarations, expressions, print, read, assert and
+    return), run one after the other, that end with a jump or with a branch
+    on a condition. Compound, If, While, For and Break only remain as edges.
+
+    A graph is stored in flat arrays of ints instead of block objects: the
+    statements of all the blocks in a single list, with the offset where
+    each block starts, two successors per block, and the predecessors of
+    all the blocks one after the other. Graphs are built and walked with
+    explicit stacks, so huge functions do not hit the recursion limit.
+"""
+
+from array import array
+
+from parser import ast_classes
+
+# Blocks every graph starts with
+ENTRY = 0
+EXIT = 1
+# Missing successor
+NONE = -1
+
+
+class CFG:
+    """ Control-flow graph of a FuncDef.
+
+        Block ENTRY starts the function, and the empty block EXIT follows
+        its Return statements and its end. A block ending in a branch has a
+        condition, and goes to its first successor when the condition is
+        true, to the second one when it is false. Other blocks have a single
+        successor, except EXIT, which has none. Blocks after a Return or a
+        Break that no jump leads to are kept, unreachable.
+
+            func:
+                The FuncDef.
+            stmts:
+                Statements of the blocks, block after block.
+            starts:
+                array of offsets: the statements of block b are
+                stmts[starts[b]:starts[b + 1]].
+            conds:
+                Condition ending each block, or None.
+            succs:
+                array of successors, two per block: those of block b are
+                succs[2 * b] and succs[2 * b + 1], NONE if missing.
+            pred_starts, preds:
+                arrays of the predecessors of the blocks, block after block:
+                those of block b are preds[pred_starts[b]:pred_starts[b + 1]].
+            loops:
+                (While or For node, header block) of every loop, outer loops
+                first. The header holds the condition of the loop, if any.
+            stmt_blocks:
+                Block where each statement starts, by statement node, for
+                all of them, Compound, If, While, For and Break included.
+    """
+
+    def __init__(self, func, stmts, starts, conds, succs, loops=(), stmt_blocks=None):
+        self.func = func
+        self.stmts = stmts
+        self.starts = starts
+        self.conds = conds
+        self.succs = succs
+        self.loops = loops
+        self.stmt_blocks = {} if stmt_blocks is None else stmt_blocks
+        n = len(conds)
+        counts = array('i', [0]) * (n + 1)
+        for s in succs:
+            if s != NONE:
+                counts[s + 1] += 1
+        for b in range(n):
+            counts[b + 1] += counts[b]
+        self.pred_starts = counts
+        self.preds = array('i', [0]) * counts[n]
+        fill = counts[:n]
+        for i, s in enumerate(succs):
+            if s != NONE:
+                self.preds[fill[s]] = i >> 1
+                fill[s] += 1
+        self._rpo = None
+        self._idom = None
+        self._dom_numbers = None
+
+    def __len__(self):
+        return len(self.conds)
+
+    def block(self, b):
+        """ List of the statements of block b. """
+        return self.stmts[self.starts[b]:self.starts[b + 1]]
+
+    def successors(self, b):
+        succs = self.succs
+        first = succs[2 * b]
+        second = succs[2 * b + 1]
+        if first == NONE:
+            return ()
+        return (first,) if second == NONE else (first, second)
+
+    def predecessors(self, b):
+        return self.preds[self.pred_starts[b]:self.pred_starts[b + 1]]
+
+    def reverse_postorder(self):
+        """ array of the blocks reachable from ENTRY, in reverse postorder:
+            every block comes before its successors, except along back
+            edges.
+        """
+        if self._rpo is None:
+            succs = self.succs
+            seen = bytearray(len(self))
+            # Number of successors visited, of each block on the stack
+            visited = bytearray(len(self))
+            order = array('i')
+            seen[ENTRY] = 1
+            stack = [ENTRY]
+            while stack:
+                b = stack[-1]
+                i = visited[b]
+                if i < 2:
+                    visited[b] = i + 1
+                    s = succs[2 * b + i]
+                    if s != NONE and not seen[s]:
+                        seen[s] = 1
+                        stack.append(s)
+                else:
+                    order.append(stack.pop())
+            order.reverse()
+            self._rpo = order
+        return self._rpo
+
+    def dominators(self):
+        """ array of the immediate dominator of each block: ENTRY for ENTRY
+            itself, NONE for unreachable blocks.
+
+            Computed by the iterative algorithm of Cooper, Harvey and
+            Kennedy, which intersects the dominators of the predecessors
+            of the blocks in reverse postorder until nothing changes.
+        """
+        if self._idom is None:
+            rpo = self.reverse_postorder()
+            order = array('i', [len(self)]) * len(self)
+            for i, b in enumerate(rpo):
+                order[b] = i
+            idom = array('i', [NONE]) * len(self)
+            idom[ENTRY] = ENTRY
+            preds = self.preds
+            pred_starts = self.pred_starts
+            changed = True
+            while changed:
+                changed = False
+                for b in rpo[1:]:
+                    new = NONE
+                    for i in range(pred_starts[b], pred_starts[b + 1]):
+                        p = preds[i]
+                        if idom[p] == NONE:
+                            continue
+                        if new == NONE:
+                            new = p
+                            continue
+                        while p != new:
+                            while order[p] > order[new]:
+                                p = idom[p]
+                            while order[new] > order[p]:
+                                new = idom[new]
+                    if idom[b] != new:
+                        idom[b] = new
+                        changed = True
+            self._idom = idom
+        return self._idom
+
+    def dominator_tree(self):
+        """ Children of the blocks in the dominator tree, as a pair of
+            arrays (starts, children): those of block b are
+            children[starts[b]:starts[b + 1]].
+        """
+        idom = self.dominators()
+        n = len(self)
+        starts = array('i', [0]) * (n + 1)
+        for b in range(n):
+            if b != ENTRY and idom[b] != NONE:
+                starts[idom[b] + 1] += 1
+        for b in range(n):
+            starts[b + 1] += starts[b]
+        children = array('i', [0]) * starts[n]
+        fill = starts[:n]
+        for b in self.reverse_postorder():
+            if b != ENTRY:
+                children[fill[idom[b]]] = b
+                fill[idom[b]] += 1
+        return starts, children
+
+    def dominates(self, a, b):
+        """ Whether block a dominates block b: every path from ENTRY to b
+            goes through a. Answered in constant time, from the intervals
+            of a preorder numbering of the dominator tree.
+        """
+        if self._dom_numbers is None:
+            starts, children = self.dominator_tree()
+            enter = array('i', [NONE]) * len(self)
+            leave = array('i', [NONE]) * len(self)
+            clock = 0
+            stack = [ENTRY]
+            while stack:
+                node = stack.pop()
+                if node < 0:
+                    leave[~node] = clock
+                    continue
+                enter[node] = clock
+                clock += 1
+                stack.append(~node)
+                stack.extend(children[starts[node]:starts[node + 1]])
+            self._dom_numbers = enter, leave
+        enter, leave = self._dom_numbers
+        return enter[b] != NONE and enter[a] <= enter[b] and leave[b] <= leave[a]
+
+    def natural_loop(self, header):
+        """ List of the blocks of the natural loop of header: header and the
+            blocks that reach one of its back edges (edges to header from a
+            block it dominates) without going through header. Empty if no
+            back edge leads to header.
+        """
+        blocks = []
+        seen = {header}
+        stack = [b for b in self.predecessors(header) if self.dominates(header, b)]
+        if not stack:
+            return blocks
+        blocks.append(header)
+        seen.update(stack)
+        while stack:
+            b = stack.pop()
+            blocks.append(b)
+            for p in self.predecessors(b):
+                if p not in seen:
+                    seen.add(p)
+                    stack.append(p)
+        return blocks
+
+
+class CFGBuilder:
+    """ Builds the CFGs of FuncDefs.
+
+        Statements are lowered by tasks taken from an explicit stack, as in
+        the BytecodeCompiler, appending simple statements to the current
+        block. A Return or a Break ends it, and the statements after them
+        start a new block with no predecessors.
+    """
+
+    def build(self, func):
+        """ Returns the CFG of the FuncDef func. """
+        self._blocks = []
+        self._conds = []
+        self._succs = array('i')
+        # Exit blocks of the enclosing loops, innermost last
+        self._loops = []
+        loops = self._headers = []
+        stmt_blocks = self._stmt_blocks = {}
+        self._new_block()
+        self._new_block()
+        self._current = ENTRY
+        self._tasks = tasks = [(self._stmt, func.body)]
+        while tasks:
+            task, arg = tasks.pop()
+            task(arg)
+        self._jump(EXIT)
+        stmts = []
+        starts = array('i', [0])
+        for block in self._blocks:
+            stmts.extend(block)
+            starts.append(len(stmts))
+        return CFG(func, stmts, starts, self._conds, self._succs, loops, stmt_blocks)
+
+    def _then(self, *tasks):
+        """ Schedules tasks, (func, arg) pairs, to run in the given order
+            before the tasks already scheduled.
+        """
+        self._tasks.extend(reversed(tasks))
+
+    # Blocks and edges
+
+    def _new_block(self):
+        self._blocks.append([])
+        self._conds.append(None)
+        self._succs.extend((NONE, NONE))
+        return len(self._blocks) - 1
+
+    def _start(self, block):
+        self._current = block
+
+    def _jump(self, target):
+        """ Ends the current block with a jump to target. """
+        self._succs[2 * self._current] = target
+
+    def _goto(self, target):
+        self._jump(target)
+        self._start(target)
+
+    def _branch(self, cond, true, false):
+        """ Ends the current block with a branch on the expression cond. """
+        b = self._current
+        self._conds[b] = cond
+        self._succs[2 * b] = true
+        self._succs[2 * b + 1] = false
+
+    def _unreachable(self):
+        self._start(self._new_block())
+
+    # Statements
+
+    def _stmt(self, node):
+        if node is None:
+            return
+        self._stmt_blocks[node] = self._current
+        method = getattr(self, 'stmt_' + node.__class__.__name__, None)
+        if method is None:
+            self._blocks[self._current].append(node)
+        else:
+            method(node)
+
+    def stmt_Compound(self, node):
+        self._then(*[(self._stmt, item) for item in node.block_items or ()])
+
+    def stmt_DeclList(self, node):
+        self._blocks[self._current].extend(node.decls)
+
+    def stmt_EmptyStatement(self, node):
+        pass
+
+    def stmt_If(self, node):
+        then = self._new_block()
+        join = self._new_block()
+        if node.iffalse is None:
+            self._branch(node.cond, then, join)
+            self._start(then)
+            self._then((self._stmt, node.iftrue), (self._goto, join))
+        else:
+            other = self._new_block()
+            self._branch(node.cond, then, other)
+            self._start(then)
+            self._then((self._stmt, node.iftrue), (self._jump, join), (self._start, other),
+                       (self._stmt, node.iffalse), (self._goto, join))
+
+    def stmt_While(self, node):
+        self._loop(node, node.cond, node.statement, None)
+
+    def stmt_For(self, node):
+        self._then((self._stmt, node.initial), (self._for_loop, node))
+
+    def _for_loop(self, node):
+        self._loop(node, node.cond, node.statement, node.next)
+
+    def _loop(self, node, cond, statement, step):
+        header = self._new_block()
+        self._headers.append((node, header))
+        self._goto(header)
+        exit = self._new_block()
+        if cond is not None:
+            body = self._new_block()
+            self._branch(cond, body, exit)
+            self._start(body)
+        self._loops.append(exit)
+        self._then((self._stmt, statement), (self._stmt, step), (self._loop_end, header))
+
+    def _loop_end(self, header):
+        self._jump(header)
+        self._start(self._loops.pop())
+
+    def stmt_Break(self, node):
+        self._jump(self._loops[-1])
+        self._unreachable()
+
+    def stmt_Return(self, node):
+        self._blocks[self._current].append(node)
+        self._jump(EXIT)
+        self._unreachable()
+
+
+def build_cfgs(program):
+    """ List of the CFGs of the FuncDefs of program, in order. """
+    builder = CFGBuilder()
+    return [builder.build(gdecl) for gdecl in program.gdecls
+            if isinstance(gdecl, ast_classes.FuncDef)]
@@ -0,0 +1,301 @@
+""" Bit-vector dataflow analyses over the CFGs of ir.cfg.
+
+    Sets are Python ints used as bitsets: bit i stands for variable or
+    definition number i, so the union, intersection or difference of two
+    sets is a single int operation, however large the function. solve()
+    iterates a worklist in reverse postorder (postorder for backward
+    problems), which reaches the fixed point in a few sweeps.
+
+    The variables analysed are the local scalars and pointers of a function
+    whose address is never taken. Globals, arrays and variables that may be
+    changed through pointers are left out.
+"""
+
+from parser import ast_classes
+
+from .cfg import ENTRY, EXIT
+
+# Kinds of accesses of statements to variables
+USE = 0
+DEF = 1
+# Declaration without an initializer, which leaves the variable undefined
+UNDEF = 2
+
+_UPDATE_OPS = ('++', '--', 'p++', 'p--')
+
+
+def solve(cfg, gen, kill, forward=True, union=True, boundary=0, universe=0):
+    """ Solves a dataflow problem on cfg, whose block b transfers a set s
+        to gen[b] | (s & ~kill[b]). The sets entering a block are met by
+        union (or by intersection, whose identity is the set universe). The
+        set boundary enters ENTRY, or EXIT for backward problems. Returns
+        the lists of the sets at the start and at the end of every block
+        (0 for unreachable blocks).
+    """
+    n = len(cfg)
+    order = cfg.reverse_postorder()
+    if forward:
+        start = ENTRY
+        sources = cfg.predecessors
+        sinks = cfg.successors
+    else:
+        order = order[::-1]
+        start = EXIT
+        sources = cfg.successors
+        sinks = cfg.predecessors
+    before = [0] * n
+    after = [0 if union else universe] * n
+    pending = bytearray(n)
+    for b in order:
+        pending[b] = 1
+    changed = True
+    while changed:
+        changed = False
+        for b in order:
+            if not pending[b]:
+                continue
+            pending[b] = 0
+            if b == start:
+                value = boundary
+            elif union:
+                value = 0
+                for s in sources(b):
+                    value |= after[s]
+            else:
+                value = universe
+                for s in sources(b):
+                    value &= after[s]
+            before[b] = value
+            value = gen[b] | (value & ~kill[b])
+            if value != after[b]:
+                after[b] = value
+                changed = True
+                for s in sinks(b):
+                    pending[s] = 1
+    if not union:
+        reached = bytearray(n)
+        for b in order:
+            reached[b] = 1
+        after = [value if reached[b] else 0 for b, value in enumerate(after)]
+    return (before, after) if forward else (after, before)
+
+
+def _effects(node, index, accesses):
+    """ Appends to accesses the (kind, var, node) accesses of the statement
+        or expression node to the variables numbered by index, in the
+        order they happen.
+    """
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, tuple):
+            accesses.append(node)
+        elif isinstance(node, ast_classes.ID):
+            var = index.get(node.symbol)
+            if var is not None:
+                accesses.append((USE, var, node))
+        elif isinstance(node, ast_classes.Decl):
+            var = index.get(node.name.symbol)
+            if var is None:
+                if node.init is not None:
+                    stack.append(node.init)
+            elif node.init is None:
+                accesses.append((UNDEF, var, node))
+            else:
+                stack.append((DEF, var, node))
+                stack.append(node.init)
+        elif isinstance(node, ast_classes.Assignment):
+            var = index.get(getattr(node.lvalue, 'symbol', None))
+            if var is None:
+                stack.append(node.lvalue)
+                stack.append(node.rvalue)
+            else:
+                stack.append((DEF, var, node))
+                stack.append(node.rvalue)
+                if node.op != '=':
+                    stack.append(node.lvalue)
+        elif isinstance(node, ast_classes.UnaryOp) and node.op in _UPDATE_OPS:
+            var = index.get(getattr(node.expr, 'symbol', None))
+            if var is not None:
+                stack.append((DEF, var, node))
+            stack.append(node.expr)
+        elif isinstance(node, ast_classes.Read):
+            targets = node.expr.exprs if isinstance(node.expr, ast_classes.ExprList) \
+                else [node.expr]
+            for target in reversed(targets):
+                var = index.get(getattr(target, 'symbol', None))
+                if var is None:
+                    stack.append(target)
+                else:
+                    stack.append((DEF, var, node))
+        else:
+            for _, child in reversed(node.children()):
+                stack.append(child)
+
+
+class Accesses:
+    """ Accesses of the statements of a CFG to its variables.
+
+            symbols:
+                Symbols of the variables, by number.
+            index:
+                Number of each variable, by symbol.
+            params:
+                Numbers of the parameters.
+            blocks:
+                List of the (kind, var, node) accesses of each block, in
+                order, those of its condition last. node is the ID read by
+                a USE, and the statement or Decl writing a DEF or UNDEF.
+    """
+
+    def __init__(self, cfg):
+        symbols = []
+        params = []
+        excluded = set()
+        args = cfg.func.decl.type.args
+        if isinstance(args, ast_classes.ParamList):
+            for param in args.params:
+                if isinstance(param, ast_classes.Decl):
+                    params.append(len(symbols))
+                    symbols.append(param.name.symbol)
+        stack = list(cfg.stmts)
+        stack.extend(cond for cond in cfg.conds if cond is not None)
+        while stack:
+            node = stack.pop()
+            if isinstance(node, ast_classes.Decl):
+                symbols.append(node.name.symbol)
+            elif isinstance(node, ast_classes.UnaryOp) and node.op == '&' and \
+                    isinstance(node.expr, ast_classes.ID):
+                excluded.add(node.expr.symbol)
+            for _, child in node.children():
+                stack.append(child)
+        self.symbols = [symbol for symbol in symbols if symbol is not None and
+                        symbol.kind in ('var', 'pointer') and symbol not in excluded]
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.params = [self.index[symbols[i]] for i in params if symbols[i] in self.index]
+        self.blocks = []
+        for b in range(len(cfg)):
+            accesses = []
+            for stmt in cfg.block(b):
+                _effects(stmt, self.index, accesses)
+            if cfg.conds[b] is not None:
+                _effects(cfg.conds[b], self.index, accesses)
+            self.blocks.append(accesses)
+
+
+class Liveness:
+    """ Live variables: those whose value may be read later, before being
+        written again. A backward union problem.
+
+            live_in, live_out:
+                Sets of the variables live at the start and at the end of
+                each block.
+    """
+
+    def __init__(self, cfg, accesses=None):
+        self.cfg = cfg
+        self.accesses = accesses = accesses or Accesses(cfg)
+        gen = []
+        kill = []
+        for items in accesses.blocks:
+            uses = defs = 0
+            for kind, var, _ in items:
+                bit = 1 << var
+                if kind == USE:
+                    if not defs & bit:
+                        uses |= bit
+                else:
+                    defs |= bit
+            gen.append(uses)
+            kill.append(defs)
+        self.live_in, self.live_out = solve(cfg, gen, kill, forward=False)
+
+    def live_after(self, b):
+        """ List of the sets of variables live after each access of block
+            b, in order.
+        """
+        live = self.live_out[b]
+        after = []
+        for kind, var, _ in reversed(self.accesses.blocks[b]):
+            after.append(live)
+            if kind == USE:
+                live |= 1 << var
+            else:
+                live &= ~(1 << var)
+        after.reverse()
+        return after
+
+
+class ReachingDefinitions:
+    """ Reaching definitions: the writes of variables whose value may still
+        be there at some point. A forward union problem.
+
+        Every DEF and UNDEF access is a definition, and so is every
+        parameter, at the start of ENTRY.
+
+            defs:
+                (kind, var, node) of each definition, by number. node is
+                the parameter Decl of parameters, which are DEFs.
+            var_defs:
+                Set of the definitions of each variable.
+            reach_in, reach_out:
+                Sets of the definitions reaching the start and the end of
+                each block.
+    """
+
+    def __init__(self, cfg, accesses=None):
+        self.cfg = cfg
+        self.accesses = accesses = accesses or Accesses(cfg)
+        self.defs = []
+        self.var_defs = var_defs = [0] * len(accesses.symbols)
+        boundary = 0
+        for var in accesses.params:
+            boundary |= self._define((DEF, var, accesses.symbols[var].decl))
+        # Bits of the definitions of each block, in order
+        self._block_defs = []
+        gen = []
+        kill = []
+        for items in accesses.blocks:
+            bits = []
+            last = {}
+            for access in items:
+                if access[0] != USE:
+                    bit = self._define(access)
+                    bits.append(bit)
+                    last[access[1]] = bit
+            self._block_defs.append(bits)
+            killed = generated = 0
+            for var, bit in last.items():
+                killed |= var_defs[var]
+                generated |= bit
+            gen.append(generated)
+            kill.append(killed)
+        self.reach_in, self.reach_out = solve(cfg, gen, kill, boundary=boundary)
+
+    def _define(self, access):
+        bit = 1 << len(self.defs)
+        self.defs.append(access)
+        self.var_defs[access[1]] |= bit
+        return bit
+
+    def uninitialized_uses(self):
+        """ List of the IDs that may read their variable before it is
+            given a value: some path to them from its declaration has no
+            assignment to it.
+        """
+        undefined = 0
+        for i, (kind, _, _) in enumerate(self.defs):
+            if kind == UNDEF:
+                undefined |= 1 << i
+        var_defs = self.var_defs
+        uses = []
+        for b in self.cfg.reverse_postorder():
+            reach = self.reach_in[b]
+            bits = iter(self._block_defs[b])
+            for kind, var, node in self.accesses.blocks[b]:
+                if kind == USE:
+                    if reach & var_defs[var] & undefined:
+                        uses.append(node)
+                else:
+                    reach = (reach & ~var_defs[var]) | next(bits)
+        return uses
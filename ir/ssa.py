@@ -0,0 +1,830 @@
+""" Lowering of uC programs into a three-address IR in SSA form.
+
+    Every function becomes a CFG (see ir.cfg) whose statements are
+    instructions: tuples (op, dest, operands...), where dest is the value
+    the instruction defines, an int, or None. Values are numbered densely
+    per function and defined exactly once. Blocks ending in a branch have
+    the value of its condition in conds; blocks ending in a 'ret' have no
+    successors.
+
+    Local scalars and pointers whose address is never taken live in values
+    only: each assignment gives the variable a new value, and phi
+    instructions merge its values where control flow joins. Phis are only
+    placed on the iterated dominance frontiers of the assignments of
+    variables that are read in a block other than the one assigning them.
+    Globals, arrays and the other locals live in memory, accessed with
+    load/store and aload/astore.
+
+    Instructions, with v* value operands:
+        const d, constant       param d, i              phi d, v1, ..., vn
+        OP d, v1, v2            (OP: + - * / % == != < <= > >=)
+        neg d, v1               not d, v1               cast d, v1, 'type'
+        load d, symbol          store -, symbol, v1     addr d, symbol
+        alloc -, symbol, init   index d, v1, v2         (address v1 + v2)
+        aload d, v1, v2         astore -, v1, v2, v3    (v1[v2] = v3)
+        call d, 'name', v...    print -, v...           read d, 'type'
+        assert -, v1, coord     ret -, v...             undef d
+    The phi operands follow the order of the predecessors of the block.
+"""
+
+from array import array
+
+from interpreter.layout import (array_size, element_type, flatten, initializer, is_row,
+                                typecode, zero_value)
+from interpreter.runtime import new_array, unescape
+from parser import ast_classes
+from semantic.type_checker import TypeChecker
+from semantic.uc_types import ArrayType, FloatType, IntType
+
+from .cfg import CFG, ENTRY, NONE
+
+# Positions of the value operands of the instructions whose operands are
+# not all values, as (start, stop) slices
+_OPERANDS = {
+    'const': (2, 2), 'param': (2, 2), 'load': (2, 2), 'addr': (2, 2), 'alloc': (3, 3),
+    'read': (2, 2), 'undef': (2, 2), 'get': (2, 2), 'cast': (2, 3), 'assert': (2, 3),
+    'store': (3, None), 'call': (3, None), 'set': (3, None),
+}
+_ALL = (2, None)
+
+# Instructions defining a value even when its type is None
+_VALUE_OPS = frozenset(('addr', 'index', 'const', 'param', 'get', 'load', 'undef', 'call',
+                        'read', 'aload', 'phi'))
+
+_UNARY_OPS = {'-': 'neg', '!': 'not'}
+_UPDATE_OPS = ('++', '--', 'p++', 'p--')
+
+
+def operands(instr):
+    """ Tuple of the value operands of the instruction instr. """
+    start, stop = _OPERANDS.get(instr[0], _ALL)
+    return instr[start:stop]
+
+
+def map_operands(instr, func):
+    """ Copy of the instruction instr with func applied to its value
+        operands.
+    """
+    start, stop = _OPERANDS.get(instr[0], _ALL)
+    stop = len(instr) if stop is None else stop
+    if start == stop:
+        return instr
+    return instr[:start] + tuple(func(v) for v in instr[start:stop]) + instr[stop:]
+
+
+class Function:
+    """ A uC function in SSA form.
+
+            name:
+                Its name ('<globals>' for the initialization of globals).
+            graph:
+                Its CFG, whose statements are instructions.
+            params:
+                Values of its parameters.
+            types:
+                UCType of each value, None for addresses.
+    """
+
+    def __init__(self, name, graph, params, types):
+        self.name = name
+        self.graph = graph
+        self.params = params
+        self.types = types
+
+    def instructions(self):
+        """ Number of instructions. """
+        return len(self.graph.stmts)
+
+
+class SSABuilder:
+    """ Lowers the functions of a checked program into SSA Functions.
+
+        As in the other passes, statements and expressions are lowered by
+        tasks taken from an explicit stack, and expressions leave their
+        values on a value stack, so deep trees do not hit the recursion
+        limit. Variables are first read and written with get and set
+        pseudo-instructions; these are then replaced by SSA values.
+    """
+
+    def __init__(self):
+        self._types = TypeChecker(None)
+
+    def build(self, program):
+        """ List of the Functions of program, the initialization of its
+            globals first.
+        """
+        gdecls = [gdecl for gdecl in program.gdecls if isinstance(gdecl, ast_classes.GlobalDecl)]
+        init = ast_classes.Compound([decl for gdecl in gdecls for decl in gdecl.decls])
+        functions = [self.function(None, init)]
+        for gdecl in program.gdecls:
+            if isinstance(gdecl, ast_classes.FuncDef):
+                functions.append(self.function(gdecl, gdecl.body))
+        return functions
+
+    def function(self, funcdef, body):
+        """ Function of the FuncDef funcdef, or of the global initializers
+            in the Compound body if funcdef is None.
+        """
+        self._begin(funcdef, body)
+        self._tasks = tasks = [(self._stmt, body)]
+        while tasks:
+            task, arg = tasks.pop()
+            task(arg)
+        self._emit('ret', None)
+        graph = self._reachable_graph(funcdef)
+        graph = _SSARenamer(graph, self._var_types, self._values).rename()
+        name = '<globals>' if funcdef is None else funcdef.decl.name.name
+        return Function(name, graph, self._params, self._values)
+
+    def _then(self, *tasks):
+        """ Schedules tasks, (func, arg) pairs, to run in the given order
+            before the tasks already scheduled.
+        """
+        self._tasks.extend(reversed(tasks))
+
+    # Functions, variables and values
+
+    def _begin(self, funcdef, body):
+        self._blocks = []
+        self._conds = []
+        self._succs = array('i')
+        self._loops = []
+        self._values = []
+        self._stack = []
+        self._vars = {}
+        self._var_types = []
+        self._params = []
+        # Decls of the parameters, which hold arrays as pointers
+        self._param_decls = set()
+        self._current = self._new_block()
+        address_taken = set()
+        stack = [body]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, ast_classes.UnaryOp) and node.op == '&' and \
+                    isinstance(node.expr, ast_classes.ID):
+                address_taken.add(node.expr.symbol)
+            stack.extend(child for _, child in node.children())
+        self._address_taken = address_taken
+        if funcdef is None:
+            return
+        args = funcdef.decl.type.args
+        if isinstance(args, ast_classes.ParamList):
+            for i, param in enumerate(args.params):
+                if not isinstance(param, ast_classes.Decl):
+                    continue
+                self._param_decls.add(param)
+                symbol = param.name.symbol
+                value = self._emit('param', self._symbol_type(symbol), i)
+                self._params.append(value)
+                var = self._var(symbol)
+                if var is None:
+                    self._emit('store', None, symbol, value)
+                else:
+                    self._emit('set', None, var, value)
+
+    def _symbol_type(self, symbol):
+        return self._types.symbol_type(symbol)
+
+    def _var(self, symbol):
+        """ Number of the variable of symbol, or None if it lives in memory. """
+        var = self._vars.get(symbol)
+        if var is None and symbol.scope != 0 and symbol.kind in ('var', 'pointer') and \
+                symbol not in self._address_taken:
+            var = self._vars[symbol] = self._new_var(self._symbol_type(symbol))
+        return var
+
+    def _new_var(self, type):
+        self._var_types.append(type)
+        return len(self._var_types) - 1
+
+    def _emit(self, op, type, *args):
+        """ Appends an instruction to the current block. If type is not
+            None, or op defines a value, the instruction defines a new
+            value of type, which is returned.
+        """
+        if type is None and op not in _VALUE_OPS:
+            self._blocks[self._current].append((op, None) + args)
+            return None
+        value = len(self._values)
+        self._values.append(type)
+        self._blocks[self._current].append((op, value) + args)
+        return value
+
+    def _constant(self, value, type):
+        return self._emit('const', type, value)
+
+    def _push(self, value):
+        self._stack.append(value)
+
+    def _pop(self):
+        return self._stack.pop()
+
+    # Blocks
+
+    def _new_block(self):
+        self._blocks.append([])
+        self._conds.append(None)
+        self._succs.extend((NONE, NONE))
+        return len(self._blocks) - 1
+
+    def _start(self, block):
+        self._current = block
+
+    def _jump(self, target):
+        self._succs[2 * self._current] = target
+
+    def _goto(self, target):
+        self._jump(target)
+        self._start(target)
+
+    def _branch(self, cond, true, false):
+        b = self._current
+        self._conds[b] = cond
+        self._succs[2 * b] = true
+        self._succs[2 * b + 1] = false
+
+    def _reachable_graph(self, funcdef):
+        """ CFG of the blocks reachable from ENTRY, in their order. """
+        stmts = []
+        starts = array('i', [0])
+        for block in self._blocks:
+            stmts.extend(block)
+            starts.append(len(stmts))
+        graph = CFG(funcdef, stmts, starts, self._conds, self._succs)
+        reachable = sorted(graph.reverse_postorder())
+        number = array('i', [NONE]) * len(graph)
+        for i, b in enumerate(reachable):
+            number[b] = i
+        stmts = []
+        starts = array('i', [0])
+        conds = []
+        succs = array('i')
+        for b in reachable:
+            stmts.extend(self._blocks[b])
+            starts.append(len(stmts))
+            conds.append(self._conds[b])
+            for s in graph.succs[2 * b:2 * b + 2]:
+                succs.append(NONE if s == NONE else number[s])
+        return CFG(funcdef, stmts, starts, conds, succs)
+
+    # Statements
+
+    def _stmt(self, node):
+        if node is None:
+            return
+        method = getattr(self, 'stmt_' + node.__class__.__name__, None)
+        if method is None:
+            self._then((self._expr, node), (self._discard, None))
+        else:
+            method(node)
+
+    def _discard(self, _):
+        self._pop()
+
+    def stmt_Compound(self, node):
+        self._then(*[(self._stmt, item) for item in node.block_items or () if item is not None])
+
+    def stmt_DeclList(self, node):
+        self._then(*[(self._stmt, decl) for decl in node.decls])
+
+    def stmt_EmptyStatement(self, node):
+        pass
+
+    def stmt_Decl(self, node):
+        symbol = node.name.symbol
+        type = self._symbol_type(symbol)
+        if isinstance(type, ArrayType):
+            self._array_decl(node, symbol, type)
+        elif node.init is None:
+            self._push(self._constant(zero_value(type), type))
+            self._assign_symbol(symbol)
+        else:
+            self._then((self._expr, node.init), (self._assign_symbol, symbol))
+
+    def _assign_symbol(self, symbol):
+        var = self._var(symbol)
+        if var is None:
+            self._emit('store', None, symbol, self._pop())
+        else:
+            self._emit('set', None, var, self._pop())
+
+    def _array_decl(self, node, symbol, type):
+        if node.init is None:
+            elem = element_type(type)
+            template = new_array(array_size(type, node.coord), typecode(elem), zero_value(elem))
+            exprs = []
+        else:
+            template, exprs = initializer(node.init, type)
+        self._emit('alloc', None, symbol, template)
+        tasks = []
+        for offset, expr in exprs:
+            tasks.append((self._expr, expr))
+            tasks.append((self._init_element, (symbol, offset)))
+        self._then(*tasks)
+
+    def _init_element(self, item):
+        symbol, offset = item
+        value = self._pop()
+        base = self._emit('addr', None, symbol)
+        self._emit('astore', None, base, self._constant(offset, IntType), value)
+
+    def stmt_If(self, node):
+        then = self._new_block()
+        join = self._new_block()
+        if node.iffalse is None:
+            self._then((self._cond, (node.cond, then, join)), (self._start, then),
+                       (self._stmt, node.iftrue), (self._goto, join))
+        else:
+            other = self._new_block()
+            self._then((self._cond, (node.cond, then, other)), (self._start, then),
+                       (self._stmt, node.iftrue), (self._jump, join), (self._start, other),
+                       (self._stmt, node.iffalse), (self._goto, join))
+
+    def stmt_While(self, node):
+        self._loop(node.cond, node.statement, None)
+
+    def stmt_For(self, node):
+        self._then((self._stmt, node.initial), (self._for_loop, node))
+
+    def _for_loop(self, node):
+        self._loop(node.cond, node.statement, node.next)
+
+    def _loop(self, cond, statement, step):
+        header = self._new_block()
+        self._goto(header)
+        exit = self._new_block()
+        tasks = []
+        if cond is not None:
+            body = self._new_block()
+            tasks.append((self._cond, (cond, body, exit)))
+            tasks.append((self._start, body))
+        self._loops.append(exit)
+        tasks.append((self._stmt, statement))
+        if step is not None:
+            tasks.append((self._stmt, step))
+        tasks.append((self._loop_end, header))
+        self._then(*tasks)
+
+    def _loop_end(self, header):
+        self._jump(header)
+        self._start(self._loops.pop())
+
+    def stmt_Break(self, node):
+        self._jump(self._loops[-1])
+        self._start(self._new_block())
+
+    def stmt_Return(self, node):
+        if node.expr is None:
+            self._ret(None)
+        else:
+            self._then((self._expr, node.expr), (self._ret, node))
+
+    def _ret(self, node):
+        if node is None:
+            self._emit('ret', None)
+        else:
+            self._emit('ret', None, self._pop())
+        self._start(self._new_block())
+
+    def stmt_Assert(self, node):
+        self._then((self._expr, node.expr), (self._assert, node))
+
+    def _assert(self, node):
+        self._emit('assert', None, self._pop(), node.coord)
+
+    def stmt_Print(self, node):
+        if node.expr is None:
+            self._emit('print', None)
+            return
+        exprs = node.expr.exprs if isinstance(node.expr, ast_classes.ExprList) else [node.expr]
+        tasks = []
+        for expr in exprs:
+            tasks.append((self._expr, expr))
+            tasks.append((self._print, None))
+        self._then(*tasks)
+
+    def _print(self, _):
+        self._emit('print', None, self._pop())
+
+    def stmt_Read(self, node):
+        exprs = node.expr.exprs if isinstance(node.expr, ast_classes.ExprList) else [node.expr]
+        tasks = []
+        for expr in exprs:
+            tasks.append((self._location, expr))
+            tasks.append((self._read, expr))
+        self._then(*tasks)
+
+    def _read(self, node):
+        self._push(self._emit('read', node.uc_type, node.uc_type.name))
+        self._store(None)
+        self._pop()
+
+    # Conditions
+
+    def _cond(self, item):
+        """ Ends the current block with a branch to true if the expression
+            node is true, to false otherwise. && and || only evaluate their
+            right operand when needed, so they branch on each operand.
+        """
+        node, true, false = item
+        if isinstance(node, ast_classes.BinaryOp) and node.op in ('&&', '||'):
+            middle = self._new_block()
+            if node.op == '&&':
+                first = (node.left, middle, false)
+            else:
+                first = (node.left, true, middle)
+            self._then((self._cond, first), (self._start, middle),
+                       (self._cond, (node.right, true, false)))
+        elif isinstance(node, ast_classes.UnaryOp) and node.op == '!':
+            self._cond((node.expr, false, true))
+        else:
+            self._then((self._expr, node), (self._branch_on, (true, false)))
+
+    def _branch_on(self, targets):
+        self._branch(self._pop(), *targets)
+
+    # Expressions
+
+    def _expr(self, node):
+        getattr(self, 'expr_' + node.__class__.__name__)(node)
+
+    def expr_Constant(self, node):
+        value = node.value
+        if node.type == 'string':
+            value = unescape(value)
+        self._push(self._constant(value, node.uc_type))
+
+    def expr_ID(self, node):
+        symbol = node.symbol
+        var = self._var(symbol)
+        if var is not None:
+            self._push(self._emit('get', symbol.type or node.uc_type, var))
+        elif isinstance(node.uc_type, ArrayType) and symbol.decl not in self._param_decls:
+            self._push(self._emit('addr', None, symbol))
+        else:
+            self._push(self._emit('load', node.uc_type, symbol))
+
+    def expr_BinaryOp(self, node):
+        if node.op in ('&&', '||'):
+            self._logical(node)
+        else:
+            self._then((self._expr, node.left), (self._expr, node.right), (self._binary, node))
+
+    def _binary(self, node):
+        right = self._pop()
+        left = self._pop()
+        self._push(self._emit(node.op, node.uc_type, left, right))
+
+    def _logical(self, node):
+        """ Value of a && or || operator: 1 or 0, merged from the branches
+            through a variable of its own.
+        """
+        var = self._new_var(IntType)
+        true = self._new_block()
+        false = self._new_block()
+        join = self._new_block()
+        self._then((self._cond, (node, true, false)), (self._logical_end, (var, true, false, join)))
+
+    def _logical_end(self, item):
+        var, true, false, join = item
+        self._start(true)
+        self._emit('set', None, var, self._constant(1, IntType))
+        self._jump(join)
+        self._start(false)
+        self._emit('set', None, var, self._constant(0, IntType))
+        self._goto(join)
+        self._push(self._emit('get', IntType, var))
+
+    def expr_UnaryOp(self, node):
+        op = node.op
+        if op in _UPDATE_OPS:
+            self._then((self._location, node.expr), (self._update, node))
+        elif op == '&':
+            self._then((self._location, node.expr), (self._address, None))
+        elif op == '*':
+            self._then((self._expr, node.expr), (self._deref, node))
+        elif op == '+':
+            self._expr(node.expr)
+        else:
+            self._then((self._expr, node.expr), (self._unary, node))
+
+    def _unary(self, node):
+        self._push(self._emit(_UNARY_OPS[node.op], node.uc_type, self._pop()))
+
+    def _deref(self, node):
+        pointer = self._pop()
+        self._push(self._emit('aload', node.uc_type, pointer, self._constant(0, IntType)))
+
+    def _address(self, _):
+        location = self._pop()
+        if location[0] == 'mem':
+            self._push(self._emit('addr', None, location[1]))
+        else:
+            self._push(self._emit('index', None, location[1], location[2]))
+
+    def _update(self, node):
+        """ Value of ++ and -- operators, from the location of their
+            operand.
+        """
+        location = self._stack[-1]
+        old = self._load(location, node.uc_type)
+        one = self._constant(1.0 if node.uc_type is FloatType else 1, node.uc_type)
+        new = self._emit('+' if node.op[-1] == '+' else '-', node.uc_type, old, one)
+        self._push(new)
+        self._store(None)
+        self._pop()
+        self._push(old if node.op[0] == 'p' else new)
+
+    def expr_ArrayRef(self, node):
+        if is_row(node):
+            self._then((self._location, node), (self._address, None))
+        else:
+            self._then((self._location, node), (self._load_location, node))
+
+    def _load_location(self, node):
+        self._push(self._load(self._pop(), node.uc_type))
+
+    def expr_FuncCall(self, node):
+        args = node.args
+        if args is None:
+            args = []
+        elif isinstance(args, ast_classes.ExprList):
+            args = args.exprs
+        else:
+            args = [args]
+        self._then(*[(self._expr, arg) for arg in args], (self._call, (node, len(args))))
+
+    def _call(self, item):
+        node, count = item
+        args = self._stack[len(self._stack) - count:]
+        del self._stack[len(self._stack) - count:]
+        type = node.uc_type
+        self._push(self._emit('call', None if type.name == 'void' else type,
+                              node.name.name, *args))
+
+    def expr_Cast(self, node):
+        self._then((self._expr, node.expr), (self._cast, node))
+
+    def _cast(self, node):
+        self._push(self._emit('cast', node.uc_type, self._pop(), node.uc_type.name))
+
+    def expr_Assignment(self, node):
+        self._then((self._location, node.lvalue), (self._expr, node.rvalue),
+                   (self._assign, node))
+
+    def _assign(self, node):
+        if node.op != '=':
+            value = self._pop()
+            location = self._stack[-1]
+            old = self._load(location, node.lvalue.uc_type)
+            self._push(self._emit(node.op[:-1], node.lvalue.uc_type, old, value))
+        self._store(None)
+
+    def expr_ExprList(self, node):
+        tasks = []
+        for expr in node.exprs[:-1]:
+            tasks.append((self._expr, expr))
+            tasks.append((self._discard, None))
+        tasks.append((self._expr, node.exprs[-1]))
+        self._then(*tasks)
+
+    # Locations
+
+    def _location(self, node):
+        """ Pushes the location of the lvalue node: ('var', var) for
+            variables in values, ('mem', symbol) for the others, and
+            ('elem', base, offset) for elements of arrays and pointers.
+        """
+        if isinstance(node, ast_classes.ID):
+            var = self._var(node.symbol)
+            self._push(('mem', node.symbol) if var is None else ('var', var))
+        elif isinstance(node, ast_classes.ArrayRef):
+            base, terms = flatten(node)
+            tasks = [(self._expr, base)]
+            for subscript, n in terms:
+                tasks.append((self._expr, subscript))
+                tasks.append((self._scale, n))
+            tasks.append((self._element, len(terms)))
+            self._then(*tasks)
+        else:
+            # *pointer
+            self._then((self._expr, node.expr), (self._pointer, None))
+
+    def _scale(self, n):
+        if n != 1:
+            self._push(self._emit('*', IntType, self._pop(), self._constant(n, IntType)))
+
+    def _element(self, count):
+        offset = self._pop()
+        for _ in range(count - 1):
+            offset = self._emit('+', IntType, self._pop(), offset)
+        self._push(('elem', self._pop(), offset))
+
+    def _pointer(self, _):
+        self._push(('elem', self._pop(), self._constant(0, IntType)))
+
+    def _load(self, location, type):
+        if location[0] == 'var':
+            return self._emit('get', type, location[1])
+        if location[0] == 'mem':
+            return self._emit('load', type, location[1])
+        return self._emit('aload', type, location[1], location[2])
+
+    def _store(self, _):
+        """ Stores the value on top of the stack at the location below it,
+            leaving the value as the value of the assignment.
+        """
+        value = self._pop()
+        location = self._pop()
+        if location[0] == 'var':
+            self._emit('set', None, location[1], value)
+        elif location[0] == 'mem':
+            self._emit('store', None, location[1], value)
+        else:
+            self._emit('astore', None, location[1], location[2], value)
+        self._push(value)
+
+
+class _SSARenamer:
+    """ Turns a graph of instructions reading and writing variables with
+        get and set into SSA form, following Cytron et al.: phis are
+        placed on the iterated dominance frontiers of the blocks setting
+        each variable, then a walk of the dominator tree replaces every
+        get by the value last set along the path to it, and drops the sets.
+    """
+
+    def __init__(self, graph, var_types, types):
+        self.graph = graph
+        self.var_types = var_types
+        self.types = types
+
+    def frontiers(self):
+        """ List of the dominance frontiers of the blocks: the blocks where
+            their dominance stops. Computed as in Cooper, Harvey and
+            Kennedy, walking up the dominator tree from the predecessors of
+            each join.
+        """
+        graph = self.graph
+        idom = graph.dominators()
+        frontiers = [[] for _ in range(len(graph))]
+        for b in range(len(graph)):
+            preds = graph.predecessors(b)
+            if len(preds) < 2:
+                continue
+            for p in preds:
+                runner = p
+                while runner != idom[b]:
+                    if not frontiers[runner] or frontiers[runner][-1] != b:
+                        frontiers[runner].append(b)
+                    runner = idom[runner]
+        return frontiers
+
+    def place_phis(self):
+        """ List of the variables needing a phi at the start of each block.
+            Variables only read in the blocks setting them need none.
+        """
+        graph = self.graph
+        sites = [[] for _ in self.var_types]
+        crossing = set()
+        for b in range(len(graph)):
+            assigned = set()
+            for instr in graph.block(b):
+                if instr[0] == 'set':
+                    var = instr[2]
+                    if var not in assigned:
+                        assigned.add(var)
+                        sites[var].append(b)
+                elif instr[0] == 'get' and instr[2] not in assigned:
+                    crossing.add(instr[2])
+        frontiers = self.frontiers()
+        phis = [[] for _ in range(len(graph))]
+        for var in sorted(crossing):
+            queued = set(sites[var])
+            work = list(sites[var])
+            placed = set()
+            while work:
+                for f in frontiers[work.pop()]:
+                    if f not in placed:
+                        placed.add(f)
+                        phis[f].append(var)
+                        if f not in queued:
+                            queued.add(f)
+                            work.append(f)
+        return phis
+
+    def rename(self):
+        """ Returns the CFG of the instructions in SSA form. """
+        graph = self.graph
+        types = self.types
+        # Value and operands of the phi of each variable, in each block
+        phis = []
+        for b, vars in enumerate(self.place_phis()):
+            entries = {}
+            for var in vars:
+                entries[var] = (len(types), [None] * len(graph.predecessors(b)))
+                types.append(self.var_types[var])
+            phis.append(entries)
+        # Value of each get, and stack of the values of each variable
+        alias = {}
+        current = [[] for _ in self.var_types]
+        undefined = []
+        code = [None] * len(graph)
+        sets = [None] * len(graph)
+        conds = list(graph.conds)
+
+        def value(v):
+            return alias.get(v, v)
+
+        def top(var):
+            values = current[var]
+            if not values:
+                # Read before any assignment: only on paths from ENTRY
+                # that skip its declaration
+                undefined.append(('undef', len(types)))
+                types.append(self.var_types[var])
+                values.append(len(types) - 1)
+            return values[-1]
+
+        starts, children = graph.dominator_tree()
+        stack = [ENTRY]
+        while stack:
+            b = stack.pop()
+            if b < 0:
+                for var in sets[~b]:
+                    current[var].pop()
+                continue
+            assigned = []
+            for var, (phi, _) in phis[b].items():
+                current[var].append(phi)
+                assigned.append(var)
+            instrs = []
+            for instr in graph.block(b):
+                op = instr[0]
+                if op == 'get':
+                    alias[instr[1]] = top(instr[2])
+                elif op == 'set':
+                    current[instr[2]].append(value(instr[3]))
+                    assigned.append(instr[2])
+                else:
+                    instrs.append(map_operands(instr, value))
+            if conds[b] is not None:
+                conds[b] = value(conds[b])
+            for s in graph.successors(b):
+                preds = graph.predecessors(s)
+                for var, (_, args) in phis[s].items():
+                    for i, p in enumerate(preds):
+                        if p == b:
+                            args[i] = top(var)
+            code[b] = instrs
+            sets[b] = assigned
+            stack.append(~b)
+            stack.extend(children[starts[b]:starts[b + 1]])
+        stmts = list(undefined)
+        starts = array('i', [0])
+        for b in range(len(graph)):
+            for var, (phi, args) in phis[b].items():
+                stmts.append(('phi', phi) + tuple(args))
+            stmts.extend(code[b])
+            starts.append(len(stmts))
+        return CFG(graph.func, stmts, starts, conds, graph.succs)
+
+
+def build_ssa(program):
+    """ List of the SSA Functions of the checked program, the
+        initialization of its globals first.
+    """
+    return SSABuilder().build(program)
+
+
+def format_function(function):
+    """ Text listing of the SSA Function function. """
+    graph = function.graph
+    lines = ['%s(%s):' % (function.name, ', '.join('v%d' % v for v in function.params))]
+    for b in range(len(graph)):
+        preds = ', '.join('b%d' % p for p in graph.predecessors(b))
+        lines.append('  b%d:%s' % (b, '  ; from ' + preds if preds else ''))
+        for instr in graph.block(b):
+            args = ', '.join(_format_operand(instr, i) for i in range(2, len(instr)))
+            if instr[1] is None:
+                lines.append('    %s %s' % (instr[0], args))
+            else:
+                lines.append('    v%d = %s %s' % (instr[1], instr[0], args))
+        succs = graph.successors(b)
+        if graph.conds[b] is not None:
+            lines.append('    branch v%d, b%d, b%d' % ((graph.conds[b],) + succs))
+        elif succs:
+            lines.append('    jump b%d' % succs)
+    return '\n'.join(line.rstrip() for line in lines) + '\n'
+
+
+def _format_operand(instr, i):
+    start, stop = _OPERANDS.get(instr[0], _ALL)
+    operand = instr[i]
+    if start <= i and (stop is None or i < stop):
+        return 'v%d' % operand
+    if hasattr(operand, 'name') and hasattr(operand, 'scope'):
+        return operand.name
+    if hasattr(operand, 'typecode') or isinstance(operand, list):
+        return '[%d]' % len(operand)
+    return repr(operand)
@@ -0,0 +1,146 @@
+""" Constant folding and algebraic simplification of uC expressions.
+
+    Constant subexpressions are evaluated with the semantics of
+    semantic.uc_ops, so a folded program computes the same values as the
+    original one. This includes the dimensions of array declarations.
+    Strings have no operators besides the comparison of their addresses,
+    so they are never folded.
+"""
+
+from parser import ast_classes
+from semantic.uc_ops import BINARY_OPS, INT_RESULT_OPS, UNARY_OPS, cast
+from semantic.uc_types import BASIC_TYPES
+
+from .rewriter import Rewriter, subtree_size
+
+# Nodes whose evaluation can change the state of the program
+_EFFECTS = (ast_classes.Assignment, ast_classes.FuncCall)
+_EFFECT_OPS = ('++', '--', 'p++', 'p--')
+
+# op -> constant value c such that (x op c) == x, for each operand type
+_RIGHT_IDENTITIES = {
+    'int': {'+': 0, '-': 0, '*': 1, '/': 1},
+    'float': {'-': 0.0, '*': 1.0, '/': 1.0},
+}
+# op -> constant value c such that (c op x) == x
+_LEFT_IDENTITIES = {
+    'int': {'+': 0, '*': 1},
+    'float': {'*': 1.0},
+}
+# op -> constant value c such that (x op c) == 0 when x has no effects
+_RIGHT_ZEROS = {
+    'int': {'*': 0, '%': 1},
+}
+
+
+def _is_pure(node):
+    """ Whether evaluating the expression node has no effects, so it can
+        be dropped.
+    """
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, _EFFECTS) or \
+                (isinstance(node, ast_classes.UnaryOp) and node.op in _EFFECT_OPS):
+            return False
+        stack.extend(child for _, child in node.children())
+    return True
+
+
+class ConstantFolder(Rewriter):
+    """ Replaces constant subexpressions by their values, and simplifies
+        identities such as x * 1, x + 0 and 0 && x.
+
+        Identities that drop an operand x are only simplified when the type
+        of x is known (after the TypeChecker) and matches the constant, so
+        an ill-typed expression is never turned into a well-typed one.
+
+            removed:
+                Number of nodes removed from the tree.
+            folded:
+                Number of constant subexpressions evaluated.
+            simplified:
+                Number of identities simplified.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.removed = 0
+        self.folded = 0
+        self.simplified = 0
+
+    def fold(self, program):
+        """ Folds program in place, returning the number of nodes removed. """
+        removed = self.removed
+        self.rewrite(program)
+        return self.removed - removed
+
+    def _constant(self, type, value, node, removed):
+        new = ast_classes.Constant(type, value, node.coord)
+        new.uc_type = BASIC_TYPES[type]
+        self.folded += 1
+        self.removed += removed
+        return new
+
+    def _simplified(self, node, removed):
+        self.simplified += 1
+        self.removed += removed
+        return node
+
+    def leave_BinaryOp(self, node):
+        op, left, right = node.op, node.left, node.right
+        Constant = ast_classes.Constant
+        left_const = isinstance(left, Constant)
+        right_const = isinstance(right, Constant)
+
+        if left_const and op in ('&&', '||') and left.type in BINARY_OPS:
+            truth = bool(left.value)
+            if truth == (op == '||'):
+                # Short circuit: right is never evaluated
+                return self._constant('int', int(truth), node, 1 + subtree_size(right))
+
+        if left_const and right_const:
+            type = left.type
+            func = BINARY_OPS.get(type, {}).get(op)
+            if func is None or right.type != type:
+                return None
+            if op in ('/', '%') and right.value == 0:
+                # Left to fail at run time
+                return None
+            result = 'int' if op in INT_RESULT_OPS else type
+            return self._constant(result, func(left.value, right.value), node, 2)
+
+        if right_const and self._typed_as(left, right):
+            identity = _RIGHT_IDENTITIES.get(right.type, {}).get(op)
+            if identity is not None and right.value == identity:
+                return self._simplified(left, 2)
+            zero = _RIGHT_ZEROS.get(right.type, {}).get(op)
+            if zero is not None and right.value == zero and _is_pure(left):
+                return self._constant('int', 0, node, subtree_size(left) + 1)
+        elif left_const and self._typed_as(right, left):
+            identity = _LEFT_IDENTITIES.get(left.type, {}).get(op)
+            if identity is not None and left.value == identity:
+                return self._simplified(right, 2)
+        return None
+
+    def _typed_as(self, node, constant):
+        return node.uc_type is not None and node.uc_type is BASIC_TYPES.get(constant.type)
+
+    def leave_UnaryOp(self, node):
+        expr = node.expr
+        if not isinstance(expr, ast_classes.Constant):
+            return None
+        func = UNARY_OPS.get(expr.type, {}).get(node.op)
+        if func is None:
+            return None
+        result = 'int' if node.op in INT_RESULT_OPS else expr.type
+        return self._constant(result, func(expr.value), node, 1)
+
+    def leave_Cast(self, node):
+        expr = node.expr
+        type = node.new_type.names[0]
+        if not isinstance(expr, ast_classes.Constant) or expr.type not in ('int', 'float') \
+                or type not in ('int', 'float'):
+            return None
+        # The Cast and its Type are removed
+        return self._constant(type, cast(expr.value, type), node, 2)
@@ -0,0 +1,348 @@
+""" Common-subexpression elimination by value numbering.
+
+    The expressions of every function are hash-consed in the order they
+    are evaluated: the key of an expression is made of its operator and of
+    the keys of its operands, down to constants and to versions of the
+    variables, which change whenever the variables are assigned. Two
+    expressions with the same key compute the same value, so the second
+    one can read it from a temporary set by the first one.
+
+    Keys are looked up within basic blocks (see ir.cfg) and across blocks
+    whose dominators computed them: a block starts from the keys of its
+    immediate dominator, after giving new versions to the variables that
+    may be assigned between the two. Globals, array elements and locals
+    whose address is taken share the version of the memory, which changes
+    with every store through them and every call.
+"""
+
+from ir.cfg import CFGBuilder, ENTRY
+from parser import ast_classes
+from semantic.uc_types import CharType, FloatType, IntType
+
+from .effects import MEMORY, UPDATE_OPS, Temporaries, global_names, read_targets, \
+    target_key, tracked_symbols, written
+from .rewriter import Rewriter
+
+_MISSING = object()
+
+# Types of the values kept in temporaries
+_VALUE_TYPES = (IntType, FloatType, CharType)
+
+
+class CommonSubexpressions(Rewriter):
+    """ Replaces the expressions (BinaryOps and ArrayRefs of basic types)
+        that compute a value already computed by temporaries. The first
+        occurrence of the value becomes an assignment to the temporary,
+        declared at the start of the function.
+
+        The program must have been resolved and type checked.
+
+            eliminated:
+                Number of expressions replaced by temporaries.
+            temporaries:
+                Number of temporaries declared.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.eliminated = 0
+        self.temporaries = 0
+        self._builder = CFGBuilder()
+        self._replacements = {}
+
+    def eliminate(self, program):
+        """ Eliminates the common subexpressions of program in place,
+            returning the number of expressions replaced.
+        """
+        eliminated = self.eliminated
+        self._globals = global_names(program)
+        for gdecl in program.gdecls:
+            if isinstance(gdecl, ast_classes.FuncDef):
+                self._function(gdecl)
+        return self.eliminated - eliminated
+
+    def leave_BinaryOp(self, node):
+        return self._replacements.get(node)
+
+    def leave_ArrayRef(self, node):
+        return self._replacements.get(node)
+
+    def _function(self, func):
+        cfg = self._builder.build(func)
+        self._tracked = tracked_symbols(func)
+        # Key -> variable version or expression entry [first node, number of uses]
+        self._table = {}
+        # (key, previous value) of every change of the table, to undo them
+        self._log = []
+        # (node, entry) of the expressions found in the table
+        self._hits = []
+        self._entries = []
+        self._branches = []
+        self._clock = 0
+
+        kills = [self._block_kills(cfg, b) for b in range(len(cfg))]
+        idom = cfg.dominators()
+        starts, children = cfg.dominator_tree()
+        # Length of the log when entering each block of the dominator tree
+        marks = {}
+        stack = [ENTRY]
+        while stack:
+            b = stack.pop()
+            if b < 0:
+                self._undo(marks.pop(~b))
+                continue
+            marks[b] = len(self._log)
+            if b != ENTRY:
+                for key in self._region_kills(cfg, b, idom[b], kills):
+                    self._define(key)
+            for stmt in cfg.block(b):
+                self._walk(stmt)
+            if cfg.conds[b] is not None:
+                self._walk(cfg.conds[b])
+            stack.append(~b)
+            stack.extend(children[starts[b]:starts[b + 1]])
+
+        if not self._hits:
+            return
+        temps = Temporaries(func, 'cse', self._globals)
+        replacements = self._replacements = {}
+        for entry in self._entries:
+            if entry[1]:
+                node = entry[0]
+                temp = temps.new(node.uc_type)
+                replacements[node] = temps.assign(temp, node, node.coord)
+                entry.append(temp)
+        for node, entry in self._hits:
+            replacements[node] = temps.ref(entry[2], node.coord)
+        self.rewrite(func.body)
+        self.temporaries += temps.declare()
+        self.eliminated += len(self._hits)
+        self._replacements = {}
+
+    # Variables and versions
+
+    def _set(self, key, value):
+        table = self._table
+        self._log.append((key, table.get(key, _MISSING)))
+        table[key] = value
+
+    def _undo(self, mark):
+        """ Undoes the changes of the table after the log had length mark,
+            returning them.
+        """
+        table = self._table
+        log = self._log
+        undone = log[mark:]
+        del log[mark:]
+        for key, value in reversed(undone):
+            if value is _MISSING:
+                del table[key]
+            else:
+                table[key] = value
+        return undone
+
+    def _define(self, key):
+        """ Gives a new version to the variable (a symbol) or memory key. """
+        self._clock += 1
+        self._set(key, self._clock)
+
+    def _id_key(self, symbol):
+        if symbol is None or symbol.kind == 'func':
+            return None
+        if symbol in self._tracked or symbol.kind == 'array':
+            return (symbol, self._table.get(symbol, 0))
+        return (symbol, self._table.get(MEMORY, 0))
+
+    def _block_kills(self, cfg, b):
+        """ Set of the keys written in block b. """
+        nodes = cfg.block(b)
+        if cfg.conds[b] is not None:
+            nodes.append(cfg.conds[b])
+        return written(nodes, self._tracked)
+
+    def _region_kills(self, cfg, b, d, kills):
+        """ Set of the keys assigned on the paths from the end of block d,
+            the immediate dominator of b, to the start of b: those of the
+            blocks that reach b without going through d.
+        """
+        killed = set()
+        seen = {d}
+        stack = [p for p in cfg.predecessors(b) if p != d]
+        seen.update(stack)
+        while stack:
+            p = stack.pop()
+            killed |= kills[p]
+            for q in cfg.predecessors(p):
+                if q not in seen:
+                    seen.add(q)
+                    stack.append(q)
+        return killed
+
+    # Walk of the statements, in the order they are evaluated. Each visit
+    # leaves the key of the node (or None) on the _keys stack.
+
+    def _walk(self, node):
+        self._keys = []
+        self._tasks = tasks = [(self._visit, node)]
+        while tasks:
+            task, arg = tasks.pop()
+            task(arg)
+
+    def _then(self, *tasks):
+        self._tasks.extend(reversed(tasks))
+
+    def _visit(self, node):
+        getattr(self, 'visit_' + node.__class__.__name__, self._visit_other)(node)
+
+    def _visit_other(self, node):
+        children = [child for _, child in node.children()]
+        self._then(*[(self._visit, child) for child in children],
+                   (self._result, (len(children), None)))
+
+    def _result(self, item):
+        """ Replaces the keys of count operands by key. """
+        count, key = item
+        if count:
+            del self._keys[-count:]
+        self._keys.append(key)
+
+    def _mark(self):
+        return len(self._log), len(self._hits)
+
+    def visit_Constant(self, node):
+        self._keys.append(None if node.type == 'string' else (node.type, node.value))
+
+    def visit_ID(self, node):
+        self._keys.append(self._id_key(node.symbol))
+
+    def visit_BinaryOp(self, node):
+        if node.op in ('&&', '||'):
+            # The right operand is not always evaluated: what it computes
+            # is only available inside it
+            self._then((self._visit, node.left), (self._branch, None), (self._visit, node.right),
+                       (self._merge, None), (self._binary, (node, self._mark())))
+        else:
+            self._then((self._visit, node.left), (self._visit, node.right),
+                       (self._binary, (node, self._mark())))
+
+    def _branch(self, _):
+        self._branches.append(len(self._log))
+
+    def _merge(self, _):
+        for key, _ in self._undo(self._branches.pop()):
+            if not isinstance(key, tuple):
+                self._define(key)
+
+    def _binary(self, item):
+        node, mark = item
+        right = self._keys.pop()
+        left = self._keys.pop()
+        key = None if left is None or right is None else (node.op, left, right)
+        self._value(node, key, mark)
+
+    def visit_ArrayRef(self, node):
+        self._then((self._visit, node.name), (self._visit, node.subscript),
+                   (self._array_ref, (node, self._mark())))
+
+    def _array_ref(self, item):
+        node, mark = item
+        subscript = self._keys.pop()
+        name = self._keys.pop()
+        key = None
+        if name is not None and subscript is not None:
+            key = ('[]', name, subscript, self._table.get(MEMORY, 0))
+        self._value(node, key, mark)
+
+    def _value(self, node, key, mark):
+        """ Looks up the key of the expression node, which is pure when it
+            has one. Once found, the expressions it contains need not be
+            computed: their effects on the table since mark are undone.
+        """
+        self._keys.append(key)
+        if key is None or node.uc_type not in _VALUE_TYPES:
+            return
+        entry = self._table.get(key)
+        if entry is None:
+            entry = [node, 0]
+            self._entries.append(entry)
+            self._set(key, entry)
+            return
+        log, hits = mark
+        self._undo(log)
+        for _, inner in self._hits[hits:]:
+            inner[1] -= 1
+        del self._hits[hits:]
+        entry[1] += 1
+        self._hits.append((node, entry))
+
+    def visit_UnaryOp(self, node):
+        if node.op in UPDATE_OPS:
+            self._then((self._lvalue, node.expr), (self._assign, node.expr))
+        elif node.op == '&':
+            self._then((self._lvalue, node.expr), (self._result, (0, None)))
+        else:
+            self._then((self._visit, node.expr), (self._unary, node))
+
+    def _unary(self, node):
+        key = self._keys.pop()
+        if key is not None:
+            key = (node.op, key, self._table.get(MEMORY, 0)) if node.op == '*' \
+                else (node.op, key)
+        self._keys.append(key)
+
+    def visit_Cast(self, node):
+        self._then((self._visit, node.expr), (self._cast, node))
+
+    def _cast(self, node):
+        key = self._keys.pop()
+        self._keys.append(None if key is None else ('cast', node.new_type.names[0], key))
+
+    def _lvalue(self, node):
+        """ Visits the subexpressions of the location node, leaving no key. """
+        if isinstance(node, ast_classes.ArrayRef):
+            self._then((self._visit, node.name), (self._visit, node.subscript),
+                       (self._drop, 2))
+        elif isinstance(node, ast_classes.UnaryOp) and node.op == '*':
+            self._then((self._visit, node.expr), (self._drop, 1))
+        elif not isinstance(node, ast_classes.ID):
+            self._then((self._visit, node), (self._drop, 1))
+
+    def _drop(self, count):
+        del self._keys[-count:]
+
+    def _assign(self, target):
+        self._define(target_key(target, self._tracked))
+        self._keys.append(None)
+
+    def visit_Assignment(self, node):
+        self._then((self._lvalue, node.lvalue), (self._visit, node.rvalue), (self._drop, 1),
+                   (self._assign, node.lvalue))
+
+    def visit_FuncCall(self, node):
+        args = node.args
+        if args is None:
+            args = []
+        elif isinstance(args, ast_classes.ExprList):
+            args = args.exprs
+        else:
+            args = [args]
+        self._then(*[(self._visit, arg) for arg in args], (self._drop_all, len(args)),
+                   (self._assign, node.name))
+
+    def _drop_all(self, count):
+        if count:
+            del self._keys[-count:]
+
+    def visit_Decl(self, node):
+        if node.init is None:
+            self._assign(node.name)
+        else:
+            self._then((self._visit, node.init), (self._drop, 1), (self._assign, node.name))
+
+    def visit_Read(self, node):
+        tasks = []
+        for target in read_targets(node):
+            tasks.append((self._lvalue, target))
+            tasks.append((self._assign, target))
+            tasks.append((self._drop, 1))
+        self._then(*tasks, (self._result, (0, None)))
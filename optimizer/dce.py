@@ -0,0 +1,270 @@
+""" Dead-code elimination.
+
+    Removes from every function:
+
+    - the branches of If, While and For statements whose condition is a
+      constant that never takes them (the ConstantFolder turns constant
+      expressions into such constants);
+    - unreachable statements, whose start no path from the start of the
+      function reaches in its CFG: statements after a Return or a Break,
+      or after a loop on a constant condition that is never left;
+    - dead stores, the assignments, updates and initializers of local
+      variables that are not live after them (see ir.dataflow), when the
+      value stored can be left out;
+    - unused declarations, of locals no statement refers to.
+
+    Removing code can make more code dead, such as stores whose only uses
+    were in dead stores, so the analyses are run again until nothing else
+    can be removed.
+"""
+
+from ir.cfg import CFGBuilder, ENTRY
+from ir.dataflow import DEF, Accesses, Liveness
+from parser import ast_classes
+from semantic.uc_ops import BINARY_OPS
+
+from .effects import UPDATE_OPS, is_safe
+
+# Kinds of dead code
+UNREACHABLE = 'unreachable'
+STORE = 'store'
+INIT = 'init'
+DECL = 'decl'
+
+
+def _truth(cond):
+    """ Truth value of the condition cond, or None if it is not constant. """
+    if isinstance(cond, ast_classes.Constant) and cond.type in BINARY_OPS:
+        return bool(cond.value)
+    return None
+
+
+class DeadCodeStats:
+    """ What the DeadCodeEliminator removed from a function.
+
+            name:
+                Name of the function.
+            unreachable:
+                Number of unreachable statements.
+            branches:
+                Number of statements on constant conditions replaced by the
+                branch taken, if any.
+            stores:
+                Number of dead stores, initializers included.
+            decls:
+                Number of unused declarations.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.unreachable = 0
+        self.branches = 0
+        self.stores = 0
+        self.decls = 0
+
+    @property
+    def removed(self):
+        return self.unreachable + self.branches + self.stores + self.decls
+
+    def __str__(self):
+        return '%s: %d unreachable statement(s), %d constant branch(es), %d dead store(s), ' \
+               '%d unused declaration(s) removed' % (
+                   self.name, self.unreachable, self.branches, self.stores, self.decls)
+
+
+class DeadCodeEliminator:
+    """ Removes the dead code of the functions of a program.
+
+        The program must have been resolved and type checked.
+
+            functions:
+                DeadCodeStats of every function code was removed from, in
+                order.
+            removed:
+                Total of the DeadCodeStats.
+    """
+
+    def __init__(self):
+        self.functions = []
+        self.removed = 0
+        self._builder = CFGBuilder()
+
+    def eliminate(self, program):
+        """ Removes the dead code of program in place, returning the number
+            of statements, branches and initializers removed.
+        """
+        removed = self.removed
+        for gdecl in program.gdecls:
+            if isinstance(gdecl, ast_classes.FuncDef):
+                stats = DeadCodeStats(gdecl.decl.name.name)
+                while self._remove(gdecl, self._dead(gdecl), stats):
+                    pass
+                if stats.removed:
+                    self.functions.append(stats)
+                    self.removed += stats.removed
+        return self.removed - removed
+
+    def report(self):
+        """ Lines describing what was removed from every function. """
+        return [str(stats) for stats in self.functions]
+
+    # Analyses
+
+    def _dead(self, func):
+        """ Dict of the kind of every dead statement of the FuncDef func,
+            by node.
+        """
+        cfg = self._builder.build(func)
+        reachable = self._reachable(cfg)
+        dead = {}
+        for stmt, b in cfg.stmt_blocks.items():
+            if not reachable[b]:
+                dead[stmt] = UNREACHABLE
+
+        accesses = Accesses(cfg)
+        liveness = Liveness(cfg, accesses)
+        for b in range(len(cfg)):
+            if not reachable[b]:
+                continue
+            stmts = set(cfg.block(b))
+            for (kind, var, node), live in zip(accesses.blocks[b], liveness.live_after(b)):
+                if kind != DEF or live >> var & 1 or node not in stmts:
+                    continue
+                if isinstance(node, ast_classes.Decl):
+                    if node.init is not None and not isinstance(node.init, ast_classes.InitList) \
+                            and is_safe(node.init):
+                        dead[node] = INIT
+                elif isinstance(node, ast_classes.Assignment):
+                    if is_safe(node.rvalue) and (node.op not in ('/=', '%=') or (
+                            isinstance(node.rvalue, ast_classes.Constant) and node.rvalue.value)):
+                        dead[node] = STORE
+                elif isinstance(node, ast_classes.UnaryOp) and node.op in UPDATE_OPS:
+                    dead[node] = STORE
+
+        used = self._used_symbols(func)
+        for stmt in cfg.stmts:
+            if isinstance(stmt, ast_classes.Decl) and stmt.name.symbol not in used and \
+                    (stmt.init is None or is_safe(stmt.init)):
+                dead[stmt] = DECL
+        return dead
+
+    @staticmethod
+    def _reachable(cfg):
+        """ bytearray of whether each block of cfg may run, following only
+            the branches constant conditions take.
+        """
+        reachable = bytearray(len(cfg))
+        reachable[ENTRY] = 1
+        stack = [ENTRY]
+        while stack:
+            b = stack.pop()
+            succs = cfg.successors(b)
+            truth = _truth(cfg.conds[b])
+            if truth is not None:
+                succs = succs[:1] if truth else succs[1:]
+            for s in succs:
+                if not reachable[s]:
+                    reachable[s] = 1
+                    stack.append(s)
+        return reachable
+
+    @staticmethod
+    def _used_symbols(func):
+        """ Set of the symbols the statements of func refer to, besides the
+            declarations of their names.
+        """
+        used = set()
+        stack = [func.body]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, ast_classes.ID):
+                used.add(node.symbol)
+            elif isinstance(node, ast_classes.Decl):
+                if node.init is not None:
+                    stack.append(node.init)
+                continue
+            stack.extend(child for _, child in node.children())
+        return used
+
+    # Removal
+
+    def _remove(self, func, dead, stats):
+        """ Removes the dead statements and the constant branches of func.
+            Returns whether anything was removed.
+        """
+        removed = stats.removed
+        stack = [func.body]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, ast_classes.Compound):
+                items = []
+                for item in node.block_items or ():
+                    item = self._statement(item, dead, stats)
+                    if item is not None:
+                        items.append(item)
+                        stack.append(item)
+                node.block_items = items
+                continue
+            if isinstance(node, ast_classes.If):
+                fields = ('iftrue', 'iffalse')
+            elif isinstance(node, (ast_classes.While, ast_classes.For)):
+                fields = ('statement',)
+            else:
+                continue
+            for field in fields:
+                stmt = getattr(node, field)
+                if stmt is None or isinstance(stmt, ast_classes.EmptyStatement):
+                    continue
+                new = self._statement(stmt, dead, stats)
+                if new is None and field != 'iffalse':
+                    new = ast_classes.EmptyStatement(stmt.coord)
+                setattr(node, field, new)
+                if new is not None:
+                    stack.append(new)
+        return stats.removed > removed
+
+    @staticmethod
+    def _statement(stmt, dead, stats):
+        """ Returns what is left of the statement stmt: itself, the branch
+            of it that is taken, or None.
+        """
+        while stmt is not None:
+            kind = dead.get(stmt)
+            if kind == UNREACHABLE:
+                stats.unreachable += 1
+                return None
+            if kind == STORE:
+                stats.stores += 1
+                return None
+            if kind == DECL:
+                stats.decls += 1
+                return None
+            if kind == INIT:
+                stats.stores += 1
+                stmt.init = None
+                del dead[stmt]
+                return stmt
+
+            if isinstance(stmt, ast_classes.If):
+                truth = _truth(stmt.cond)
+                if truth is None:
+                    return stmt
+                stats.branches += 1
+                stmt = stmt.iftrue if truth else stmt.iffalse
+            elif isinstance(stmt, ast_classes.While) and _truth(stmt.cond) is False:
+                stats.branches += 1
+                return None
+            elif isinstance(stmt, ast_classes.For) and _truth(stmt.cond) is False:
+                initial = stmt.initial
+                if isinstance(initial, ast_classes.DeclList):
+                    # Declarations go with the loop, only their initializers
+                    # could matter
+                    if not all(decl.init is None or is_safe(decl.init)
+                               for decl in initial.decls):
+                        return stmt
+                    initial = None
+                stats.branches += 1
+                stmt = initial
+            else:
+                return stmt
+        return None
@@ -0,0 +1,206 @@
+""" Variables written by uC statements, and new locals, for the passes
+    that move or reuse computations.
+
+    Writes are described by keys: the symbol of a tracked variable (a local
+    scalar or pointer whose address is never taken, or a local array, which
+    is created anew by its declaration), or MEMORY for everything else:
+    globals, array elements, locals written through pointers and whatever
+    a called function may change.
+"""
+
+from parser import ast_classes
+from semantic.symtab import Symbol
+from semantic.uc_types import FloatType
+
+# Key of the writes to memory
+MEMORY = 'memory'
+
+UPDATE_OPS = ('++', '--', 'p++', 'p--')
+
+# Binary operators that cannot fail on any operands
+SAFE_OPS = frozenset(('+', '-', '*', '==', '!=', '<', '<=', '>', '>=', '&&', '||'))
+
+
+def is_safe(node):
+    """ Whether evaluating the expression node has no effects and cannot
+        fail, so it can be left out.
+    """
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (ast_classes.Assignment, ast_classes.FuncCall,
+                             ast_classes.ArrayRef)):
+            return False
+        if isinstance(node, ast_classes.UnaryOp) and (node.op in UPDATE_OPS or node.op == '*'):
+            return False
+        if isinstance(node, ast_classes.BinaryOp) and node.op not in SAFE_OPS and not (
+                isinstance(node.right, ast_classes.Constant) and node.right.value):
+            return False
+        if isinstance(node, ast_classes.Cast) and node.new_type.names[0] == 'int' and \
+                node.expr.uc_type is FloatType:
+            return False
+        stack.extend(child for _, child in node.children())
+    return True
+
+
+def tracked_symbols(func):
+    """ Set of the symbols of the FuncDef func whose writes are tracked. """
+    symbols = set()
+    excluded = set()
+    stack = [func]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ast_classes.ID) and node.symbol is not None:
+            symbols.add(node.symbol)
+        elif isinstance(node, ast_classes.UnaryOp) and node.op == '&' and \
+                isinstance(node.expr, ast_classes.ID):
+            excluded.add(node.expr.symbol)
+        stack.extend(child for _, child in node.children())
+    return {symbol for symbol in symbols if symbol.scope > 0 and symbol not in excluded and
+            symbol.kind in ('var', 'pointer', 'array')}
+
+
+def declared_names(root):
+    """ Set of the names declared in the tree rooted at root. """
+    names = set()
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ast_classes.Decl):
+            names.add(node.name.name)
+        stack.extend(child for _, child in node.children())
+    return names
+
+
+def global_names(program):
+    """ Set of the names declared at the global scope of program. """
+    names = set()
+    for gdecl in program.gdecls:
+        if isinstance(gdecl, ast_classes.FuncDef):
+            names.add(gdecl.decl.name.name)
+        else:
+            names.update(decl.name.name for decl in gdecl.decls)
+    return names
+
+
+def read_targets(node):
+    """ List of the locations the Read node writes. """
+    if isinstance(node.expr, ast_classes.ExprList):
+        return node.expr.exprs
+    return [node.expr]
+
+
+def target_key(node, tracked):
+    """ Key of the writes to the location node. """
+    if isinstance(node, ast_classes.ID) and node.symbol in tracked:
+        return node.symbol
+    return MEMORY
+
+
+def written(nodes, tracked):
+    """ Set of the keys of the writes of the statements or expressions
+        nodes, and of their descendants.
+    """
+    keys = set()
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ast_classes.Assignment):
+            keys.add(target_key(node.lvalue, tracked))
+        elif isinstance(node, ast_classes.UnaryOp) and node.op in UPDATE_OPS:
+            keys.add(target_key(node.expr, tracked))
+        elif isinstance(node, ast_classes.Decl):
+            keys.add(target_key(node.name, tracked))
+        elif isinstance(node, ast_classes.FuncCall):
+            keys.add(MEMORY)
+        elif isinstance(node, ast_classes.Read):
+            keys.update(target_key(target, tracked) for target in read_targets(node))
+        stack.extend(child for _, child in node.children())
+    return keys
+
+
+class Temporaries:
+    """ New local variables of a FuncDef, named prefix_0, prefix_1... and
+        declared without initializer at the start of its body by declare().
+        Names declared in the function, or in taken (the globals), are
+        skipped.
+    """
+
+    def __init__(self, func, prefix, taken=()):
+        self.func = func
+        self.prefix = prefix
+        self.decls = []
+        self.taken = declared_names(func) | set(taken)
+        self._count = 0
+        # Ids of the new symbols follow those of the function, so the
+        # names of the locals it is translated into stay unique
+        self._next_id = 0
+        stack = [func]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, ast_classes.ID) and node.symbol is not None:
+                self._next_id = max(self._next_id, node.symbol.id + 1)
+            stack.extend(child for _, child in node.children())
+
+    def new(self, type):
+        """ Returns an ID of a new local of the basic type. """
+        coord = self.func.coord
+        name = '%s_%d' % (self.prefix, self._count)
+        while name in self.taken:
+            self._count += 1
+            name = '%s_%d' % (self.prefix, self._count)
+        self._count += 1
+        self.taken.add(name)
+        name = ast_classes.ID(name, coord)
+        decl = ast_classes.Decl(name, ast_classes.VarDecl(
+            name, ast_classes.Type([type.name], coord), coord), None, coord)
+        name.symbol = self.symbol(name.name, decl, 'var', type)
+        name.uc_type = type
+        self.decls.append(decl)
+        return name
+
+    def fresh(self, name):
+        """ Returns name, or name followed by _1, _2... if it is taken,
+            taking it.
+        """
+        fresh = name
+        count = 0
+        while fresh in self.taken:
+            count += 1
+            fresh = '%s_%d' % (name, count)
+        self.taken.add(fresh)
+        return fresh
+
+    def symbol(self, name, decl, kind, type):
+        """ Returns a new local Symbol of the function, declared by the
+            Decl decl.
+        """
+        symbol = Symbol(self._next_id, name, decl, kind, 1)
+        symbol.type = type
+        self._next_id += 1
+        return symbol
+
+    @staticmethod
+    def ref(temp, coord=None):
+        """ Returns a new ID reading the local of the ID temp. """
+        ref = ast_classes.ID(temp.name, coord)
+        ref.symbol = temp.symbol
+        ref.uc_type = temp.uc_type
+        return ref
+
+    @staticmethod
+    def assign(temp, value, coord=None):
+        """ Returns an Assignment of the expression value to the local of
+            the ID temp.
+        """
+        assign = ast_classes.Assignment('=', Temporaries.ref(temp, coord), value, coord)
+        assign.uc_type = temp.uc_type
+        return assign
+
+    def declare(self):
+        """ Declares the new locals, returning their number. """
+        body = self.func.body
+        if body.block_items is None:
+            body.block_items = []
+        body.block_items[:0] = self.decls
+        return len(self.decls)
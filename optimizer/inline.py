@@ -0,0 +1,549 @@
+""" Function inlining.
+
+    A call is inlined by replacing the statement it is in by a copy of the
+    body of the function called, followed by the statement with the call
+    replaced by the value returned. The parameters become locals of the
+    caller initialized with the arguments, except array parameters, which
+    are replaced by the arrays passed. Every local of the copy gets a new
+    symbol, so copies never share variables.
+
+    A Return ending the body becomes an assignment of the value to a
+    temporary. When there are other Returns, the copy is wrapped in a
+    while (1) loop, and each Return becomes the assignment followed by a
+    Break; functions returning from inside their own loops are not inlined.
+
+    The copy runs before the rest of the statement, which must not change
+    what the statement does: the call must be the first one the statement
+    evaluates, in a part always evaluated (not the right operand of && or
+    ||), and what the statement evaluates before it must have no effects
+    and read nothing the arguments or the function may write.
+
+    Functions are inlined in their callers after the calls in their own
+    bodies are, when their body is within the size budget. Recursive
+    functions, which may call themselves through a chain of calls, are
+    never inlined, nor are functions using a global (or calling a
+    function) whose name a local of the caller shadows, as the copy would
+    then name the local.
+"""
+
+from parser import ast_classes
+from semantic.uc_types import CharType, FloatType, IntType, VoidType
+
+from .effects import MEMORY, SAFE_OPS, UPDATE_OPS, Temporaries, declared_names, \
+    global_names, tracked_symbols, written
+from .rewriter import node_fields, subtree_size
+
+# Default maximum number of nodes of the body of an inlined function
+BUDGET = 40
+
+# Types of the values kept in temporaries
+_VALUE_TYPES = (IntType, FloatType, CharType)
+
+
+def _call_args(call):
+    if call.args is None:
+        return []
+    if isinstance(call.args, ast_classes.ExprList):
+        return call.args.exprs
+    return [call.args]
+
+
+def _params(func):
+    params = func.decl.type.args
+    return [] if params is None else params.params
+
+
+def _callee(call):
+    symbol = call.name.symbol if isinstance(call.name, ast_classes.ID) else None
+    return symbol if symbol is not None and symbol.kind == 'func' else None
+
+
+def clone(root, symbol_of, substitutes):
+    """ Returns a copy of the tree rooted at root, annotations included.
+        The IDs of the symbols in substitutes are replaced by copies of
+        the IDs they map to, and the others are renamed after the symbol
+        returned by symbol_of(old symbol), or kept if it returns None.
+    """
+    Node = ast_classes.Node
+    copies = {}
+    order = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node in copies:
+            continue
+        cls = node.__class__
+        copies[node] = cls.__new__(cls)
+        order.append(node)
+        for field in node_fields(cls):
+            value = getattr(node, field)
+            if isinstance(value, Node):
+                stack.append(value)
+            elif isinstance(value, list):
+                stack.extend(elem for elem in value if isinstance(elem, Node))
+
+    for node in order:
+        copy = copies[node]
+        for slot in node.__class__.__slots__:
+            if slot.startswith('__') or not hasattr(node, slot):
+                continue
+            value = getattr(node, slot)
+            if isinstance(value, Node):
+                value = copies[value]
+            elif isinstance(value, list):
+                value = [copies[elem] if isinstance(elem, Node) else elem for elem in value]
+            setattr(copy, slot, value)
+        if isinstance(node, ast_classes.ID) and node.symbol is not None:
+            substitute = substitutes.get(node.symbol)
+            if substitute is not None:
+                copy.name = substitute.name
+                copy.symbol = substitute.symbol
+                copy.uc_type = substitute.uc_type
+            else:
+                symbol = symbol_of(node.symbol)
+                if symbol is not None:
+                    copy.name = symbol.name
+                    copy.symbol = symbol
+    return copies[root], copies
+
+
+class _Function:
+    """ What the Inliner knows of a function it may inline. """
+
+    def __init__(self, func, budget):
+        self.func = func
+        self.params = _params(func)
+        body = func.body
+        self.size = subtree_size(body)
+        self.tracked = tracked_symbols(func)
+        # Names of the globals and functions it uses
+        self.globals = set()
+        # Whether it writes memory, and may do input or output
+        self.memory = MEMORY in written([body], self.tracked)
+        self.io = False
+        # Whether a Return is inside a loop, or anywhere but at the end
+        returns_in_loop = False
+        self.returns_early = False
+        last = body.block_items[-1] if body.block_items else None
+        # (node, whether it is inside a loop)
+        stack = [(body, False)]
+        while stack:
+            node, in_loop = stack.pop()
+            if isinstance(node, ast_classes.Return):
+                returns_in_loop = returns_in_loop or in_loop
+                self.returns_early = self.returns_early or node is not last
+            elif isinstance(node, (ast_classes.Print, ast_classes.Read, ast_classes.Assert,
+                                   ast_classes.FuncCall)):
+                self.io = True
+            elif isinstance(node, ast_classes.ID) and node.symbol is not None and \
+                    node.symbol.scope == 0:
+                self.globals.add(node.name)
+            in_loop = in_loop or isinstance(node, (ast_classes.While, ast_classes.For))
+            stack.extend((child, in_loop) for _, child in node.children())
+
+        if self.size > budget:
+            self.reason = '%d node(s), over the budget of %d' % (self.size, budget)
+        elif returns_in_loop:
+            self.reason = 'returns from inside a loop'
+        else:
+            self.reason = None
+
+
+class Inliner:
+    """ Inlines the calls of the functions whose body has at most budget
+        nodes, where the program allows it.
+
+        The program must have been resolved and type checked.
+
+            inlined:
+                Number of calls inlined.
+            temporaries:
+                Number of temporaries declared for the returned values.
+    """
+
+    def __init__(self, budget=BUDGET):
+        self.budget = budget
+        self.inlined = 0
+        self.temporaries = 0
+        # Name -> number of calls inlined, or reason not to inline it, of
+        # every function called
+        self.calls = {}
+        self.skipped = {}
+
+    def inline(self, program):
+        """ Inlines the calls of program in place, returning the number of
+            calls inlined.
+        """
+        inlined = self.inlined
+        funcs = {gdecl.decl.name.symbol: gdecl for gdecl in program.gdecls
+                 if isinstance(gdecl, ast_classes.FuncDef)}
+        callees = {symbol: self._callees(func) & funcs.keys()
+                   for symbol, func in funcs.items()}
+        self._recursive = self._recursive_functions(callees)
+        self._globals = global_names(program)
+        self._functions = {}
+        for symbol in self._bottom_up(funcs, callees):
+            self._function(funcs[symbol])
+            if symbol not in self._recursive:
+                self._functions[symbol] = _Function(funcs[symbol], self.budget)
+        return self.inlined - inlined
+
+    def report(self):
+        """ Lines describing what was done to every function called. """
+        lines = ['%s: %d call(s) inlined' % item for item in sorted(self.calls.items())]
+        lines.extend('%s: not inlined, %s' % item for item in sorted(self.skipped.items()))
+        return lines
+
+    # Call graph
+
+    @staticmethod
+    def _callees(func):
+        callees = set()
+        stack = [func.body]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, ast_classes.FuncCall) and _callee(node) is not None:
+                callees.add(_callee(node))
+            stack.extend(child for _, child in node.children())
+        return callees
+
+    @staticmethod
+    def _recursive_functions(callees):
+        """ Set of the functions that may call themselves. """
+        recursive = set()
+        for symbol in callees:
+            seen = set()
+            stack = list(callees[symbol])
+            while stack:
+                callee = stack.pop()
+                if callee is symbol:
+                    recursive.add(symbol)
+                    break
+                if callee not in seen:
+                    seen.add(callee)
+                    stack.extend(callees[callee])
+        return recursive
+
+    @staticmethod
+    def _bottom_up(funcs, callees):
+        """ The functions, each after those it calls (but in a cycle). """
+        order = []
+        done = set()
+        for root in funcs:
+            stack = [(root, False)]
+            while stack:
+                symbol, ready = stack.pop()
+                if ready:
+                    order.append(symbol)
+                    continue
+                if symbol in done:
+                    continue
+                done.add(symbol)
+                stack.append((symbol, True))
+                stack.extend((callee, False) for callee in callees[symbol])
+        return order
+
+    # Call sites
+
+    def _function(self, func):
+        self._temps = Temporaries(func, 'inl', self._globals)
+        self._tracked = tracked_symbols(func)
+        self._caller = func.decl.name.name
+        self._locals = declared_names(func.body) | declared_names(func.decl)
+        # The statements of inlined bodies were visited in their function
+        stack = [func.body]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, ast_classes.Compound):
+                items = []
+                for item in node.block_items or ():
+                    items.extend(self._statement(item))
+                    stack.append(item)
+                node.block_items = items
+                continue
+            if isinstance(node, ast_classes.If):
+                fields = ('iftrue', 'iffalse')
+            elif isinstance(node, (ast_classes.While, ast_classes.For)):
+                fields = ('statement',)
+            else:
+                continue
+            for field in fields:
+                stmt = getattr(node, field)
+                if stmt is None:
+                    continue
+                stmts = self._statement(stmt)
+                if len(stmts) > 1 or stmts[0] is not stmt:
+                    setattr(node, field, ast_classes.Compound(stmts, stmt.coord))
+                stack.append(stmt)
+        self.temporaries += self._temps.declare()
+
+    def _statement(self, stmt):
+        """ Inlines the calls of the statement stmt that can be, returning
+            the statements replacing it.
+        """
+        stmts = []
+        while True:
+            site = self._site(stmt)
+            if site is None:
+                return stmts + [stmt]
+            stmts.extend(self._expand(stmt, *site))
+            if site[0] is stmt:
+                return stmts
+
+    @staticmethod
+    def _head(stmt):
+        """ (expression, holder) of the expression stmt evaluates first,
+            where holder is the (node, field, index) holding it, or None.
+        """
+        if isinstance(stmt, (ast_classes.Return, ast_classes.Assert)):
+            return stmt.expr, (stmt, 'expr', None)
+        if isinstance(stmt, ast_classes.Print):
+            # Only the first value is printed before the call
+            if isinstance(stmt.expr, ast_classes.ExprList):
+                return stmt.expr.exprs[0], (stmt.expr, 'exprs', 0)
+            return stmt.expr, (stmt, 'expr', None)
+        if isinstance(stmt, ast_classes.If):
+            return stmt.cond, (stmt, 'cond', None)
+        if isinstance(stmt, ast_classes.Decl):
+            if isinstance(stmt.init, ast_classes.InitList):
+                return None, None
+            return stmt.init, (stmt, 'init', None)
+        if isinstance(stmt, (ast_classes.Assignment, ast_classes.FuncCall,
+                             ast_classes.UnaryOp, ast_classes.BinaryOp, ast_classes.ExprList)):
+            return stmt, None
+        return None, None
+
+    def _site(self, stmt):
+        """ (call, holder of the call, _Function called) of the call of the
+            statement stmt to inline, or None.
+        """
+        head, holder = self._head(stmt)
+        if head is None:
+            return None
+        # Preorder of the nodes evaluated: (node, index of the parent
+        # entry, holder, whether it is a location, whether it is always
+        # evaluated)
+        entries = []
+        stack = [(head, -1, holder, False, True)]
+        call = None
+        while stack:
+            entry = stack.pop()
+            node, parent = entry[0], entry[1]
+            if call is not None and not self._descends(entries, parent, call):
+                break
+            index = len(entries)
+            entries.append(entry)
+            if isinstance(node, ast_classes.FuncCall):
+                call = index
+            stack.extend(reversed(self._operands(entry, index)))
+        if call is None:
+            return None
+
+        node, _, holder, _, always = entries[call]
+        callee = _callee(node)
+        if callee in self._recursive:
+            self.skipped[callee.name] = 'recursive'
+            return None
+        function = self._functions.get(callee)
+        if not always or function is None:
+            return None
+        if function.reason is not None:
+            self.skipped[callee.name] = function.reason
+            return None
+        shadowed = function.globals & self._locals
+        if shadowed:
+            self.skipped[callee.name] = 'uses %s, shadowed by a local of %s' % (
+                ', '.join(sorted(shadowed)), self._caller)
+            return None
+        args = _call_args(node)
+        for param, arg in zip(function.params, args):
+            if param.name.symbol.kind == 'array' and not isinstance(arg, ast_classes.ID):
+                return None
+        if node.uc_type not in _VALUE_TYPES and node.uc_type is not VoidType:
+            return None
+
+        # What the statement evaluates before the call runs after it now
+        ancestors = set()
+        parent = entries[call][1]
+        while parent >= 0:
+            ancestors.add(parent)
+            parent = entries[parent][1]
+        before = [entry for index, entry in enumerate(entries[:call]) if index not in ancestors]
+        reads = self._reads(before)
+        if reads is None:
+            return None
+        symbols, memory, fails = reads
+        writes = written(args, self._tracked)
+        if function.memory:
+            writes.add(MEMORY)
+        if symbols & writes or memory and MEMORY in writes or \
+                fails and (writes or function.io):
+            return None
+        return node, holder, function
+
+    @staticmethod
+    def _descends(entries, parent, ancestor):
+        while parent > ancestor:
+            parent = entries[parent][1]
+        return parent == ancestor
+
+    @staticmethod
+    def _operands(entry, index):
+        """ Entries of the operands of the node of entry, in the order they
+            are evaluated.
+        """
+        node, _, _, location, always = entry
+        operands = []
+        for field in node_fields(node.__class__):
+            value = getattr(node, field)
+            if isinstance(value, ast_classes.Node):
+                operands.append((value, field, None))
+            elif isinstance(value, list):
+                operands.extend((elem, field, i) for i, elem in enumerate(value))
+        entries = []
+        for value, field, i in operands:
+            if isinstance(node, ast_classes.Assignment):
+                is_location = field == 'lvalue'
+            elif isinstance(node, ast_classes.UnaryOp):
+                is_location = node.op in UPDATE_OPS or node.op == '&'
+            elif isinstance(node, ast_classes.ArrayRef):
+                is_location = location and field == 'name'
+            else:
+                is_location = False
+            evaluated = always and not (isinstance(node, ast_classes.BinaryOp) and
+                                        node.op in ('&&', '||') and field == 'right')
+            entries.append((value, index, (node, field, i), is_location, evaluated))
+        return entries
+
+    def _reads(self, entries):
+        """ (tracked symbols read, whether memory is read, whether it may
+            fail) of the nodes of entries, or None if they have effects.
+        """
+        symbols = set()
+        memory = fails = False
+        for node, _, _, location, _ in entries:
+            if isinstance(node, (ast_classes.Assignment, ast_classes.FuncCall)) or \
+                    isinstance(node, ast_classes.UnaryOp) and node.op in UPDATE_OPS:
+                return None
+            if isinstance(node, ast_classes.ID):
+                if location or node.symbol is None or node.symbol.kind == 'func':
+                    continue
+                if node.symbol in self._tracked:
+                    symbols.add(node.symbol)
+                else:
+                    memory = True
+            elif isinstance(node, ast_classes.ArrayRef) or \
+                    isinstance(node, ast_classes.UnaryOp) and node.op == '*':
+                memory = fails = True
+            elif isinstance(node, ast_classes.BinaryOp):
+                if node.op not in SAFE_OPS and not (
+                        isinstance(node.right, ast_classes.Constant) and node.right.value):
+                    fails = True
+            elif isinstance(node, ast_classes.Cast):
+                if node.new_type.names[0] == 'int' and node.expr.uc_type is FloatType:
+                    fails = True
+        return symbols, memory, fails
+
+    # Expansion
+
+    def _expand(self, stmt, call, holder, function):
+        """ Returns the statements running the body of function for call,
+            replacing call in stmt by the value returned.
+        """
+        name = function.func.decl.name.name
+        self.calls[name] = self.calls.get(name, 0) + 1
+        self.inlined += 1
+        temps = self._temps
+        result = None
+        if holder is not None and call.uc_type is not VoidType:
+            result = temps.new(call.uc_type)
+            self._tracked.add(result.symbol)
+
+        # Array parameters are replaced by the arrays, the others are
+        # declared with the arguments as initializers
+        substitutes = {}
+        bound = []
+        for param, arg in zip(function.params, _call_args(call)):
+            if param.name.symbol.kind == 'array':
+                substitutes[param.name.symbol] = arg
+            else:
+                bound.append((param, arg))
+        symbols = {}
+
+        def symbol_of(symbol):
+            if symbol.scope == 0 or symbol.kind == 'func':
+                return None
+            new = symbols.get(symbol)
+            if new is None:
+                new = symbols[symbol] = temps.symbol(symbol.name, None, symbol.kind, symbol.type)
+                # Unique, so declarations in the same block do not clash
+                new.name = temps.fresh('%s_%s_%d' % (temps.prefix, symbol.name, new.id))
+                if symbol in function.tracked:
+                    self._tracked.add(new)
+            return new
+
+        stmts = []
+        copies = {}
+        for param, arg in bound:
+            decl, param_copies = clone(param, symbol_of, substitutes)
+            decl.init = arg
+            copies.update(param_copies)
+            stmts.append(decl)
+        body, body_copies = clone(function.func.body, symbol_of, substitutes)
+        copies.update(body_copies)
+        for old, new in symbols.items():
+            new.decl = copies[old.decl]
+        stmts.extend(self._returns(body, result, function.returns_early))
+
+        if holder is None:
+            return stmts
+        node, field, index = holder
+        value = temps.ref(result, call.coord)
+        if index is None:
+            setattr(node, field, value)
+        else:
+            getattr(node, field)[index] = value
+        return stmts
+
+    def _returns(self, body, result, early):
+        """ Statements of the copy body of a function, with its Returns
+            replaced by assignments to the ID result (None for no value).
+        """
+        items = body.block_items or []
+        if not early:
+            if items and isinstance(items[-1], ast_classes.Return):
+                items[-1:] = self._result(items[-1], result)
+            return items
+        # Returns, by the node (and index) holding them
+        stack = [body]
+        while stack:
+            node = stack.pop()
+            for field in node_fields(node.__class__):
+                value = getattr(node, field)
+                if isinstance(value, ast_classes.Return):
+                    stmts = self._result(value, result) + [ast_classes.Break(value.coord)]
+                    setattr(node, field, ast_classes.Compound(stmts, value.coord))
+                elif isinstance(value, ast_classes.Node):
+                    stack.append(value)
+                elif isinstance(value, list):
+                    for i, elem in enumerate(value):
+                        if isinstance(elem, ast_classes.Return):
+                            value[i] = ast_classes.Compound(
+                                self._result(elem, result) + [ast_classes.Break(elem.coord)],
+                                elem.coord)
+                        elif isinstance(elem, ast_classes.Node):
+                            stack.append(elem)
+        cond = ast_classes.Constant('int', 1, body.coord)
+        cond.uc_type = IntType
+        loop = ast_classes.While(cond, ast_classes.Compound(
+            items + [ast_classes.Break(body.coord)], body.coord), body.coord)
+        return [loop]
+
+    @staticmethod
+    def _result(ret, result):
+        """ Statements doing what the Return ret does but leaving. """
+        if ret.expr is None:
+            return []
+        if result is None:
+            return [ret.expr]
+        return [Temporaries.assign(result, ret.expr, ret.coord)]
@@ -0,0 +1,453 @@
+""" Loop optimizations: loop-invariant code motion and strength reduction.
+
+    Loops are the natural loops of the CFGs of ir.cfg, one per While or
+    For whose body may run again. The variables and memory a loop may write
+    are those written by the blocks of its natural loop (see
+    optimizer.effects).
+
+    An expression is invariant in a loop when the loop writes none of the
+    variables it reads, nor memory if it reads memory. The largest
+    invariant expressions are computed once into temporaries before the
+    outermost loop they are invariant in, by statements placed after the
+    initial clause of a For. They run even when the loop body would not,
+    so only expressions that cannot fail are moved: no array elements, no
+    pointers, and no division by something other than a non-zero constant.
+
+    A basic induction variable of a loop is an int variable that the loop
+    only changes by statements adding a constant to it (i++, i -= 2,
+    i = i + 3...). A product of an induction variable i by a constant, or by
+    a variable the loop does not write, is replaced by a temporary set
+    before the loop and increased along with i, after each of these
+    statements. Products wrap around as additions do, so the temporary
+    always holds the product.
+"""
+
+from ir.cfg import CFGBuilder
+from parser import ast_classes
+from semantic.uc_ops import wrap_int
+from semantic.uc_types import CharType, FloatType, IntType
+
+from .effects import MEMORY, SAFE_OPS, UPDATE_OPS, Temporaries, global_names, \
+    read_targets, tracked_symbols, written
+from .rewriter import Rewriter
+
+# Types of the values kept in temporaries
+_VALUE_TYPES = (IntType, FloatType, CharType)
+
+
+class LoopStats:
+    """ What the LoopOptimizer did to a loop.
+
+            loop:
+                The While or For node.
+            depth:
+                Number of loops it is nested in, plus one.
+            blocks:
+                Number of blocks of its natural loop.
+            hoisted:
+                Number of invariant expressions replaced by temporaries
+                computed before it.
+            reduced:
+                Number of multiplications by an induction variable replaced
+                by temporaries increased along with it.
+    """
+
+    def __init__(self, loop, depth, blocks):
+        self.loop = loop
+        self.depth = depth
+        self.blocks = blocks
+        self.hoisted = 0
+        self.reduced = 0
+
+    def __str__(self):
+        return 'line %d: %s loop, depth %d, %d block(s): %d invariant(s) hoisted, ' \
+               '%d multiplication(s) reduced' % (
+                   self.loop.coord.line if self.loop.coord else 0,
+                   self.loop.__class__.__name__.lower(), self.depth, self.blocks,
+                   self.hoisted, self.reduced)
+
+
+def _step(node, symbol):
+    """ Constant added to the variable of symbol by the statement node, or
+        None if node does something else to it.
+    """
+    if isinstance(node, ast_classes.UnaryOp):
+        if node.op in UPDATE_OPS:
+            return 1 if node.op[-1] == '+' else -1
+        return None
+    if not isinstance(node, ast_classes.Assignment):
+        return None
+    value = node.rvalue
+    if node.op in ('+=', '-='):
+        if _is_int_constant(value):
+            return value.value if node.op == '+=' else -value.value
+        return None
+    if node.op != '=' or not isinstance(value, ast_classes.BinaryOp) or \
+            value.op not in ('+', '-'):
+        return None
+    left, right = value.left, value.right
+    if _is_int_constant(right) and _reads(left, symbol):
+        return right.value if value.op == '+' else -right.value
+    if value.op == '+' and _is_int_constant(left) and _reads(right, symbol):
+        return left.value
+    return None
+
+
+def _is_int_constant(node):
+    return isinstance(node, ast_classes.Constant) and node.type == 'int'
+
+
+def _reads(node, symbol):
+    return isinstance(node, ast_classes.ID) and node.symbol is symbol
+
+
+class LoopOptimizer(Rewriter):
+    """ Moves the invariant expressions out of the loops of a program, and
+        reduces the multiplications by their induction variables to
+        additions. Loops and Break statements are left as they are.
+
+        The program must have been resolved and type checked.
+
+            loops:
+                LoopStats of every loop optimized, in order.
+            hoisted, reduced:
+                Totals of the LoopStats.
+            temporaries:
+                Number of temporaries declared.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.loops = []
+        self.hoisted = 0
+        self.reduced = 0
+        self.temporaries = 0
+        self._builder = CFGBuilder()
+        self._replacements = {}
+        self._preheaders = {}
+
+    def optimize(self, program):
+        """ Optimizes the loops of program in place, returning the number
+            of expressions replaced.
+        """
+        before = self.hoisted + self.reduced
+        self._globals = global_names(program)
+        for gdecl in program.gdecls:
+            if isinstance(gdecl, ast_classes.FuncDef):
+                self._function(gdecl)
+        return self.hoisted + self.reduced - before
+
+    def report(self):
+        """ Lines describing what was done to every loop. """
+        return [str(stats) for stats in self.loops]
+
+    def leave_BinaryOp(self, node):
+        return self._replacements.get(node)
+
+    def leave_UnaryOp(self, node):
+        return self._replacements.get(node)
+
+    def leave_Cast(self, node):
+        return self._replacements.get(node)
+
+    def leave_Assignment(self, node):
+        return self._replacements.get(node)
+
+    def leave_While(self, node):
+        return self._preheader(node)
+
+    def leave_For(self, node):
+        return self._preheader(node)
+
+    def _preheader(self, loop):
+        """ Compound running the statements hoisted out of loop before it,
+            or None if there are none.
+        """
+        stmts = self._preheaders.get(loop)
+        if not stmts:
+            return None
+        if isinstance(loop, ast_classes.For) and loop.initial is not None:
+            stmts.insert(0, loop.initial)
+            loop.initial = None
+        return ast_classes.Compound(stmts + [loop], loop.coord)
+
+    def _function(self, func):
+        cfg = self._builder.build(func)
+        self._tracked = tracked_symbols(func)
+        self._temps = Temporaries(func, 'loop', self._globals)
+        self._summaries = {}
+        # Keys written by each loop, by loop node
+        self._kills = {}
+        self._stats = {}
+        for node, header in cfg.loops:
+            blocks = cfg.natural_loop(header)
+            if blocks:
+                nodes = [cfg.conds[b] for b in blocks if cfg.conds[b] is not None]
+                for b in blocks:
+                    nodes.extend(cfg.block(b))
+                self._kills[node] = written(nodes, self._tracked)
+                self._stats[node] = LoopStats(node, 0, len(blocks))
+        if not self._kills:
+            return
+        # Statements to run before each loop, the temporaries of the
+        # expressions they compute, and the induction variables of loops
+        self._preheaders = {node: [] for node in self._kills}
+        self._hoisted = {}
+        self._reduced = {}
+        self._inductions = {}
+        self._replacements = {}
+        self._walk(func.body)
+        self.rewrite(func.body)
+        self.temporaries += self._temps.declare()
+        self._replacements = {}
+        self._preheaders = {}
+
+    def _walk(self, body):
+        """ Walks the statements of body with the loops they are in. """
+        # (node, enclosing loops, whether node is a location)
+        stack = [(body, (), False)]
+        while stack:
+            node, loops, location = stack.pop()
+            if location:
+                children = self._location_parts(node)
+            elif isinstance(node, (ast_classes.While, ast_classes.For)):
+                children = self._loop_parts(node, loops)
+            else:
+                if loops and isinstance(node, (ast_classes.BinaryOp, ast_classes.UnaryOp,
+                                               ast_classes.Cast)):
+                    loops = self._move(node, loops)
+                    if loops is None:
+                        continue
+                children = self._parts(node)
+            for child, is_location, inner in reversed(children):
+                if child is not None:
+                    stack.append((child, loops + inner, is_location))
+
+    def _loop_parts(self, node, loops):
+        stats = self._stats.get(node)
+        inner = ()
+        if stats is not None:
+            stats.depth = len(loops) + 1
+            self.loops.append(stats)
+            inner = (node,)
+        if isinstance(node, ast_classes.While):
+            return [(node.cond, False, inner), (node.statement, False, inner)]
+        return [(node.initial, False, ()), (node.cond, False, inner),
+                (node.next, False, inner), (node.statement, False, inner)]
+
+    @staticmethod
+    def _parts(node):
+        """ Children of node, as (child, whether it is a location, ()). """
+        if isinstance(node, ast_classes.Assignment):
+            return [(node.lvalue, True, ()), (node.rvalue, False, ())]
+        if isinstance(node, ast_classes.UnaryOp) and (node.op in UPDATE_OPS or node.op == '&'):
+            return [(node.expr, True, ())]
+        if isinstance(node, ast_classes.Read):
+            return [(target, True, ()) for target in read_targets(node)]
+        if isinstance(node, ast_classes.Decl):
+            return [(node.init, False, ())]
+        return [(child, False, ()) for _, child in node.children()]
+
+    @staticmethod
+    def _location_parts(node):
+        if isinstance(node, ast_classes.ArrayRef):
+            return [(node.name, True, ()), (node.subscript, False, ())]
+        if isinstance(node, ast_classes.UnaryOp) and node.op == '*':
+            return [(node.expr, False, ())]
+        return []
+
+    # Invariant expressions
+
+    def _summary(self, node):
+        """ (key, tracked variables read, whether memory is read) of the
+            expression node, or None if it cannot be computed ahead: it has
+            effects, may fail, or reads arrays or pointers. Equal keys mean
+            equal expressions.
+        """
+        summaries = self._summaries
+        if node in summaries:
+            return summaries[node]
+        stack = [(node, False)]
+        while stack:
+            item, ready = stack.pop()
+            if item in summaries:
+                continue
+            children = [child for _, child in item.children()] \
+                if isinstance(item, (ast_classes.BinaryOp, ast_classes.UnaryOp)) else \
+                [item.expr] if isinstance(item, ast_classes.Cast) else []
+            if not ready:
+                stack.append((item, True))
+                stack.extend((child, False) for child in children)
+                continue
+            summaries[item] = self._summarize(item, [summaries[child] for child in children])
+        return summaries[node]
+
+    def _summarize(self, node, parts):
+        if None in parts:
+            return None
+        if isinstance(node, ast_classes.Constant):
+            if node.type == 'string':
+                return None
+            return (node.type, node.value), frozenset(), False
+        if isinstance(node, ast_classes.ID):
+            symbol = node.symbol
+            if symbol is None or symbol.kind not in ('var', 'pointer') or \
+                    node.uc_type not in _VALUE_TYPES:
+                return None
+            if symbol in self._tracked:
+                return symbol, frozenset((symbol,)), False
+            return symbol, frozenset(), True
+        if isinstance(node, ast_classes.BinaryOp):
+            if node.op not in SAFE_OPS and not (
+                    isinstance(node.right, ast_classes.Constant) and node.right.value):
+                return None
+        elif isinstance(node, ast_classes.UnaryOp):
+            if node.op not in ('-', '!', '+'):
+                return None
+        elif isinstance(node, ast_classes.Cast):
+            # A float too large for an int fails to convert
+            if node.new_type.names[0] == 'int' and node.expr.uc_type is FloatType:
+                return None
+        else:
+            return None
+        key = (node.__class__.__name__, getattr(node, 'op', None) or node.new_type.names[0]) + \
+            tuple(part[0] for part in parts)
+        reads = frozenset().union(*[part[1] for part in parts])
+        return key, reads, any(part[2] for part in parts)
+
+    def _invariant(self, summary, loop):
+        kills = self._kills[loop]
+        return not (summary[1] & kills) and not (summary[2] and MEMORY in kills)
+
+    def _move(self, node, loops):
+        """ Hoists or reduces the expression node of the given loops, if
+            it can. Returns the loops its children are in then, or None if
+            they need not be visited.
+        """
+        if node.uc_type not in _VALUE_TYPES:
+            return loops
+        summary = self._summary(node)
+        if summary is None or not (summary[1] or summary[2]):
+            # Constant expressions are left to constant folding
+            return loops
+        depth = len(loops)
+        while depth > 0 and self._invariant(summary, loops[depth - 1]):
+            depth -= 1
+        if depth > 0 and self._reduce(node, loops[depth - 1]):
+            return None
+        if depth == len(loops):
+            return loops
+        loop = loops[depth]
+        self._stats[loop].hoisted += 1
+        self.hoisted += 1
+        key = (loop, summary[0])
+        temp = self._hoisted.get(key)
+        if temp is not None:
+            self._replacements[node] = self._temps.ref(temp, node.coord)
+            return None
+        temp = self._hoisted[key] = self._temps.new(node.uc_type)
+        self._preheaders[loop].append(self._temps.assign(temp, node, node.coord))
+        self._replacements[node] = self._temps.ref(temp, node.coord)
+        return loops[:depth]
+
+    # Strength reduction
+
+    def _induction_variables(self, loop):
+        """ Dict of the basic induction variables of loop: the list of the
+            (statement, step) changing each one, by symbol.
+        """
+        defs = {}
+        excluded = set()
+        # (node, whether it is a statement)
+        stack = [(loop.cond, False), (loop.next, True), (loop.statement, True)] \
+            if isinstance(loop, ast_classes.For) else [(loop.cond, False), (loop.statement, True)]
+        while stack:
+            node, statement = stack.pop()
+            if node is None:
+                continue
+            if isinstance(node, ast_classes.Read):
+                targets = read_targets(node)
+            elif isinstance(node, ast_classes.Assignment):
+                targets = [node.lvalue]
+            elif isinstance(node, ast_classes.UnaryOp) and node.op in UPDATE_OPS:
+                targets = [node.expr]
+            elif isinstance(node, ast_classes.Decl):
+                targets = [node.name]
+            else:
+                targets = []
+            for target in targets:
+                symbol = getattr(target, 'symbol', None)
+                if symbol not in self._tracked:
+                    continue
+                step = _step(node, symbol) if statement else None
+                if step is None or target.uc_type is not IntType:
+                    excluded.add(symbol)
+                else:
+                    defs.setdefault(symbol, []).append((node, step))
+            if isinstance(node, ast_classes.Compound):
+                stack.extend((item, True) for item in node.block_items or ())
+            elif isinstance(node, ast_classes.If):
+                stack.extend(((node.cond, False), (node.iftrue, True), (node.iffalse, True)))
+            elif isinstance(node, ast_classes.While):
+                stack.extend(((node.cond, False), (node.statement, True)))
+            elif isinstance(node, ast_classes.For):
+                stack.extend(((node.initial, True), (node.cond, False), (node.next, True),
+                              (node.statement, True)))
+            elif isinstance(node, (ast_classes.ExprList, ast_classes.DeclList)):
+                stack.extend((child, statement) for _, child in node.children())
+            else:
+                stack.extend((child, False) for _, child in node.children())
+        return {symbol: steps for symbol, steps in defs.items() if symbol not in excluded}
+
+    def _reduce(self, node, loop):
+        """ Reduces node if it multiplies an induction variable of loop by
+            a constant or by a variable loop does not write.
+        """
+        if not isinstance(node, ast_classes.BinaryOp) or node.op != '*' or \
+                node.uc_type is not IntType:
+            return False
+        inductions = self._inductions.get(loop)
+        if inductions is None:
+            inductions = self._inductions[loop] = self._induction_variables(loop)
+        for var, factor in ((node.left, node.right), (node.right, node.left)):
+            steps = inductions.get(getattr(var, 'symbol', None))
+            if steps is None or not isinstance(var, ast_classes.ID):
+                continue
+            if _is_int_constant(factor):
+                key = (loop, var.symbol, factor.value)
+            elif isinstance(factor, ast_classes.ID) and factor.symbol in self._tracked and \
+                    factor.symbol not in self._kills[loop] and \
+                    all(step in (1, -1) for _, step in steps):
+                key = (loop, var.symbol, factor.symbol)
+            else:
+                continue
+            temp = self._reduced.get(key)
+            if temp is None:
+                temp = self._reduced[key] = self._temps.new(IntType)
+                self._preheaders[loop].append(self._temps.assign(temp, node, node.coord))
+                for stmt, step in steps:
+                    self._increase(stmt, temp, step, factor)
+            self._replacements[node] = self._temps.ref(temp, node.coord)
+            self._stats[loop].reduced += 1
+            self.reduced += 1
+            return True
+        return False
+
+    def _increase(self, stmt, temp, step, factor):
+        """ Makes the statement stmt also add step times factor to temp. """
+        coord = stmt.coord
+        if isinstance(factor, ast_classes.Constant):
+            op = '+'
+            amount = ast_classes.Constant('int', wrap_int(step * factor.value), coord)
+        else:
+            op = '+' if step == 1 else '-'
+            amount = self._temps.ref(factor, coord)
+        amount.uc_type = IntType
+        total = ast_classes.BinaryOp(op, self._temps.ref(temp, coord), amount, coord)
+        total.uc_type = IntType
+        update = self._temps.assign(temp, total, coord)
+        sequence = self._replacements.get(stmt)
+        if sequence is None:
+            sequence = self._replacements[stmt] = ast_classes.ExprList([stmt], coord)
+            sequence.uc_type = IntType
+        sequence.exprs.append(update)
@@ -0,0 +1,78 @@
+from parser import ast_classes
+
+_fields = {}
+
+
+def node_fields(cls):
+    """ Names of the fields of a node class: its slots before coord, as
+        shown by repr(). The slots after coord hold annotations.
+    """
+    fields = _fields.get(cls)
+    if fields is None:
+        slots = cls.__slots__
+        fields = _fields[cls] = slots[:slots.index('coord')] if 'coord' in slots else slots
+    return fields
+
+
+def subtree_size(node):
+    """ Number of nodes of the tree rooted at node. """
+    count = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(child for _, child in node.children())
+    return count
+
+
+class Rewriter:
+    """ Base class of the AST-to-AST passes.
+
+        rewrite() walks the tree with an explicit stack and calls the
+        leave_<ClassName> method of every node that has one, after its
+        children have been left. A method returns the node that replaces
+        the one left, or None to keep it, and the replacement is stored in
+        the field (or list item) of the parent that held the node.
+    """
+
+    def __init__(self):
+        self._methods = {}
+
+    def rewrite(self, root):
+        """ Rewrites the tree rooted at root, returning its new root. """
+        Node = ast_classes.Node
+        # (node, parent, field, index in the list of the field or None)
+        order = []
+        stack = [(root, None, None, None)]
+        while stack:
+            item = stack.pop()
+            order.append(item)
+            node = item[0]
+            for field in node_fields(node.__class__):
+                value = getattr(node, field)
+                if isinstance(value, Node):
+                    stack.append((value, node, field, None))
+                elif isinstance(value, list):
+                    for i, elem in enumerate(value):
+                        if isinstance(elem, Node):
+                            stack.append((elem, node, field, i))
+
+        # Descendants come after their ancestors in preorder
+        methods = self._methods
+        for node, parent, field, index in reversed(order):
+            cls = node.__class__
+            method = methods.get(cls, False)
+            if method is False:
+                method = methods[cls] = getattr(self, 'leave_' + cls.__name__, None)
+            if method is None:
+                continue
+            new = method(node)
+            if new is None or new is node:
+                continue
+            if parent is None:
+                root = new
+            elif index is None:
+                setattr(parent, field, new)
+            else:
+                getattr(parent, field)[index] = new
+        return root
@@ -1,13 +1,79 @@
 import sys
 
-def _repr(obj):
+_repr_plans = {}
+
+def _repr_plan(cls):
+    """ How a node class is represented: its opening text, its fields (with
+        their leading text and the indentation added to their lines) and its
+        closing text. Cached per class.
+    """
+    plan = _repr_plans.get(cls)
+    if plan is None:
+        name = cls.__name__
+        pad = ' ' * len(name)
+        # Slots after coord hold annotations of later passes, not fields
+        slots = cls.__slots__
+        fields = slots[:slots.index('coord')] if 'coord' in slots else slots
+        plan = _repr_plans[cls] = (
+            name,
+            tuple(((',' + pad if i else '') + f + '=', f, '  ' + ' ' * (len(f) + len(name)))
+                  for i, f in enumerate(fields)),
+            pad + ')' if fields else ')')
+    return plan
+
+def _repr(obj, max_depth=None, max_size=None):
     """
     Get the representation of an object, with dedicated pprint-like format for lists.
+
+    The result is written into a single buffer, walking nested nodes and lists
+    with an explicit stack and tracking the indentation of the current line.
+        max_depth:
+            Nodes nested deeper than this are written as ClassName(...).
+        max_size:
+            The output is cut after about this many characters, ending in '...'.
     """
-    if isinstance(obj, list):
-        return '[' + (',\n '.join((_repr(e).replace('\n', '\n ') for e in obj))) + '\n]'
-    else:
-        return repr(obj)
+    parts = []
+    size = 0
+    # Items are either literal text or (value, indent, depth) to be expanded
+    stack = [(obj, '', 0)]
+    push = stack.append
+    while stack:
+        item = stack.pop()
+        if item.__class__ is str:
+            text = item
+        else:
+            value, indent, depth = item
+            if isinstance(value, Node):
+                name, fields, closing = _repr_plan(value.__class__)
+                if max_depth is not None and depth >= max_depth:
+                    text = name + '(...)'
+                else:
+                    push(closing)
+                    depth += 1
+                    for lead, field, extra in reversed(fields):
+                        push((getattr(value, field), indent + extra, depth))
+                        push(lead)
+                    text = name + '('
+            elif isinstance(value, list):
+                push('\n' + indent + ']')
+                inner = indent + ' '
+                for i in range(len(value) - 1, 0, -1):
+                    push((value[i], inner, depth))
+                    push(',\n' + inner)
+                if value:
+                    push((value[0], inner, depth))
+                text = '['
+            else:
+                text = repr(value)
+                if '\n' in text:
+                    text = text.replace('\n', '\n' + indent)
+        parts.append(text)
+        if max_size is not None:
+            size += len(text)
+            if size > max_size:
+                parts.append('...')
+                break
+    return ''.join(parts)
 
 class Node(object):
     """
@@ -24,20 +90,14 @@ class Node(object):
     """
     __slots__ = ()
 
+    # Default limits of repr(), e.g. to keep logging of huge trees cheap
+    repr_max_depth = None
+    repr_max_size = None
+
     def __repr__(self):
         """ Generates a python representation of the current node
         """
-        result = self.__class__.__name__ + '('
-        indent = ''
-        separator = ''
-        for name in self.__slots__[:-1]:
-            result += separator
-            result += indent
-            result += name + '=' + (_repr(getattr(self, name)).replace('\n', '\n  ' + (' ' * (len(name) + len(self.__class__.__name__)))))
-            separator = ','
-            indent = ' ' * len(self.__class__.__name__)
-        result += indent + ')'
-        return result
+        return _repr(self, self.repr_max_depth, self.repr_max_size)
 
     def children(self):
         """ A sequence of all children that are Nodes
@@ -69,7 +129,7 @@ class Node(object):
                 attrstr = ', '.join('%s=%s' % nv for nv in nvlist)
             else:
                 vlist = [getattr(self, n) for n in self.attr_names]
-                attrstr = ', '.join('%s' % v for v in vlist)
+                attrstr = ', '.join('%s' % (v, ) for v in vlist)
             buf.write(attrstr)
 
         if showcoord:
@@ -98,11 +158,12 @@ class Coord(object):
         return coord_str
 
 class Cast(Node):
-    __slots__ = ('new_type', 'expr', 'coord')
+    __slots__ = ('new_type', 'expr', 'coord', 'uc_type')
     def __init__(self, new_type, expr, coord=None):
         self.new_type = new_type
         self.expr = expr
         self.coord = coord
+        self.uc_type = None
 
     def children(self):
         nodelist = []
@@ -128,12 +189,13 @@ class Program(Node):
     attr_names = ()
 
 class Constant(Node):
-    __slots__ = ('type', 'value', 'coord')
+    __slots__ = ('type', 'value', 'coord', 'uc_type')
 
     def __init__(self, type, value, coord=None):
         self.type = type
         self.value = value
         self.coord = coord
+        self.uc_type = None
 
     def children(self):
         nodelist = []
@@ -159,13 +221,14 @@ class Type(Node):
     attr_names = ('names', )
 
 class Assignment(Node):
-    __slots__ = ('op', 'lvalue', 'rvalue', 'coord')
+    __slots__ = ('op', 'lvalue', 'rvalue', 'coord', 'uc_type')
 
     def __init__(self, op, lvalue, rvalue, coord=None):
         self.op = op
         self.lvalue = lvalue
         self.rvalue = rvalue
         self.coord = coord
+        self.uc_type = None
 
     def children(self):
         nodelist = []
@@ -343,7 +406,7 @@ class For(Node):
 
 
 class EmptyStatement(Node):
-    __slots__ = ("coord")
+    __slots__ = ("coord", )
 
     def __init__(self, coord=None):
         self.coord = coord
@@ -368,11 +431,12 @@ class Return(Node):
     attr_names = ()
 
 class UnaryOp(Node):
-    __slots__ = ('op', 'expr', 'coord')
+    __slots__ = ('op', 'expr', 'coord', 'uc_type')
     def __init__(self, op, expr, coord=None):
         self.op = op
         self.expr = expr
         self.coord = coord
+        self.uc_type = None
 
     def children(self):
         nodelist = []
@@ -383,12 +447,13 @@ class UnaryOp(Node):
     attr_names = ('op', )
 
 class BinaryOp(Node):
-    __slots__ = ('op', 'left', 'right', 'coord')
+    __slots__ = ('op', 'left', 'right', 'coord', 'uc_type')
     def __init__(self, op, left, right, coord=None):
         self.op = op
         self.left = left
         self.right = right
         self.coord = coord
+        self.uc_type = None
 
     def children(self):
         nodelist = []
@@ -402,10 +467,14 @@ class BinaryOp(Node):
 
 
 class ID(Node):
-    __slots__ = ('name', 'coord')
+    __slots__ = ('name', 'coord', 'symbol', 'uc_type')
     def __init__(self, name, coord=None):
         self.name = name
         self.coord = coord
+        # Symbol the name resolves to, set by the semantic analysis
+        self.symbol = None
+        # Type of the expression, set by the type checker
+        self.uc_type = None
 
     def children(self):
         nodelist = []
@@ -419,10 +488,11 @@ class ID(Node):
 
 
 class ExprList(Node):
-    __slots__ = ('exprs', 'coord')
+    __slots__ = ('exprs', 'coord', 'uc_type')
     def __init__(self, exprs, coord=None):
         self.exprs = exprs
         self.coord = coord
+        self.uc_type = None
 
     def children(self):
         nodelist = []
@@ -433,11 +503,12 @@ class ExprList(Node):
     attr_names = ()
 
 class FuncCall(Node):
-    __slots__ = ('name', 'args', 'coord')
+    __slots__ = ('name', 'args', 'coord', 'uc_type')
     def __init__(self, name, args, coord=None):
         self.name = name
         self.args = args
         self.coord = coord
+        self.uc_type = None
 
     def children(self):
         nodelist = []
@@ -550,11 +621,12 @@ class Decl(Node):
     attr_names = ('name',)
 
 class ArrayRef(Node):
-    __slots__ = ('name', 'subscript', 'coord')
+    __slots__ = ('name', 'subscript', 'coord', 'uc_type')
     def __init__(self, name, subscript, coord=None):
         self.name = name
         self.subscript = subscript
         self.coord = coord
+        self.uc_type = None
 
     def children(self):
         nodelist = []
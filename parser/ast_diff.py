@@ -0,0 +1,479 @@
+import gc
+from bisect import bisect_left
+from collections import namedtuple, deque, Counter
+
+from . import ast_classes
+
+
+Edit = namedtuple('Edit', ['op', 'old', 'new'])
+Edit.__doc__ = """ A single edit operation of an AST diff.
+        op:
+            One of 'update', 'move', 'insert' or 'delete'.
+        old:
+            The node of the old tree (None for inserts).
+        new:
+            The node of the new tree (None for deletes).
+    """
+
+# Cost of renaming a node into another of a different class. It is higher
+# than a delete plus an insert, so the edit distance never maps those.
+_FORBIDDEN = 3
+
+# Attributes that identify a node but are not listed in its attr_names
+_EXTRA_LABEL_ATTRS = {
+    'VarDecl': ('declname', ),
+}
+
+
+def _attr_value(value):
+    if isinstance(value, ast_classes.ID):
+        return value.name
+    if isinstance(value, list):
+        return tuple(_attr_value(v) for v in value)
+    return value
+
+
+# Labels of the most common nodes, built without the generic attribute walk
+_LABELERS = {
+    ast_classes.ID: lambda n: ('ID', n.name),
+    ast_classes.Constant: lambda n: ('Constant', n.type, n.value),
+    ast_classes.BinaryOp: lambda n: ('BinaryOp', n.op),
+    ast_classes.UnaryOp: lambda n: ('UnaryOp', n.op),
+    ast_classes.Assignment: lambda n: ('Assignment', n.op),
+    ast_classes.Type: lambda n: ('Type', tuple(n.names)),
+}
+
+
+def _generic_labeler(cls):
+    name = cls.__name__
+    attrs = cls.attr_names + _EXTRA_LABEL_ATTRS.get(name, ())
+    if not attrs:
+        label = (name, )
+        return lambda n: label
+    return lambda n: (name, ) + tuple([_attr_value(getattr(n, a)) for a in attrs])
+
+
+def _label(node):
+    """ The label of a node: its class name and its attribute values,
+        ignoring coordinates and children.
+    """
+    cls = node.__class__
+    labeler = _LABELERS.get(cls)
+    if labeler is None:
+        labeler = _LABELERS[cls] = _generic_labeler(cls)
+    return labeler(node)
+
+
+class _Tree:
+    """ Flattened view of an AST used by the diff.
+
+        Nodes are numbered in preorder, so the subtree of node i is the
+        range [i, i + size[i]). Every node also gets a structural id,
+        which is equal for two nodes iff their subtrees are equal
+        (ignoring coordinates).
+    """
+
+    def __init__(self, root, consing):
+        nodes = []
+        parent = []
+        kids = []
+        stack = [root]
+        parents = [-1]
+        pop, push = stack.pop, stack.append
+        ppop, ppush = parents.pop, parents.append
+        idx = 0
+        while stack:
+            node = pop()
+            par = ppop()
+            nodes.append(node)
+            parent.append(par)
+            kids.append([])
+            if par >= 0:
+                kids[par].append(idx)
+            for _, child in reversed(node.children()):
+                push(child)
+                ppush(idx)
+            idx += 1
+
+        n = len(nodes)
+        size = [1] * n
+        labels = [None] * n
+        struct = [0] * n
+        get = consing.get
+        for i in range(n - 1, -1, -1):
+            label = labels[i] = _label(nodes[i])
+            ks = kids[i]
+            key = (label, tuple([struct[k] for k in ks])) if ks else label
+            sid = get(key)
+            if sid is None:
+                sid = consing[key] = len(consing)
+            struct[i] = sid
+            par = parent[i]
+            if par >= 0:
+                size[par] += size[i]
+
+        self.nodes = nodes
+        self.parent = parent
+        self.kids = kids
+        self.size = size
+        self.labels = labels
+        self.struct = struct
+
+
+class _Postorder:
+    """ 1-based postorder numbering of the subtree of t rooted at root, as
+        the Zhang-Shasha algorithm walks it.
+
+            order:
+                Node of t of every number.
+            lml:
+                Number of the leftmost leaf of every node.
+            keyroots:
+                Numbers of the nodes whose leftmost leaf differs from
+                their parent's, in increasing order.
+            work:
+                Total size of the subtrees of the keyroots: the tree edit
+                distance fills work * work' cells against another tree.
+    """
+
+    def __init__(self, t, root):
+        order = [None]
+        lml = [0]
+        first = {}
+        stack = [(root, False)]
+        while stack:
+            i, expanded = stack.pop()
+            if expanded or not t.kids[i]:
+                order.append(i)
+                kids = t.kids[i]
+                lml.append(first[kids[0]] if kids else len(order) - 1)
+                first[i] = lml[-1]
+                continue
+            stack.append((i, True))
+            for k in reversed(t.kids[i]):
+                stack.append((k, False))
+
+        last = {}
+        for i in range(1, len(lml)):
+            last[lml[i]] = i
+        self.order = order
+        self.lml = lml
+        self.keyroots = sorted(last.values())
+        self.work = sum(i - lml[i] + 1 for i in self.keyroots)
+        self.labels = [None] + [t.labels[i] for i in order[1:]]
+
+
+def _zhang_shasha(pa, pb):
+    """ Computes an optimal mapping between two subtrees, given by their
+        _Postorder, with the Zhang-Shasha tree edit distance algorithm,
+        returning it as a list of (node, node) pairs.
+    """
+    la, lb = pa.lml, pb.lml
+    xa, xb = pa.labels, pb.labels
+    na, nb = len(la) - 1, len(lb) - 1
+
+    def rename(i, j):
+        x, y = xa[i], xb[j]
+        if x == y:
+            return 0
+        return 1 if x[0] == y[0] else _FORBIDDEN
+
+    # Forest distances of every pair of keyroots, by their leftmost leaves.
+    # The table of a pair holds the distances between all the prefixes of
+    # their forests, so the backtracking reads those of any pair of nodes
+    # from the table of their keyroots.
+    treedist = [[0] * (nb + 1) for _ in range(na + 1)]
+    tables = {}
+    for i in pa.keyroots:
+        li = la[i]
+        for j in pb.keyroots:
+            lj = lb[j]
+            cols = j - lj + 2
+            prev = list(range(cols))
+            fd = [prev]
+            for i1 in range(li, i + 1):
+                row = [i1 - li + 1] * cols
+                whole = la[i1] == li
+                base = fd[la[i1] - li]
+                dist = treedist[i1]
+                for c in range(1, cols):
+                    j1 = lj + c - 1
+                    best = prev[c] + 1
+                    d = row[c - 1] + 1
+                    if d < best:
+                        best = d
+                    if whole and lb[j1] == lj:
+                        d = prev[c - 1] + rename(i1, j1)
+                        if d < best:
+                            best = d
+                        dist[j1] = best
+                    else:
+                        d = base[lb[j1] - lj] + dist[j1]
+                        if d < best:
+                            best = d
+                    row[c] = best
+                fd.append(row)
+                prev = row
+            tables[(li, lj)] = fd
+
+    mapping = []
+    pending = [(na, nb)]
+    while pending:
+        i, j = pending.pop()
+        li, lj = la[i], lb[j]
+        fd = tables[(li, lj)]
+        i1, j1 = i, j
+        while i1 >= li and j1 >= lj:
+            r, c = i1 - li + 1, j1 - lj + 1
+            here = fd[r][c]
+            if here == fd[r - 1][c] + 1:
+                i1 -= 1
+            elif here == fd[r][c - 1] + 1:
+                j1 -= 1
+            elif la[i1] == li and lb[j1] == lj:
+                if rename(i1, j1) < _FORBIDDEN:
+                    mapping.append((pa.order[i1], pb.order[j1]))
+                i1 -= 1
+                j1 -= 1
+            else:
+                pending.append((i1, j1))
+                i1 = la[i1] - 1
+                j1 = lb[j1] - 1
+    return mapping
+
+
+def _longest_increasing(seq):
+    """ Returns the set of positions of seq that belong to one of its
+        longest strictly increasing subsequences.
+    """
+    tails = []
+    tails_pos = []
+    prev = [-1] * len(seq)
+    for pos, value in enumerate(seq):
+        lo, hi = 0, len(tails)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if tails[mid] < value:
+                lo = mid + 1
+            else:
+                hi = mid
+        prev[pos] = tails_pos[lo - 1] if lo else -1
+        if lo == len(tails):
+            tails.append(value)
+            tails_pos.append(pos)
+        else:
+            tails[lo] = value
+            tails_pos[lo] = pos
+    keep = set()
+    pos = tails_pos[-1] if tails_pos else -1
+    while pos >= 0:
+        keep.add(pos)
+        pos = prev[pos]
+    return keep
+
+
+class ASTDiff:
+    """ Computes the differences between two ASTs.
+
+        Unchanged subtrees are matched first by their structural hashes,
+        which makes the diff of two mostly equal programs nearly linear.
+        Parents of matched nodes are then matched bottom-up, and only the
+        small subtrees left unmatched under them are aligned with the
+        Zhang-Shasha tree edit distance.
+
+            old, new:
+                Root nodes of the trees being compared.
+            zs_limit:
+                Maximum subtree size on which the tree edit distance
+                is computed. Larger subtrees are aligned child by child.
+            zs_budget:
+                Maximum number of table cells the tree edit distance fills
+                over the whole diff. Once it is spent, the remaining
+                subtrees are aligned child by child too.
+
+        After the diff, zs_work is the number of cells it filled.
+            min_size:
+                Minimum size of the subtrees matched by their hashes.
+    """
+
+    def __init__(self, old, new, zs_limit=64, min_size=2, zs_budget=400000):
+        self.zs_limit = zs_limit
+        self.zs_budget = zs_budget
+        self.zs_work = 0
+        self.min_size = min_size
+
+        # The diff allocates many small containers and no cycles, so the
+        # cyclic collector would only rescan the trees over and over.
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            consing = {}
+            self.old = _Tree(old, consing)
+            self.new = _Tree(new, consing)
+            self.old_to_new = [-1] * len(self.old.nodes)
+            self.new_to_old = [-1] * len(self.new.nodes)
+            # Roots of the subtrees matched as a whole to identical ones
+            self.whole = [False] * len(self.old.nodes)
+
+            self._match_identical()
+            self._match_parents()
+            self._match_remaining()
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def _link(self, a, b):
+        self.old_to_new[a] = b
+        self.new_to_old[b] = a
+
+    def _link_subtrees(self, a, b):
+        # Identical subtrees have the same shape, so preorder numbers align
+        size = self.old.size[a]
+        self.old_to_new[a:a + size] = range(b, b + size)
+        self.new_to_old[b:b + size] = range(a, a + size)
+        self.whole[a] = True
+
+    def _match_identical(self):
+        """ Matches identical subtrees, largest first. When a subtree occurs
+            many times, the occurrence closest to the same relative position
+            in the new tree wins. Single leaves are left to the next phases,
+            which match them through their parents.
+        """
+        old, new = self.old, self.new
+        candidates = {}
+        for b in range(len(new.nodes)):
+            if new.size[b] >= self.min_size:
+                candidates.setdefault(new.struct[b], []).append(b)
+
+        scale = len(new.nodes) / len(old.nodes)
+        order = [a for a in range(len(old.nodes)) if old.size[a] >= self.min_size]
+        order.sort(key=old.size.__getitem__, reverse=True)
+        for a in order:
+            if self.old_to_new[a] >= 0:
+                continue
+            cands = candidates.get(old.struct[a])
+            if not cands:
+                continue
+            # Nearest unmatched candidate around the relative position
+            # of a, dropping the matched ones found on the way.
+            target = a * scale
+            i = bisect_left(cands, target)
+            while i < len(cands) and self.new_to_old[cands[i]] >= 0:
+                del cands[i]
+            while i > 0 and self.new_to_old[cands[i - 1]] >= 0:
+                del cands[i - 1]
+                i -= 1
+            best = cands[i] if i < len(cands) else None
+            if i > 0 and (best is None or target - cands[i - 1] < best - target):
+                best = cands[i - 1]
+            if best is not None:
+                self._link_subtrees(a, best)
+
+    def _match_parents(self):
+        """ Bottom-up matching of nodes whose children were matched. """
+        old, new = self.old, self.new
+        for a in range(len(old.nodes) - 1, -1, -1):
+            if self.old_to_new[a] >= 0 or not old.kids[a]:
+                continue
+            votes = Counter()
+            for k in old.kids[a]:
+                b = self.old_to_new[k]
+                if b >= 0 and new.parent[b] >= 0:
+                    votes[new.parent[b]] += 1
+            for b, _ in votes.most_common():
+                if self.new_to_old[b] < 0 and new.labels[b][0] == old.labels[a][0]:
+                    self._link(a, b)
+                    break
+
+        if self.old_to_new[0] < 0 and self.new_to_old[0] < 0 \
+                and old.labels[0][0] == new.labels[0][0]:
+            self._link(0, 0)
+
+    def _match_remaining(self):
+        """ Aligns the unmatched descendants of matched pairs, with the
+            tree edit distance for small subtrees and child by child for
+            the others.
+        """
+        old, new = self.old, self.new
+        a = 0
+        while a < len(old.nodes):
+            b = self.old_to_new[a]
+            if b < 0:
+                a += 1
+                continue
+            if self.whole[a]:
+                a += old.size[a]
+                continue
+            # The subtree sizes bound the work from below, so the pairs
+            # past the budget are known before numbering them
+            if old.size[a] <= self.zs_limit and new.size[b] <= self.zs_limit \
+                    and self.zs_work + old.size[a] * new.size[b] <= self.zs_budget:
+                pa, pb = _Postorder(old, a), _Postorder(new, b)
+                if self.zs_work + pa.work * pb.work <= self.zs_budget:
+                    self.zs_work += pa.work * pb.work
+                    for x, y in _zhang_shasha(pa, pb):
+                        if self.old_to_new[x] < 0 and self.new_to_old[y] < 0:
+                            self._link(x, y)
+                    a += old.size[a]
+                    continue
+            free = {}
+            for k in new.kids[b]:
+                if self.new_to_old[k] < 0:
+                    free.setdefault(new.labels[k][0], deque()).append(k)
+            for k in old.kids[a]:
+                if self.old_to_new[k] < 0:
+                    queue = free.get(old.labels[k][0])
+                    if queue:
+                        self._link(k, queue.popleft())
+            a += 1
+
+    def edits(self):
+        """ Returns the list of Edit operations that turn the old tree into
+            the new one. Inserted and deleted subtrees are reported once, at
+            their topmost node.
+        """
+        old, new = self.old, self.new
+        result = []
+        a = 0
+        while a < len(old.nodes):
+            b = self.old_to_new[a]
+            par = old.parent[a]
+            if b < 0:
+                if par < 0 or self.old_to_new[par] >= 0:
+                    result.append(Edit('delete', old.nodes[a], None))
+                a += 1
+                continue
+            if par >= 0 and self.old_to_new[par] != new.parent[b]:
+                result.append(Edit('move', old.nodes[a], new.nodes[b]))
+            if self.whole[a]:
+                a += old.size[a]
+                continue
+            if old.labels[a] != new.labels[b]:
+                result.append(Edit('update', old.nodes[a], new.nodes[b]))
+
+            # Children that stayed under the same parent but changed order
+            if len(old.kids[a]) > 1:
+                positions = {k: p for p, k in enumerate(new.kids[b])}
+                stayed = [self.old_to_new[k] for k in old.kids[a]
+                          if self.old_to_new[k] in positions]
+                order = [positions[k] for k in stayed]
+                if any(x > y for x, y in zip(order, order[1:])):
+                    keep = _longest_increasing(order)
+                    for p, k in enumerate(stayed):
+                        if p not in keep:
+                            result.append(Edit('move', old.nodes[self.new_to_old[k]], new.nodes[k]))
+            a += 1
+
+        for b in range(len(new.nodes)):
+            if self.new_to_old[b] < 0:
+                par = new.parent[b]
+                if par < 0 or self.new_to_old[par] >= 0:
+                    result.append(Edit('insert', None, new.nodes[b]))
+        return result
+
+
+def diff_ast(old, new, zs_limit=64, min_size=2, zs_budget=400000):
+    """ Returns the list of Edit operations between two ASTs, with the
+        parameters of ASTDiff.
+    """
+    return ASTDiff(old, new, zs_limit, min_size, zs_budget).edits()
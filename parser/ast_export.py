@@ -0,0 +1,120 @@
+import json
+
+from . import ast_classes
+
+
+# Attributes that are not listed in attr_names, because show() omits them
+_EXTRA_ATTRS = {
+    'VarDecl': ('declname', ),
+}
+
+# Markers pushed on the writer stack between the nodes
+_CLOSE = object()
+_COMMA = object()
+
+_dumps = json.JSONEncoder(ensure_ascii=False, check_circular=False).encode
+
+
+class _ChunkWriter:
+    """ Collects small strings and hands them to the buffer in chunks, so
+        the export costs few write() calls without holding the document.
+    """
+
+    def __init__(self, buf, chunk_size=1 << 16):
+        self.buf = buf
+        self.chunk_size = chunk_size
+        self.parts = []
+        self.size = 0
+
+    def write(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.parts:
+            self.buf.write(''.join(self.parts))
+            self.parts = []
+            self.size = 0
+
+
+def _attr_value(value):
+    if isinstance(value, ast_classes.ID):
+        return value.name
+    if isinstance(value, (list, tuple)):
+        return [_attr_value(v) for v in value]
+    return value
+
+
+def _attributes(node):
+    name = node.__class__.__name__
+    attrs = node.attr_names + _EXTRA_ATTRS.get(name, ())
+    return [(a, _attr_value(getattr(node, a))) for a in attrs]
+
+
+def _write_node(out, node, field=None, showcoord=True):
+    """ Writes node and its children as a single JSON object. The tree is
+        walked with an explicit stack, so deep trees are fine.
+    """
+    write = out.write
+    stack = [(node, field)]
+    while stack:
+        item = stack.pop()
+        if item is _COMMA:
+            write(',')
+            continue
+        if item is _CLOSE:
+            write(']}')
+            continue
+
+        node, field = item
+        write('{"kind":"' + node.__class__.__name__ + '"')
+        if field is not None:
+            write(',"field":' + _dumps(field))
+        attrs = _attributes(node)
+        if attrs:
+            write(',"attrs":{' + ','.join(
+                _dumps(n) + ':' + _dumps(v) for n, v in attrs) + '}')
+        if showcoord:
+            coord = node.coord
+            if coord is not None and coord.line:
+                write(',"coord":[%d,%s]' % (coord.line, _dumps(coord.column)))
+            else:
+                write(',"coord":null')
+
+        children = node.children()
+        if not children:
+            write('}')
+            continue
+        write(',"children":[')
+        stack.append(_CLOSE)
+        for i in range(len(children) - 1, -1, -1):
+            child_field, child = children[i]
+            stack.append((child, child_field))
+            if i:
+                stack.append(_COMMA)
+
+
+def export_json(node, buf, showcoord=True):
+    """ Writes the AST rooted at node to buf as one JSON document.
+        buf:
+            Open text buffer into which the JSON is written.
+        showcoord:
+            Whether the coordinates of each node are exported.
+    """
+    out = _ChunkWriter(buf)
+    _write_node(out, node, showcoord=showcoord)
+    out.write('\n')
+    out.flush()
+
+
+def export_jsonl(program, buf, showcoord=True):
+    """ Writes a Program to buf as JSON lines, one record per top-level
+        declaration, in source order.
+    """
+    out = _ChunkWriter(buf)
+    for field, decl in program.children():
+        _write_node(out, decl, field, showcoord)
+        out.write('\n')
+    out.flush()
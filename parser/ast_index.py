@@ -0,0 +1,143 @@
+""" Index of the nodes of an AST, for repeated queries.
+
+    Built once with a walk of the tree, it answers the queries that would
+    otherwise walk it again (the FuncCalls to a name, the ArrayRefs of a
+    function, the parent of a node) in time proportional to their result,
+    or to its logarithm for a single node.
+
+    The index describes the tree as it was built: a pass that changes the
+    tree must build a new one.
+"""
+
+from bisect import bisect_left
+
+from . import ast_classes
+
+
+class ASTIndex:
+    """ Index of the tree rooted at root.
+
+            nodes:
+                Nodes of the tree, in preorder (the order of children()).
+            functions:
+                FuncDef of every function, by name.
+
+        A node is numbered by its position in nodes, and the nodes of its
+        subtree are those numbered from it up to its end.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.nodes = nodes = []
+        self.functions = {}
+        self._numbers = numbers = {}
+        self._parents = parents = []
+        self._fields = fields = []
+        self._types = types = {}
+        self._names = names = {}
+        self._calls = calls = {}
+
+        stack = [(root, -1, None)]
+        while stack:
+            node, parent, field = stack.pop()
+            number = len(nodes)
+            nodes.append(node)
+            numbers[node] = number
+            parents.append(parent)
+            fields.append(field)
+            cls = node.__class__
+            instances = types.get(cls)
+            if instances is None:
+                instances = types[cls] = []
+            instances.append(number)
+            if cls is ast_classes.ID:
+                names.setdefault(node.name, []).append(number)
+            elif cls is ast_classes.FuncCall:
+                calls.setdefault(node.name.name, []).append(number)
+            elif cls is ast_classes.FuncDef:
+                self.functions[node.decl.name.name] = node
+            children = node.children()
+            for i in range(len(children) - 1, -1, -1):
+                child_field, child = children[i]
+                stack.append((child, number, child_field))
+
+        # Preorder numbers the subtrees contiguously: each one ends where
+        # the last of its children's does
+        self._ends = ends = list(range(1, len(nodes) + 1))
+        for number in range(len(nodes) - 1, 0, -1):
+            parent = parents[number]
+            if ends[number] > ends[parent]:
+                ends[parent] = ends[number]
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, node):
+        return node in self._numbers
+
+    # Tree structure
+
+    def parent(self, node):
+        """ Parent of node, None for the root. """
+        parent = self._parents[self._numbers[node]]
+        return self.nodes[parent] if parent >= 0 else None
+
+    def field(self, node):
+        """ Name under which the parent of node lists it in children(), such
+            as 'cond' or 'block_items[2]', None for the root.
+        """
+        return self._fields[self._numbers[node]]
+
+    def ancestors(self, node):
+        """ List of the ancestors of node, from its parent up to the root. """
+        ancestors = []
+        parent = self._parents[self._numbers[node]]
+        while parent >= 0:
+            ancestors.append(self.nodes[parent])
+            parent = self._parents[parent]
+        return ancestors
+
+    def enclosing(self, node, cls):
+        """ Innermost ancestor of node that is an instance of cls, or None. """
+        parent = self._parents[self._numbers[node]]
+        while parent >= 0:
+            if isinstance(self.nodes[parent], cls):
+                return self.nodes[parent]
+            parent = self._parents[parent]
+        return None
+
+    def subtree(self, node):
+        """ List of the nodes of the subtree rooted at node, in preorder. """
+        number = self._numbers[node]
+        return self.nodes[number:self._ends[number]]
+
+    # Queries
+
+    def instances(self, cls, within=None):
+        """ List of the nodes of class cls (an ast_classes class), in
+            preorder, in the subtree rooted at within (the whole tree if
+            None).
+        """
+        return self._select(self._types.get(cls), within)
+
+    def references(self, name, within=None):
+        """ List of the IDs named name, in preorder, in the subtree rooted at
+            within. The names of declarations are not IDs of the tree.
+        """
+        return self._select(self._names.get(name), within)
+
+    def calls(self, name, within=None):
+        """ List of the FuncCalls to the function name, in preorder, in the
+            subtree rooted at within.
+        """
+        return self._select(self._calls.get(name), within)
+
+    def _select(self, numbers, within):
+        if not numbers:
+            return []
+        if within is None:
+            return [self.nodes[number] for number in numbers]
+        start = self._numbers[within]
+        lo = bisect_left(numbers, start)
+        hi = bisect_left(numbers, self._ends[start], lo)
+        return [self.nodes[numbers[i]] for i in range(lo, hi)]
@@ -0,0 +1,95 @@
+import sys
+
+
+class TypeNames(tuple):
+    """ Immutable list of type names held by a Type node. It is printed
+        like a list, so the AST output does not depend on interning.
+    """
+    __slots__ = ()
+
+    def __repr__(self):
+        return '[' + ', '.join(repr(name) for name in self) + ']'
+
+
+class Interner:
+    """ Shares immutable AST payloads across a compilation session.
+
+        Type names, identifier names and small constants are stored once
+        and every node carrying an equal payload points to the same object,
+        instead of keeping one copy per node.
+
+            max_string:
+                Longest string constant that is interned. Longer strings
+                rarely repeat and are kept as they are.
+    """
+
+    def __init__(self, max_string=64):
+        self.max_string = max_string
+        self._names = {}
+        self._identifiers = {}
+        self._constants = {}
+        # kind -> [requests, hits, bytes saved]
+        self._stats = {
+            'type names': [0, 0, 0],
+            'identifiers': [0, 0, 0],
+            'constants': [0, 0, 0],
+        }
+
+    def _count(self, kind, hit, nbytes):
+        stats = self._stats[kind]
+        stats[0] += 1
+        if hit:
+            stats[1] += 1
+            stats[2] += nbytes
+
+    def type_names(self, names):
+        """ Returns the shared TypeNames equal to the given names. """
+        key = tuple(names)
+        shared = self._names.get(key)
+        if shared is None:
+            shared = self._names[key] = TypeNames(self.identifier(n) for n in key)
+            self._count('type names', False, 0)
+        else:
+            self._count('type names', True, sys.getsizeof(names))
+        return shared
+
+    def identifier(self, name):
+        """ Returns the shared string equal to name. """
+        shared = self._identifiers.get(name)
+        if shared is None:
+            shared = self._identifiers[name] = sys.intern(name)
+            self._count('identifiers', False, 0)
+        else:
+            self._count('identifiers', shared is not name, sys.getsizeof(name))
+        return shared
+
+    def constant(self, value):
+        """ Returns the shared object equal to a constant value. Strings
+            longer than max_string are returned unchanged.
+        """
+        if isinstance(value, str) and len(value) > self.max_string:
+            return value
+        # 1 == 1.0, so the type is part of the key
+        key = (value.__class__, value)
+        shared = self._constants.get(key)
+        if shared is None:
+            shared = self._constants[key] = value
+            self._count('constants', False, 0)
+        else:
+            self._count('constants', shared is not value, sys.getsizeof(value))
+        return shared
+
+    def stats(self):
+        """ Returns a dict of kind -> (requests, hits, bytes saved). """
+        return {kind: tuple(values) for kind, values in self._stats.items()}
+
+    def report(self):
+        """ Returns a printable report of the memory saved by interning. """
+        lines = ['Interning report:']
+        total = 0
+        for kind, (requests, hits, saved) in self._stats.items():
+            lines.append('    {:<12} {:>9} requests {:>9} shared {:>12} bytes saved'.format(
+                kind, requests, hits, saved))
+            total += saved
+        lines.append('    {:<12} {:>44} bytes saved'.format('total', total))
+        return '\n'.join(lines) + '\n'
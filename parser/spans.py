@@ -0,0 +1,87 @@
+""" Position lookups in a source, through the spans of its nodes.
+
+    A UCParser built with spans=True records the (start, end) offsets of
+    the nodes it builds. A SpanIndex over them answers which node is the
+    innermost one at a position, with a binary search.
+
+    The spans of a tree nest: two of them are disjoint, or one holds the
+    other. Their ends split the text into segments, each one inside the
+    same spans all along, and the index keeps the innermost of them for
+    every segment.
+"""
+
+from bisect import bisect_right
+
+
+class SpanIndex:
+    """ Index of the spans of the nodes parsed from text.
+
+            spans:
+                (start, end) offsets of the nodes, by node, such as the
+                spans of a UCParser after its parse of text.
+    """
+
+    def __init__(self, text, spans):
+        self.text = text
+        self.spans = spans
+        # Offsets of the starts of the lines
+        self._lines = lines = [0]
+        find = text.find
+        newline = find('\n')
+        while newline >= 0:
+            lines.append(newline + 1)
+            newline = find('\n', newline + 1)
+
+        # Outer spans first, and among equal spans the ones recorded last,
+        # that is, built last, around the others
+        order = sorted(range(len(spans)), key=_outer_first(list(spans.values())))
+        nodes = list(spans)
+        bounds = []
+        innermost = []
+        stack = []
+        i = 0
+        points = sorted({offset for span in spans.values() for offset in span})
+        for point in points:
+            while stack and spans[stack[-1]][1] <= point:
+                stack.pop()
+            while i < len(order) and spans[nodes[order[i]]][0] == point:
+                stack.append(nodes[order[i]])
+                i += 1
+            bounds.append(point)
+            innermost.append(stack[-1] if stack else None)
+        self._bounds = bounds
+        self._innermost = innermost
+
+    def offset(self, line, column):
+        """ Offset of the 1-based line and column of a Coord. """
+        return self._lines[line - 1] + column - 1
+
+    def position(self, offset):
+        """ (line, column) of offset, as in a Coord. """
+        line = bisect_right(self._lines, offset)
+        return line, offset - self._lines[line - 1] + 1
+
+    def node_at(self, line, column):
+        """ Innermost node whose span holds the character at line and
+            column, or None.
+        """
+        return self.node_at_offset(self.offset(line, column))
+
+    def node_at_offset(self, offset):
+        """ Innermost node whose span holds the character at offset, or
+            None.
+        """
+        i = bisect_right(self._bounds, offset) - 1
+        return self._innermost[i] if i >= 0 else None
+
+    def source(self, node):
+        """ Text of the span of node. """
+        start, end = self.spans[node]
+        return self.text[start:end]
+
+
+def _outer_first(spans):
+    def key(i):
+        start, end = spans[i]
+        return start, -end, -i
+    return key
@@ -1,6 +1,8 @@
+from ply.lex import LexToken
 from ply.yacc import yacc
 
 from . import ast_classes
+from .interning import Interner
 from .lex.uc_lexer import UCLexer
 
 
@@ -12,14 +14,44 @@ class ParseError(Exception):
     pass
 
 
+# Nodes that rules extend with one more item at a time, keeping them first
+_GROWN = {ast_classes.ExprList, ast_classes.InitList, ast_classes.ParamList}
+
+
+def _symbol_span(symbol, token_ends):
+    """ (start, end) offsets of a symbol of a production, None for a
+        nonterminal reduced from nothing.
+    """
+    if symbol.__class__ is LexToken:
+        return symbol.lexpos, token_ends.get(symbol.lexpos, symbol.lexpos)
+    return getattr(symbol, 'span', None)
+
+
 class UCParser:
     tokens = UCLexer.tokens
 
-    def __init__(self):
+    def __init__(self, interner=None, spans=False):
+        """ Create a new parser.
+            interner:
+                Interner shared by every parse of the session. A new
+                one is created if none is given.
+            spans:
+                Whether to record the source span of the nodes: after
+                each parse, self.spans maps every node built by a
+                grammar rule to its (start, end) offsets in the text,
+                end excluded (see parser.spans). None if not recorded.
+        """
+        self.interner = interner if interner is not None else Interner()
         self.lexer = UCLexer(print_error)
         self.lexer.build()
         self.parser = yacc(module=self)
-        pass
+        self.spans = None
+        self._token_ends = None
+        if spans:
+            self.spans = {}
+            for production in self.parser.productions:
+                if production.callable is not None:
+                    production.callable = self._spanning(production.callable)
 
     def _token_coord(self, p, token_idx, set_column=False):
         last_cr = p.lexer.lexer.lexdata.rfind('\n', 0, p.lexpos(token_idx))
@@ -85,12 +117,13 @@ class UCParser:
             # Functions default to returning int
             if not isinstance(decl.type, ast_classes.FuncDecl):
                 self._parse_error("Missing type in declaration", decl.coord)
-            type.type = ast_classes.Type(['int'], coord=decl.coord)
+            type.type = ast_classes.Type(
+                self.interner.type_names(['int']), coord=decl.coord)
         else:
             # At this point, we know that typename is a list of Type
             # nodes. Concatenate all the names into a single list.
             type.type = ast_classes.Type(
-                [typename.names[0]],
+                self.interner.type_names(typename.names[:1]),
                 coord=typename.coord)
         return decl
 
@@ -130,6 +163,46 @@ class UCParser:
     def _parse_error(self, msg, coord):
         raise Exception("{}: {}".format(coord, msg))
 
+    def _spanning(self, rule):
+        """ Wraps the grammar rule function rule to record the span of what
+            it builds. The span of each reduced symbol is kept on it, for
+            the rules that reduce it in turn: it goes from the start of its
+            first symbol to the end of its last one, empty ones left out.
+        """
+        def spanning(p):
+            rule(p)
+            symbols = p.slice
+            start = end = None
+            for i in range(1, len(symbols)):
+                start = _symbol_span(symbols[i], self._token_ends)
+                if start is not None:
+                    break
+            if start is None:
+                return
+            for i in range(len(symbols) - 1, 0, -1):
+                end = _symbol_span(symbols[i], self._token_ends)
+                if end is not None:
+                    break
+            span = symbols[0].span = (start[0], end[1])
+            spans = self.spans
+            value = symbols[0].value
+            if isinstance(value, ast_classes.Node):
+                if value not in spans or (value.__class__ in _GROWN and
+                                          symbols[1].value is value):
+                    spans[value] = span
+            elif isinstance(value, list):
+                for node in value:
+                    if isinstance(node, ast_classes.Node) and node not in spans:
+                        spans[node] = span
+        return spanning
+
+    def _span_token(self):
+        """ Returns the next token, recording where it ends. """
+        token = self.lexer.token()
+        if token is not None:
+            self._token_ends[token.lexpos] = self.lexer.lexer.lexpos
+        return token
+
     def parse(self, text, filename='', debug=False):
         """ Parses uC code and returns an AST.
             text:
@@ -138,10 +211,41 @@ class UCParser:
                 Name of the file being parsed (for meaningful
                 error messages)
         """
-        return self.parser.parse(
-            input=text,
-            lexer=self.lexer,
-            debug=debug)
+        self.lexer.reset_lineno()
+        if self.spans is None:
+            return self.parser.parse(
+                input=text,
+                lexer=self.lexer,
+                debug=debug)
+        self.spans = {}
+        self._token_ends = {}
+        try:
+            ast = self.parser.parse(
+                input=text,
+                lexer=self.lexer,
+                debug=debug,
+                tokenfunc=self._span_token)
+        finally:
+            self._token_ends = None
+        if ast is not None:
+            self._fill_spans(ast)
+        return ast
+
+    def _fill_spans(self, ast):
+        """ Gives the nodes that no rule built, such as the Decl of a
+            FuncDef, the smallest span holding those of their children.
+        """
+        spans = self.spans
+        stack = [(ast, False)]
+        while stack:
+            node, done = stack.pop()
+            if not done:
+                stack.append((node, True))
+                stack.extend((child, False) for _, child in node.children())
+            elif node not in spans:
+                inner = [spans[child] for _, child in node.children() if child in spans]
+                if inner:
+                    spans[node] = (min(span[0] for span in inner), max(span[1] for span in inner))
 
     precedence = (
         ('left', 'OR'),
@@ -454,7 +558,7 @@ class UCParser:
         """ identifier : ID
         """
         coord = self._token_coord(p, 1)
-        p[0] = ast_classes.ID(p[1], coord)
+        p[0] = ast_classes.ID(self.interner.identifier(p[1]), coord)
 
     def p_identifier_list_opt(self, p):
         """ identifier_list_opt : identifier_list
@@ -488,25 +592,25 @@ class UCParser:
                            | FLOAT
         """
         coord = self._token_coord(p, 1)
-        p[0] = ast_classes.Type([p[1]], coord)
+        p[0] = ast_classes.Type(self.interner.type_names([p[1]]), coord)
 
     def p_constant_1(self, p):
         """ constant : INT_CONST
         """
         coord = self._token_coord(p, 1)
-        p[0] = ast_classes.Constant('int', p[1], coord)
+        p[0] = ast_classes.Constant('int', self.interner.constant(p[1]), coord)
 
     def p_constant_2(self, p):
         """ constant : FLOAT_CONST
         """
         coord = self._token_coord(p, 1)
-        p[0] = ast_classes.Constant('float', p[1], coord)
+        p[0] = ast_classes.Constant('float', self.interner.constant(p[1]), coord)
 
     def p_constant_3(self, p):
         """ constant : STRING_CONST
         """
         coord = self._token_coord(p, 1)
-        p[0] = ast_classes.Constant('string', p[1], coord)
+        p[0] = ast_classes.Constant('string', self.interner.constant(p[1]), coord)
 
     def p_jump_statement_1(self, p):
         """ jump_statement  : BREAK SEMI
@@ -614,7 +718,7 @@ class UCParser:
         """ function_definition : declarator declaration_list_opt compound_statement
         """
         spec = dict(
-            type=[ast_classes.Type(['void'],
+            type=[ast_classes.Type(self.interner.type_names(['void']),
             coord=self._token_coord(p, 1))],
             function=[])
 
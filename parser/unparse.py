@@ -0,0 +1,435 @@
+""" Generation of uC source code from an AST.
+
+    The printer writes the tree back as source that parses to an equal
+    tree (coordinates aside), with parentheses only where the precedence of
+    the operators needs them. It walks the tree with an explicit stack of
+    items, each one either text or a node to expand with a handler and an
+    argument (the precedence of its context, or the depth of a statement),
+    and writes the text in chunks as it goes.
+"""
+
+import io
+from decimal import Decimal
+
+from . import ast_classes
+from .ast_export import _ChunkWriter
+from .uc_parser import UCParser
+
+
+# Text of the operator tokens of the parser's precedence table
+_TOKEN_OPS = {
+    'OR': '||', 'AND': '&&', 'EQUAL': '==', 'DIFFERENT': '!=',
+    'BIGGER': '>', 'BIGGER_EQUAL': '>=', 'SMALLER': '<', 'SMALLER_EQUAL': '<=',
+    'PLUS': '+', 'MINUS': '-', 'TIMES': '*', 'DIVIDE': '/', 'MOD': '%',
+}
+
+# Precedence levels of the expressions: an expression is parenthesized when
+# its context requires a higher level than its own
+COMMA = 0
+ASSIGNMENT = 1
+BINARY = ASSIGNMENT + 1
+CAST = BINARY + len(UCParser.precedence)
+UNARY = CAST + 1
+POSTFIX = UNARY + 1
+PRIMARY = POSTFIX + 1
+
+
+def _binary_levels():
+    """ Level of the binary operators, by op, from the loosest level of the
+        parser's table up. All of them are left associative: the right
+        operand of an operator needs a level above it.
+    """
+    levels = {}
+    for level, (_, *tokens) in enumerate(UCParser.precedence, BINARY):
+        for token in tokens:
+            levels[_TOKEN_OPS[token]] = level
+    return levels
+
+
+BINARY_LEVELS = _binary_levels()
+
+# Prefix operators whose operand is a cast expression, and not a unary one
+_UNARY_OPERATORS = {'&', '*', '+', '-', '!'}
+
+INDENT = '    '
+
+
+def _float_text(value):
+    """ Text of a float constant the lexer reads back as value: it has no
+        exponents.
+    """
+    text = repr(value)
+    if 'e' in text:
+        text = format(Decimal(text), 'f')
+        if '.' not in text:
+            text += '.'
+    return text
+
+
+def _constant_text(node):
+    if node.type == 'float' and isinstance(node.value, float):
+        return _float_text(node.value)
+    return str(node.value)
+
+
+def _level(node):
+    """ Precedence level of the expression node. """
+    cls = node.__class__
+    if cls is ast_classes.BinaryOp:
+        return BINARY_LEVELS.get(node.op, BINARY)
+    if cls is ast_classes.ID:
+        return PRIMARY
+    if cls is ast_classes.Constant:
+        return UNARY if _constant_text(node)[0] == '-' else PRIMARY
+    if cls is ast_classes.UnaryOp:
+        return POSTFIX if node.op[0] == 'p' else UNARY
+    if cls is ast_classes.Assignment:
+        return ASSIGNMENT
+    if cls is ast_classes.Cast:
+        return CAST
+    if cls is ast_classes.ExprList:
+        return COMMA
+    return POSTFIX
+
+
+def _first_char(node):
+    """ First character of the text of an operand of a prefix operator,
+        when it could join it in a token.
+    """
+    if node.__class__ is ast_classes.UnaryOp and node.op[0] != 'p':
+        return node.op[0]
+    if node.__class__ is ast_classes.Constant:
+        return _constant_text(node)[0]
+    return None
+
+
+def _dangles(stmt):
+    """ Whether the statement stmt ends in an If without else, that would
+        take an else following stmt.
+    """
+    while True:
+        if isinstance(stmt, ast_classes.If):
+            if stmt.iffalse is None:
+                return True
+            stmt = stmt.iffalse
+        elif isinstance(stmt, (ast_classes.While, ast_classes.For)):
+            stmt = stmt.statement
+        else:
+            return False
+
+
+class SourceGenerator:
+    """ Writes the uC source of trees to a buffer. """
+
+    def __init__(self, buf, indent=INDENT):
+        self.writer = _ChunkWriter(buf)
+        self.indent = indent
+        self._pads = ['']
+        self._statements = {
+            ast_classes.Compound: self._compound,
+            ast_classes.If: self._if,
+            ast_classes.While: self._while,
+            ast_classes.For: self._for,
+            ast_classes.Return: self._return,
+            ast_classes.Break: self._break,
+            ast_classes.Assert: self._assert,
+            ast_classes.Print: self._print,
+            ast_classes.Read: self._read,
+            ast_classes.EmptyStatement: self._empty,
+            ast_classes.Decl: self._local_decl,
+            ast_classes.DeclList: self._decl_list,
+            ast_classes.GlobalDecl: self._decl_list,
+            ast_classes.FuncDef: self._func_def,
+            ast_classes.Program: self._program,
+        }
+        self._expressions = {
+            ast_classes.ID: self._id,
+            ast_classes.Constant: self._constant,
+            ast_classes.BinaryOp: self._binary_op,
+            ast_classes.UnaryOp: self._unary_op,
+            ast_classes.Assignment: self._assignment,
+            ast_classes.Cast: self._cast,
+            ast_classes.ArrayRef: self._array_ref,
+            ast_classes.FuncCall: self._func_call,
+            ast_classes.ExprList: self._expr_list,
+            ast_classes.InitList: self._init_list,
+        }
+
+    def write(self, node):
+        """ Writes the source of the tree rooted at node: a Program, a
+            statement or an expression.
+        """
+        if node.__class__ in self._statements:
+            stack = [(self._statement, node, 0)]
+        else:
+            stack = [(self._expression, node, COMMA)]
+        write = self.writer.write
+        while stack:
+            item = stack.pop()
+            if item.__class__ is str:
+                write(item)
+            else:
+                handler, node, arg = item
+                items = handler(node, arg)
+                stack.extend(reversed(items))
+        self.writer.flush()
+
+    def _pad(self, depth):
+        pads = self._pads
+        while len(pads) <= depth:
+            pads.append(pads[-1] + self.indent)
+        return pads[depth]
+
+    # Statements: the items of a statement at depth, after its indentation,
+    # up to its final newline
+
+    def _statement(self, node, depth):
+        return [self._pad(depth), (self._bare, node, depth)]
+
+    def _bare(self, node, depth):
+        handler = self._statements.get(node.__class__)
+        if handler is None:
+            return [(self._expression, node, COMMA), ';\n']
+        return handler(node, depth)
+
+    def _program(self, node, depth):
+        items = []
+        previous = None
+        for gdecl in node.gdecls or ():
+            # Functions are set apart by blank lines
+            if previous is not None and ast_classes.FuncDef in (
+                    previous.__class__, gdecl.__class__):
+                items.append('\n')
+            items.append((self._statement, gdecl, depth))
+            previous = gdecl
+        return items
+
+    def _block(self, node, depth):
+        """ Items of the Compound node, from { to }, without newline. """
+        items = ['{\n']
+        if node.block_items:
+            items.extend((self._statement, item, depth + 1) for item in node.block_items)
+        else:
+            # Blocks hold at least a statement
+            items.append(self._pad(depth + 1) + ';\n')
+        items.append(self._pad(depth) + '}')
+        return items
+
+    def _compound(self, node, depth):
+        return self._block(node, depth) + ['\n']
+
+    def _body(self, items, body, depth, brace):
+        """ Adds to items those of the statement body of an If, While or For
+            at depth, braced if brace. Returns whether it ends in a }, its
+            line still open.
+        """
+        if isinstance(body, ast_classes.Compound):
+            items.extend((' ', (self._block, body, depth)))
+            return True
+        if brace:
+            items.extend((' {\n', (self._statement, body, depth + 1), self._pad(depth) + '}'))
+            return True
+        items.extend(('\n', (self._statement, body, depth + 1)))
+        return False
+
+    def _if(self, node, depth):
+        items = ['if (', (self._expression, node.cond, COMMA), ')']
+        iffalse = node.iffalse
+        braced = self._body(items, node.iftrue, depth,
+                            iffalse is not None and _dangles(node.iftrue))
+        if iffalse is None:
+            if braced:
+                items.append('\n')
+            return items
+        items.append(' else' if braced else self._pad(depth) + 'else')
+        if isinstance(iffalse, ast_classes.If):
+            items.extend((' ', (self._bare, iffalse, depth)))
+        elif self._body(items, iffalse, depth, False):
+            items.append('\n')
+        return items
+
+    def _while(self, node, depth):
+        items = ['while (', (self._expression, node.cond, COMMA), ')']
+        if self._body(items, node.statement, depth, False):
+            items.append('\n')
+        return items
+
+    def _for(self, node, depth):
+        items = ['for (']
+        if isinstance(node.initial, ast_classes.DeclList):
+            items.extend(self._declaration(node.initial.decls))
+        elif node.initial is not None:
+            items.append((self._expression, node.initial, COMMA))
+        items.append(';')
+        for expr, end in ((node.cond, ';'), (node.next, ')')):
+            if expr is not None:
+                items.extend((' ', (self._expression, expr, COMMA)))
+            items.append(end)
+        if self._body(items, node.statement, depth, False):
+            items.append('\n')
+        return items
+
+    def _return(self, node, depth):
+        if node.expr is None:
+            return ['return;\n']
+        return ['return ', (self._expression, node.expr, COMMA), ';\n']
+
+    def _break(self, node, depth):
+        return ['break;\n']
+
+    def _assert(self, node, depth):
+        return ['assert ', (self._expression, node.expr, COMMA), ';\n']
+
+    def _print(self, node, depth):
+        if node.expr is None:
+            return ['print();\n']
+        return ['print(', (self._expression, node.expr, COMMA), ');\n']
+
+    def _read(self, node, depth):
+        return ['read(', (self._expression, node.expr, COMMA), ');\n']
+
+    def _empty(self, node, depth):
+        return [';\n']
+
+    def _local_decl(self, node, depth):
+        return self._declaration([node]) + [';\n']
+
+    def _decl_list(self, node, depth):
+        return self._declaration(node.decls) + [';\n']
+
+    def _func_def(self, node, depth):
+        items = self._declaration([node.decl])
+        items.extend((' ', (self._block, node.body, depth), '\n'))
+        return items
+
+    # Declarations
+
+    def _declaration(self, decls):
+        """ Items of a declaration of decls, sharing the type of the first
+            one, without semicolon.
+        """
+        base = decls[0].type
+        while not isinstance(base, ast_classes.Type):
+            base = base.type
+        items = [' '.join(base.names), ' ']
+        for i, decl in enumerate(decls):
+            if i:
+                items.append(', ')
+            items.extend(self._declarator(decl.type))
+            if decl.init is not None:
+                items.extend((' = ', (self._expression, decl.init, ASSIGNMENT)))
+        return items
+
+    def _declarator(self, node):
+        """ Items of the declarator of the chain of modifiers starting at
+            node, up to its VarDecl.
+        """
+        modifiers = []
+        while not isinstance(node, ast_classes.VarDecl):
+            modifiers.append(node)
+            node = node.type
+        items = [node.declname.name]
+        previous = None
+        for modifier in modifiers:
+            if isinstance(modifier, ast_classes.PtrDecl):
+                items.insert(0, '*')
+            else:
+                if isinstance(previous, ast_classes.PtrDecl):
+                    items.insert(0, '(')
+                    items.append(')')
+                if isinstance(modifier, ast_classes.ArrayDecl):
+                    items.append('[')
+                    if modifier.dim is not None:
+                        items.append((self._expression, modifier.dim, BINARY))
+                    items.append(']')
+                else:
+                    items.append('(')
+                    items.extend(self._parameters(modifier.args))
+                    items.append(')')
+            previous = modifier
+        return items
+
+    def _parameters(self, params):
+        items = []
+        for i, param in enumerate(params.params if params is not None else ()):
+            if i:
+                items.append(', ')
+            if isinstance(param, ast_classes.ID):
+                items.append(param.name)
+            else:
+                items.extend(self._declaration([param]))
+        return items
+
+    # Expressions: the items of an expression in a context requiring the
+    # given precedence level
+
+    def _expression(self, node, level):
+        if _level(node) < level:
+            return ['(', (self._expression, node, COMMA), ')']
+        return self._expressions[node.__class__](node, level)
+
+    def _id(self, node, level):
+        return [node.name]
+
+    def _constant(self, node, level):
+        return [_constant_text(node)]
+
+    def _binary_op(self, node, level):
+        op_level = BINARY_LEVELS.get(node.op, BINARY)
+        return [(self._expression, node.left, op_level), ' %s ' % node.op,
+                (self._expression, node.right, op_level + 1)]
+
+    def _unary_op(self, node, level):
+        op = node.op
+        if op[0] == 'p':
+            return [(self._expression, node.expr, POSTFIX), op[1:]]
+        operand = (self._expression, node.expr, CAST if op in _UNARY_OPERATORS else UNARY)
+        # - -x, not --x
+        if _first_char(node.expr) == op[-1] and _level(node.expr) >= UNARY:
+            return [op, ' ', operand]
+        return [op, operand]
+
+    def _assignment(self, node, level):
+        return [(self._expression, node.lvalue, UNARY), ' %s ' % node.op,
+                (self._expression, node.rvalue, ASSIGNMENT)]
+
+    def _cast(self, node, level):
+        return ['(%s) ' % ' '.join(node.new_type.names), (self._expression, node.expr, CAST)]
+
+    def _array_ref(self, node, level):
+        return [(self._expression, node.name, POSTFIX), '[',
+                (self._expression, node.subscript, COMMA), ']']
+
+    def _func_call(self, node, level):
+        items = [(self._expression, node.name, POSTFIX), '(']
+        if isinstance(node.args, ast_classes.ExprList):
+            items.extend(self._expr_list(node.args, level))
+        elif node.args is not None:
+            items.append((self._expression, node.args, ASSIGNMENT))
+        items.append(')')
+        return items
+
+    def _expr_list(self, node, level):
+        items = []
+        for i, expr in enumerate(node.exprs):
+            if i:
+                items.append(', ')
+            items.append((self._expression, expr, ASSIGNMENT))
+        return items
+
+    def _init_list(self, node, level):
+        return ['{'] + self._expr_list(node, level) + ['}']
+
+
+def write_source(node, buf, indent=INDENT):
+    """ Writes the uC source of the tree rooted at node to the buffer buf,
+        indenting blocks with indent.
+    """
+    SourceGenerator(buf, indent).write(node)
+
+
+def to_source(node, indent=INDENT):
+    """ uC source of the tree rooted at node. """
+    buf = io.StringIO()
+    write_source(node, buf, indent)
+    return buf.getvalue()
@@ -0,0 +1,176 @@
+from parser import ast_classes
+
+from .symtab import SymbolTable
+
+# Marker pushed on the walk stack to close a scope
+_EXIT = object()
+
+
+def symbol_kind(decl):
+    """ Kind of the symbol declared by a Decl node. """
+    type = decl.type
+    if isinstance(type, ast_classes.FuncDecl):
+        return 'func'
+    if isinstance(type, ast_classes.ArrayDecl):
+        return 'array'
+    if isinstance(type, ast_classes.PtrDecl):
+        return 'pointer'
+    return 'var'
+
+
+def _signature(type):
+    """ Shape of a declarator, with its names and array dimensions left
+        out, to compare the declarations of a function.
+    """
+    shape = []
+    while not isinstance(type, ast_classes.Type):
+        if isinstance(type, ast_classes.FuncDecl):
+            params = []
+            if isinstance(type.args, ast_classes.ParamList):
+                params = [_signature(p.type) for p in type.args.params
+                          if isinstance(p, ast_classes.Decl)]
+            shape.append(('FuncDecl', tuple(params)))
+        else:
+            shape.append(type.__class__.__name__)
+        type = type.type
+    shape.append(tuple(type.names))
+    return tuple(shape)
+
+
+class NameResolver:
+    """ Resolves every identifier of a program to its declaration.
+
+        The program is walked once, in source order, with an explicit stack
+        (so long expression chains do not hit the recursion limit). Every
+        declaration gets a Symbol with a dense integer id, and every ID node
+        gets its symbol attribute set, so later passes just follow
+        id.symbol.decl instead of looking names up again.
+
+        A global function may be declared by prototypes before its
+        definition: they all share its symbol, whose decl is the one of
+        the definition once it is seen.
+
+            error_func:
+                Called with a line number and a message for every error.
+    """
+
+    def __init__(self, error_func):
+        self.error_func = error_func
+        self.symtab = SymbolTable()
+        self._methods = {}
+        # Ids of the symbols of the functions defined so far
+        self._defined = set()
+
+    def resolve(self, program):
+        """ Resolves the names of program and returns the symbol table. """
+        self._stack = stack = [program]
+        while stack:
+            item = stack.pop()
+            if item is _EXIT:
+                self.symtab.exit_scope()
+                continue
+            method = self._methods.get(item.__class__)
+            if method is None:
+                method = getattr(self, 'visit_' + item.__class__.__name__, self.generic_visit)
+                self._methods[item.__class__] = method
+            method(item)
+
+        for symbol in self.symtab.symbols:
+            if symbol.kind == 'func' and symbol.id not in self._defined:
+                self._error(symbol.decl.name, "Function '%s' is declared but never defined"
+                            % symbol.name)
+        return self.symtab
+
+    def _push_all(self, nodes):
+        """ Schedules nodes to be visited in the given order. """
+        for node in reversed(nodes):
+            if node is not None:
+                self._stack.append(node)
+
+    def _error(self, node, message):
+        self.error_func(node.coord.line if node.coord else 0, message)
+
+    def _declare(self, decl, definition=False):
+        name = decl.name
+        symbol = self.symtab.declare(name.name, decl, symbol_kind(decl))
+        if symbol is None:
+            symbol = self.symtab.lookup(name.name)
+            message = self._redeclare(symbol, decl, definition)
+            if message is not None:
+                self._error(name, message % name.name)
+        elif definition:
+            self._defined.add(symbol.id)
+        name.symbol = symbol
+
+    def _redeclare(self, symbol, decl, definition):
+        """ Declares the global function of symbol again with decl, if it
+            is compatible and does not define the function twice. Returns
+            None if it did, else the message of the error.
+        """
+        if symbol.scope != 0 or symbol.kind != 'func' or symbol_kind(decl) != 'func':
+            return "Name '%s' is already declared in this scope"
+        if _signature(symbol.decl.type) != _signature(decl.type):
+            if definition:
+                self._defined.add(symbol.id)
+            return "Conflicting declarations of function '%s'"
+        if definition:
+            if symbol.id in self._defined:
+                return "Function '%s' is already defined"
+            self._defined.add(symbol.id)
+            symbol.decl = decl
+        return None
+
+    def generic_visit(self, node):
+        self._push_all([child for _, child in node.children()])
+
+    def visit_ID(self, node):
+        symbol = self.symtab.lookup(node.name)
+        if symbol is None:
+            self._error(node, "Undeclared name '%s'" % node.name)
+        node.symbol = symbol
+
+    def visit_Decl(self, node):
+        # Array dimensions are evaluated before the name is declared, and
+        # the initializer after it, as in C.
+        dims = []
+        type = node.type
+        while not isinstance(type, (ast_classes.VarDecl, ast_classes.FuncDecl)):
+            if isinstance(type, ast_classes.ArrayDecl):
+                dims.append(type.dim)
+            type = type.type
+        self._push_all(dims + [_Declare(node), node.init])
+
+    def visit__Declare(self, item):
+        self._declare(item.decl)
+
+    def visit_Type(self, node):
+        pass
+
+    def visit_FuncDef(self, node):
+        self._declare(node.decl, definition=True)
+        # Parameters and the outermost block of the body share a scope
+        self.symtab.enter_scope()
+        self._stack.append(_EXIT)
+        params = []
+        if isinstance(node.decl.type.args, ast_classes.ParamList):
+            params = [p for p in node.decl.type.args.params if isinstance(p, ast_classes.Decl)]
+        body = node.body.block_items if node.body is not None else None
+        self._push_all(params + (body or []))
+
+    def visit_Compound(self, node):
+        self.symtab.enter_scope()
+        self._stack.append(_EXIT)
+        self._push_all(node.block_items or [])
+
+    def visit_For(self, node):
+        self.symtab.enter_scope()
+        self._stack.append(_EXIT)
+        self._push_all([node.initial, node.cond, node.next, node.statement])
+
+
+class _Declare:
+    """ Walk stack item that declares the name of a Decl. """
+    __slots__ = ('decl', )
+
+    def __init__(self, decl):
+        self.decl = decl
@@ -0,0 +1,82 @@
+class Symbol:
+    """ A declared name.
+        id:
+            Dense integer id, the index of the symbol in its table.
+        name:
+            The declared name.
+        decl:
+            The Decl node that declares it.
+        kind:
+            'func', 'array', 'pointer' or 'var'.
+        scope:
+            Nesting depth of the scope it belongs to (0 is global).
+        shadowed:
+            Symbol of the same name hidden by this one, if any.
+        type:
+            Its UCType, set by the type checker.
+    """
+    __slots__ = ('id', 'name', 'decl', 'kind', 'scope', 'shadowed', 'type')
+
+    def __init__(self, id, name, decl, kind, scope, shadowed=None):
+        self.id = id
+        self.name = name
+        self.decl = decl
+        self.kind = kind
+        self.scope = scope
+        self.shadowed = shadowed
+        self.type = None
+
+    def __repr__(self):
+        return 'Symbol(%d, %r, %s, scope=%d)' % (self.id, self.name, self.kind, self.scope)
+
+
+class SymbolTable:
+    """ Scoped symbol table.
+
+        A single dict maps every name to its innermost visible symbol, and
+        each symbol is chained to the one it shadows. Looking up, declaring
+        and leaving a scope are all O(1) per name, no matter how deep the
+        scopes are nested.
+    """
+
+    def __init__(self):
+        # All symbols ever declared, indexed by their ids
+        self.symbols = []
+        self._visible = {}
+        # Symbols declared in each open scope
+        self._scopes = [[]]
+
+    @property
+    def depth(self):
+        """ Nesting depth of the current scope (0 is global). """
+        return len(self._scopes) - 1
+
+    def enter_scope(self):
+        self._scopes.append([])
+
+    def exit_scope(self):
+        """ Closes the current scope, making visible again the symbols
+            shadowed by its declarations.
+        """
+        for symbol in reversed(self._scopes.pop()):
+            if symbol.shadowed is None:
+                del self._visible[symbol.name]
+            else:
+                self._visible[symbol.name] = symbol.shadowed
+
+    def lookup(self, name):
+        """ Returns the innermost visible symbol of name, or None. """
+        return self._visible.get(name)
+
+    def declare(self, name, decl, kind):
+        """ Declares name in the current scope and returns its symbol, or
+            returns None if it is already declared in this scope.
+        """
+        visible = self._visible.get(name)
+        if visible is not None and visible.scope == self.depth:
+            return None
+        symbol = Symbol(len(self.symbols), name, decl, kind, self.depth, visible)
+        self.symbols.append(symbol)
+        self._visible[name] = symbol
+        self._scopes[-1].append(symbol)
+        return symbol
@@ -0,0 +1,260 @@
+from parser import ast_classes
+
+from .uc_types import (BASIC_TYPES, ArrayType, CharType, FloatType, FuncType,
+                       IntType, PtrType, VoidType, is_scalar)
+
+
+def _assignable(target, value):
+    """ Whether a value of type value can be stored in a target of type
+        target. Arrays decay into pointers to their elements.
+    """
+    if target == value:
+        return True
+    return isinstance(target, PtrType) and isinstance(value, ArrayType) \
+        and target.element == value.element
+
+
+def _is_lvalue(node):
+    if isinstance(node, ast_classes.ID):
+        return node.symbol is not None and node.symbol.kind in ('var', 'pointer')
+    if isinstance(node, ast_classes.ArrayRef):
+        return True
+    return isinstance(node, ast_classes.UnaryOp) and node.op == '*'
+
+
+class TypeChecker:
+    """ Computes the type of every expression of a resolved program.
+
+        The tree is walked once in postorder with an explicit stack. When a
+        node is left, the types of its operands are already stored in their
+        uc_type slots, so the type of each expression is computed exactly
+        once, in constant time, and cached in its own uc_type slot. The
+        types of declared names are cached in their symbols.
+
+        Names must have been resolved by the NameResolver.
+
+            error_func:
+                Called with a line number and a message for every error.
+    """
+
+    def __init__(self, error_func):
+        self.error_func = error_func
+        self._function = None
+        self._methods = {}
+
+    def check(self, program):
+        """ Type checks program, annotating its nodes. """
+        stack = [(program, False)]
+        methods = self._methods
+        while stack:
+            node, leaving = stack.pop()
+            cls = node.__class__
+            if leaving:
+                methods[cls](node)
+                continue
+            if cls not in methods:
+                methods[cls] = getattr(self, 'leave_' + cls.__name__, None)
+            if cls is ast_classes.FuncDef:
+                self._function = node.decl.name.symbol
+            if methods[cls] is not None:
+                stack.append((node, True))
+            children = node.children()
+            for i in range(len(children) - 1, -1, -1):
+                stack.append((children[i][1], False))
+
+    def _error(self, node, message):
+        self.error_func(node.coord.line if node.coord else 0, message)
+
+    def decl_type(self, node):
+        """ UCType described by the type modifiers of a declaration. """
+        if isinstance(node, ast_classes.VarDecl):
+            return BASIC_TYPES[node.type.names[0]]
+        if isinstance(node, ast_classes.ArrayDecl):
+            size = None
+            if isinstance(node.dim, ast_classes.Constant) and node.dim.type == 'int':
+                size = node.dim.value
+            return ArrayType(self.decl_type(node.type), size)
+        if isinstance(node, ast_classes.PtrDecl):
+            return PtrType(self.decl_type(node.type))
+        params = ()
+        if isinstance(node.args, ast_classes.ParamList):
+            params = tuple(self.decl_type(p.type) for p in node.args.params
+                           if isinstance(p, ast_classes.Decl))
+        return FuncType(self.decl_type(node.type), params)
+
+    def symbol_type(self, symbol):
+        if symbol.type is None:
+            symbol.type = self.decl_type(symbol.decl.type)
+        return symbol.type
+
+    # Expressions
+
+    def leave_Constant(self, node):
+        if node.type == 'string':
+            node.uc_type = ArrayType(CharType, len(node.value) - 2)
+        else:
+            node.uc_type = BASIC_TYPES[node.type]
+
+    def leave_ID(self, node):
+        if node.symbol is not None:
+            node.uc_type = self.symbol_type(node.symbol)
+
+    def leave_BinaryOp(self, node):
+        left, right = node.left.uc_type, node.right.uc_type
+        if left is None or right is None:
+            return
+        if left != right:
+            self._error(node, "Binary operator '%s' does not have matching types: %s and %s"
+                        % (node.op, left, right))
+        elif node.op in left.binary_ops:
+            node.uc_type = left
+        elif node.op in left.rel_ops:
+            node.uc_type = IntType
+        else:
+            self._error(node, "Binary operator '%s' is not supported by type %s" % (node.op, left))
+
+    def leave_UnaryOp(self, node):
+        type = node.expr.uc_type
+        if type is None:
+            return
+        op = node.op
+        if op not in type.unary_ops:
+            self._error(node, "Unary operator '%s' is not supported by type %s" % (op, type))
+        elif op in ('++', '--', 'p++', 'p--') and not _is_lvalue(node.expr):
+            self._error(node, "Operand of '%s' is not assignable" % op.lstrip('p'))
+        elif op == '&':
+            node.uc_type = PtrType(type)
+        elif op == '*':
+            node.uc_type = type.element
+        elif op == '!':
+            node.uc_type = IntType
+        else:
+            node.uc_type = type
+
+    def leave_Assignment(self, node):
+        target, value = node.lvalue.uc_type, node.rvalue.uc_type
+        if target is None or value is None:
+            return
+        if not _is_lvalue(node.lvalue):
+            self._error(node, "Left side of '%s' is not assignable" % node.op)
+        elif not _assignable(target, value):
+            self._error(node, "Cannot assign %s to %s" % (value, target))
+        elif node.op not in target.assign_ops:
+            self._error(node, "Assignment operator '%s' is not supported by type %s"
+                        % (node.op, target))
+        else:
+            node.uc_type = target
+
+    def leave_ArrayRef(self, node):
+        type, subscript = node.name.uc_type, node.subscript.uc_type
+        if type is None or subscript is None:
+            return
+        if not isinstance(type, (ArrayType, PtrType)):
+            self._error(node, "Subscripted value of type %s is not an array" % type)
+        elif subscript is not IntType:
+            self._error(node, "Array subscript must be int, not %s" % subscript)
+        else:
+            node.uc_type = type.element
+
+    def leave_FuncCall(self, node):
+        type = node.name.uc_type
+        if type is None:
+            return
+        if not isinstance(type, FuncType):
+            self._error(node, "Called object of type %s is not a function" % type)
+            return
+        if node.args is None:
+            args = []
+        elif isinstance(node.args, ast_classes.ExprList):
+            args = node.args.exprs
+        else:
+            args = [node.args]
+        if len(args) != len(type.params):
+            self._error(node, "Function expects %d argument(s), %d given"
+                        % (len(type.params), len(args)))
+            return
+        for i, (arg, param) in enumerate(zip(args, type.params)):
+            if arg.uc_type is not None and not _assignable(param, arg.uc_type):
+                self._error(arg, "Argument %d must be %s, not %s" % (i + 1, param, arg.uc_type))
+        node.uc_type = type.result
+
+    def leave_Cast(self, node):
+        type = node.expr.uc_type
+        if type is None:
+            return
+        if type not in (IntType, FloatType, CharType):
+            self._error(node, "Cannot cast %s" % type)
+        else:
+            node.uc_type = BASIC_TYPES[node.new_type.names[0]]
+
+    def leave_ExprList(self, node):
+        node.uc_type = node.exprs[-1].uc_type
+
+    # Statements and declarations
+
+    def leave_Return(self, node):
+        if self._function is None:
+            return
+        expected = self.symbol_type(self._function).result
+        type = VoidType if node.expr is None else node.expr.uc_type
+        if type is not None and not _assignable(expected, type):
+            self._error(node, "Return of %s in function returning %s" % (type, expected))
+
+    def leave_Decl(self, node):
+        symbol = node.name.symbol
+        if node.init is None or symbol is None or symbol.decl is not node:
+            return
+        type = self.symbol_type(symbol)
+        init = node.init
+        if isinstance(init, ast_classes.InitList):
+            if not isinstance(type, ArrayType):
+                self._error(node.name, "Initializer list given to %s" % type)
+                return
+            self._check_init_list(init, type)
+            size = len(init.exprs)
+        elif isinstance(type, ArrayType) and isinstance(init, ast_classes.Constant) \
+                and init.type == 'string':
+            if type.element is not CharType:
+                self._error(node.name, "String given to %s" % type)
+                return
+            size = len(init.value) - 2
+        else:
+            if init.uc_type is not None and not _assignable(type, init.uc_type):
+                self._error(node.name, "Cannot initialize %s with %s" % (type, init.uc_type))
+            return
+        if type.size is None:
+            symbol.type = ArrayType(type.element, size)
+        elif size > type.size:
+            self._error(node.name, "Too many initializers for %s" % type)
+
+    def _check_init_list(self, init, type):
+        for expr in init.exprs:
+            if isinstance(expr, ast_classes.InitList):
+                if isinstance(type.element, ArrayType):
+                    self._check_init_list(expr, type.element)
+                else:
+                    self._error(expr, "Initializer list given to %s" % type.element)
+            elif expr.uc_type is not None and not _assignable(type.element, expr.uc_type):
+                self._error(expr, "Cannot initialize %s with %s" % (type.element, expr.uc_type))
+
+    def _check_cond(self, node, cond):
+        if cond is not None and cond.uc_type is not None and not is_scalar(cond.uc_type):
+            self._error(node, "Condition must be a scalar, not %s" % cond.uc_type)
+
+    def leave_If(self, node):
+        self._check_cond(node, node.cond)
+
+    def leave_While(self, node):
+        self._check_cond(node, node.cond)
+
+    def leave_For(self, node):
+        self._check_cond(node, node.cond)
+
+    def leave_Assert(self, node):
+        self._check_cond(node, node.expr)
+
+    def leave_Read(self, node):
+        args = node.expr.exprs if isinstance(node.expr, ast_classes.ExprList) else [node.expr]
+        for arg in args:
+            if not _is_lvalue(arg):
+                self._error(arg, "Argument of read is not assignable")
@@ -0,0 +1,88 @@
+""" Semantics of the uC operators on values.
+
+    uC ints are 32-bit two's complement integers: arithmetic wraps around,
+    division truncates towards zero and the remainder takes the sign of the
+    dividend, as in C. Floats are Python floats. Comparisons and logical
+    operators give the ints 1 and 0.
+"""
+
+INT_MIN = -(1 << 31)
+INT_MAX = (1 << 31) - 1
+
+
+def wrap_int(value):
+    """ Wraps an integer around to 32 bits. """
+    if INT_MIN <= value <= INT_MAX:
+        return value
+    return ((value - INT_MIN) & 0xFFFFFFFF) + INT_MIN
+
+
+def int_div(left, right):
+    """ C integer division, truncating towards zero. """
+    quotient = abs(left) // abs(right)
+    if (left < 0) != (right < 0):
+        quotient = -quotient
+    return wrap_int(quotient)
+
+
+def int_mod(left, right):
+    """ C integer remainder, with the sign of the dividend. """
+    remainder = abs(left) % abs(right)
+    return -remainder if left < 0 else remainder
+
+
+_comparisons = {
+    '==': lambda a, b: int(a == b),
+    '!=': lambda a, b: int(a != b),
+    '<': lambda a, b: int(a < b),
+    '>': lambda a, b: int(a > b),
+    '<=': lambda a, b: int(a <= b),
+    '>=': lambda a, b: int(a >= b),
+    '&&': lambda a, b: int(bool(a) and bool(b)),
+    '||': lambda a, b: int(bool(a) or bool(b)),
+}
+
+# op -> function of the operand values, per operand type
+BINARY_OPS = {
+    'int': dict(_comparisons, **{
+        '+': lambda a, b: wrap_int(a + b),
+        '-': lambda a, b: wrap_int(a - b),
+        '*': lambda a, b: wrap_int(a * b),
+        '/': int_div,
+        '%': int_mod,
+    }),
+    'float': dict(_comparisons, **{
+        '+': lambda a, b: a + b,
+        '-': lambda a, b: a - b,
+        '*': lambda a, b: a * b,
+        '/': lambda a, b: a / b,
+    }),
+}
+
+UNARY_OPS = {
+    'int': {
+        '-': lambda a: wrap_int(-a),
+        '+': lambda a: a,
+        '!': lambda a: int(not a),
+    },
+    'float': {
+        '-': lambda a: -a,
+        '+': lambda a: a,
+        '!': lambda a: int(not a),
+    },
+}
+
+# Types of the results of the operators that do not keep their operand type
+INT_RESULT_OPS = frozenset(_comparisons) | {'!'}
+
+
+def cast(value, type_name):
+    """ Converts a value to the basic type type_name ('int', 'float' or
+        'char'), as a uC cast does.
+    """
+    if type_name == 'float':
+        return float(value)
+    value = wrap_int(int(value))
+    if type_name == 'char':
+        value = ((value + 128) & 0xFF) - 128
+    return value
@@ -0,0 +1,102 @@
+class UCType:
+    """ Base class of the uC types.
+        name:
+            Name of the type, as shown in error messages.
+        unary_ops, binary_ops, rel_ops, assign_ops:
+            Operators supported by values of the type.
+    """
+    __slots__ = ('name', 'unary_ops', 'binary_ops', 'rel_ops', 'assign_ops')
+
+    def __init__(self, name, unary_ops=(), binary_ops=(), rel_ops=(), assign_ops=()):
+        self.name = name
+        self.unary_ops = frozenset(unary_ops)
+        self.binary_ops = frozenset(binary_ops)
+        self.rel_ops = frozenset(rel_ops)
+        self.assign_ops = frozenset(assign_ops)
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return 'UCType(%s)' % self.name
+
+
+_rel_ops = ('==', '!=', '<', '>', '<=', '>=', '&&', '||')
+
+IntType = UCType('int',
+                 unary_ops=('-', '+', '!', '++', '--', 'p++', 'p--', '&'),
+                 binary_ops=('+', '-', '*', '/', '%'),
+                 rel_ops=_rel_ops,
+                 assign_ops=('=', '+=', '-=', '*=', '/=', '%='))
+
+FloatType = UCType('float',
+                   unary_ops=('-', '+', '!', '++', '--', 'p++', 'p--', '&'),
+                   binary_ops=('+', '-', '*', '/'),
+                   rel_ops=_rel_ops,
+                   assign_ops=('=', '+=', '-=', '*=', '/='))
+
+CharType = UCType('char',
+                  unary_ops=('!', '&'),
+                  rel_ops=_rel_ops,
+                  assign_ops=('=', ))
+
+VoidType = UCType('void')
+
+BASIC_TYPES = {t.name: t for t in (IntType, FloatType, CharType, VoidType)}
+
+
+class ArrayType(UCType):
+    """ Array of element, with size elements (None if unknown). Arrays
+        are equal when their elements are, whatever their sizes.
+    """
+    __slots__ = ('element', 'size')
+
+    def __init__(self, element, size=None):
+        super().__init__('%s[%s]' % (element, '' if size is None else size),
+                         unary_ops=('&', ), rel_ops=('==', '!='))
+        self.element = element
+        self.size = size
+
+    def __eq__(self, other):
+        return isinstance(other, ArrayType) and self.element == other.element
+
+    def __hash__(self):
+        return hash(('array', self.element))
+
+
+class PtrType(UCType):
+    """ Pointer to element. """
+    __slots__ = ('element', )
+
+    def __init__(self, element):
+        super().__init__('%s*' % element, unary_ops=('*', '&'),
+                         rel_ops=('==', '!='), assign_ops=('=', ))
+        self.element = element
+
+    def __eq__(self, other):
+        return isinstance(other, PtrType) and self.element == other.element
+
+    def __hash__(self):
+        return hash(('ptr', self.element))
+
+
+class FuncType(UCType):
+    """ Function returning result, taking params (a tuple of types). """
+    __slots__ = ('result', 'params')
+
+    def __init__(self, result, params):
+        super().__init__('%s(%s)' % (result, ', '.join(str(p) for p in params)))
+        self.result = result
+        self.params = params
+
+    def __eq__(self, other):
+        return isinstance(other, FuncType) and self.result == other.result \
+            and self.params == other.params
+
+    def __hash__(self):
+        return hash(('func', self.result, self.params))
+
+
+def is_scalar(type):
+    """ Whether values of type can be tested as conditions. """
+    return type in (IntType, FloatType, CharType) or isinstance(type, PtrType)
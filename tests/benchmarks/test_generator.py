@@ -0,0 +1,32 @@
+from benchmarks.generator import generate_program
+from benchmarks.run import compare, count_nodes, table
+
+
+def test_generated_programs_parse(parse):
+    for seed in range(5):
+        code = generate_program(functions=3, statements=15, expr_depth=4,
+                                comment_size=40, seed=seed)
+        ast = parse(code)
+        # the functions and main, after the three global declarations
+        assert len(ast.gdecls) == 3 + 3 + 1
+
+
+def test_generator_parameters(parse):
+    code = generate_program(functions=1, array_size=50, line_length=200, seed=1)
+    assert code == generate_program(functions=1, array_size=50, line_length=200, seed=1)
+    assert max(len(line) for line in code.splitlines()[3:]) <= 200 + 4
+    init = parse(code).gdecls[0].decls[0].init
+    assert len(init.exprs) == 50
+
+
+def test_compare():
+    baselines = {'s': {'parse_nodes_per_s': 100.0, 'parse_peak_mb': 10.0}}
+    results = {'s': {'parse_nodes_per_s': 50.0, 'parse_peak_mb': 9.0}}
+    lines, regressions = compare(baselines, results, 0.2)
+    assert regressions == 1
+    assert len(lines) == 3
+    assert len(table(results)) == 3
+
+
+def test_count_nodes(parse):
+    assert count_nodes(parse('int x = 1 + 2;')) == 8
@@ -1,11 +1,20 @@
+import io
 import os
 import pytest
 
 from glob import glob
 
+from parser.uc_parser import UCParser
+from semantic.resolver import NameResolver
+from semantic.type_checker import TypeChecker
+
 io_path = os.path.join('tests', 'io')
 
 
+def semantic_error(lineno, message):
+    raise AssertionError('%s: %s' % (lineno, message))
+
+
 def read_files(ext):
     files = []
 
@@ -22,3 +31,56 @@ def read_files(ext):
 def tests(request):
     return request.param
 
+
+@pytest.fixture(scope='session')
+def uc_parser():
+    return UCParser()
+
+
+@pytest.fixture
+def parse(uc_parser):
+
+    def parse(code):
+        return uc_parser.parse(code)
+
+    return parse
+
+
+@pytest.fixture
+def errors():
+    return []
+
+
+@pytest.fixture
+def error_func(errors):
+
+    def error_func(lineno, message):
+        errors.append((lineno, message))
+
+    return error_func
+
+
+@pytest.fixture
+def checked(parse):
+
+    def checked(code):
+        ast = parse(code)
+        NameResolver(semantic_error).resolve(ast)
+        TypeChecker(semantic_error).check(ast)
+        return ast
+
+    return checked
+
+
+@pytest.fixture
+def run_with():
+    """ Runs a compiled program on an input string, returning its exit
+        status and its output.
+    """
+
+    def run_with(program, stdin=''):
+        out = io.StringIO()
+        status = program.run(io.StringIO(stdin), out)
+        return status, out.getvalue()
+
+    return run_with
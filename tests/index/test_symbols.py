@@ -0,0 +1,104 @@
+import os
+
+from index.symbols import (CALL, DECLARATION, FUNCTION, GLOBAL, REFERENCE, Location, SymbolIndex,
+                           main)
+
+LIB = r'''
+int count = 0;
+int sq(int x) { return x * x; }
+int sum(int v[], int n) {
+    int i, s = 0;
+    for (i = 0; i < n; i++) s = s + sq(v[i]);
+    count = count + 1;
+    return s;
+}
+'''
+
+MAIN = r'''
+int v[3] = {1, 2, 3};
+int main() {
+    print(sum(v, 3), sq(4));
+    return count;
+}
+'''
+
+
+def write(path, text):
+    path.write_text(text)
+    # Changes within the resolution of the clock still get a new mtime
+    stat = os.stat(str(path))
+    os.utime(str(path), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def test_index_and_query(tmp_path):
+    write(tmp_path / 'lib.uc', LIB)
+    (tmp_path / 'app').mkdir()
+    write(tmp_path / 'app' / 'main.uc', MAIN)
+    lib = str(tmp_path / 'lib.uc')
+    app = str(tmp_path / 'app' / 'main.uc')
+    with SymbolIndex() as index:
+        assert index.update_tree(str(tmp_path)) == (2, 0, 0)
+        assert index.definitions('sq') == [Location(lib, 3, 5, FUNCTION, None)]
+        assert index.calls('sq') == [Location(app, 4, 22, CALL, 'main'),
+                                     Location(lib, 6, 37, CALL, 'sum')]
+        assert index.find('count') == [
+            Location(app, 5, 12, REFERENCE, 'main'),
+            Location(lib, 2, 5, GLOBAL, None),
+            Location(lib, 7, 5, REFERENCE, 'sum'),
+            Location(lib, 7, 13, REFERENCE, 'sum'),
+        ]
+        # Locals and parameters are not indexed, their uses are
+        assert index.definitions('s') == [] and len(index.references('s')) == 3
+        assert index.files() == [(app, None), (lib, None)]
+
+
+def test_prototypes(tmp_path):
+    write(tmp_path / 'f.uc', 'int n;\nint sq(int x);\nint main() { return sq(n); }\n'
+                             'int sq(int x) { return x; }')
+    path = str(tmp_path / 'f.uc')
+    with SymbolIndex() as index:
+        index.update([path])
+        # A prototype declares a function, and defines no global
+        assert index.definitions('sq') == [Location(path, 4, 5, FUNCTION, None)]
+        assert index.declarations('sq') == [Location(path, 2, 5, DECLARATION, None)]
+        assert index.definitions('n') == [Location(path, 1, 5, GLOBAL, None)]
+
+
+def test_incremental_updates(tmp_path):
+    database = str(tmp_path / 'symbols.db')
+    src = tmp_path / 'src'
+    src.mkdir()
+    write(src / 'lib.uc', LIB)
+    write(src / 'main.uc', MAIN)
+    with SymbolIndex(database) as index:
+        assert index.update_tree(str(src)) == (2, 0, 0)
+        assert index.update_tree(str(src)) == (0, 2, 0)
+        # A new modification time alone does not reparse the file
+        write(src / 'lib.uc', LIB)
+        assert index.update_tree(str(src)) == (0, 2, 0)
+        write(src / 'lib.uc', LIB.replace('sq(v[i])', 'v[i]'))
+        assert index.update_tree(str(src)) == (1, 1, 0)
+        assert len(index.calls('sq')) == 1
+
+    # The index persists, and is updated from worker processes too
+    os.remove(str(src / 'main.uc'))
+    write(src / 'bad.uc', 'int main() { return 0 }')
+    write(src / 'other.uc', MAIN.replace('sq(4)', 'sq(5)'))
+    with SymbolIndex(database) as index:
+        assert index.update_tree(str(src), jobs=2) == (2, 1, 1)
+        assert [location.path for location in index.calls('sq')] == [str(src / 'other.uc')]
+        files = index.files()
+        assert [os.path.basename(path) for path, _ in files] == ['bad.uc', 'lib.uc', 'other.uc']
+        assert files[0][1] is not None and files[1][1] is None
+
+
+def test_command_line(tmp_path, capsys):
+    write(tmp_path / 'lib.uc', LIB)
+    database = str(tmp_path / 'symbols.db')
+    assert main(['-d', database, '-j', '1', 'update', str(tmp_path)]) == 0
+    assert capsys.readouterr().out == '1 file(s) indexed, 0 unchanged, 0 removed.\n'
+    assert main(['-d', database, 'find', 'sq']) == 0
+    assert capsys.readouterr().out.splitlines() == [
+        '%s:3:5: function sq' % (tmp_path / 'lib.uc'),
+        '%s:6:37: call sq in sum' % (tmp_path / 'lib.uc'),
+    ]
@@ -0,0 +1,44 @@
+from interpreter.batch import find_cases, run_batch
+
+
+def test_run_batch(tmp_path):
+    for name, stdin, stdout in (('1', '3\n', '6'), ('2', '0', '0'), ('3', '7', None)):
+        (tmp_path / (name + '.in')).write_text(stdin)
+        if stdout is not None:
+            (tmp_path / (name + '.out')).write_text(stdout)
+    assert [case[0] for case in find_cases(str(tmp_path))] == ['1', '2', '3']
+    programs = [
+        ('double', 'int main() { int n; read(n); print(n * 2); return 0; }'),
+        ('loop', 'int main() { int n; read(n); while (n) n = n; print(0); return 0; }'),
+        ('inverse', 'int main() { int n; read(n); print(6 / n); return 0; }'),
+        ('wrong', 'int main() { return x; }'),
+    ]
+    lines = []
+    passed, total = run_batch(programs, str(tmp_path), lines.append, jobs=2, steps=1000)
+    assert (passed, total) == (5, 12)
+    assert lines[0].startswith('ERROR wrong does not compile 1: ')
+    assert [line.split()[:3] for line in lines[1:]] == [
+        ['PASS', 'double', '1.in'], ['PASS', 'double', '2.in'], ['PASS', 'double', '3.in'],
+        ['STEPS', 'loop', '1.in'], ['PASS', 'loop', '2.in'], ['STEPS', 'loop', '3.in'],
+        ['FAIL', 'inverse', '1.in'], ['ERROR', 'inverse', '2.in'], ['PASS', 'inverse', '3.in'],
+    ]
+
+
+def test_unexpected_errors(tmp_path):
+    (tmp_path / '1.in').write_bytes(b'\xff\xfe\n')
+    (tmp_path / '2.in').write_text('4')
+    lines = []
+    program = ('read', 'int main() { int n; read(n); print(n); return 0; }')
+    assert run_batch([program], str(tmp_path), lines.append, jobs=1) == (1, 2)
+    assert lines[0].startswith('ERROR read 1.in')
+    assert 'UnicodeDecodeError' in lines[0]
+    assert lines[1].startswith('PASS  read 2.in')
+
+
+def test_time_limit(tmp_path):
+    (tmp_path / '1.in').write_text('1')
+    lines = []
+    program = ('loop', 'int main() { int n; read(n); while (n) n = n; return 0; }')
+    assert run_batch([program], str(tmp_path), lines.append, jobs=1, time_limit=0.2,
+                     steps=None) == (0, 1)
+    assert lines[0].startswith('TIME  loop 1.in 0.2')
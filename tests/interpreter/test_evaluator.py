@@ -0,0 +1,111 @@
+import pytest
+
+from benchmarks.generator import generate_program
+from interpreter.evaluator import Evaluator
+from interpreter.runtime import UCRuntimeError
+
+
+@pytest.fixture
+def run(checked, run_with):
+
+    def run(code, stdin=''):
+        return run_with(Evaluator(checked(code)), stdin)
+
+    return run
+
+
+def test_runs_test_program(run):
+    with open('test.uc') as f:
+        code = f.read()
+    assert run(code, '1230\n') == (0, 'Enter a number: Reversed Number: 321')
+
+
+def test_functions_arrays_and_pointers(run):
+    status, out = run(r'''
+        int fact(int n) { if (n <= 1) return 1; return n * fact(n - 1); }
+        int m[2][3] = {{1, 2, 3}, {4, 5, 6}};
+        char s[] = "hi\n";
+        void swap(int *a, int *b) { int t = *a; *a = *b; *b = t; }
+        int sum(int v[], int n) {
+            int i, total = 0;
+            for (i = 0; i < n; i++) total += v[i];
+            return total;
+        }
+        int main() {
+            int x = 3, y = 4;
+            float h = 7.0 / 2.0;
+            swap(&x, &y);
+            m[0][1] = sum(m[1], 3);
+            print(fact(10), " ", x, y, " ", m[0][1], " ", h, s);
+            print();
+            return x;
+        }''')
+    assert (status, out) == (4, '3628800 43 15 3.5hi\n\n')
+
+
+def test_loops_and_int_semantics(run):
+    status, out = run(r'''
+        int main() {
+            int i = 0, n = 2147483647, q, r;
+            while (1) {
+                i++;
+                if (i == 5) break;
+            }
+            for (int j = 0; j < 3; j++) i += j;
+            q = -7 / 2;
+            r = -7 % 2;
+            n = n + 1;
+            print(i, " ", q, " ", r, " ", n, " ", (int) 2.9, " ", !3);
+            return 0;
+        }''')
+    assert out == '8 -3 -1 -2147483648 2 0'
+
+
+def test_read_and_assert(run):
+    code = r'''
+        int main() {
+            int a, b;
+            float c;
+            read(a, b);
+            read(c);
+            print(a + b, " ", c * 2.0);
+            assert a < b;
+            print("!");
+            return 0;
+        }'''
+    assert run(code, '1 2\n1.5') == (0, '3 3.0!')
+    assert run(code, '5\n2 0.5\n') == (1, '7 1.0assertion_fail on 8:13\n')
+
+
+def test_runtime_errors(run):
+    with pytest.raises(UCRuntimeError, match='Division by zero'):
+        run('int main() { int z = 0; return 1 / z; }')
+    with pytest.raises(UCRuntimeError, match='end of input'):
+        run('int main() { int x; read(x); return x; }')
+
+
+def test_negative_index(run):
+    # A negative subscript must not wrap around to the last elements
+    for code in ('int main() { int v[3] = {1, 2, 3}, i = -1; return v[i]; }',
+                 'int main() { int v[3]; v[-1] = 1; return 0; }',
+                 'int main() { int m[2][2], i = -1; return m[i][1]; }',
+                 'int f(int v[], int i) { return v[i + 1]; }\n'
+                 'int main() { int v[2]; return f(v, -2); }'):
+        with pytest.raises(UCRuntimeError, match='out of range'):
+            run(code)
+
+
+def test_runs_many_times(checked, run_with):
+    program = Evaluator(checked('int g = 1; int main() { g = g * 2; print(g); return 0; }'))
+    assert run_with(program) == run_with(program) == (0, '2')
+
+
+def test_deep_expressions(run):
+    status, out = run('int main() { int x = 1; print(' + ' + '.join(['x'] * 5000) + '); return 0; }')
+    assert out == '5000'
+
+
+def test_generated_program(run):
+    status, out = run(generate_program(functions=5, loop_iterations=20))
+    assert status == 0
+    assert out.rstrip().split('total: ')[1].split(' count: ')[1].isdigit()
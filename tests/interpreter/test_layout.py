@@ -0,0 +1,86 @@
+from array import array
+
+import pytest
+
+from interpreter.bytecode import BytecodeCompiler
+from interpreter.evaluator import Evaluator
+from interpreter.layout import flatten, initializer
+from interpreter.runtime import Pointer, chars_to_str
+from interpreter.transpiler import PythonProgram, compile_program
+from interpreter.vm import VM
+
+ENGINES = {
+    'eval': Evaluator,
+    'vm': lambda ast: VM(BytecodeCompiler().compile(ast)),
+    'py': lambda ast: PythonProgram(compile_program(ast)),
+}
+
+
+def test_arrays_are_flat_typed_buffers(checked, run_with):
+    vm = VM(BytecodeCompiler().compile(checked('''
+        int m[2][3] = {{1, 2}, {4, 5, 6}};
+        float f[4];
+        char s[] = "abc";
+        int *p[2];
+        int main() { return 0; }''')))
+    assert run_with(vm) == (0, '')
+    m, f, s, p = vm.globals
+    assert m == array('i', [1, 2, 0, 4, 5, 6])
+    assert f == array('d', [0.0] * 4)
+    assert s == array('b', b'abc')
+    assert p == [None, None]
+
+
+def test_initializer(checked):
+    ast = checked('int x; int m[3][2] = {{1, x}, {3}};')
+    decl = ast.gdecls[1].decls[0]
+    template, exprs = initializer(decl.init, decl.name.symbol.type)
+    assert template == array('i', [1, 0, 3, 0, 0, 0])
+    assert [(offset, expr.name) for offset, expr in exprs] == [(1, 'x')]
+
+
+def test_flatten(checked):
+    ast = checked('int m[2][3][4]; int main() { return m[1][2][3]; }')
+    ref = ast.gdecls[1].body.block_items[0].expr
+    base, terms = flatten(ref)
+    assert base.name == 'm'
+    assert [(subscript.value, stride) for subscript, stride in terms] == [(1, 12), (2, 4), (3, 1)]
+
+
+def test_chars_to_str():
+    chars = array('b', b'hi\0there\0')
+    assert chars_to_str(chars) == 'hi'
+    assert chars_to_str(Pointer(chars, 3)) == 'there'
+    assert chars_to_str([104, -23, 0]) == 'h\xe9'
+
+
+@pytest.mark.parametrize('engine', sorted(ENGINES))
+def test_rows_and_strides(engine, checked, run_with):
+    program = ENGINES[engine](checked(r'''
+        int m[3][4] = {{1, 2}, {5, 6, 7, 8}};
+        char names[2][4];
+        int cube[2][2][3];
+        int total(int v[], int n) { int i, s = 0; for (i = 0; i < n; i++) s += v[i]; return s; }
+        int trace(int a[][4], int n) {
+            int i, s = 0;
+            for (i = 0; i < n; i++) s = s + a[i][i];
+            a[1][1] = 60;
+            return s;
+        }
+        void fill(char s[], char c) { s[0] = c; s[1] = c; }
+        int main() {
+            int i = 1, j = 2;
+            int loc[2][3] = {{i, 2, j}, {4}};
+            int *p = &m[1][2];
+            m[i][j] += 10;
+            m[i][j]++;
+            *p = *p + 1;
+            cube[1][1][2] = 7;
+            read(m[2][0], names[1][0]);
+            fill(names[0], names[1][0]);
+            print(m[1][2], " ", m[2][0], " ", total(m[1], 4), " ", total(loc[0], 3), loc[1][2], " ");
+            print(trace(m, 3), " ", m[1][1], " ", names[0], names[1], " ", cube[1][1][2], " ");
+            print(m[1] == m[1], m[0] == m[1], " ", loc[1][0]);
+            return 0;
+        }'''))
+    assert run_with(program, '42 Z') == (0, '19 42 38 50 7 60 ZZZ 7 10 4')
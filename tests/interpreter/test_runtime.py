@@ -0,0 +1,51 @@
+import io
+
+import pytest
+
+from interpreter.evaluator import Evaluator
+from interpreter.runtime import Input, Output, UCRuntimeError
+
+
+class Terminal(io.StringIO):
+
+    def isatty(self):
+        return True
+
+
+def test_input_tokens_across_blocks():
+    stream = io.StringIO('12 345\n6  78\n\n9')
+    source = Input(stream, block_size=3)
+    assert [source.token() for _ in range(5)] == ['12', '345', '6', '78', '9']
+    with pytest.raises(UCRuntimeError, match='end of input'):
+        source.token()
+
+
+def test_interactive_input_flushes_output():
+    out = io.StringIO()
+    output = Output(out)
+    output.write('Enter a number: ')
+    assert out.getvalue() == ''
+    source = Input(Terminal('5\n'), output)
+    assert source.token() == '5'
+    assert out.getvalue() == 'Enter a number: '
+
+
+def test_output_is_buffered():
+    out = io.StringIO()
+    output = Output(out, limit=3)
+    output.write('a')
+    output.write('b')
+    assert out.getvalue() == ''
+    output.write('c')
+    assert out.getvalue() == 'abc'
+    output.write('d')
+    output.flush()
+    assert out.getvalue() == 'abcd'
+
+
+def test_output_is_flushed_on_errors(checked):
+    evaluator = Evaluator(checked('int main() { int z = 0; print("before"); return 1 / z; }'))
+    out = io.StringIO()
+    with pytest.raises(UCRuntimeError, match='Division by zero'):
+        evaluator.run(io.StringIO(), out)
+    assert out.getvalue() == 'before'
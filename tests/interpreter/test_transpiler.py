@@ -0,0 +1,204 @@
+import os
+
+import pytest
+
+from benchmarks.generator import generate_program
+from interpreter import transpiler
+from interpreter.evaluator import Evaluator
+from interpreter.runtime import UCRuntimeError
+from interpreter.transpiler import PythonProgram, Transpiler, compile_program, compile_source
+import uc_compiler
+
+
+@pytest.fixture
+def run(checked, run_with):
+
+    def run(code, stdin=''):
+        return run_with(PythonProgram(compile_program(checked(code))), stdin)
+
+    return run
+
+
+def test_runs_test_program(run):
+    with open('test.uc') as f:
+        code = f.read()
+    assert run(code, '1230\n') == (0, 'Enter a number: Reversed Number: 321')
+
+
+def test_native_loops_and_locals(checked):
+    source = Transpiler().transpile(checked(
+        'int main() { int i, s = 0; for (i = 0; i < 10; i++) s = s + i * 2 - 1; return s; }'))
+    assert 'def f_main():' in source
+    assert 'while (l_i_1 < 10):' in source
+    # A single wrap around for the whole chain
+    assert source.count('4294967295') == 2
+
+
+def test_functions_arrays_and_pointers(run):
+    status, out = run(r'''
+        int fact(int n) { if (n <= 1) return 1; return n * fact(n - 1); }
+        int m[2][3] = {{1, 2, 3}, {4, 5, 6}};
+        char s[] = "hi\n";
+        int g;
+        void swap(int *a, int *b) { int t = *a; *a = *b; *b = t; }
+        int sum(int v[], int n) {
+            int i, total = 0;
+            for (i = 0; i < n; i++) total += v[i];
+            return total;
+        }
+        int main() {
+            int x = 3, y = 4;
+            int v[3] = {x, 2, y};
+            int *p = &g;
+            float h = 7.0 / 2.0;
+            swap(&x, &y);
+            m[0][1] = sum(m[1], 3);
+            *p = 6;
+            v[1] += 5; v[1]++;
+            print(fact(10), " ", x, y, " ", m[0][1], " ", h, s, v[1]--, v[1], v[0], g);
+            print();
+            return x;
+        }''')
+    assert (status, out) == (4, '3628800 43 15 3.5hi\n8736\n')
+
+
+def test_int_semantics(run):
+    status, out = run(r'''
+        int main() {
+            int n = 2147483647, m = -2147483647 - 1, q = -7, k = 0;
+            print(n + 1, " ", m - 1, " ", n * n, " ", -m, " ", q / 2, " ", q % 2, " ");
+            print(m / -1, " ", 7 / 2, " ", (n + 1) / 2, " ", (int) 2.9, " ", !3, " ");
+            while (k < 10) k = k + 3;
+            print(k);
+            return 0;
+        }''')
+    assert out == '-2147483648 2147483647 1 -2147483648 -3 -1 -2147483648 3 -1073741824 2 0 12'
+
+
+def test_effects_in_expressions_keep_their_order(run):
+    status, out = run(r'''
+        int g;
+        int inc() { g++; return g; }
+        int main() {
+            int x, y = 0, i = 0, k;
+            int a[3];
+            k = (x = 4) + (x = 5) + x;
+            print(k, " ", inc() + g + inc(), " ");
+            print(0 && (y = 9), y, " ", 1 && (y = 11), y, " ");
+            a[i++] = i;
+            a[i] = i++;
+            print(a[0], a[1], i, " ");
+            y = 7;
+            while ((y = y - 1) > 2) k++;
+            print(k, " ", (k = 3, k + 1));
+            return 0;
+        }''')
+    assert out == '14 4 00 111 112 18 4'
+
+
+def test_read_and_assert(run):
+    code = r'''
+        int main() {
+            int a, b;
+            float c;
+            read(a, b);
+            read(c);
+            print(a + b, " ", c * 2.0);
+            assert a < b;
+            print("!");
+            return 0;
+        }'''
+    assert run(code, '1 2\n1.5') == (0, '3 3.0!')
+    assert run(code, '5\n2 0.5\n') == (1, '7 1.0assertion_fail on 8:13\n')
+
+
+def test_runtime_errors(run):
+    with pytest.raises(UCRuntimeError, match='Division by zero'):
+        run('int main() { int z = 0; return 1 / z; }')
+    with pytest.raises(UCRuntimeError, match='end of input'):
+        run('int main() { int x; read(x); return x; }')
+    with pytest.raises(UCRuntimeError, match='out of range'):
+        run('int main() { int v[2]; return v[5]; }')
+
+
+def test_negative_index(run):
+    # A negative subscript must not wrap around to the last elements
+    for code in ('int main() { int v[3] = {1, 2, 3}, i = -1; return v[i]; }',
+                 'int main() { int v[3]; v[-1] = 1; return 0; }',
+                 'int main() { int m[2][2], i = -1; return m[i][1]; }',
+                 'int f(int v[], int i) { return v[i + 1]; }\n'
+                 'int main() { int v[2]; return f(v, -2); }'):
+        with pytest.raises(UCRuntimeError, match='out of range'):
+            run(code)
+
+
+def test_deep_expressions(run):
+    status, out = run('int main() { int x = 1; print(' + ' + '.join(['x'] * 5000) + '); return 0; }')
+    assert out == '5000'
+
+
+def test_matches_evaluator(checked, run_with):
+    for params in (dict(functions=5, loop_iterations=20), dict(functions=4, expr_depth=8, seed=3),
+                   dict(functions=3, array_size=50, seed=5)):
+        source = generate_program(**params)
+        expected = run_with(Evaluator(checked(source)))
+        assert run_with(PythonProgram(compile_program(checked(source)))) == expected
+
+
+def test_code_is_cached_on_disk(tmp_path, monkeypatch, run_with):
+    transpiler.clear_cache()
+    source = 'int g = 1; int main() { g = g * 2; print(g); return 0; }'
+    program = compile_source(source, None, cache_dir=str(tmp_path))
+    files = os.listdir(str(tmp_path))
+    assert len(files) == 1 and files[0].endswith('.ucc')
+    assert run_with(program) == run_with(program) == (0, '2')
+    # In memory, then from the disk, without parsing again
+    assert compile_source(source, None, cache_dir=str(tmp_path)).code is program.code
+    transpiler.clear_cache()
+    program = compile_source(source, None, parser=object(), cache_dir=str(tmp_path))
+    assert run_with(program) == (0, '2')
+    # A damaged cache file is replaced
+    transpiler.clear_cache()
+    with open(os.path.join(str(tmp_path), files[0]), 'wb') as f:
+        f.write(b'\0garbage')
+    assert run_with(compile_source(source, None, cache_dir=str(tmp_path))) == (0, '2')
+    # Code translated by another version of the compiler is not used
+    transpiler.clear_cache()
+    monkeypatch.setattr(transpiler, 'SOURCES', 'changed')
+    assert run_with(compile_source(source, None, cache_dir=str(tmp_path))) == (0, '2')
+    assert len(os.listdir(str(tmp_path))) == 2
+
+
+def test_compile_source_errors():
+    errors = []
+    program = compile_source('int main() { return x; }',
+                             lambda lineno, message: errors.append(lineno), cache_dir=None)
+    assert program is None
+    assert errors == [1]
+
+
+def test_compiler_translates_the_optimized_tree(tmp_path, monkeypatch, capsys):
+    translated = []
+
+    def compile_tree(program, source, passes):
+        translated.append((program, passes))
+        return transpiler.compile_tree(program, source, passes, cache_dir=str(tmp_path))
+
+    monkeypatch.setattr(uc_compiler, 'compile_tree', compile_tree)
+    transpiler.clear_cache()
+    source = 'int sq(int x) { return x * x; }\nint main() { print(sq(3) + 2 * 4); return 0; }'
+    compiler = uc_compiler.Compiler()
+    compiler.compile(source, False, None, False, fold=True, run=True, engine='py',
+                     passes=['inline'])
+    assert capsys.readouterr().out == '17'
+    # The call was inlined in the tree that ran
+    assert translated == [(compiler.ast, ['fold', 'inline=%d' % compiler.inline_budget])]
+    main = compiler.ast.gdecls[1]
+    assert 'FuncCall' not in repr(main)
+
+    # The cache tells the translations of the source apart by their passes
+    compiler = uc_compiler.Compiler()
+    compiler.compile(source, False, None, False, run=True, engine='py')
+    assert capsys.readouterr().out == '17'
+    assert translated[-1] == (compiler.ast, [])
+    assert len(os.listdir(str(tmp_path))) == 2
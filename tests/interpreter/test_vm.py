@@ -0,0 +1,165 @@
+import io
+
+import pytest
+
+from benchmarks.generator import generate_program
+from interpreter import bytecode
+from interpreter.bytecode import BytecodeCompiler, clear_cache, compile_source, disassemble
+from interpreter.evaluator import Evaluator
+from interpreter.runtime import StepLimitExceeded, UCRuntimeError
+from interpreter.vm import VM
+
+
+@pytest.fixture
+def run(checked, run_with):
+
+    def run(code, stdin=''):
+        return run_with(VM(BytecodeCompiler().compile(checked(code))), stdin)
+
+    return run
+
+
+def test_runs_test_program(run):
+    with open('test.uc') as f:
+        code = f.read()
+    assert run(code, '1230\n') == (0, 'Enter a number: Reversed Number: 321')
+
+
+def test_functions_arrays_and_pointers(run):
+    status, out = run(r'''
+        int fact(int n) { if (n <= 1) return 1; return n * fact(n - 1); }
+        int m[2][3] = {{1, 2, 3}, {4, 5, 6}};
+        char s[] = "hi\n";
+        void swap(int *a, int *b) { int t = *a; *a = *b; *b = t; }
+        int sum(int v[], int n) {
+            int i, total = 0;
+            for (i = 0; i < n; i++) total += v[i];
+            return total;
+        }
+        int main() {
+            int x = 3, y = 4;
+            int v[3] = {x, 2, y};
+            float h = 7.0 / 2.0;
+            swap(&x, &y);
+            m[0][1] = sum(m[1], 3);
+            v[1] += 5; v[1]++;
+            print(fact(10), " ", x, y, " ", m[0][1], " ", h, s, v[1]--, v[1], v[0]);
+            print();
+            return x;
+        }''')
+    assert (status, out) == (4, '3628800 43 15 3.5hi\n873\n')
+
+
+def test_loops_logic_and_int_semantics(run):
+    status, out = run(r'''
+        int main() {
+            int i = 0, n = 2147483647, k = 0, m = 10;
+            while (1) {
+                i++;
+                if (i == 5 || i > 100 && n) break;
+            }
+            for (int j = 0; j < 3; j++) i += j;
+            while (m > -1) {
+                if (!(m % 2)) k++;
+                m -= 3;
+            }
+            n = n + 1;
+            print(i, " ", -7 / 2, " ", -7 % 2, " ", n, " ", (int) 2.9, " ", !3, " ", k);
+            return 0;
+        }''')
+    assert out == '8 -3 -1 -2147483648 2 0 2'
+
+
+def test_read_and_assert(run):
+    code = r'''
+        int main() {
+            int a, b;
+            float c;
+            read(a, b);
+            read(c);
+            print(a + b, " ", c * 2.0);
+            assert a < b;
+            print("!");
+            return 0;
+        }'''
+    assert run(code, '1 2\n1.5') == (0, '3 3.0!')
+    assert run(code, '5\n2 0.5\n') == (1, '7 1.0assertion_fail on 8:13\n')
+
+
+def test_runtime_errors(run):
+    with pytest.raises(UCRuntimeError, match='Division by zero'):
+        run('int main() { int z = 0; return 1 / z; }')
+    with pytest.raises(UCRuntimeError, match='end of input'):
+        run('int main() { int x; read(x); return x; }')
+
+
+def test_negative_index(run):
+    # A negative subscript must not wrap around to the last elements
+    for code in ('int main() { int v[3] = {1, 2, 3}, i = -1; return v[i]; }',
+                 'int main() { int v[3]; v[-1] = 1; return 0; }',
+                 'int main() { int m[2][2], i = -1; return m[i][1]; }',
+                 'int f(int v[], int i) { return v[i + 1]; }\n'
+                 'int main() { int v[2]; return f(v, -2); }'):
+        with pytest.raises(UCRuntimeError, match='out of range'):
+            run(code)
+
+
+def test_deep_expressions(run):
+    status, out = run('int main() { int x = 1; print(' + ' + '.join(['x'] * 5000) + '); return 0; }')
+    assert out == '5000'
+
+
+def test_matches_evaluator(checked, run_with):
+    ast = checked(generate_program(functions=5, loop_iterations=20))
+    expected = run_with(Evaluator(ast))
+    assert expected[0] == 0
+    assert run_with(VM(BytecodeCompiler().compile(ast))) == expected
+
+
+def test_compile_source_cache():
+    clear_cache()
+    errors = []
+    source = 'int g = 1; int main() { g = g * 2; print(g); return 0; }'
+    module = compile_source(source, lambda lineno, message: errors.append(lineno))
+    assert compile_source(source, None) is module
+    vm = VM(module)
+    for _ in range(2):
+        out = io.StringIO()
+        assert vm.run(io.StringIO(), out) == 0
+        assert out.getvalue() == '2'
+    assert compile_source('int main() { return x; }',
+                          lambda lineno, message: errors.append(lineno)) is None
+    assert errors == [1]
+
+
+def test_disassemble():
+    module = compile_source('int main() { int i; for (i = 0; i < 3; i++) print(i); return i; }',
+                            None)
+    listing = disassemble(module.functions[module.main], module.constants)
+    assert listing.startswith('main: ')
+    assert 'JNLT' in listing and 'PRINT' in listing and 'RET' in listing
+    # The constants of the opcodes follow the names of the listings
+    assert [getattr(bytecode, name) for name in bytecode.OPCODES] == \
+        list(range(len(bytecode.OPCODES)))
+
+
+def test_store_location_is_computed_first(run):
+    status, out = run('''
+        int main() {
+            int i = 0;
+            int a[3];
+            a[i++] = i;
+            a[i] = i++;
+            print(a[0], a[1], a[2], i);
+            return 0;
+        }''')
+    assert out == '1102'
+
+
+def test_step_limit(checked, run_with):
+    module = BytecodeCompiler().compile(checked('''
+        int f(int n) { return n; }
+        int main() { int i, s = 0; for (i = 0; i < 10; i++) s += f(i); print(s); return 0; }'''))
+    assert run_with(VM(module, 20)) == (0, '45')
+    with pytest.raises(StepLimitExceeded):
+        run_with(VM(module, 19))
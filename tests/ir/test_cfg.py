@@ -0,0 +1,71 @@
+from ir.cfg import ENTRY, EXIT, NONE, CFGBuilder, build_cfgs
+
+
+def kinds(cfg, b):
+    return [stmt.__class__.__name__ for stmt in cfg.block(b)]
+
+
+def test_test_program(parse):
+    with open('test.uc') as f:
+        cfg, = build_cfgs(parse(f.read()))
+    assert kinds(cfg, ENTRY) == ['Decl', 'Decl', 'Decl', 'Print', 'Read']
+    header, = cfg.successors(ENTRY)
+    assert cfg.conds[header].op == '!='
+    body, after = cfg.successors(header)
+    assert kinds(cfg, body) == ['Assignment'] * 3
+    assert cfg.successors(body) == (header,)
+    assert kinds(cfg, after) == ['Print', 'Return']
+    assert sorted(cfg.predecessors(header)) == [ENTRY, body]
+    assert list(cfg.reverse_postorder()) == [ENTRY, header, after, EXIT, body]
+    idom = cfg.dominators()
+    assert (idom[header], idom[body], idom[after], idom[EXIT]) == (ENTRY, header, header, after)
+    assert cfg.dominates(header, EXIT) and not cfg.dominates(body, EXIT)
+
+
+def test_branches_and_breaks(parse):
+    cfg, = build_cfgs(parse('''
+        int f(int n) {
+            int i;
+            for (i = 0; ; i++) {
+                if (i > n) break; else n--;
+                print(i);
+            }
+            if (n) return 1;
+            return 0;
+            print(n);
+        }'''))
+    assert kinds(cfg, ENTRY) == ['Decl', 'Assignment']
+    header, = cfg.successors(ENTRY)
+    assert cfg.conds[header].op == '>'
+    taken, other = cfg.successors(header)
+    exit, = cfg.successors(taken)
+    assert kinds(cfg, taken) == []
+    assert kinds(cfg, other) == ['UnaryOp']
+    join, = cfg.successors(other)
+    assert kinds(cfg, join) == ['Print', 'UnaryOp']
+    assert cfg.successors(join) == (header,)
+    assert cfg.conds[exit].name == 'n'
+    returns = [b for b in range(len(cfg)) if kinds(cfg, b)[-1:] == ['Return']]
+    assert all(cfg.successors(b) == (EXIT,) for b in returns)
+    # The print after the last return is kept, in a block no edge leads to
+    dead, = [b for b in range(len(cfg)) if kinds(cfg, b) == ['Print']]
+    assert len(cfg.predecessors(dead)) == 0 and cfg.dominators()[dead] == NONE
+    assert dead not in cfg.reverse_postorder()
+    assert not cfg.dominates(ENTRY, dead)
+
+
+def test_deep_nesting(parse):
+    depth = 3000
+    code = 'int f(int n) { ' + 'while (n) { if (n) n--; ' * depth + '}' * depth + ' return n; }'
+    cfg = CFGBuilder().build(parse(code).gdecls[0])
+    rpo = cfg.reverse_postorder()
+    assert len(rpo) == len(cfg) - 1
+    idom = cfg.dominators()
+    innermost = max(b for b in rpo if cfg.conds[b] is not None)
+    assert cfg.dominates(ENTRY, innermost) and cfg.dominates(rpo[1], innermost)
+    depth_of = 0
+    b = innermost
+    while b != ENTRY:
+        b = idom[b]
+        depth_of += 1
+    assert depth_of >= 2 * depth
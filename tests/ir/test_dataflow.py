@@ -0,0 +1,86 @@
+from benchmarks.generator import generate_program
+from ir.cfg import ENTRY, build_cfgs
+from ir.dataflow import DEF, UNDEF, USE, Accesses, Liveness, ReachingDefinitions, solve
+
+
+def names(accesses, bits):
+    return sorted(symbol.name for var, symbol in enumerate(accesses.symbols) if bits >> var & 1)
+
+
+def test_test_program(checked):
+    with open('test.uc') as f:
+        cfg, = build_cfgs(checked(f.read()))
+    liveness = Liveness(cfg)
+    accesses = liveness.accesses
+    assert names(accesses, (1 << len(accesses.symbols)) - 1) == ['n', 'rem', 'reverse']
+    header, = cfg.successors(ENTRY)
+    body, after = cfg.successors(header)
+    assert names(accesses, liveness.live_in[header]) == ['n', 'reverse']
+    assert names(accesses, liveness.live_out[body]) == ['n', 'reverse']
+    assert names(accesses, liveness.live_in[after]) == ['reverse']
+    definitions = ReachingDefinitions(cfg, accesses)
+    # rem is declared without a value, but assigned before every use
+    assert [node.name for node in definitions.uninitialized_uses()] == []
+    reaching = [definitions.defs[i] for i in range(len(definitions.defs))
+                if definitions.reach_in[header] >> i & 1]
+    assert sorted((accesses.symbols[var].name, kind, node.__class__.__name__)
+                  for kind, var, node in reaching) == [
+        ('n', DEF, 'Assignment'), ('n', DEF, 'Read'), ('rem', DEF, 'Assignment'),
+        ('rem', UNDEF, 'Decl'), ('reverse', DEF, 'Assignment'), ('reverse', DEF, 'Decl')]
+
+
+def test_uninitialized_uses(checked):
+    cfg, = build_cfgs(checked('''
+        int f(int a) {
+            int x, y, z, w;
+            int *p = &z;
+            if (a) x = 1;
+            print(x, z);
+            y = y + 1;
+            while (a) { int t; a--; t = a; read(w); }
+            return x + a + w;
+        }'''))
+    definitions = ReachingDefinitions(cfg)
+    assert [(node.name, node.coord.line) for node in definitions.uninitialized_uses()] == [
+        ('x', 6), ('y', 7), ('x', 9), ('w', 9)]
+
+
+def test_live_after(checked):
+    cfg, = build_cfgs(checked('int f(int a) { int b = a; a = 2; b = a + b; return b; }'))
+    liveness = Liveness(cfg)
+    accesses = liveness.accesses
+    assert [(kind, accesses.symbols[var].name, names(accesses, live)) for (kind, var, _), live
+            in zip(accesses.blocks[ENTRY], liveness.live_after(ENTRY))] == [
+        (USE, 'a', []), (DEF, 'b', ['b']), (DEF, 'a', ['a', 'b']), (USE, 'a', ['b']),
+        (USE, 'b', []), (DEF, 'b', ['b']), (USE, 'b', [])]
+
+
+def test_intersection_problem(checked):
+    # Variables assigned on every path: a forward problem met by intersection
+    cfg, = build_cfgs(checked('''
+        int f(int a) {
+            int x, y;
+            if (a) { x = 1; y = 2; } else y = 3;
+            while (a) x = 2;
+            return y;
+        }'''))
+    accesses = Accesses(cfg)
+    gen = [0] * len(cfg)
+    for b, items in enumerate(accesses.blocks):
+        for kind, var, _ in items:
+            if kind == DEF:
+                gen[b] |= 1 << var
+    universe = (1 << len(accesses.symbols)) - 1
+    assigned_in, _ = solve(cfg, gen, [0] * len(cfg), union=False, boundary=1, universe=universe)
+    returns = [b for b in range(len(cfg)) if cfg.block(b)[-1:] and
+               cfg.block(b)[-1].__class__.__name__ == 'Return']
+    assert names(accesses, assigned_in[returns[0]]) == ['a', 'y']
+
+
+def test_generated_function(checked):
+    ast = checked(generate_program(functions=2, statements=1500))
+    for cfg in build_cfgs(ast):
+        definitions = ReachingDefinitions(cfg)
+        assert definitions.uninitialized_uses() == []
+        liveness = Liveness(cfg, definitions.accesses)
+        assert liveness.live_in[ENTRY] & ~((1 << len(definitions.accesses.params)) - 1) == 0
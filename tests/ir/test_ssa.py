@@ -0,0 +1,194 @@
+import io
+
+from benchmarks.generator import generate_program
+from interpreter.evaluator import Evaluator
+from interpreter.runtime import chars_to_str
+from ir.cfg import ENTRY
+from ir.ssa import build_ssa, format_function, operands
+from semantic.uc_ops import BINARY_OPS, UNARY_OPS, cast
+from semantic.uc_types import CharType, FloatType
+
+
+class Stop(Exception):
+    pass
+
+
+class Interpreter:
+    """ Reference interpreter of the SSA IR, to check that lowering keeps
+        the meaning of programs.
+    """
+
+    def __init__(self, functions, stdin):
+        self.functions = {function.name: function for function in functions}
+        self.tokens = iter(stdin.split())
+        self.out = []
+        self.globals = {}
+
+    def run(self):
+        try:
+            self.call(self.functions['<globals>'], [])
+            return self.call(self.functions['main'], []) or 0, ''.join(self.out)
+        except Stop:
+            return 1, ''.join(self.out)
+
+    def cell(self, frame, symbol):
+        memory = self.globals if symbol.scope == 0 else frame
+        return memory.setdefault(symbol, [0])
+
+    def call(self, function, args):
+        graph = function.graph
+        types = function.types
+        v = [None] * len(types)
+        frame = {}
+        b = ENTRY
+        previous = None
+        while True:
+            for instr in graph.block(b):
+                op = instr[0]
+                ops = [v[x] for x in operands(instr)]
+                if op == 'phi':
+                    result = ops[list(graph.predecessors(b)).index(previous)]
+                elif op == 'const':
+                    result = instr[2]
+                elif op == 'param':
+                    result = args[instr[2]]
+                elif op == 'undef':
+                    result = 0
+                elif op in BINARY_OPS['int']:
+                    kind = 'float' if types[instr[2]] is FloatType else 'int'
+                    result = BINARY_OPS[kind][op](*ops)
+                elif op in ('neg', 'not'):
+                    kind = 'float' if types[instr[2]] is FloatType else 'int'
+                    result = UNARY_OPS[kind]['-' if op == 'neg' else '!'](ops[0])
+                elif op == 'cast':
+                    result = cast(ops[0], instr[3])
+                elif op == 'load':
+                    result = self.cell(frame, instr[2])[0]
+                elif op == 'store':
+                    self.cell(frame, instr[2])[0] = ops[0]
+                elif op == 'alloc':
+                    frame[instr[2]] = self.globals[instr[2]] = instr[3][:]
+                elif op == 'addr':
+                    result = (self.cell(frame, instr[2]), 0)
+                elif op == 'index':
+                    result = (ops[0][0], ops[0][1] + ops[1])
+                elif op == 'aload':
+                    result = ops[0][0][ops[0][1] + ops[1]]
+                elif op == 'astore':
+                    ops[0][0][ops[0][1] + ops[1]] = ops[2]
+                elif op == 'call':
+                    result = self.call(self.functions[instr[2]], ops)
+                elif op == 'print':
+                    for x, value in zip(operands(instr), ops):
+                        if isinstance(value, tuple):
+                            self.out.append(chars_to_str(value[0][value[1]:]))
+                        elif types[x] is CharType:
+                            self.out.append(chr(value & 0xFF))
+                        else:
+                            self.out.append(str(value))
+                    if not ops:
+                        self.out.append('\n')
+                elif op == 'read':
+                    token = next(self.tokens)
+                    result = float(token) if instr[2] == 'float' else int(token)
+                elif op == 'assert':
+                    if not ops[0]:
+                        coord = instr[3]
+                        self.out.append('assertion_fail on %s:%s\n' % (coord.line, coord.column))
+                        raise Stop()
+                elif op == 'ret':
+                    return ops[0] if ops else None
+                if instr[1] is not None:
+                    v[instr[1]] = result
+            succs = graph.successors(b)
+            previous = b
+            if graph.conds[b] is not None:
+                b = succs[0] if v[graph.conds[b]] else succs[1]
+            else:
+                b, = succs
+
+
+def check_ssa(function):
+    """ Checks that every value is defined once, before its uses. """
+    graph = function.graph
+    defined = {}
+    for b in range(len(graph)):
+        for i, instr in enumerate(graph.block(b)):
+            if instr[1] is not None:
+                assert instr[1] not in defined
+                defined[instr[1]] = (b, i)
+    for b in range(len(graph)):
+        preds = graph.predecessors(b)
+        uses = [(instr, i) for i, instr in enumerate(graph.block(b))]
+        for instr, i in uses:
+            for k, value in enumerate(operands(instr)):
+                where, position = defined[value]
+                if instr[0] == 'phi':
+                    assert graph.dominates(where, preds[k])
+                elif where == b:
+                    assert position < i
+                else:
+                    assert graph.dominates(where, b)
+        if graph.conds[b] is not None:
+            assert graph.dominates(defined[graph.conds[b]][0], b)
+
+
+def compare(ast, stdin=''):
+    out = io.StringIO()
+    expected = Evaluator(ast).run(io.StringIO(stdin), out), out.getvalue()
+    functions = build_ssa(ast)
+    for function in functions:
+        check_ssa(function)
+    assert Interpreter(functions, stdin).run() == expected
+    return functions
+
+
+def test_test_program(checked):
+    with open('test.uc') as f:
+        functions = compare(checked(f.read()), '1230')
+    main = functions[1]
+    header = main.graph.successors(ENTRY)[0]
+    phis = [instr for instr in main.graph.block(header) if instr[0] == 'phi']
+    # n and reverse change in the loop; rem is only read where it is set
+    assert len(phis) == 2
+    listing = format_function(main)
+    assert listing.startswith('main():\n  b0:\n')
+    assert 'branch v' in listing and 'v4 = read \'int\'' in listing
+
+
+def test_statement_forms(checked):
+    compare(checked(r'''
+        int g = 3, table[2][3] = {{1, 2, 3}, {4, 5, 6}};
+        char name[] = "uC";
+        float half = 0.5;
+        int sum(int v[], int n) { int i, s = 0; for (i = 0; i < n; i++) s += v[i]; return s; }
+        void bump(int *p) { *p = *p + 1; }
+        int fact(int n) { if (n <= 1) return 1; return n * fact(n - 1); }
+        int main() {
+            int i = 0, j, k = 10, x;
+            float f = 1.5;
+            int *p = &x;
+            read(x, j);
+            while (1) {
+                i++;
+                if (i > 4 || i == x) break;
+                else if (!(i % 2) && k) k -= i;
+                ;
+            }
+            for (int m = 0; m < 3; m = m + 1) { table[1][m] *= 2; g = g + table[1][m]; }
+            bump(&x);
+            bump(p);
+            k = (j = 2, j + 1);
+            f = f * half + (float) k;
+            assert i > 0;
+            print(i, " ", k, " ", x, " ", g, " ", sum(table[1], 3), " ", fact(5), " ", f);
+            print(" ", name, name[1], " ", i++ + ++i, " ", --k, " ", (int) f, " ", -i);
+            print();
+            assert j == 3;
+            print("unreachable");
+            return 0;
+        }'''), '4 9')
+
+
+def test_generated_programs(checked):
+    compare(checked(generate_program(functions=6, loop_iterations=5)))
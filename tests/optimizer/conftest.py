@@ -0,0 +1,24 @@
+import pytest
+
+from interpreter.bytecode import BytecodeCompiler
+from interpreter.evaluator import Evaluator
+from interpreter.transpiler import PythonProgram, compile_program
+from interpreter.vm import VM
+
+
+@pytest.fixture
+def run_everywhere(checked, run_with):
+    """ Runs transform(ast) on the checked tree of code, checking that the
+        program still prints the same on every engine. Returns the tree.
+    """
+
+    def run_everywhere(code, transform):
+        expected = run_with(Evaluator(checked(code)))
+        ast = checked(code)
+        transform(ast)
+        assert run_with(Evaluator(ast)) == expected
+        assert run_with(VM(BytecodeCompiler().compile(ast))) == expected
+        assert run_with(PythonProgram(compile_program(ast))) == expected
+        return ast
+
+    return run_everywhere
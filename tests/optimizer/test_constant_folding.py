@@ -0,0 +1,101 @@
+import pytest
+
+from optimizer.constant_folding import ConstantFolder
+from optimizer.rewriter import subtree_size
+from parser import ast_classes
+from semantic.resolver import NameResolver
+from semantic.type_checker import TypeChecker
+from semantic.uc_ops import int_div, int_mod, wrap_int
+
+
+def fold(ast, error_func):
+    NameResolver(error_func).resolve(ast)
+    TypeChecker(error_func).check(ast)
+    folder = ConstantFolder()
+    before = subtree_size(ast)
+    removed = folder.fold(ast)
+    assert before - subtree_size(ast) == removed
+    return folder
+
+
+def init_of(ast, index):
+    return ast.gdecls[index].decls[0].init
+
+
+@pytest.mark.parametrize('left, right, div, mod', [
+    (7, 2, 3, 1), (-7, 2, -3, -1), (7, -2, -3, 1), (-7, -2, 3, -1),
+])
+def test_c_division(left, right, div, mod):
+    assert int_div(left, right) == div
+    assert int_mod(left, right) == mod
+
+
+def test_wrap_int():
+    assert wrap_int(2 ** 31) == -2 ** 31
+    assert wrap_int(-2 ** 31 - 1) == 2 ** 31 - 1
+    assert wrap_int(5) == 5
+
+
+def test_folds_constants(parse, error_func, errors):
+    ast = parse(r'''
+        int a = (1 + 2) * 3 - 10 / 4;
+        int b = -7 % 3;
+        float c = 1.5 * 2.0 + (float) 1;
+        int d = (int) 2.9 + !0;
+        int e = 2.5 < 3.0;
+        int f = 2147483647 + 1;
+        int g[2 * 3];
+        int h = 1 / 0;
+        ''')
+    folder = fold(ast, error_func)
+    assert errors == []
+    values = [(init_of(ast, i).type, init_of(ast, i).value) for i in range(6)]
+    assert values == [('int', 7), ('int', -1), ('float', 4.0), ('int', 3),
+                      ('int', 1), ('int', -2 ** 31)]
+    dim = ast.gdecls[6].decls[0].type.dim
+    assert isinstance(dim, ast_classes.Constant) and dim.value == 6
+    assert isinstance(init_of(ast, 7), ast_classes.BinaryOp)
+    assert folder.removed == 28
+
+
+def test_simplifies_identities(parse, error_func, errors):
+    ast = parse(r'''
+        int f(int x) { return x; }
+        int main() {
+            int x = 3;
+            float y = 1.0;
+            x = (x + 0) * 1 - 0;
+            y = 1.0 * y / 1.0;
+            y = y + 0.0;
+            x = x * 0;
+            x = f(x) * 0;
+            x = 0 && f(x);
+            x = 2 || f(x);
+            return 0;
+        }''')
+    fold(ast, error_func)
+    assert errors == []
+    body = ast.gdecls[1].body.block_items
+    values = [stmt.rvalue for stmt in body[2:-1]]
+    assert isinstance(values[0], ast_classes.ID)
+    assert isinstance(values[1], ast_classes.ID)
+    # -0.0 + 0.0 is 0.0, so y + 0.0 is kept
+    assert isinstance(values[2], ast_classes.BinaryOp)
+    assert values[3].value == 0
+    # The call must still be made
+    assert isinstance(values[4], ast_classes.BinaryOp)
+    assert values[5].value == 0
+    assert values[6].value == 1
+
+
+def test_keeps_ill_typed_identities(parse):
+    ast = parse('float x = 1.0; float y = x * 1;')
+    assert ConstantFolder().fold(ast) == 0
+    assert isinstance(init_of(ast, 1), ast_classes.BinaryOp)
+
+
+def test_deep_constant_chain(parse, error_func):
+    ast = parse('int x = ' + ' + '.join(['1'] * 5000) + ';')
+    folder = fold(ast, error_func)
+    assert init_of(ast, 0).value == 5000
+    assert folder.folded == 4999
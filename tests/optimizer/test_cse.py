@@ -0,0 +1,87 @@
+import pytest
+
+from benchmarks.generator import generate_program
+from optimizer.cse import CommonSubexpressions
+
+
+@pytest.fixture
+def eliminate(run_everywhere):
+
+    def eliminate(code):
+        """ Runs the pass on code, checking that the program still prints
+            the same on every engine. Returns the pass and the program.
+        """
+        cse = CommonSubexpressions()
+
+        def transform(ast):
+            assert cse.eliminate(ast) == cse.eliminated
+
+        return cse, run_everywhere(code, transform)
+
+    return eliminate
+
+
+def test_eliminates_within_and_across_blocks(eliminate):
+    cse, ast = eliminate(r'''
+        int main() {
+            int a[10], i, s = 0, n = 7, t;
+            for (i = 0; i < 10; i++) a[i] = i * 3;
+            for (i = 1; i < 9; i++) {
+                s = s + a[i] * a[i] + (n * i + 1);
+                t = n * i + 1;
+                if (s > 100) s = s - t;
+                s = s + a[i] * a[i];
+            }
+            if (n * 2 > 3) s = s + n * 2; else s = s - n * 2;
+            print(s, " ", t, " ", n * 2);
+            return 0;
+        }''')
+    # a[i], n * i + 1 and a[i] * a[i] in the loop, n * 2 three times after it
+    assert (cse.eliminated, cse.temporaries) == (6, 4)
+    body = ast.gdecls[0].body.block_items
+    assert [decl.name.name for decl in body[:4]] == ['cse_0', 'cse_1', 'cse_2', 'cse_3']
+
+
+def test_skips_taken_names(eliminate):
+    cse, ast = eliminate(r'''
+        int cse_1 = 4;
+        int main() {
+            int a = 2, b = 3, cse_0 = 7;
+            print(a * b + cse_0, " ", a * b, " ", a + b + cse_1, " ", a + b);
+            return 0;
+        }''')
+    assert (cse.eliminated, cse.temporaries) == (2, 2)
+    body = ast.gdecls[-1].body.block_items
+    assert [decl.name.name for decl in body[:2]] == ['cse_2', 'cse_3']
+
+
+def test_keeps_values_that_may_change(eliminate):
+    cse, _ = eliminate(r'''
+        int g = 1;
+        int h[3];
+        int bump() { g = g + 1; h[0] = h[0] + 1; return g; }
+        int main() {
+            int x = 2, y = 3, s, i = 0;
+            int *p = &y;
+            s = x * y;
+            x = 5;
+            s = s + x * y;
+            s = s + g * 2 + bump() + g * 2;
+            s = s + h[0] + bump() + h[0];
+            s = s + (x + y) * 2;
+            *p = 10;
+            s = s + (x + y) * 2;
+            while (i < 3) { s = s + x * 4; x++; i++; }
+            if (s > 0 && x / 3 > 1) s = s + x / 3;
+            if (s > 0) s = s + 1; else x = 1;
+            s = s + x - 1;
+            print(s, " ", x - 1);
+            return 0;
+        }''')
+    assert cse.eliminated == 0
+
+
+def test_generated_programs(eliminate):
+    cse, _ = eliminate(
+                       generate_program(functions=8, loop_iterations=6))
+    assert cse.eliminated > 0
@@ -0,0 +1,98 @@
+import pytest
+
+from benchmarks.generator import generate_program
+from optimizer.dce import DeadCodeEliminator
+from optimizer.inline import Inliner
+from optimizer.loops import LoopOptimizer
+
+
+@pytest.fixture
+def eliminate(run_everywhere):
+
+    def eliminate(code, passes=False):
+        """ Runs the pass on code (after inlining and loop optimization if
+            passes), checking that the program still prints the same on
+            every engine. Returns the pass and the program.
+        """
+        dce = DeadCodeEliminator()
+
+        def transform(ast):
+            if passes:
+                Inliner().inline(ast)
+                LoopOptimizer().optimize(ast)
+            assert dce.eliminate(ast) == dce.removed
+
+        return dce, run_everywhere(code, transform)
+
+    return eliminate
+
+
+def test_removes_dead_code(eliminate):
+    dce, ast = eliminate(r'''
+        int g = 0;
+        int f(int x) {
+            int unused, t = x * 2;
+            t = x + 1;
+            if (x > 3) return t; else return x;
+            print("never");
+            g = 1;
+        }
+        int main() {
+            int i, s = 0, d = 4, e;
+            for (i = 0; i < 10; i++) {
+                if (i == 5) { break; s = s + 100; }
+                s = s + f(i);
+                e = s * 3;
+            }
+            while (0) s = s + 1;
+            if (1) { s = s + 1; } else { print("no"); }
+            d = d + 1;
+            e = 7;
+            print(s, " ", g);
+            return 0;
+        }''')
+    # Removing e = s * 3 leaves d and e only written, then never used
+    assert dce.report() == [
+        'f: 2 unreachable statement(s), 0 constant branch(es), 1 dead store(s), '
+        '1 unused declaration(s) removed',
+        'main: 1 unreachable statement(s), 2 constant branch(es), 3 dead store(s), '
+        '2 unused declaration(s) removed',
+    ]
+    assert dce.removed == 12
+    assert [item.__class__.__name__ for item in ast.gdecls[1].body.block_items] == \
+        ['Decl', 'Assignment', 'If']
+
+
+def test_keeps_what_may_matter(eliminate):
+    dce, ast = eliminate(r'''
+        int g = 1;
+        int f() { g = g + 1; return g; }
+        int main() {
+            int a = f(), z = g, b = 10, *p, t = 3, c;
+            int v[3] = {1, 2, 3};
+            float x = 2.5;
+            p = &t;
+            a = g / z;
+            b /= z;
+            c = v[2];
+            a = (int) x;
+            *p = 4;
+            f();
+            for (int i = 0; 0; i++) print("never");
+            print(g, " ", t);
+            return 0;
+        }''')
+    # Only the loop that never runs goes: the other stores may fail, or
+    # write through p
+    assert dce.report() == [
+        'main: 0 unreachable statement(s), 1 constant branch(es), 0 dead store(s), '
+        '0 unused declaration(s) removed',
+    ]
+    assert len(ast.gdecls[-1].body.block_items) == 17
+
+
+def test_generated_programs(eliminate):
+    code = generate_program(functions=4, loop_iterations=5, kernels=2, helpers=2)
+    eliminate(code)
+    dce, _ = eliminate(code, passes=True)
+    assert dce.removed > 0
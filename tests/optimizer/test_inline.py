@@ -0,0 +1,152 @@
+import pytest
+
+from benchmarks.generator import generate_program
+from interpreter.evaluator import Evaluator
+from optimizer.cse import CommonSubexpressions
+from optimizer.inline import Inliner
+from optimizer.loops import LoopOptimizer
+from parser import ast_classes
+from parser.unparse import to_source
+
+
+@pytest.fixture
+def inline(run_everywhere):
+
+    def inline(code, budget=40, passes=False):
+        """ Runs the pass on code (followed by CSE and loop optimization if
+            passes), checking that the program still prints the same on
+            every engine. Returns the pass and the program.
+        """
+        inliner = Inliner(budget)
+
+        def transform(ast):
+            assert inliner.inline(ast) == inliner.inlined
+            if passes:
+                CommonSubexpressions().eliminate(ast)
+                LoopOptimizer().optimize(ast)
+
+        return inliner, run_everywhere(code, transform)
+
+    return inline
+
+
+def calls(node):
+    """ Names of the functions called in the tree rooted at node. """
+    names = []
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ast_classes.FuncCall):
+            names.append(node.name.name)
+        stack.extend(child for _, child in node.children())
+    return sorted(names)
+
+
+PROGRAM = r'''
+    int g = 0;
+    int v[5] = {1, 2, 3, 4, 5};
+    int sq(int x) { return x * x; }
+    int clamp(int x, int lo, int hi) { if (x < lo) return lo; if (x > hi) return hi; return x; }
+    int dot(int a[], int n) { int i, s = 0; for (i = 0; i < n; i++) s = s + a[i] * a[i]; return s; }
+    void bump(int d) { g = g + d; }
+    int fact(int n) { if (n <= 1) return 1; return n * fact(n - 1); }
+    float half(float f) { return f / 2.0; }
+    int twice(int x) { return sq(x) + sq(x + 1); }
+    int main() {
+        int i, s = 0, t;
+        for (i = 0; i < 10; i++) {
+            if (i == 8) break;
+            s = s + sq(i) + clamp(i, 2, 7);
+            bump(i);
+            t = twice(i) - sq(clamp(i * 3, 0, 20));
+            if (sq(i) > 20 && sq(i) < 50) s = s + t;
+        }
+        int d = dot(v, 5);
+        print(sq(3), " ", s, " ", g, " ", d, " ", fact(5), " ", half(3.0));
+        return sq(0);
+    }'''
+
+
+def test_inlines_calls(inline):
+    inliner, ast = inline(PROGRAM)
+    assert inliner.calls == {'bump': 1, 'clamp': 2, 'dot': 1, 'sq': 7, 'twice': 1}
+    assert inliner.report()[-1] == 'fact: not inlined, recursive'
+    # Calls only evaluated after others, or not always, are kept
+    assert calls(ast.gdecls[-1]) == ['fact', 'half', 'sq']
+    assert calls(ast.gdecls[-2]) == []
+
+
+def test_budget(inline):
+    inliner, _ = inline(PROGRAM, budget=5)
+    # sq(clamp(...)) is kept too: clamp is called first
+    assert inliner.calls == {'sq': 6}
+    # The size of twice is that of its body once sq is inlined in it
+    assert 'twice: not inlined, 31 node(s), over the budget of 5' in inliner.report()
+
+
+def test_keeps_calls_that_cannot_move(inline):
+    inliner, ast = inline(r'''
+        int g = 1;
+        int a[4] = {5, 6, 7, 8};
+        int incg() { g = g + 1; return g; }
+        int loud(int x) { print("x", x); return x; }
+        int id(int x) { return x; }
+        int three(char s[]) { return 3; }
+        int find(int v[], int n, int x) {
+            int i;
+            for (i = 0; i < n; i++) if (v[i] == x) return i;
+            return -1;
+        }
+        void setp(int *p, int x) { *p = x; }
+        void early(int x) { if (x > 2) return; g = g + x; }
+        int local(int k) { int t[3] = {1, 2, 3}; t[k] = t[k] * 10; return t[0] + t[1] + t[2]; }
+        int main() {
+            int s = 0, k = 1, t = 0;
+            s = g + incg();
+            s = s + a[k] + loud(1);
+            s = s + id(k++);
+            s = s + three("abc") + find(a, 4, 7);
+            s = s + find(a, 4, 6);
+            setp(&t, 4);
+            early(1); early(5);
+            for (k = 0; k < 3; k++) { if (k == 2) break; s = s + local(k); }
+            s = s + (k > 0 || id(9) > 0);
+            print(s, " ", g, " ", t);
+            return 0;
+        }''')
+    assert inliner.calls == {'early': 2, 'id': 1, 'local': 1, 'setp': 1}
+    assert inliner.skipped == {'find': 'returns from inside a loop'}
+    assert calls(ast.gdecls[-1]) == ['find', 'find', 'id', 'incg', 'loud', 'three']
+
+
+def test_shadowed_globals(inline, checked, run_with):
+    code = r'''
+        int g = 100;
+        int getg(int x) { return g + x; }
+        int twice(int x) { return getg(x) + getg(x); }
+        int main() {
+            int g = 1;
+            int r = getg(g), t = twice(2);
+            print(r, " ", t);
+            return 0;
+        }
+        int other() {
+            int g = 1;
+            return getg(2);
+        }'''
+    inliner, ast = inline(code)
+    # Inlined in twice, which then uses g too
+    assert inliner.calls == {'getg': 2}
+    assert inliner.skipped == {'getg': 'uses g, shadowed by a local of other',
+                               'twice': 'uses g, shadowed by a local of main'}
+    # The inlined program prints the same once written out and read back
+    source = to_source(ast)
+    assert 'getg(g)' in source
+    assert run_with(Evaluator(checked(source))) == (0, '101 204')
+
+
+def test_generated_programs(inline):
+    code = generate_program(functions=4, loop_iterations=5, kernels=2, helpers=2)
+    inliner, _ = inline(code)
+    assert inliner.calls == {'h0': 4, 'h1': 4}
+    inline(code, budget=10000, passes=True)
@@ -0,0 +1,90 @@
+import pytest
+
+from benchmarks.generator import generate_program
+from optimizer.cse import CommonSubexpressions
+from optimizer.loops import LoopOptimizer
+
+
+@pytest.fixture
+def optimize(run_everywhere):
+
+    def optimize(code, cse=False):
+        """ Runs the pass on code (after CSE if cse), checking that the
+            program still prints the same on every engine. Returns the pass.
+        """
+        loops = LoopOptimizer()
+
+        def transform(ast):
+            if cse:
+                CommonSubexpressions().eliminate(ast)
+            assert loops.optimize(ast) == loops.hoisted + loops.reduced
+
+        run_everywhere(code, transform)
+        return loops
+
+    return optimize
+
+
+def test_hoists_and_reduces(optimize):
+    loops = optimize(r'''
+        int m[100];
+        int main() {
+            int n = 10, s = 0, a = 3, b = 4;
+            for (int i = 0; i < n; i++) {
+                for (int j = 0; j < n; j++) {
+                    m[i * n + j] = (a * b + j * 5) % 97 + i;
+                    if (j > 7 && i > 8) break;
+                }
+            }
+            int k = 0;
+            while (k < 100) {
+                s = s + m[k] * (a + b) + k * 3;
+                k += 2;
+                if (s > 100000) break;
+            }
+            print(s, " ", a * b);
+            return 0;
+        }''')
+    # a * b out of both loops, i * n and j * 5 into additions, a + b and
+    # k * 3 in the while loop
+    assert loops.report() == [
+        'line 5: for loop, depth 1, 8 block(s): 1 invariant(s) hoisted, '
+        '1 multiplication(s) reduced',
+        'line 6: for loop, depth 2, 4 block(s): 1 invariant(s) hoisted, '
+        '1 multiplication(s) reduced',
+        'line 12: while loop, depth 1, 4 block(s): 1 invariant(s) hoisted, '
+        '1 multiplication(s) reduced',
+    ]
+    assert (loops.hoisted, loops.reduced, loops.temporaries) == (3, 3, 6)
+
+
+def test_keeps_what_may_change_or_fail(optimize):
+    loops = optimize(r'''
+        int g = 5;
+        int f(int x) { g = g + x; return g; }
+        int main() {
+            int i, s = 0, z = 0, t = 1, a[4] = {1, 2, 3, 4};
+            int *p = &t;
+            float x = 1.5;
+            for (i = 0; i < 4; i++) { s = s + g * 2; s = s + f(1); }
+            i = 0;
+            while (i < 0) { s = s + 10 / z; s = s + a[2] * 3; i++; }
+            for (i = 0; i < 3; i = i * 2 + 1) s = s + i * 4;
+            for (i = 0; i < 3; i++) { s = s + i * 5; if (s > 3) i = i + s - s; }
+            for (i = 0; i < 3; i++) { s = s + t * 2; *p = *p + 1; }
+            for (i = 0; i < 3; i++) { x = x * 2.0; s = s + (int) x; }
+            for (i = 0; i < 3; i++) s = s + i++ * 2;
+            while (1) { s = s + z * 2; break; }
+            print(s);
+            return 0;
+        }''')
+    # The last while loop is not a loop: it never goes back to its test
+    assert len(loops.loops) == 7
+    assert (loops.hoisted, loops.reduced, loops.temporaries) == (0, 0, 0)
+
+
+def test_generated_programs(optimize):
+    code = generate_program(functions=4, loop_iterations=6, kernels=2)
+    loops = optimize(code)
+    assert loops.hoisted > 0 and loops.reduced > 0
+    optimize(code, cse=True)
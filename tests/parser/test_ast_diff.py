@@ -0,0 +1,74 @@
+from parser import ast_classes
+from parser.ast_diff import ASTDiff, diff_ast
+
+
+program = r'''
+int main() {
+    int x = 1;
+    x = x + 2;
+    print(x);
+    return 0;
+}
+'''
+
+
+def ops(edits):
+    return sorted((e.op, type(e.old or e.new).__name__) for e in edits)
+
+
+def test_identical(parse):
+    assert diff_ast(parse(program), parse(program)) == []
+
+
+def test_ignores_positions(parse):
+    moved = '\n\n' + program.replace('    ', '\t\t')
+    assert diff_ast(parse(program), parse(moved)) == []
+
+
+def test_update(parse):
+    edits = diff_ast(parse(program), parse(program.replace('x + 2', 'x + 3')))
+    assert ops(edits) == [('update', 'Constant')]
+    assert edits[0].old.value == 2
+    assert edits[0].new.value == 3
+
+
+def test_insert_and_delete(parse):
+    old = parse(program)
+    new = parse(program.replace('print(x);', 'print(x);\n    print(x + 1);'))
+    edits = diff_ast(old, new)
+    assert ops(edits) == [('insert', 'Print')]
+    assert ops(diff_ast(new, old)) == [('delete', 'Print')]
+
+
+def test_move(parse):
+    swapped = program.replace('x = x + 2;\n    print(x);', 'print(x);\n    x = x + 2;')
+    edits = diff_ast(parse(program), parse(swapped))
+    assert len(edits) == 1
+    assert edits[0].op == 'move'
+    assert isinstance(edits[0].old, (ast_classes.Assignment, ast_classes.Print))
+
+
+OLD = 'int f%d(int x) { int y = x * %d; if (y > 3) y = y - 1; return y + 2; }\n'
+NEW = 'int f%d(int x) { int y = x + 4; while (y < %d) y = y * 2; print(y); return 0; }\n'
+
+
+def test_zs_budget(parse):
+    # Dissimilar functions leave their bodies to the tree edit distance,
+    # whose total work the budget caps
+    old = parse(''.join(OLD % (i, i) for i in range(40)))
+    new = parse(''.join(NEW % (i, i) for i in range(40)))
+    full = ASTDiff(old, new)
+    assert full.zs_work > 2000
+    for budget in (0, 2000):
+        capped = ASTDiff(old, new, zs_budget=budget)
+        assert capped.zs_work <= budget
+        # Nodes are still only matched to nodes of their class
+        for a, b in enumerate(capped.old_to_new):
+            if b >= 0:
+                assert capped.old.labels[a][0] == capped.new.labels[b][0]
+        assert capped.edits()
+
+    # A small change is still found without the tree edit distance
+    changed = parse(''.join(OLD % (i, i + (i == 7)) for i in range(40)))
+    edits = diff_ast(old, changed, zs_budget=0)
+    assert ops(edits) == [('update', 'Constant')] and edits[0].new.value == 8
@@ -0,0 +1,42 @@
+import io
+import json
+
+from parser.ast_export import export_json, export_jsonl
+
+
+program = r'''
+int n = 3;
+
+int doubleMe (int x) {
+    return x * x;
+}
+'''
+
+
+def test_export_json(parse):
+    buf = io.StringIO()
+    export_json(parse(program), buf)
+    tree = json.loads(buf.getvalue())
+    assert tree['kind'] == 'Program'
+    decl = tree['children'][0]['children'][0]
+    assert decl['kind'] == 'Decl'
+    assert decl['attrs'] == {'name': 'n'}
+    init = decl['children'][1]
+    assert init == {'kind': 'Constant', 'field': 'init',
+                    'attrs': {'type': 'int', 'value': 3}, 'coord': [2, 9]}
+
+
+def test_export_jsonl(parse):
+    buf = io.StringIO()
+    export_jsonl(parse(program), buf)
+    lines = buf.getvalue().splitlines()
+    assert [json.loads(line)['kind'] for line in lines] == ['GlobalDecl', 'FuncDef']
+
+
+def test_export_deep_tree(parse):
+    ast = parse('int x = ' + ' + '.join(['1'] * 5000) + ';')
+    buf = io.StringIO()
+    export_json(ast, buf, showcoord=False)
+    text = buf.getvalue()
+    assert text.count('"kind":"BinaryOp"') == 4999
+    assert text.count('{') == text.count('}')
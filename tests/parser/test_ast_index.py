@@ -0,0 +1,73 @@
+from benchmarks.generator import generate_program
+from parser import ast_classes
+from parser.ast_index import ASTIndex
+
+
+program = r'''
+int g = 0;
+int v[4] = {1, 2, 3, 4};
+int sq(int x) { return x * x; }
+int main() {
+    int i, s = 0;
+    for (i = 0; i < 4; i++) {
+        s = s + sq(v[i]) + sq(g);
+        v[i] = s;
+    }
+    print(sq(s));
+    return 0;
+}
+'''
+
+
+def walk(node):
+    """ Nodes of the tree rooted at node, in preorder, walked again. """
+    nodes = []
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(child for _, child in reversed(node.children()))
+    return nodes
+
+
+def test_queries(parse):
+    ast = parse(program)
+    index = ASTIndex(ast)
+    main = index.functions['main']
+    assert index.calls('sq') == [node for node in walk(ast)
+                                 if isinstance(node, ast_classes.FuncCall)]
+    assert len(index.calls('sq', within=main)) == 3
+    assert index.calls('sq', within=index.functions['sq']) == []
+    assert index.calls('nothing') == []
+
+    refs = index.instances(ast_classes.ArrayRef, within=main)
+    assert len(refs) == 2 and index.instances(ast_classes.ArrayRef, within=refs[0]) == refs[:1]
+    assert [ref.name.name for ref in refs] == ['v', 'v']
+    assert len(index.references('s')) == 4
+    assert [node.coord.line for node in index.references('i', within=main)] == [7, 7, 7, 8, 9]
+
+    call = index.calls('sq', within=main)[-1]
+    assert isinstance(index.parent(call), ast_classes.Print)
+    assert index.field(call) == 'print'
+    assert index.enclosing(call, ast_classes.FuncDef) is main
+    assert index.enclosing(call, ast_classes.While) is None
+    assert index.ancestors(call)[-2:] == [main, ast]
+    assert index.parent(ast) is None and index.field(ast) is None
+
+
+def test_matches_a_walk(parse):
+    ast = parse(generate_program(functions=6, kernels=2, helpers=2))
+    index = ASTIndex(ast)
+    nodes = walk(ast)
+    assert index.nodes == nodes and len(index) == len(nodes)
+    for node in nodes:
+        assert node in index
+        assert index.subtree(node) == walk(node)
+        for field, child in node.children():
+            assert index.parent(child) is node and index.field(child) == field
+    for func in index.instances(ast_classes.FuncDef):
+        below = walk(func)
+        assert index.instances(ast_classes.BinaryOp, within=func) == \
+            [node for node in below if isinstance(node, ast_classes.BinaryOp)]
+        assert index.references('x', within=func) == \
+            [node for node in below if isinstance(node, ast_classes.ID) and node.name == 'x']
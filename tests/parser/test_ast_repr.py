@@ -0,0 +1,24 @@
+from parser import ast_classes
+from parser.ast_classes import _repr
+
+
+def test_repr_format():
+    assert repr(ast_classes.ID('x')) == "ID(name='x'  )"
+    assert repr(ast_classes.Break()) == 'Break()'
+    assert repr(ast_classes.EmptyStatement()) == 'EmptyStatement()'
+    init = ast_classes.InitList([ast_classes.ID('a'), ast_classes.ID('b')])
+    assert repr(init) == ("InitList(exprs=[ID(name='a'  ),\n"
+                          "                ID(name='b'  )\n"
+                          "               ]        )")
+
+
+def test_repr_deep_tree(parse):
+    ast = parse('int x = ' + ' + '.join(['1'] * 3000) + ';')
+    assert repr(ast).count('BinaryOp(') == 2999
+
+
+def test_repr_limits(parse):
+    ast = parse('int main() { int x = 1 + 2 * 3; return x; }')
+    assert _repr(ast, max_depth=1) == 'Program(gdecls=[FuncDef(...)\n               ]       )'
+    limited = _repr(ast, max_size=50)
+    assert len(limited) < 80 and limited.endswith('...')
@@ -0,0 +1,58 @@
+import io
+
+from parser.interning import Interner, TypeNames
+
+
+program = r'''
+int counter = 1000;
+int main() {
+    int a = 1000, b;
+    float c = 1000.5;
+    b = counter + a;
+    return b;
+}
+'''
+
+
+def find(node, cls):
+    found = [node] if isinstance(node, cls) else []
+    for _, child in node.children():
+        found += find(child, cls)
+    return found
+
+
+def test_type_names_are_shared(parse):
+    from parser.ast_classes import Type
+    types = [t for t in find(parse(program), Type) if t.names == ('int', )]
+    assert len(types) > 3
+    assert all(t.names is types[0].names for t in types)
+    assert isinstance(types[0].names, TypeNames)
+
+
+def test_identifiers_and_constants_are_shared(parse):
+    from parser.ast_classes import ID, Constant
+    ast = parse(program)
+    ids = [i.name for i in find(ast, ID) if i.name == 'b']
+    assert len(ids) == 2 and ids[0] is ids[1]
+    ints = [c.value for c in find(ast, Constant) if c.value == 1000 and c.type == 'int']
+    assert len(ints) == 2 and ints[0] is ints[1]
+
+
+def test_type_names_show_as_list(parse):
+    buf = io.StringIO()
+    parse('int x;').show(buf=buf)
+    assert "Type: ['int']" in buf.getvalue()
+
+
+def test_constant_keeps_type():
+    interner = Interner()
+    assert interner.constant(1) == 1
+    assert isinstance(interner.constant(1.0), float)
+
+
+def test_report():
+    interner = Interner()
+    interner.identifier(''.join(['na', 'me']))
+    interner.identifier(''.join(['na', 'me']))
+    assert interner.stats()['identifiers'][:2] == (2, 1)
+    assert 'bytes saved' in interner.report()
@@ -0,0 +1,74 @@
+from benchmarks.generator import generate_program
+from parser import ast_classes
+from parser.spans import SpanIndex
+from parser.uc_parser import UCParser
+
+
+program = r'''int g = 1;
+int f(int x, int y) { return x * (y + 2); }
+int main() {
+    int a[3] = {1, 2, 3}, i;
+    for (i = 0; i < 3; i++) ;
+    print(f(a[1], g), "s");
+    return 0;
+}
+'''
+
+
+def parse_spans(code):
+    parser = UCParser(spans=True)
+    ast = parser.parse(code)
+    return ast, SpanIndex(code, parser.spans)
+
+
+def test_spans():
+    ast, index = parse_spans(program)
+    assert index.source(ast.gdecls[1]) == 'int f(int x, int y) { return x * (y + 2); }'
+    assert index.source(ast.gdecls[1].decl.type.args) == 'int x, int y'
+    main = ast.gdecls[2].body.block_items
+    assert [index.source(item) for item in main[2:]] == [
+        'for (i = 0; i < 3; i++) ;', 'print(f(a[1], g), "s");', 'return 0;']
+    assert index.source(main[0].init) == '1, 2, 3'
+    assert index.source(main[3].expr.exprs[0].args) == 'a[1], g'
+
+    # Innermost nodes, parentheses belonging to the enclosing one
+    assert index.source(index.node_at(2, 35)) == 'y'
+    assert index.source(index.node_at(2, 34)) == 'x * (y + 2)'
+    assert index.source(index.node_at(2, 37)) == 'y + 2'
+    assert isinstance(index.node_at(6, 14), ast_classes.ArrayRef)
+    assert index.node_at(3, 12) is ast.gdecls[2].body
+    assert index.node_at(2, 44) is ast
+    assert index.node_at_offset(len(program) - 1) is None
+    assert index.position(index.offset(6, 15)) == (6, 15)
+
+
+def test_matches_a_scan():
+    code = generate_program(functions=3, kernels=1, helpers=1)
+    ast, index = parse_spans(code)
+    spans = index.spans
+    # Spans nest like the tree, and hold the lines of their nodes. Only the
+    # Types copied for each declarator have none
+    stack = [(ast, spans[ast])]
+    while stack:
+        node, (start, end) = stack.pop()
+        if node in spans:
+            assert start <= spans[node][0] <= spans[node][1] <= end
+            start, end = spans[node]
+            if node.coord is not None and node.coord.line:
+                assert index.position(start)[0] <= node.coord.line <= \
+                    index.position(end - 1)[0]
+        else:
+            assert isinstance(node, ast_classes.Type)
+        stack.extend((child, (start, end)) for _, child in node.children())
+
+    order = list(spans)
+    for offset in range(0, len(code), 7):
+        inside = [node for node in order if spans[node][0] <= offset < spans[node][1]]
+        expected = min(inside, key=lambda node: spans[node][1] - spans[node][0], default=None)
+        assert index.node_at_offset(offset) is expected
+
+
+def test_spans_are_optional():
+    parser = UCParser()
+    assert repr(parser.parse(program)) == repr(parse_spans(program)[0])
+    assert parser.spans is None
@@ -0,0 +1,73 @@
+import io
+
+from benchmarks.generator import generate_program
+from parser import ast_classes
+from parser.unparse import to_source, write_source
+
+
+program = r'''
+int v[3] = {1, 2, 3}, *p, *a[3], n = -1;
+float f = 0.5;
+char s[] = "uc";
+
+int mix(int x, float y) {
+    int r;
+    r = (x + 1) * (x - (2 - x)) / -x % 3;
+    r += - -x;
+    r = !(x > 1 && x < 9 || x == 0) && (x <= 2);
+    if (x)
+        if (r) r = 1; else r = 2;
+    if (x) {
+        if (r) r = 3;
+    } else if (r != 0) r = 4;
+    else ;
+    while (r > 0) r--;
+    for (int i = 0, j; i < 3; i++) {
+        j = (int)y + v[i];
+        print(j, "j");
+    }
+    for (;;) break;
+    assert r == 0;
+    return (r = x, r + 1);
+}
+
+void main() {
+    read(n);
+    print(mix(n, (float)n * f));
+    return;
+}
+'''
+
+
+def round_trip(parse, code):
+    ast = parse(code)
+    source = to_source(ast)
+    assert repr(parse(source)) == repr(ast)
+    return source
+
+
+def test_round_trip(parse):
+    source = round_trip(parse, program)
+    assert 'r = (x + 1) * (x - (2 - x)) / -x % 3;' in source
+    assert 'r += - -x;' in source
+    assert 'int v[3] = {1, 2, 3}, *p, *a[3], n = -1;' in source
+    with open('test.uc') as f:
+        round_trip(parse, f.read())
+    round_trip(parse, generate_program(functions=4, kernels=2, helpers=2))
+
+
+def test_built_trees():
+    a, b, c = (ast_classes.ID(name) for name in 'abc')
+    product = ast_classes.BinaryOp('*', ast_classes.BinaryOp('+', a, b), c)
+    assert to_source(product) == '(a + b) * c'
+    negative = ast_classes.Constant('int', -2)
+    assert to_source(ast_classes.BinaryOp('-', a, negative)) == 'a - -2'
+    assert to_source(ast_classes.UnaryOp('-', negative)) == '- -2'
+    assert to_source(ast_classes.Constant('float', 1e-05)) == '0.00001'
+
+    # An inner if without else takes braces, or it would take the else
+    inner = ast_classes.If(a, ast_classes.Break(), None)
+    outer = ast_classes.If(b, inner, ast_classes.Compound(None))
+    buf = io.StringIO()
+    write_source(outer, buf, indent='  ')
+    assert buf.getvalue() == 'if (b) {\n  if (a)\n    break;\n} else {\n  ;\n}\n'
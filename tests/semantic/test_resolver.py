@@ -0,0 +1,103 @@
+from parser import ast_classes
+from semantic.resolver import NameResolver
+from semantic.symtab import SymbolTable
+
+
+program = r'''
+int n = 3;
+
+int doubleMe (int x) {
+    return x * n;
+}
+
+int main () {
+    int v = n;
+    {
+        int v = 2;
+        v = v + 1;
+    }
+    for (int i = 0; i < v; i++)
+        v = doubleMe(i);
+    return v;
+}
+'''
+
+
+def find(node, cls):
+    found = [node] if isinstance(node, cls) else []
+    for _, child in node.children():
+        found += find(child, cls)
+    return found
+
+
+def test_symbol_table():
+    symtab = SymbolTable()
+    outer = symtab.declare('x', None, 'var')
+    symtab.enter_scope()
+    inner = symtab.declare('x', None, 'var')
+    assert symtab.declare('x', None, 'var') is None
+    assert symtab.lookup('x') is inner
+    symtab.exit_scope()
+    assert symtab.lookup('x') is outer
+    assert [s.id for s in symtab.symbols] == [0, 1]
+
+
+def test_resolve(parse, error_func, errors):
+    ast = parse(program)
+    symtab = NameResolver(error_func).resolve(ast)
+    assert errors == []
+    assert [s.name for s in symtab.symbols] == ['n', 'doubleMe', 'x', 'main', 'v', 'v', 'i']
+
+    ids = find(ast, ast_classes.ID)
+    assert all(i.symbol is not None and i.symbol.name == i.name for i in ids)
+    # the inner block uses its own v, the for loop the outer one
+    v_ids = [i for i in ids if i.name == 'v']
+    assert [i.symbol.id for i in v_ids] == [5, 5, 4, 4, 4]
+    call = find(ast, ast_classes.FuncCall)[0]
+    assert call.name.symbol.kind == 'func'
+    assert call.name.symbol.decl is ast.gdecls[1].decl
+
+
+def test_errors(parse, error_func, errors):
+    ast = parse('int x;\nint x;\nint main() { return y; }')
+    NameResolver(error_func).resolve(ast)
+    assert errors == [(2, "Name 'x' is already declared in this scope"),
+                      (3, "Undeclared name 'y'")]
+
+
+def test_prototypes(parse, error_func, errors):
+    ast = parse(r'''
+int odd(int n);
+int even(int n) {
+    if (n == 0) return 1;
+    return odd(n - 1);
+}
+int odd(int n) {
+    if (n == 0) return 0;
+    return even(n - 1);
+}
+''')
+    NameResolver(error_func).resolve(ast)
+    assert errors == []
+    calls = find(ast, ast_classes.FuncCall)
+    assert [call.name.name for call in calls] == ['odd', 'even']
+    # The prototype and the definition share the symbol of odd
+    odd = calls[0].name.symbol
+    assert ast.gdecls[0].decls[0].name.symbol is odd is ast.gdecls[2].decl.name.symbol
+    assert odd.decl is ast.gdecls[2].decl
+    assert calls[1].name.symbol.decl is ast.gdecls[1].decl
+
+
+def test_prototype_errors(parse, error_func, errors):
+    ast = parse('int f(int a);\nint f(float a) { return 0; }\n'
+                'int g();\nint g() { return 0; }\nint g() { return 1; }\nint h();')
+    NameResolver(error_func).resolve(ast)
+    assert errors == [(2, "Conflicting declarations of function 'f'"),
+                      (5, "Function 'g' is already defined"),
+                      (6, "Function 'h' is declared but never defined")]
+
+
+def test_deep_expression(parse, error_func, errors):
+    ast = parse('int x = 1;\nint y = ' + ' + '.join(['x'] * 5000) + ';')
+    NameResolver(error_func).resolve(ast)
+    assert errors == []
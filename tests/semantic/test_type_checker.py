@@ -0,0 +1,53 @@
+from semantic.resolver import NameResolver
+from semantic.type_checker import TypeChecker
+from semantic.uc_types import ArrayType, FloatType, IntType
+
+
+def check(ast, error_func):
+    NameResolver(error_func).resolve(ast)
+    TypeChecker(error_func).check(ast)
+    return ast
+
+
+def test_annotates_expressions(parse, error_func, errors):
+    ast = check(parse(r'''
+        int v[] = {1, 2, 3};
+        float half(int x) { return (float) x / 2.0; }
+        int main() {
+            float h = half(v[1] + 1);
+            return v[0] * 2 < 3;
+        }'''), error_func)
+    assert errors == []
+    assert ast.gdecls[0].decls[0].name.symbol.type == ArrayType(IntType, 3)
+    body = ast.gdecls[2].body.block_items
+    call = body[0].init
+    assert call.uc_type is FloatType
+    assert call.args.uc_type is IntType
+    assert call.args.left.uc_type is IntType
+    assert body[1].expr.uc_type is IntType
+
+
+def test_errors(parse, error_func, errors):
+    check(parse(r'''
+int f(int a) { return a; }
+void main() {
+    int x = 1.5;
+    float y = 1.0;
+    y = x + y;
+    x = f(1, 2);
+    x[0] = 1;
+    return 1;
+}'''), error_func)
+    assert errors == [
+        (4, 'Cannot initialize int with float'),
+        (6, "Binary operator '+' does not have matching types: int and float"),
+        (7, 'Function expects 1 argument(s), 2 given'),
+        (8, 'Subscripted value of type int is not an array'),
+        (9, 'Return of int in function returning void'),
+    ]
+
+
+def test_deep_expression(parse, error_func, errors):
+    ast = check(parse('int x = 1;\nint y = ' + ' + '.join(['x'] * 5000) + ';'), error_func)
+    assert errors == []
+    assert ast.gdecls[1].decls[0].init.uc_type is IntType
@@ -10,6 +10,22 @@
 import sys
 from contextlib import contextmanager
 from parser.uc_parser import UCParser
+from parser.interning import Interner
+from parser.ast_export import export_json, export_jsonl
+from parser.unparse import write_source
+from semantic.resolver import NameResolver
+from semantic.type_checker import TypeChecker
+from optimizer.constant_folding import ConstantFolder
+from optimizer.cse import CommonSubexpressions
+from optimizer.dce import DeadCodeEliminator
+from optimizer.inline import BUDGET, Inliner
+from optimizer.loops import LoopOptimizer
+from interpreter.bytecode import BytecodeCompiler
+from interpreter.evaluator import Evaluator
+from interpreter.vm import VM
+from interpreter.runtime import UCRuntimeError
+from interpreter.transpiler import compile_tree
+from interpreter.batch import STEP_LIMIT, TIME_LIMIT, run_batch
 from parser.lex.uc_lexer import UCLexer
 """
 One of the most important (and difficult) parts of writing a compiler
@@ -102,51 +118,200 @@ def subscribe_errors(handler):
         _subscribers.remove(handler)
 
 
+# Optimization passes, run in the order of their -<name> options after
+# constant folding
+OPTIMIZATIONS = ('inline', 'cse', 'loops', 'dce')
+
+# Extension of the AST file, by format. The source written by -uc must not
+# replace the one it comes from
+AST_EXTENSIONS = {'text': '.ast', 'json': '.json', 'jsonl': '.jsonl', 'uc': '.gen.uc'}
+
+
 class Compiler:
     """ This object encapsulates the compiler and serves as a
         facade interface for the compiler itself.
     """
 
-    def __init__(self):
+    def __init__(self, interner=None, inline_budget=BUDGET):
         self.total_errors = 0
         self.total_warnings = 0
+        self.interner = interner
+        self.inline_budget = inline_budget
 
-    def _parse(self, susy, ast_file, debug):
-        """ Parses the source code. If ast_file != None,
-            or running at susy machine,
-            prints out the abstract syntax tree.
-        """
-        self.parser = UCParser()
+    def _parse(self, debug):
+        """ Parses the source code. """
+        self.parser = UCParser(self.interner)
         self.ast = self.parser.parse(self.code, '', debug)
+
+    def _emit_ast(self, susy, ast_file, ast_format):
+        """ If ast_file != None, or running at susy machine,
+            prints out the abstract syntax tree, in the
+            given ast_format ('text', 'json', 'jsonl' or 'uc',
+            as source).
+        """
         if susy:
             self.ast.show(showcoord=True)
         elif ast_file is not None:
-            self.ast.show(buf=ast_file, showcoord=True)
+            if ast_format == 'json':
+                export_json(self.ast, ast_file)
+            elif ast_format == 'jsonl':
+                export_jsonl(self.ast, ast_file)
+            elif ast_format == 'uc':
+                write_source(self.ast, ast_file)
+            else:
+                self.ast.show(buf=ast_file, showcoord=True)
 
-    def _do_compile(self, susy, ast_file, debug):
-        """ Compiles the code to the given file object. """
-        self._parse(susy, ast_file, debug)
+    def _sema(self):
+        """ Resolves every name of the program to its declaration,
+            then type checks it.
+        """
+        self.symtab = NameResolver(error).resolve(self.ast)
+        TypeChecker(error).check(self.ast)
+
+    def _report(self, message):
+        """ Reports what a pass did on stderr, apart from the output of the
+            program and the AST.
+        """
+        print(message, file=sys.stderr)
+
+    def _fold(self):
+        """ Folds the constant expressions of the checked program. """
+        removed = ConstantFolder().fold(self.ast)
+        self._report("Constant folding removed %d node(s)." % removed)
 
-    def compile(self, code, susy, ast_file, debug):
-        """ Compiles the given code string """
+    def _inline(self):
+        """ Inlines the calls of the checked program to the functions
+            within the size budget, reporting what was done to each one.
+        """
+        inliner = Inliner(self.inline_budget)
+        inliner.inline(self.ast)
+        for line in inliner.report():
+            self._report(line)
+        self._report("Inlining replaced %d call(s)." % inliner.inlined)
+
+    def _cse(self):
+        """ Replaces the common subexpressions of the checked program by
+            temporaries.
+        """
+        cse = CommonSubexpressions()
+        cse.eliminate(self.ast)
+        self._report("Common-subexpression elimination replaced %d expression(s) with %d temporary(ies)."
+                     % (cse.eliminated, cse.temporaries))
+
+    def _loops(self):
+        """ Hoists the loop invariants of the checked program and reduces
+            the strength of the products of its loop counters, reporting
+            what was done in every loop.
+        """
+        loops = LoopOptimizer()
+        loops.optimize(self.ast)
+        for line in loops.report():
+            self._report(line)
+        self._report("Loop optimization hoisted %d invariant(s) and reduced %d multiplication(s)."
+                     % (loops.hoisted, loops.reduced))
+
+    def _dce(self):
+        """ Removes the dead code of the checked program, reporting what was
+            removed from every function.
+        """
+        dce = DeadCodeEliminator()
+        dce.eliminate(self.ast)
+        for line in dce.report():
+            self._report(line)
+        self._report("Dead-code elimination removed %d statement(s)." % dce.removed)
+
+    def _run(self, engine):
+        """ Runs the checked program on the standard streams, with the given
+            engine: 'eval' (the Evaluator), 'vm' (the bytecode VM) or 'py'
+            (the optimized tree translated to Python, with its code cached on
+            disk by its source and the passes applied).
+        """
+        try:
+            if engine == 'vm':
+                program = VM(BytecodeCompiler().compile(self.ast))
+            elif engine == 'py':
+                program = compile_tree(self.ast, self.code, self.applied)
+            else:
+                program = Evaluator(self.ast)
+            self.status = program.run()
+        except UCRuntimeError as e:
+            sys.stdout.flush()
+            error(e.coord.line if e.coord else 0, "Runtime error: %s" % e.message)
+
+    def _do_compile(self, susy, ast_file, debug, ast_format, fold, run, engine, passes):
+        """ Compiles the code to the given file object. """
+        self._parse(debug)
+        if self.ast is None:
+            return
+        errors = errors_reported()
+        self._sema()
+        if errors_reported() != errors:
+            run = False
+        else:
+            if fold:
+                self._fold()
+                self.applied.append('fold')
+            for name in passes:
+                getattr(self, '_' + name)()
+                self.applied.append('inline=%d' % self.inline_budget if name == 'inline' else name)
+        self._emit_ast(susy, ast_file, ast_format)
+        if run:
+            self._run(engine)
+
+    def compile(self, code, susy, ast_file, debug, ast_format='text', fold=False, run=False,
+                engine='eval', passes=()):
+        """ Compiles the given code string, optimizing it with the passes
+            named in passes (see OPTIMIZATIONS). If run, also runs it with
+            engine and returns its exit status.
+        """
         self.code = code
+        self.status = 0
+        # Names of the passes applied to the AST, in order
+        self.applied = []
         with subscribe_errors(lambda msg: sys.stderr.write(msg+"\n")):
-            self._do_compile(susy, ast_file, debug)
+            self._do_compile(susy, ast_file, debug, ast_format, fold, run, engine, passes)
             if errors_reported():
                 sys.stderr.write("{} error(s) encountered.".format(errors_reported()))
-        return 0
+        return self.status
+
+
+def _run_batch(files, cases, jobs, time_limit, steps):
+    """ Runs every program of files on the cases of the directory cases,
+        printing a line per run. Returns the exit status: 0 if all runs
+        passed, 1 otherwise.
+    """
+    programs = []
+    for file in files:
+        with open(file if file[-3:] == '.uc' else file + '.uc') as source:
+            programs.append((file, source.read()))
+    passed, total = run_batch(programs, cases, lambda line: print(line, flush=True),
+                              jobs, time_limit, steps)
+    print("%d of %d run(s) passed." % (passed, total))
+    return 0 if passed == total else 1
 
 
 def run_compiler():
     """ Runs the command-line compiler. """
 
     if len(sys.argv) < 2:
-        print("Usage: ./uc.py <source-file> [-at-susy] [-no-ast] [-debug]")
+        print("Usage: ./uc.py <source-file> [-at-susy] [-no-ast] [-debug] [-json|-jsonl|-uc] [-mem-report] [-fold] [-inline] [-inline-budget=N] [-cse] [-loops] [-dce] [-run] [-vm|-py]")
+        print("       ./uc.py <source-file>... -batch=<cases-dir> [-jobs=N] [-time-limit=SECONDS] [-step-limit=N]")
         sys.exit(1)
 
     emit_ast = True
     susy = False
     debug = False
+    mem_report = False
+    fold = False
+    passes = []
+    inline_budget = BUDGET
+    run = False
+    engine = 'eval'
+    ast_format = 'text'
+    cases = None
+    jobs = None
+    time_limit = TIME_LIMIT
+    steps = STEP_LIMIT
 
     params = sys.argv[1:]
     files = sys.argv[1:]
@@ -159,11 +324,40 @@ def run_compiler():
                 susy = True
             elif param == '-debug':
                 debug = True
+            elif param in ('-json', '-jsonl', '-uc'):
+                ast_format = param[1:]
+            elif param == '-mem-report':
+                mem_report = True
+            elif param == '-fold':
+                fold = True
+            elif param[1:] in OPTIMIZATIONS:
+                passes.append(param[1:])
+            elif param.startswith('-inline-budget='):
+                inline_budget = int(param[15:])
+            elif param == '-run':
+                run = True
+            elif param in ('-vm', '-py'):
+                run = True
+                engine = param[1:]
+            elif param.startswith('-batch='):
+                cases = param[7:]
+            elif param.startswith('-jobs='):
+                jobs = int(param[6:])
+            elif param.startswith('-time-limit='):
+                time_limit = float(param[12:])
+            elif param.startswith('-step-limit='):
+                steps = int(param[12:])
             else:
                 print("Unknown option: %s" % param)
                 sys.exit(1)
             files.remove(param)
 
+    if cases is not None:
+        sys.exit(_run_batch(files, cases, jobs, time_limit, steps))
+
+    # Shared by all the files, so equal payloads are stored only once
+    interner = Interner()
+
     for file in files:
         if file[-3:] == '.uc':
             source_filename = file
@@ -173,7 +367,7 @@ def run_compiler():
         open_files = []
         ast_file = None
         if emit_ast and not susy:
-            ast_filename = source_filename[:-3] + '.ast'
+            ast_filename = source_filename[:-3] + AST_EXTENSIONS[ast_format]
             print("Outputting the AST to %s." % ast_filename)
             ast_file = open(ast_filename, 'w')
             open_files.append(ast_file)
@@ -182,12 +376,16 @@ def run_compiler():
         code = source.read()
         source.close()
 
-        retval = Compiler().compile(code, susy, ast_file, debug)
+        retval = Compiler(interner, inline_budget).compile(
+            code, susy, ast_file, debug, ast_format, fold, run, engine, passes)
         for f in open_files:
             f.close()
         if retval != 0:
             sys.exit(retval)
 
+    if mem_report:
+        sys.stdout.write(interner.report())
+
     sys.exit(retval)
 
 